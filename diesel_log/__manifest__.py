@@ -12,8 +12,10 @@
         'data/sequence.xml',
         'data/sequence_equipment_log.xml',
         'data/mail_activity_type.xml',
+        'data/cron.xml',
         'views/diesel_log_equipment_views.xml',
         'views/diesel_log_views.xml',
+        'views/diesel_fuel_anomaly_views.xml',
         'views/diesel_log_menus.xml',
         'views/fleet_vehicle_views.xml',
         'views/hr_attendance_views.xml',
@@ -2,6 +2,7 @@
 
 from . import res_config_settings
 from . import diesel_log
+from . import diesel_fuel_anomaly
 """Keep only active models; equipment log model kept if still needed separately."""
 try:
 	from . import diesel_equipment_log  # optional legacy
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import math
+import time
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - pure Python fallback
+    np = None
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+def score_fuel_series(vehicle_ids, distances, consumptions, window, min_periods, threshold):
+    """Flag logs whose efficiency departs from the rolling efficiency of their vehicle.
+
+    The inputs are parallel sequences sorted by vehicle, then date. Every log
+    is compared with the mean and standard deviation of the ``window``
+    previous logs of the same vehicle, once at least ``min_periods`` of them
+    exist. Uses NumPy over the whole fleet at once when it is installed.
+
+    :returns: ``[(index, rolling_efficiency, z_score, expected_consumption)]``
+        for the logs with ``|z_score| >= threshold``
+    """
+    if not vehicle_ids:
+        return []
+    if np is not None:
+        return _score_fuel_series_numpy(vehicle_ids, distances, consumptions, window, min_periods, threshold)
+    return _score_fuel_series_python(vehicle_ids, distances, consumptions, window, min_periods, threshold)
+
+
+def _score_fuel_series_numpy(vehicle_ids, distances, consumptions, window, min_periods, threshold):
+    vehicles = np.asarray(vehicle_ids)
+    distance = np.asarray(distances, dtype=float)
+    efficiency = distance / np.asarray(consumptions, dtype=float)
+    size = len(efficiency)
+    positions = np.arange(size)
+    # Rolling sums over the previous ``window`` logs of the same vehicle from prefix sums
+    starts = np.r_[0, np.flatnonzero(vehicles[1:] != vehicles[:-1]) + 1]
+    window_start = np.maximum(np.repeat(starts, np.diff(np.r_[starts, size])), positions - window)
+    count = positions - window_start
+    sums = np.r_[0.0, np.cumsum(efficiency)]
+    squares = np.r_[0.0, np.cumsum(efficiency * efficiency)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (sums[positions] - sums[window_start]) / count
+        spread = np.sqrt(np.clip((squares[positions] - squares[window_start]) / count - mean * mean, 0.0, None))
+        z_score = (efficiency - mean) / spread
+        flagged = np.flatnonzero(
+            (count >= min_periods) & (spread > 1e-6 * np.abs(mean)) & (np.abs(z_score) >= threshold)
+        )
+    return list(zip(
+        flagged.tolist(),
+        mean[flagged].tolist(),
+        z_score[flagged].tolist(),
+        (distance[flagged] / mean[flagged]).tolist(),
+    ))
+
+
+def _score_fuel_series_python(vehicle_ids, distances, consumptions, window, min_periods, threshold):
+    efficiency = [distance / consumption for distance, consumption in zip(distances, consumptions)]
+    sums = list(accumulate(efficiency, initial=0.0))
+    squares = list(accumulate((value * value for value in efficiency), initial=0.0))
+    flagged = []
+    group_start = 0
+    for index, value in enumerate(efficiency):
+        if index and vehicle_ids[index] != vehicle_ids[index - 1]:
+            group_start = index
+        start = max(group_start, index - window)
+        count = index - start
+        if count < min_periods:
+            continue
+        mean = (sums[index] - sums[start]) / count
+        spread = math.sqrt(max((squares[index] - squares[start]) / count - mean * mean, 0.0))
+        if spread <= 1e-6 * abs(mean):
+            continue
+        z_score = (value - mean) / spread
+        if abs(z_score) >= threshold:
+            flagged.append((index, mean, z_score, distances[index] / mean))
+    return flagged
+
+
+class DieselFuelAnomaly(models.Model):
+    """Diesel logs whose efficiency is out of line with their vehicle's recent logs.
+
+    Filled by ``_analyse_fleet``, which scores the whole fleet from one
+    query. Anomalies that were reviewed are kept when the analysis runs
+    again; unreviewed ones disappear once their log no longer stands out.
+    """
+    _name = 'diesel.fuel.anomaly'
+    _description = 'Diesel Fuel Anomaly'
+    _order = 'date desc, id desc'
+    _rec_name = 'log_id'
+
+    log_id = fields.Many2one(
+        'diesel.log',
+        string='Diesel Log',
+        required=True,
+        ondelete='cascade',
+        index=True,
+        readonly=True
+    )
+    vehicle_id = fields.Many2one(related='log_id.vehicle_id', string='Vehicle', store=True, index=True)
+    date = fields.Datetime(related='log_id.date', string='Date', store=True)
+    company_id = fields.Many2one(related='log_id.company_id', string='Company', store=True)
+    kind = fields.Selection([
+        ('loss', 'Fuel Loss'),
+        ('gain', 'Efficiency Spike'),
+    ], string='Type', required=True, readonly=True,
+       help='Fuel Loss: far less distance per liter than usual (possible theft or leak). '
+            'Efficiency Spike: far more than usual (possible odometer or gaje error).')
+    efficiency = fields.Float(string='Efficiency', readonly=True, aggregator='avg')
+    rolling_efficiency = fields.Float(
+        string='Rolling Efficiency',
+        readonly=True,
+        aggregator='avg',
+        help='Mean efficiency of the previous logs of the vehicle.'
+    )
+    z_score = fields.Float(string='Z-Score', readonly=True, digits=(12, 2), aggregator='avg')
+    actual_consumption = fields.Float(string='Actual Consumption', readonly=True)
+    expected_consumption = fields.Float(
+        string='Expected Consumption',
+        readonly=True,
+        help='Fuel the distance of this log needs at the rolling efficiency.'
+    )
+    consumption_delta = fields.Float(
+        string='Excess Fuel',
+        readonly=True,
+        help='Actual minus expected consumption (positive = more fuel used than expected).'
+    )
+    state = fields.Selection([
+        ('new', 'To Review'),
+        ('confirmed', 'Confirmed'),
+        ('dismissed', 'Dismissed'),
+    ], string='Status', default='new', required=True)
+
+    _log_uniq = models.Constraint('UNIQUE(log_id)', 'A diesel log is flagged at most once.')
+
+    def action_confirm(self):
+        self.write({'state': 'confirmed'})
+
+    def action_dismiss(self):
+        self.write({'state': 'dismissed'})
+
+    @api.model
+    def action_run_analysis(self):
+        self._analyse_fleet()
+        return {'type': 'ir.actions.client', 'tag': 'reload'}
+
+    @api.model
+    def cron_analyse_fleet(self):
+        self._analyse_fleet()
+
+    @api.model
+    def _analysis_params(self):
+        params = self.env['ir.config_parameter'].sudo()
+        return (
+            int(params.get_param('diesel_log.anomaly_window', 10) or 10),
+            int(params.get_param('diesel_log.anomaly_min_periods', 5) or 5),
+            float(params.get_param('diesel_log.anomaly_z_threshold', 3.0) or 3.0),
+        )
+
+    @api.model
+    def _analyse_fleet(self, vehicle_ids=None):
+        """Score the diesel logs of ``vehicle_ids`` (all vehicles by default) and sync the anomalies.
+
+        :returns: number of logs flagged
+        """
+        started = time.monotonic()
+        window, min_periods, threshold = self._analysis_params()
+        self.env['diesel.log'].flush_model(['vehicle_id', 'date', 'log_type', 'state', 'odometer_difference', 'fuel_consumption'])
+        query = """
+            SELECT id, vehicle_id, odometer_difference, fuel_consumption
+              FROM diesel_log
+             WHERE log_type = 'diesel'
+               AND state != 'cancel'
+               AND vehicle_id IS NOT NULL
+               AND date IS NOT NULL
+               AND odometer_difference > 0
+               AND fuel_consumption > 0
+        """
+        args = []
+        if vehicle_ids is not None:
+            query += " AND vehicle_id = ANY(%s)"
+            args.append(list(vehicle_ids))
+        self.env.cr.execute(query + " ORDER BY vehicle_id, date, id", args)
+        rows = self.env.cr.fetchall()
+        log_ids, vehicles, distances, consumptions = zip(*rows) if rows else ((), (), (), ())
+        flagged = score_fuel_series(vehicles, distances, consumptions, window, min_periods, threshold)
+
+        results = {}
+        for index, rolling_efficiency, z_score, expected in flagged:
+            results[log_ids[index]] = {
+                'kind': 'loss' if z_score < 0 else 'gain',
+                'efficiency': distances[index] / consumptions[index],
+                'rolling_efficiency': rolling_efficiency,
+                'z_score': z_score,
+                'actual_consumption': consumptions[index],
+                'expected_consumption': expected,
+                'consumption_delta': consumptions[index] - expected,
+            }
+
+        domain = [] if vehicle_ids is None else [('vehicle_id', 'in', list(vehicle_ids))]
+        existing = self.search(domain)
+        stale = existing.filtered(lambda anomaly: anomaly.state == 'new' and anomaly.log_id.id not in results)
+        stale.unlink()
+        for anomaly in existing - stale:
+            vals = results.pop(anomaly.log_id.id, None)
+            if vals:
+                anomaly.write(vals)
+        self.create([dict(vals, log_id=log_id) for log_id, vals in results.items()])
+
+        _logger.info(
+            "Fuel anomaly analysis: %s logs scored, %s flagged in %.2fs",
+            len(rows), len(flagged), time.monotonic() - started,
+        )
+        return len(flagged)
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 
+from collections import defaultdict
+
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import split_every
 from odoo.addons.fleet.models.fleet_vehicle_model import FUEL_TYPES
 
 
@@ -24,21 +27,30 @@ class DieselLog(models.Model):
 
     @api.depends('vehicle_id', 'attendance_check_in', 'attendance_check_out')
     def _compute_old_log_ids(self):
-        for rec in self:
-            if not rec.vehicle_id:
-                rec.old_log_ids = False
-                continue
+        with_vehicle = self.filtered('vehicle_id')
+        (self - with_vehicle).old_log_ids = False
+        if not with_vehicle:
+            return
 
-            domain = [
-                ('vehicle_id', '=', rec.vehicle_id.id),
-                ('id', '!=', rec.id),
-            ]
-            if rec.attendance_check_in:
-                domain.append(('date', '>=', rec.attendance_check_in))
-            if rec.attendance_check_out:
-                domain.append(('date', '<=', rec.attendance_check_out))
+        # One search for all vehicles, narrowed per record in memory
+        domain = [('vehicle_id', 'in', with_vehicle.vehicle_id.ids)]
+        check_ins = [check_in for check_in in with_vehicle.mapped('attendance_check_in') if check_in]
+        check_outs = [check_out for check_out in with_vehicle.mapped('attendance_check_out') if check_out]
+        if len(check_ins) == len(with_vehicle):
+            domain.append(('date', '>=', min(check_ins)))
+        if len(check_outs) == len(with_vehicle):
+            domain.append(('date', '<=', max(check_outs)))
+        logs_by_vehicle = defaultdict(list)
+        for log in self.env['diesel.log'].search(domain, order='date desc'):
+            logs_by_vehicle[log.vehicle_id.id].append(log)
 
-            old_logs = self.env['diesel.log'].search(domain, order='date desc')
+        for rec in with_vehicle:
+            old_logs = self.env['diesel.log'].browse([
+                log.id for log in logs_by_vehicle[rec.vehicle_id.id]
+                if log.id != rec.id
+                and (not rec.attendance_check_in or (log.date and log.date >= rec.attendance_check_in))
+                and (not rec.attendance_check_out or (log.date and log.date <= rec.attendance_check_out))
+            ])
             rec.old_log_ids = old_logs
 
             if rec.log_type == 'equipment':
@@ -150,6 +162,9 @@ class DieselLog(models.Model):
     _description = 'Diesel Log'
     _order = 'create_date desc'
     _inherit = ['mail.thread', 'mail.activity.mixin']  # Enable chatter so message_post works
+
+    # Logs created per batch by the bulk import path
+    _IMPORT_BATCH_SIZE = 500
     
     # Core fields
     name = fields.Char(
@@ -165,6 +180,7 @@ class DieselLog(models.Model):
         'fleet.vehicle',
         string='Vehicle',
         required=False,  # conditionally required only for diesel logs
+        index=True,
         domain="[('company_id', 'in', [company_id, False]), '|', ('fuel_type', '=', False), ('fuel_type', 'in', ['diesel', 'plug_in_hybrid_diesel'])]",
         tracking=True,
         help='Vehicle (required for Diesel logs, optional for Equipment).'
@@ -436,25 +452,28 @@ class DieselLog(models.Model):
                     raise UserError(_('Please configure the Diesel Product in Settings before creating diesel logs.'))
                 vals['product_id'] = diesel_product_id
 
-            vehicle_id = vals.get('vehicle_id')
-            if vehicle_id and not vals.get('last_odometer'):
-                last_odometer = self.env['fleet.vehicle.odometer'].search([
-                    ('vehicle_id', '=', vehicle_id)
-                ], order='value desc', limit=1)
-                vals['last_odometer'] = last_odometer.value if last_odometer else 0.0
-                if last_odometer:
-                    vals['last_odometer_datetime'] = last_odometer.date or last_odometer.create_date
-
-            if vehicle_id and not vals.get('last_gaje'):
-                prev_log = self.env['diesel.log'].search([
-                    ('vehicle_id', '=', vehicle_id)
-                ], order='date desc,id desc', limit=1)
-                vals['last_gaje'] = prev_log.current_gaje if prev_log else 0.0
-
             prepared.append(vals)
 
+        if not self.env.context.get('skip_predecessor_lookup'):
+            lookup_vehicle_ids = {
+                vals['vehicle_id'] for vals in prepared
+                if vals.get('vehicle_id') and not (vals.get('last_odometer') and vals.get('last_gaje'))
+            }
+            odometers, gajes = self._latest_vehicle_readings(lookup_vehicle_ids)
+            for vals in prepared:
+                vehicle_id = vals.get('vehicle_id')
+                if vehicle_id and not vals.get('last_odometer'):
+                    value, reading_date = odometers.get(vehicle_id, (0.0, False))
+                    vals['last_odometer'] = value
+                    if reading_date:
+                        vals['last_odometer_datetime'] = reading_date
+                if vehicle_id and not vals.get('last_gaje'):
+                    vals['last_gaje'] = gajes.get(vehicle_id, 0.0)
+
         records = super(DieselLog, self).create(prepared)
 
+        odometer_vals_list = []
+        link_odometer = 'diesel_log_id' in self.env['fleet.vehicle.odometer']._fields
         for record in records:
             if record.log_type == 'diesel' and not record.product_id:
                 diesel_product_id = record._get_default_product_id()
@@ -473,20 +492,252 @@ class DieselLog(models.Model):
                     'date': record.date or fields.Datetime.now(),
                     'driver_id': driver.id if driver else False,
                 }
-                if 'diesel_log_id' in record.env['fleet.vehicle.odometer']._fields:
+                if link_odometer:
                     odometer_vals['diesel_log_id'] = record.id
-                record.env['fleet.vehicle.odometer'].create(odometer_vals)
+                odometer_vals_list.append(odometer_vals)
 
             if record.log_type == 'diesel':
                 picking = record._create_stock_picking()
                 if picking:
                     record.picking_id = picking.id
 
-            record._sync_shortage_activity()
-
+        if odometer_vals_list:
+            self.env['fleet.vehicle.odometer'].create(odometer_vals_list)
+        records._sync_shortage_activity()
         records._auto_enforce_shortage_workflow()
         return records
 
+    @api.model
+    def _latest_vehicle_readings(self, vehicle_ids):
+        """Return the highest odometer reading and the gaje of the latest log of each vehicle.
+
+        :returns: ``({vehicle_id: (value, reading_datetime)}, {vehicle_id: current_gaje})``
+        """
+        if not vehicle_ids:
+            return {}, {}
+        self.env['fleet.vehicle.odometer'].flush_model(['vehicle_id', 'value', 'date'])
+        self.flush_model(['vehicle_id', 'date', 'current_gaje'])
+        cr = self.env.cr
+        cr.execute("""
+            SELECT DISTINCT ON (vehicle_id) vehicle_id, value, COALESCE(date::timestamp, create_date)
+              FROM fleet_vehicle_odometer
+             WHERE vehicle_id = ANY(%s)
+             ORDER BY vehicle_id, value DESC, id DESC
+        """, [list(vehicle_ids)])
+        odometers = {vehicle_id: (value, reading_date) for vehicle_id, value, reading_date in cr.fetchall()}
+        cr.execute("""
+            SELECT DISTINCT ON (vehicle_id) vehicle_id, current_gaje
+              FROM diesel_log
+             WHERE vehicle_id = ANY(%s)
+             ORDER BY vehicle_id, date DESC NULLS LAST, id DESC
+        """, [list(vehicle_ids)])
+        gajes = {vehicle_id: gaje or 0.0 for vehicle_id, gaje in cr.fetchall()}
+        return odometers, gajes
+
+    def _load_records_create(self, vals_list):
+        if self.env.context.get('import_file'):
+            return self._import_logs(vals_list)
+        return super()._load_records_create(vals_list)
+
+    @api.model
+    def _import_logs(self, vals_list):
+        """Create diesel logs from imported rows, chained per vehicle in date order.
+
+        Diesel rows are keyed on ``(vehicle, date)``. A row already logged
+        updates that log with the values that changed and re-chains the log
+        that follows it, so importing the same file twice changes nothing and
+        a corrected file fixes the readings. Previous readings of all new rows
+        are resolved together (see ``_chain_import_rows``) and the logs are
+        created in batches of ``_IMPORT_BATCH_SIZE``. Returns the logs
+        matching ``vals_list``, in order.
+        """
+        now = fields.Datetime.now()
+        rows = []
+        for vals in vals_list:
+            vals = dict(vals)
+            if vals.get('log_type', 'diesel') == 'diesel':
+                vals['date'] = fields.Datetime.to_datetime(vals.get('date') or now).replace(microsecond=0)
+            rows.append(vals)
+        chained = [
+            index for index, vals in enumerate(rows)
+            if vals.get('log_type', 'diesel') == 'diesel' and vals.get('vehicle_id')
+        ]
+
+        existing = {}
+        if chained:
+            for log in self.search([
+                ('log_type', '=', 'diesel'),
+                ('vehicle_id', 'in', list({rows[index]['vehicle_id'] for index in chained})),
+                ('date', 'in', list({rows[index]['date'] for index in chained})),
+            ]):
+                existing.setdefault((log.vehicle_id.id, log.date), log.id)
+
+        row_keys = {}
+        first_rows = {}
+        for index in chained:
+            key = (rows[index]['vehicle_id'], rows[index]['date'])
+            row_keys[index] = key
+            first_rows.setdefault(key, index)
+        # Existing logs are updated first, so the new rows chain onto their corrected readings
+        updated = self.browse()
+        for key, index in first_rows.items():
+            if key in existing:
+                log = self.browse(existing[key])
+                if log._update_from_import(rows[index]):
+                    updated |= log
+        updated._rechain_successors()
+        new_rows = sorted((index for key, index in first_rows.items() if key not in existing),
+                          key=lambda index: row_keys[index])
+        self._chain_import_rows([rows[index] for index in new_rows])
+
+        to_create = [index for index in range(len(rows)) if index not in row_keys] + new_rows
+        created = {}
+        Logs = self.with_context(skip_predecessor_lookup=True)
+        for batch in split_every(self._IMPORT_BATCH_SIZE, to_create):
+            for index, log in zip(batch, Logs.create([rows[index] for index in batch])):
+                created[index] = log.id
+
+        log_ids = []
+        for index in range(len(rows)):
+            if index in created:
+                log_ids.append(created[index])
+            else:
+                key = row_keys[index]
+                log_ids.append(existing[key] if key in existing else created[first_rows[key]])
+        return self.browse(log_ids)
+
+    def _update_from_import(self, vals):
+        """Write the imported ``vals`` that differ from the log; return whether anything changed."""
+        self.ensure_one()
+        changes = {}
+        for fname, value in vals.items():
+            if fname in ('vehicle_id', 'date', 'log_type'):
+                continue
+            field = self._fields[fname]
+            if field.type in ('one2many', 'many2many'):
+                continue
+            if field.convert_to_record(field.convert_to_cache(value, self), self) != self[fname]:
+                changes[fname] = value
+        if changes:
+            self.write(changes)
+        return bool(changes)
+
+    def _rechain_successors(self):
+        """Point the log following each of ``self`` (per vehicle and date) at its readings."""
+        logs = self.filtered(lambda log: log.vehicle_id and log.date)
+        if not logs:
+            return
+        self.flush_model(['vehicle_id', 'date', 'current_odometer', 'current_gaje'])
+        self.env.cr.execute("""
+            SELECT id, next_id
+              FROM (SELECT id, LEAD(id) OVER (PARTITION BY vehicle_id ORDER BY date, id) AS next_id
+                      FROM diesel_log
+                     WHERE vehicle_id = ANY(%s)
+                       AND date IS NOT NULL) chain
+             WHERE id = ANY(%s)
+               AND next_id IS NOT NULL
+        """, [logs.vehicle_id.ids, logs.ids])
+        for log_id, next_id in self.env.cr.fetchall():
+            log, successor = self.browse(log_id), self.browse(next_id)
+            updates = {
+                'last_odometer': log.current_odometer or 0.0,
+                'last_odometer_datetime': log.date,
+                'last_gaje': log.current_gaje or 0.0,
+            }
+            if any(successor[field] != value for field, value in updates.items()):
+                successor.write(updates)
+
+    @api.model
+    def _chain_import_rows(self, rows):
+        """Set the previous readings of ``rows`` in place.
+
+        ``rows`` are diesel log values sorted by vehicle and date. A single
+        ``LAG()`` window over the vehicles' existing logs and the rows gives
+        every row its predecessor; rows without one start from the highest
+        odometer reading recorded up to their date. Existing logs that now
+        directly follow an imported row are re-chained onto it, so the result
+        does not depend on the order in which files are imported.
+        """
+        if not rows:
+            return
+        self.flush_model(['vehicle_id', 'date', 'current_odometer', 'current_gaje'])
+        self.env['fleet.vehicle.odometer'].flush_model(['vehicle_id', 'value', 'date'])
+        self.env.cr.execute("""
+            WITH incoming AS (
+                SELECT *
+                  FROM unnest(%(seqs)s::int[], %(vehicles)s::int[], %(dates)s::timestamp[])
+                       AS t(seq, vehicle_id, date)
+            ), chain AS (
+                SELECT NULL::int AS seq, l.id, l.vehicle_id, l.date, l.current_odometer, l.current_gaje
+                  FROM diesel_log l
+                 WHERE l.vehicle_id IN (SELECT vehicle_id FROM incoming)
+                   AND l.date IS NOT NULL
+                 UNION ALL
+                SELECT seq, NULL, vehicle_id, date, NULL, NULL
+                  FROM incoming
+            ), ordered AS (
+                SELECT seq, id, vehicle_id, date,
+                       LAG(seq) OVER w AS prev_seq,
+                       LAG(id) OVER w AS prev_id,
+                       LAG(date) OVER w AS prev_date,
+                       LAG(current_odometer) OVER w AS prev_odometer,
+                       LAG(current_gaje) OVER w AS prev_gaje
+                  FROM chain
+                WINDOW w AS (PARTITION BY vehicle_id ORDER BY date, id NULLS LAST, seq)
+            )
+            SELECT o.seq, o.id, o.prev_seq, o.prev_id, o.prev_date, o.prev_odometer, o.prev_gaje,
+                   base.value, base.reading_date
+              FROM ordered o
+              LEFT JOIN LATERAL (
+                    SELECT odo.value, COALESCE(odo.date::timestamp, odo.create_date) AS reading_date
+                      FROM fleet_vehicle_odometer odo
+                     WHERE o.seq IS NOT NULL AND o.prev_seq IS NULL AND o.prev_id IS NULL
+                       AND odo.vehicle_id = o.vehicle_id
+                       AND odo.date <= o.date
+                     ORDER BY odo.value DESC
+                     LIMIT 1
+                   ) base ON TRUE
+             WHERE o.seq IS NOT NULL OR o.prev_seq IS NOT NULL
+        """, {
+            'seqs': list(range(len(rows))),
+            'vehicles': [vals['vehicle_id'] for vals in rows],
+            'dates': [vals['date'] for vals in rows],
+        })
+
+        predecessors = {}
+        successors = []
+        for seq, log_id, prev_seq, prev_id, prev_date, prev_odometer, prev_gaje, base_value, base_date in self.env.cr.fetchall():
+            if seq is None:
+                successors.append((log_id, rows[prev_seq]))
+            elif prev_seq is not None:
+                prev = rows[prev_seq]
+                predecessors[seq] = (prev.get('current_odometer') or 0.0, prev['date'], prev.get('current_gaje') or 0.0)
+            elif prev_id:
+                predecessors[seq] = (prev_odometer or 0.0, prev_date, prev_gaje or 0.0)
+            else:
+                predecessors[seq] = (base_value or 0.0, base_date or False, 0.0)
+
+        # Only the chained inputs are set: the balance fields are computed for
+        # each created batch at once from them.
+        for seq, vals in enumerate(rows):
+            odometer, odometer_date, gaje = predecessors[seq]
+            if not vals.get('last_odometer'):
+                vals['last_odometer'] = odometer
+                if odometer_date:
+                    vals['last_odometer_datetime'] = odometer_date
+            if not vals.get('last_gaje'):
+                vals['last_gaje'] = gaje
+
+        for log_id, prev in successors:
+            log = self.browse(log_id)
+            updates = {
+                'last_odometer': prev.get('current_odometer') or 0.0,
+                'last_odometer_datetime': prev['date'],
+                'last_gaje': prev.get('current_gaje') or 0.0,
+            }
+            if any(log[field] != value for field, value in updates.items()):
+                log.write(updates)
+
     def write(self, vals):
         res = super(DieselLog, self).write(vals)
         if 'current_odometer' in vals:
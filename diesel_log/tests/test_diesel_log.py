@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 
-from odoo.tests.common import TransactionCase
+import random
+import time
+from datetime import timedelta
+
+from odoo.tests.common import BaseCase, TransactionCase, tagged
 from odoo.exceptions import ValidationError, UserError
 from odoo import fields
 
+from odoo.addons.diesel_log.models.diesel_fuel_anomaly import score_fuel_series
+
 
 class TestDieselLog(TransactionCase):
     
@@ -350,3 +356,103 @@ class TestDieselLog(TransactionCase):
         
         # Should not see diesel log from first company
         self.assertNotIn(diesel_log1, diesel_logs_company2)
+
+    def test_bulk_import_chains_logs_and_is_idempotent(self):
+        """Imported logs chain per vehicle whatever the file order; re-importing only applies changed values"""
+        self.vehicle.gaje_liter = 10.0
+        start = fields.Datetime.now().replace(microsecond=0) + timedelta(days=1)
+        rows = [{
+            'vehicle_id': self.vehicle.id,
+            'date': start + timedelta(days=day),
+            'quantity': quantity,
+            'current_odometer': odometer,
+            'current_gaje': gaje,
+            'company_id': self.company.id,
+        } for day, quantity, odometer, gaje in [(0, 40.0, 50100, 3.0), (1, 20.0, 50200, 4.0), (2, 30.0, 50300, 2.0)]]
+        Logs = self.env['diesel.log'].with_company(self.company)
+
+        first, third = Logs._import_logs([rows[2], rows[0]])
+        self.assertEqual(third.last_gaje, 3.0)
+        self.assertEqual(third.last_odometer, 50100)
+        self.assertEqual(first.last_odometer, 50000)
+
+        second, first_again = Logs._import_logs([rows[1], rows[0]])
+        self.assertEqual(first_again, first)
+        self.assertEqual((second.last_odometer, second.last_gaje), (50100, 3.0))
+        self.assertEqual(second.opening_diesel, 30.0)
+        self.assertEqual(second.closing_diesel, 40.0)
+        self.assertEqual(second.fuel_consumption, 10.0)
+        self.assertEqual(second.fuel_efficiency, 10.0)
+        # The log imported first is re-chained onto its new predecessor
+        self.assertEqual((third.last_odometer, third.last_gaje), (50200, 4.0))
+        self.assertEqual(third.fuel_consumption, 50.0)
+        self.assertEqual(third.fuel_efficiency, 2.0)
+
+        logs = first | second | third
+        snapshot = logs.read(['last_odometer', 'last_gaje', 'fuel_consumption', 'fuel_short', 'write_date'])
+        again = Logs._import_logs(rows)
+        self.assertEqual(again, first + second + third)
+        self.assertEqual(Logs.search_count([('vehicle_id', '=', self.vehicle.id)]), 3)
+        self.assertEqual(logs.read(['last_odometer', 'last_gaje', 'fuel_consumption', 'fuel_short', 'write_date']), snapshot)
+
+        # A corrected file updates the logged row and re-chains the log that follows it
+        corrected = dict(rows[1], quantity=25.0, current_gaje=5.0)
+        self.assertEqual(Logs._import_logs([corrected]), second)
+        self.assertEqual((second.quantity, second.current_gaje), (25.0, 5.0))
+        self.assertEqual(second.fuel_consumption, 5.0)
+        self.assertEqual(third.last_gaje, 5.0)
+        self.assertEqual(third.fuel_consumption, 60.0)
+        self.assertEqual(Logs.search_count([('vehicle_id', '=', self.vehicle.id)]), 3)
+
+    def test_fuel_anomaly_analysis(self):
+        """A log far below its vehicle's rolling efficiency is flagged once, and reviews survive re-analysis"""
+        params = self.env['ir.config_parameter'].sudo()
+        params.set_param('diesel_log.anomaly_window', 5)
+        params.set_param('diesel_log.anomaly_min_periods', 3)
+        params.set_param('diesel_log.anomaly_z_threshold', 2.0)
+        start = fields.Datetime.now().replace(microsecond=0) + timedelta(days=1)
+        logs = self.env['diesel.log'].with_company(self.company)._import_logs([{
+            'vehicle_id': self.vehicle.id,
+            'date': start + timedelta(days=day),
+            'quantity': quantity,
+            'current_odometer': 50100 + 100 * day,
+            'company_id': self.company.id,
+        } for day, quantity in enumerate([10.0, 11.0, 9.0, 10.0, 11.0, 25.0])])
+
+        Anomaly = self.env['diesel.fuel.anomaly']
+        self.assertEqual(Anomaly._analyse_fleet(self.vehicle.ids), 1)
+        anomaly = Anomaly.search([('vehicle_id', '=', self.vehicle.id)])
+        self.assertEqual(anomaly.log_id, logs[-1])
+        self.assertEqual(anomaly.kind, 'loss')
+        self.assertAlmostEqual(anomaly.rolling_efficiency, 9.8586, places=3)
+        self.assertLess(anomaly.z_score, -2.0)
+        self.assertAlmostEqual(anomaly.consumption_delta, 25.0 - 100 / anomaly.rolling_efficiency, places=6)
+
+        anomaly.action_confirm()
+        Anomaly._analyse_fleet(self.vehicle.ids)
+        self.assertEqual(Anomaly.search([('vehicle_id', '=', self.vehicle.id)]), anomaly)
+        self.assertEqual(anomaly.state, 'confirmed')
+
+
+@tagged('-standard', 'diesel_log_benchmark')
+class TestFuelAnomalyBenchmark(BaseCase):
+
+    def test_score_one_million_logs(self):
+        """Score a synthetic fleet of 300 vehicles and 1M logs (run with --test-tags diesel_log_benchmark)"""
+        rng = random.Random(42)
+        vehicles, distances, consumptions = [], [], []
+        for vehicle in range(300):
+            for _index in range(3334):
+                distance = rng.uniform(80.0, 120.0)
+                consumption = distance / rng.gauss(10.0, 0.5)
+                if rng.random() < 0.001:
+                    consumption *= 3
+                vehicles.append(vehicle)
+                distances.append(distance)
+                consumptions.append(consumption)
+
+        started = time.monotonic()
+        flagged = score_fuel_series(vehicles, distances, consumptions, 10, 5, 3.0)
+        elapsed = time.monotonic() - started
+        self.assertTrue(flagged)
+        self.assertLess(elapsed, 10.0, "Scoring %s logs took %.2fs" % (len(vehicles), elapsed))
@@ -291,8 +291,7 @@ class WebhookController(http.Controller):
                     _logger.error("Empty Text: %s", text)
                     return {'status': 'error', 'message': f'Empty Text: {text}'}
                 
-                _texttohtml_utils = texttohtml_utils.TextToHtmlUtils()                   
-                message = _texttohtml_utils.clean_html_for_whatsapp(text)
+                message = texttohtml_utils.clean_html_for_whatsapp(text)
 
             data.append({
                         "text" :  f"{message}"
@@ -37,6 +37,11 @@ class WhatsappAccount(models.Model):
         sanitize=False,
         help="Optional greeting sent when an unknown contact reaches out.",
     )
+    send_rate_limit = fields.Float(
+        string="Send Rate (msg/s)",
+        default=20.0,
+        help="Maximum messages per second dispatched to this account by the blasting queue. 0 disables throttling.",
+    )
     ir_deployment = fields.Char(string="Deployment", compute="_compute_ir_deployment")
     invisible_trial = fields.Boolean(string="Invisible Trial")
     whatsapp_number = fields.Char(
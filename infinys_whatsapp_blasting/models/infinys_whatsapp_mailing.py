@@ -7,6 +7,7 @@ from odoo.exceptions import UserError
 from ..utils import waha_utils
 from ..utils import texttohtml_utils
 from ..utils import n8n_utils
+from ..utils import send_engine
 
 
 _logger = logging.getLogger(__name__)
@@ -250,8 +251,10 @@ class WhatsappMailing(models.Model):
                 raise UserError(_("No active contacts found !!."))
 
             self.mailing_queue(record, contact_ids, 'send now') 
-            # Immediately flush the queue so recipients are actually contacted.
-            self._execute_enqueue()
+            # Wake the scheduler up so the queue is sent right away, outside this request
+            cron = self.env.ref('infinys_whatsapp_blasting.ir_cron_send_whatsapp_blasting', raise_if_not_found=False)
+            if cron:
+                cron.sudo()._trigger()
             message = f"Processing message from {self.whatsapp_config_id.whatsapp_number} with total recipients: {total_contact} on queue"
             _logger.info(f"Sending message to {self.whatsapp_config_id.whatsapp_number} ")
             
@@ -394,7 +397,6 @@ class WhatsappMailing(models.Model):
             ('schedule_date', '<=', one_minute_after)
         ])
 
-        enqueue_needed = False
         if records:
             _logger.info("Found records to process: %s", records)
             for record in records:
@@ -405,10 +407,9 @@ class WhatsappMailing(models.Model):
                     record.write({'state': 'failed', 'error_msg': str(exc)})
                     continue
                 self.mailing_queue(record, contacts, record.state)
-                enqueue_needed = True
 
-        if enqueue_needed:
-            self._execute_enqueue()
+        # Also sends the messages queued by "Send Now" and the retries that are due
+        self._execute_enqueue()
 
         return True
 
@@ -428,31 +429,73 @@ class WhatsappMailing(models.Model):
                 parts.append("<em>%s</em>" % tools.html_escape(template.footer_text))
             mailing.wa_template_preview = '<br/>'.join(parts)
     
+    def _get_send_settings(self):
+        params = self.env['ir.config_parameter'].sudo()
+
+        def _num(key, default, cast=int):
+            try:
+                return cast(params.get_param(key, default))
+            except (TypeError, ValueError):
+                return default
+
+        return {
+            'batch_size': max(_num('infinys_whatsapp_blasting.send_batch_size', 500), 1),
+            'workers': max(_num('infinys_whatsapp_blasting.send_workers', send_engine.DEFAULT_WORKERS), 1),
+            'timeout': _num('infinys_whatsapp_blasting.send_timeout', send_engine.DEFAULT_TIMEOUT, float),
+            'max_attempts': max(_num('infinys_whatsapp_blasting.send_max_attempts', 5), 1),
+            'retry_delay': max(_num('infinys_whatsapp_blasting.send_retry_delay', 60, float), 0.0),
+        }
+
     def _execute_enqueue(self):
         _logger.info("__execute_queue")
-        
-        records = self.env['infinys.whatsapp.sent'].search([('is_queued', '=', True)],limit=10)
-        
-        for record in records:
+        settings = self._get_send_settings()
+        Sent = self.env['infinys.whatsapp.sent']
+
+        records = Sent._claim_queued(settings['batch_size'])
+        if not records:
+            return True
+
+        limiters = {
+            account.id: send_engine.get_limiter((self.env.cr.dbname, account.id), account.send_rate_limit)
+            for account in records.config_id
+        }
+        outcomes = {}
+
+        waha_records = records.filtered(lambda r: self._should_use_waha(r.config_id))
+        jobs = []
+        for record in waha_records:
             try:
-                record.error_msg = ""
-                if self._should_use_waha(record.config_id):
-                    self._send_via_waha(record)
-                else:
+                jobs.append(self._prepare_waha_job(record))
+            except Exception as e:
+                outcomes[record.id] = f"Error in _execute_enqueue: {e}"
+        for key, error in send_engine.dispatch(
+            jobs, limiters, max_workers=settings['workers'], timeout=settings['timeout'],
+        ).items():
+            outcomes[key] = error and f"Error in _execute_enqueue: {error}"
+
+        # The native WhatsApp transport goes through the ORM, so it stays on
+        # the cursor thread; the per-account budget still applies.
+        for record in records - waha_records:
+            limiters[record.config_id.id].acquire()
+            try:
+                with self.env.cr.savepoint():
                     self._send_via_meta(record)
-                record.is_queued = False
-
+                outcomes[record.id] = False
             except Exception as e:
                 _logger.error(f"Error in _execute_enqueue: {e}")
-                record.error_msg = f"Error in _execute_enqueue: {e}"
-                record.is_queued = True
+                outcomes[record.id] = f"Error in _execute_enqueue: {e}"
 
+        Sent._apply_send_outcomes(outcomes, settings['max_attempts'], settings['retry_delay'])
+        _logger.info(
+            "Processed %s queued WhatsApp messages (%s failed)",
+            len(outcomes), len([error for error in outcomes.values() if error]),
+        )
         return True
 
     def _should_use_waha(self, account):
         return bool(account and getattr(account, 'provider', False) == 'waha' and account.webhook_url)
 
-    def _send_via_waha(self, record):
+    def _prepare_waha_payload(self, record):
         contact = record.contact_id
         contact_data = ({
            "sent_id" : f"{record.id}",
@@ -461,9 +504,8 @@ class WhatsappMailing(models.Model):
            "contact_whatsapp" : f"{record.from_number}",
             "message" : f"{record.body}",
         })
-        _logger.info(f"Sending contact_data: {contact_data}")
 
-        payload = {
+        return {
             "jsonrpc": "2.0",
             "wa_config_id": f"{record.config_id.id}",
             "wa_config_name": f"{record.config_id.name}",
@@ -476,6 +518,25 @@ class WhatsappMailing(models.Model):
             "contact": f"{json.dumps(contact_data)}"
         }
 
+    def _prepare_waha_job(self, record):
+        """Build a self-contained HTTP job that can run outside the cursor thread."""
+        config = record.config_id
+        url, headers = n8n_utils.build_request(
+            record,
+            config.webhook_url,
+            config.authentication_user,
+            config.authentication_password,
+        )
+        return {
+            'key': record.id,
+            'limiter_key': config.id,
+            'url': url,
+            'headers': headers,
+            'payload': self._prepare_waha_payload(record),
+        }
+
+    def _send_via_waha(self, record):
+        payload = self._prepare_waha_payload(record)
         _logger.info(f"Sending payload: {payload}")
                     
         n8n_utils.send_message(
@@ -484,6 +545,7 @@ class WhatsappMailing(models.Model):
             record.config_id.authentication_user,
             record.config_id.authentication_password,
             payload,
+            timeout=self._get_send_settings()['timeout'],
         )
 
     def _send_via_meta(self, record):
@@ -1,4 +1,7 @@
 import logging
+from collections import defaultdict
+from datetime import timedelta
+
 from odoo import api, fields, models
 from odoo.exceptions import UserError
 
@@ -16,7 +19,12 @@ class WhatsappSentMessage(models.Model):
     body = fields.Text(string="Message", help="The main content of the message.")
     json_message = fields.Text(string="JSON Message", help="The main content of the message.")
     json_contact = fields.Text(string="JSON Contact")
-    is_queued = fields.Boolean(string="Is Queued", default=True)
+    is_queued = fields.Boolean(string="Is Queued", default=True, index=True)
+    is_failed = fields.Boolean(string="Failed", default=False, readonly=True,
+                               help="Set once the message is dropped from the queue after its last attempt.")
+    send_attempts = fields.Integer(string="Attempts", default=0, readonly=True)
+    next_try_at = fields.Datetime(string="Next Try", default=fields.Datetime.now, index=True, readonly=True,
+                                  help="The queue does not pick the message up before this time.")
     quotedMsgId = fields.Char(string="Quoted Message ID")
 
     config_id = fields.Many2one('whatsapp.account', string="WhatsApp Account", required=True, ondelete='cascade')
@@ -65,3 +73,50 @@ class WhatsappSentMessage(models.Model):
         for record in self:
             if record.create_date:
                 record.order_month = record.create_date.strftime("%Y-%b")
+
+    def _claim_queued(self, limit):
+        """Lock and return up to ``limit`` queued messages that are due, oldest due first.
+
+        ``SKIP LOCKED`` lets overlapping cron runs claim disjoint batches
+        instead of sending the same rows twice.
+        """
+        self.flush_model(['is_queued', 'next_try_at'])
+        self.env.cr.execute("""
+            SELECT id
+              FROM infinys_whatsapp_sent
+             WHERE is_queued
+               AND (next_try_at IS NULL OR next_try_at <= %s)
+          ORDER BY next_try_at NULLS FIRST, id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, [fields.Datetime.now(), limit])
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _apply_send_outcomes(self, outcomes, max_attempts, retry_delay):
+        """Write ``{sent_id: error_message or False}`` back, grouping the writes per outcome.
+
+        A failed message stays queued until ``retry_delay`` seconds, doubled
+        at every further attempt, have passed; after ``max_attempts`` it is
+        dropped from the queue and marked as failed.
+        """
+        now = fields.Datetime.now()
+        attempts = {record.id: record.send_attempts for record in self.browse(list(outcomes))}
+        by_outcome = defaultdict(list)
+        for sent_id, error in outcomes.items():
+            if not error:
+                by_outcome[False, 0].append(sent_id)
+            else:
+                by_outcome[error, attempts[sent_id] + 1].append(sent_id)
+        for (error, attempt), ids in by_outcome.items():
+            if not error:
+                vals = {'is_queued': False, 'is_failed': False, 'error_msg': ""}
+            elif attempt >= max_attempts:
+                vals = {'is_queued': False, 'is_failed': True, 'error_msg': error, 'send_attempts': attempt}
+            else:
+                vals = {
+                    'is_queued': True,
+                    'error_msg': error,
+                    'send_attempts': attempt,
+                    'next_try_at': now + timedelta(seconds=retry_delay * 2 ** (attempt - 1)),
+                }
+            self.browse(ids).write(vals)
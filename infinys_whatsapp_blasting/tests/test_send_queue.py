@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase, TransactionCase
+
+from odoo.addons.infinys_whatsapp_blasting.utils import send_engine
+
+
+@tagged('post_install', '-at_install')
+class TestWhatsappSendQueue(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.account = cls.env['whatsapp.account'].create({
+            'name': 'Blasting Account',
+            'account_uid': 'blasting-account',
+            'app_secret': 'secret',
+            'app_uid': 'blasting-app',
+            'phone_uid': '6281200000000',
+            'token': 'token',
+        })
+        cls.contact = cls.env['infinys.whatsapp.contact'].create({
+            'partner_id': cls.env['res.partner'].create({'name': 'Blast Contact', 'phone': '6281211111111'}).id,
+        })
+        cls.Sent = cls.env['infinys.whatsapp.sent']
+
+    def _queue(self, count, **vals):
+        return self.Sent.create([dict({
+            'name': 'Queued %s' % index,
+            'config_id': self.account.id,
+            'contact_id': self.contact.id,
+            'from_number': '6281211111111',
+            'to_number': '6281200000000',
+            'body': 'Hello',
+        }, **vals) for index in range(count)])
+
+    def test_claim_due_messages_by_next_try(self):
+        """Only due messages are claimed, the longest waiting first"""
+        now = fields.Datetime.now()
+        later, first, second = self._queue(3)
+        later.next_try_at = now + timedelta(minutes=5)
+        first.next_try_at = now - timedelta(minutes=10)
+        second.next_try_at = now - timedelta(minutes=1)
+        claimed = self.Sent._claim_queued(10)
+        self.assertEqual(claimed.filtered(lambda sent: sent in later | first | second).ids, [first.id, second.id])
+
+    def test_failed_send_backs_off_then_fails(self):
+        """A failing message is retried later with a growing delay, then dropped as failed"""
+        failing, ok = self._queue(2)
+        self.Sent._apply_send_outcomes({failing.id: 'timeout', ok.id: False}, max_attempts=3, retry_delay=60)
+        self.assertEqual((ok.is_queued, ok.is_failed, ok.send_attempts), (False, False, 0))
+        self.assertTrue(failing.is_queued)
+        self.assertEqual(failing.send_attempts, 1)
+        first_try = failing.next_try_at
+        self.assertGreater(first_try, fields.Datetime.now() + timedelta(seconds=30))
+        self.assertNotIn(failing, self.Sent._claim_queued(100), 'A message is not retried before its next try.')
+
+        self.Sent._apply_send_outcomes({failing.id: 'timeout'}, max_attempts=3, retry_delay=60)
+        self.assertEqual(failing.send_attempts, 2)
+        self.assertGreater(failing.next_try_at, first_try, 'The delay doubles at every attempt.')
+
+        self.Sent._apply_send_outcomes({failing.id: 'timeout'}, max_attempts=3, retry_delay=60)
+        self.assertEqual((failing.is_queued, failing.is_failed, failing.send_attempts), (False, True, 3))
+        self.assertEqual(failing.error_msg, 'timeout')
+
+    def test_execute_enqueue_retries_up_to_max_attempts(self):
+        """A message failing at every run is retried by the next run, then failed after the last attempt"""
+        params = self.env['ir.config_parameter'].sudo()
+        params.set_param('infinys_whatsapp_blasting.send_max_attempts', 2)
+        params.set_param('infinys_whatsapp_blasting.send_retry_delay', 0)
+        limiter_key = (self.env.cr.dbname, self.account.id)
+        self.addCleanup(send_engine._limiters.pop, limiter_key, None)
+        sent = self._queue(1)
+        Mailing = self.env['infinys.whatsapp.mailing']
+
+        def send_via_meta(mailing, record):
+            raise UserError("Graph API unavailable")
+
+        with patch.object(type(Mailing), '_send_via_meta', send_via_meta):
+            Mailing._execute_enqueue()
+            self.assertEqual((sent.is_queued, sent.send_attempts), (True, 1))
+            limiter = send_engine._limiters[limiter_key]
+            Mailing._execute_enqueue()
+        self.assertEqual((sent.is_queued, sent.is_failed, sent.send_attempts), (False, True, 2))
+        self.assertIn("Graph API unavailable", sent.error_msg)
+        self.assertIs(send_engine._limiters[limiter_key], limiter, 'The rate budget carries over between runs.')
+
+    def test_send_now_only_queues(self):
+        """Send Now queues the recipients for the scheduler instead of sending in the request"""
+        mailing = self.env['infinys.whatsapp.mailing'].create({
+            'name': 'Queue Only Mailing',
+            'whatsapp_config_id': self.account.id,
+            'recipients': 'mailinglistcontact',
+            'contact_ids': [(6, 0, self.contact.ids)],
+            'message': '<p>Hello {{contact.name}}</p>',
+        })
+        mailing.btn_send_now()
+        sent = self.Sent.search([('mailing_id', '=', mailing.id)])
+        self.assertEqual(len(sent), 1)
+        self.assertTrue(sent.is_queued)
+        self.assertEqual(sent.send_attempts, 0, 'Nothing should be sent before the scheduler runs.')
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@tagged('post_install', '-at_install')
+class TestRateLimiter(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        self.clock = FakeClock()
+        for name in ('monotonic', 'sleep'):
+            patcher = patch.object(send_engine.time, name, getattr(self.clock, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(send_engine._limiters.clear)
+
+    def test_acquire_waits_once_the_burst_is_spent(self):
+        limiter = send_engine.RateLimiter(2)
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(self.clock.slept, [])
+        limiter.acquire()
+        self.assertEqual(self.clock.slept, [0.5])
+
+    def test_zero_rate_never_waits(self):
+        limiter = send_engine.RateLimiter(0)
+        for _index in range(100):
+            limiter.acquire()
+        self.assertEqual(self.clock.slept, [])
+
+    def test_budget_is_shared_between_runs(self):
+        """Each cron run gets the limiter of the previous one, so its spent budget still counts"""
+        send_engine.get_limiter(('db', 1), 1).acquire()
+        limiter = send_engine.get_limiter(('db', 1), 1)
+        limiter.acquire()
+        self.assertEqual(self.clock.slept, [1.0])
+        self.assertIsNot(send_engine.get_limiter(('db', 2), 1), limiter)
+        self.assertIsNot(send_engine.get_limiter(('db', 1), 5), limiter, 'A new rate gets a new bucket.')
@@ -1,3 +1,4 @@
 from . import texttohtml_utils
 from . import waha_utils
-from . import n8n_utils
\ No newline at end of file
+from . import send_engine
+from . import n8n_utils
@@ -5,9 +5,12 @@ import logging
 from odoo import api, fields, models
 from odoo.exceptions import UserError
 
+from . import send_engine
+
 _logger = logging.getLogger(__name__)
 
-def send_message(self, n8n_webhook_url, user_auth, user_password, payloads):
+def build_request(self, n8n_webhook_url, user_auth, user_password):
+    """Resolve the deployment-specific webhook URL and auth headers."""
     url = n8n_webhook_url 
 
     if not n8n_webhook_url:
@@ -34,7 +37,8 @@ def send_message(self, n8n_webhook_url, user_auth, user_password, payloads):
         "Content-Type": "application/json",
         "Authorization": f"Basic {basic64.b64encode(f'{user_auth}:{user_password}'.encode()).decode()}"
     }
-     
-    response = requests.post(url, headers=headers, data=json.dumps(payloads))
-    
-    return response.json()
+    return url, headers
+
+def send_message(self, n8n_webhook_url, user_auth, user_password, payloads, timeout=send_engine.DEFAULT_TIMEOUT):
+    url, headers = build_request(self, n8n_webhook_url, user_auth, user_password)
+    return send_engine.post_json(url, headers, payloads, timeout=timeout)
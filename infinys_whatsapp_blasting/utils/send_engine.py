@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_WORKERS = 8
+
+_thread_local = threading.local()
+
+# Rate limiters shared by the cron runs of this worker process, per key
+# (database and account), so the budget of an account is not reset by
+# every run.
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing ``rate`` acquisitions per second.
+
+    A rate of 0 (or less) disables throttling.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate or 0.0)
+        self.capacity = float(burst or max(self.rate, 1.0))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def get_limiter(key, rate, burst=None):
+    """Return the process-wide ``RateLimiter`` of ``key``, created again when ``rate`` changes."""
+    rate = float(rate or 0.0)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None or limiter.rate != rate:
+            limiter = _limiters[key] = RateLimiter(rate, burst)
+        return limiter
+
+
+def get_session(pool_size=DEFAULT_WORKERS):
+    """Return a pooled ``requests.Session`` bound to the calling thread."""
+    session = getattr(_thread_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _thread_local.session = session
+    return session
+
+
+def post_json(url, headers, payload, timeout=DEFAULT_TIMEOUT, session=None):
+    """POST ``payload`` as JSON and return the decoded response (or None)."""
+    session = session or get_session()
+    response = session.post(url, headers=headers, json=payload, timeout=timeout)
+    response.raise_for_status()
+    if not response.content:
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+def dispatch(jobs, limiters=None, max_workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT):
+    """Send ``jobs`` concurrently and return ``{job_key: error_message or False}``.
+
+    Each job is a dict with ``key``, ``limiter_key``, ``url``, ``headers`` and
+    ``payload``. Jobs never touch the ORM: the caller prepares them in the
+    cursor thread and writes the outcomes back in bulk afterwards.
+    """
+    limiters = limiters or {}
+    results = {}
+    if not jobs:
+        return results
+
+    def _run(job):
+        limiter = limiters.get(job.get('limiter_key'))
+        if limiter:
+            limiter.acquire()
+        try:
+            post_json(job['url'], job['headers'], job['payload'],
+                      timeout=timeout, session=get_session(max_workers))
+            return job['key'], False
+        except Exception as e:  # noqa: BLE001 - one bad recipient must not stop the batch
+            _logger.warning("WhatsApp send %s failed: %s", job['key'], e)
+            return job['key'], str(e) or type(e).__name__
+
+    workers = max(1, min(int(max_workers or 1), len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='wa_send') as executor:
+        for key, error in executor.map(_run, jobs):
+            results[key] = error
+    return results
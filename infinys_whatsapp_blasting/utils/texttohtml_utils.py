@@ -4,71 +4,103 @@ import re
 from html.parser import HTMLParser
 from html import unescape
 
+# Patterns are compiled once at import; the converters below only run the
+# passes whose order actually matters and fuse the rest into single scans.
+
+_FMT_H1_RE = re.compile(r'(\n/(?!/))(?P<id>.+)')
+_FMT_H2_RE = re.compile(r'(\n//(?!/))(?P<id>.+)')
+_FMT_H3_RE = re.compile(r'(\n///(?!/))(?P<id>.+)')
+_FMT_H4_RE = re.compile(r'(\n////(?!/))(?P<id>.+)')
+_FMT_IMG_RULES = [
+    # img + link (external)
+    (re.compile(r'(?P<prefix> |\n)img__http://(?P<fileName>.*?)(?P<fileExt>\.gif|\.jpg|\.jpeg|\.png)__(?P<fileAlt>.*?)__(?P<link>.*?)__'),
+     r'\g<prefix><a href="\g<link>"><img src="http://\g<fileName>\g<fileExt>" alt="\g<fileAlt>" title="\g<fileAlt>" /></a>'),
+    # img + link (internal)
+    (re.compile(r'(?P<prefix> |\n)img__(?P<fileName>.*?)(?P<fileExt>\.gif|\.jpg|\.jpeg|\.png)__(?P<fileAlt>.*?)__(?P<link>.*?)__'),
+     r'\g<prefix><a href="\g<link>"><img src="/static/upload/\g<fileName>\g<fileExt>" alt="\g<fileAlt>" title="\g<fileAlt>" /></a>'),
+    # img only (external)
+    (re.compile(r'(?P<prefix> |\n)img__http://(?P<fileName>.*?)(?P<fileExt>\.gif|\.jpg|\.jpeg|\.png)__(?P<fileAlt>.*?)__'),
+     r'\g<prefix><img src="http://\g<fileName>\g<fileExt>" alt="\g<fileAlt>" title="\g<fileAlt>" />'),
+    # img only (internal)
+    (re.compile(r'(?P<prefix> |\n)imgright__(?P<fileName>.*?)(?P<fileExt>\.gif|\.jpg|\.jpeg|\.png)__(?P<fileAlt>.*?)__'),
+     r'\g<prefix><img src="/static/upload/\g<fileName>\g<fileExt>" alt="\g<fileAlt>" title="\g<fileAlt>" style="float:right" />'),
+    (re.compile(r'(?P<prefix> |\n)imgcenter__(?P<fileName>.*?)(?P<fileExt>\.gif|\.jpg|\.jpeg|\.png)__(?P<fileAlt>.*?)__'),
+     r'\g<prefix><div class="row" style="text-align:center"><img src="/static/upload/\g<fileName>\g<fileExt>" alt="\g<fileAlt>" title="\g<fileAlt>" /></div>'),
+    (re.compile(r'(?P<prefix> |\n)img__(?P<fileName>.*?)(?P<fileExt>\.gif|\.jpg|\.jpeg|\.png)__(?P<fileAlt>.*?)__'),
+     r'\g<prefix><img src="/static/upload/\g<fileName>\g<fileExt>" alt="\g<fileAlt>" title="\g<fileAlt>" />'),
+]
+_FMT_LINK_SPACE_RE = re.compile(r'__(?P<link>(http://|/).*?)__ ')
+_FMT_LINK_ANCHOR_RE = re.compile(r'__(?P<link>(http://|/).*?)__(?P<anchor>\n|,|\.|;|\?|!|:|<)')
+_FMT_LINK_RE = re.compile(r'__(?P<id>(http://|/).*?)__ ')
+_FMT_LI_RE = re.compile(r'(\n- (?P<id>.+))')
+_FMT_TABLE_RULES = [
+    (re.compile(r'(!!)(?P<id>.*?)'), '</td><td>'),
+    (re.compile(r'\n\n</td><td>(?P<id>.*)'), r'\n<table class="table table-bordered table-striped table-hover"><tr><td>\g<id>'),
+    (re.compile(r'</td><td>\n</td><td>'), r'</td></tr>\n<tr><td>'),
+    (re.compile(r'</td><td>\n\n'), r'</td></tr></table>\n\n'),
+]
+_FMT_DOC_RE = re.compile(r'(?P<prefix> |\n)__(?P<fileName>.*?)__(?P<anchor>.*?)__')
+_FMT_BR_RE = re.compile(r'\n(?!\n)(?!<h1|<h2|<h3|<li|<ul|<table|<tr|<td|</td)')
+_FMT_P_OPEN_RE = re.compile(r'\n<br />')
+_FMT_P_RE = re.compile(r'\n<p>(?P<id>.*)')
+_FMT_UL_OPEN_RE = re.compile(r'\n\n<li>(?P<id>.*)')
+_FMT_UL_CLOSE_RE = re.compile(r'</li>\n(?!<li>)')
+_FMT_I_RE = re.compile(r'\*\*(?!\*)(?P<id>.*?)\*\*(?!\*)')
+_FMT_B_RE = re.compile(r'\*(?!\*)(?P<id>.*?)\*(?!\*)')
+
 def formatHtml(text):
     # Remove Windows Linebreaks
     text = text.replace('\r\n', '\n')
 
-    # Replace  H1
-    text = re.sub('(\n/(?!/))(?P<id>.+)', '<h1>\g<id></h1>', text, 1)
-
-    # Replace  H2
-    text = re.sub('(\n//(?!/))(?P<id>.+)', '\n<h2>\g<id></h2>', text)
-
-    # Replace  H3
-    text = re.sub('(\n///(?!/))(?P<id>.+)', '\n<h3>\g<id></h3>', text)
-    
-    # Replace  H4
-    text = re.sub('(\n////(?!/))(?P<id>.+)', '\n<h4>\g<id></h4>', text)
+    # Replace  H1 .. H4
+    text = _FMT_H1_RE.sub(r'<h1>\g<id></h1>', text, 1)
+    text = _FMT_H2_RE.sub(r'\n<h2>\g<id></h2>', text)
+    text = _FMT_H3_RE.sub(r'\n<h3>\g<id></h3>', text)
+    text = _FMT_H4_RE.sub(r'\n<h4>\g<id></h4>', text)
 
     # Replace IMG
-    # img + link (external)
-    text = re.sub('(?P<prefix> |\n)img__http://(?P<fileName>.*?)(?P<fileExt>\.gif|\.jpg|\.jpeg|\.png)__(?P<fileAlt>.*?)__(?P<link>.*?)__', '\g<prefix><a href="\g<link>"><img src="http://\g<fileName>\g<fileExt>" alt="\g<fileAlt>" title="\g<fileAlt>" /></a>', text)
-    # img + link (internal)
-    text = re.sub('(?P<prefix> |\n)img__(?P<fileName>.*?)(?P<fileExt>\.gif|\.jpg|\.jpeg|\.png)__(?P<fileAlt>.*?)__(?P<link>.*?)__', '\g<prefix><a href="\g<link>"><img src="/static/upload/\g<fileName>\g<fileExt>" alt="\g<fileAlt>" title="\g<fileAlt>" /></a>', text)
-    # img only (external)
-    text = re.sub('(?P<prefix> |\n)img__http://(?P<fileName>.*?)(?P<fileExt>\.gif|\.jpg|\.jpeg|\.png)__(?P<fileAlt>.*?)__', '\g<prefix><img src="http://\g<fileName>\g<fileExt>" alt="\g<fileAlt>" title="\g<fileAlt>" />', text)
-    # img only (internal)
-    text = re.sub('(?P<prefix> |\n)imgright__(?P<fileName>.*?)(?P<fileExt>\.gif|\.jpg|\.jpeg|\.png)__(?P<fileAlt>.*?)__', '\g<prefix><img src="/static/upload/\g<fileName>\g<fileExt>" alt="\g<fileAlt>" title="\g<fileAlt>" style="float:right" />', text)
-    text = re.sub('(?P<prefix> |\n)imgcenter__(?P<fileName>.*?)(?P<fileExt>\.gif|\.jpg|\.jpeg|\.png)__(?P<fileAlt>.*?)__', '\g<prefix><div class="row" style="text-align:center"><img src="/static/upload/\g<fileName>\g<fileExt>" alt="\g<fileAlt>" title="\g<fileAlt>" /></div>', text)
-    text = re.sub('(?P<prefix> |\n)img__(?P<fileName>.*?)(?P<fileExt>\.gif|\.jpg|\.jpeg|\.png)__(?P<fileAlt>.*?)__', '\g<prefix><img src="/static/upload/\g<fileName>\g<fileExt>" alt="\g<fileAlt>" title="\g<fileAlt>" />', text)
-    
+    if 'img' in text:
+        for pattern, repl in _FMT_IMG_RULES:
+            text = pattern.sub(repl, text)
+
     # Replace A
     # We add a space to all A near a special character or at the end of a line
     # We add a double space to A with already 1 space to preserve that space after linkFormat function
-    text = re.sub('__(?P<link>(http://|/).*?)__ ', '__\g<link>__  ', text)
-    text = re.sub('__(?P<link>(http://|/).*?)__(?P<anchor>\n|,|\.|;|\?|!|:|<)', '__\g<link>__ \g<anchor>', text)
-    # All A followed by a space will be targeted
-    text = re.sub('__(?P<id>(http://|/).*?)__ ', formatLink, text)
+    if '__' in text:
+        text = _FMT_LINK_SPACE_RE.sub(r'__\g<link>__  ', text)
+        text = _FMT_LINK_ANCHOR_RE.sub(r'__\g<link>__ \g<anchor>', text)
+        # All A followed by a space will be targeted
+        text = _FMT_LINK_RE.sub(formatLink, text)
 
     # Replace  LI
-    text = re.sub('(\n- (?P<id>.+))', '\n<li>\g<id></li>', text)
+    text = _FMT_LI_RE.sub(r'\n<li>\g<id></li>', text)
     
     # Replace TABLE
-    text = re.sub('(!!)(?P<id>.*?)', '</td><td>', text)
-    text = re.sub('\n\n</td><td>(?P<id>.*)', '\n<table class="table table-bordered table-striped table-hover"><tr><td>\g<id>', text)
-    text = re.sub('</td><td>\n</td><td>', '</td></tr>\n<tr><td>', text)
-    text = re.sub('</td><td>\n\n', '</td></tr></table>\n\n', text)
+    if '!!' in text or '</td><td>' in text:
+        for pattern, repl in _FMT_TABLE_RULES:
+            text = pattern.sub(repl, text)
     
     # Replace DOC
-    text = re.sub('(?P<prefix> |\n)__(?P<fileName>.*?)__(?P<anchor>.*?)__', '\g<prefix><a href="/static/upload/\g<fileName>">\g<anchor></a>', text)
+    if '__' in text:
+        text = _FMT_DOC_RE.sub(r'\g<prefix><a href="/static/upload/\g<fileName>">\g<anchor></a>', text)
     
     # Replace BR and P
-    text = re.sub('\n(?!\n)(?!<h1|<h2|<h3|<li|<ul|<table|<tr|<td|</td)', '<br />', text)
-    text = re.sub('\n<br />', '\n<p>', text)
-    text = re.sub('\n<p>(?P<id>.*)', '\n<p>\g<id></p>', text)
+    text = _FMT_BR_RE.sub('<br />', text)
+    text = _FMT_P_OPEN_RE.sub(r'\n<p>', text)
+    text = _FMT_P_RE.sub(r'\n<p>\g<id></p>', text)
     
     # Replace UL and LI
-    text = re.sub('\n\n<li>(?P<id>.*)', '\n<ul><li>\g<id>', text)
-    text = re.sub('</li>\n(?!<li>)', '</li></ul>\n', text)
+    text = _FMT_UL_OPEN_RE.sub(r'\n<ul><li>\g<id>', text)
+    text = _FMT_UL_CLOSE_RE.sub(r'</li></ul>\n', text)
     
-    # Replace I
-    text = re.sub('\*\*(?!\*)(?P<id>.*?)\*\*(?!\*)', '<i>\g<id></i>', text)
-    
-    # Replace B
-    text = re.sub('\*(?!\*)(?P<id>.*?)\*(?!\*)', '<b>\g<id></b>', text)
+    if '*' in text:
+        # Replace I
+        text = _FMT_I_RE.sub(r'<i>\g<id></i>', text)
+        # Replace B
+        text = _FMT_B_RE.sub(r'<b>\g<id></b>', text)
     
     # Clean accidental empy tags
-    text = re.sub('<p></p>', '', text)
+    text = text.replace('<p></p>', '')
     
     return text
 
@@ -82,65 +114,71 @@ def formatLink(match):
         return '<a href="'+g[0]+'">'+g[2]+'</a>'
 
 
+_WA_LINK_RE = re.compile(r'<a\s+href=["\'](.*?)["\'].*?>(.*?)</a>', re.IGNORECASE | re.DOTALL)
+# Line breaks, block elements and list markup, which all map to constant
+# text and never overlap, are rewritten in a single scan.
+_WA_BLOCK_RE = re.compile(
+    r'<(?:(?P<item>li[^>]*>)|(?P<item_end>/li>)'
+    r'|br\s*/?>|br\s*/?\s*>\\?'
+    r'|/div>|div[^>]*>|/p>|p[^>]*>|/?ul[^>]*>)',
+    re.IGNORECASE,
+)
+_WA_H12_RE = re.compile(r'<h[1-2][^>]*>(.*?)</h[1-2]>', re.IGNORECASE | re.DOTALL)
+_WA_H34_RE = re.compile(r'<h[3-4][^>]*>(.*?)</h[3-4]>', re.IGNORECASE | re.DOTALL)
+_WA_BOLD_RE = re.compile(r'<(b|strong)>(.*?)</\1>', re.IGNORECASE | re.DOTALL)
+_WA_ITALIC_RE = re.compile(r'<(i|em)>(.*?)</\1>', re.IGNORECASE | re.DOTALL)
+_WA_TAG_RE = re.compile(r'<[^>]+>')
+_WA_MSO_CLASS_RE = re.compile(r'class="Mso[^"]*"', re.IGNORECASE)
+_WA_STYLE_RE = re.compile(r'style="[^"]*"', re.IGNORECASE)
+_WA_BLANK_LINES_RE = re.compile(r'\n\s*\n+')
+# Only runs that actually change: two or more blanks, or any tab.
+_WA_SPACES_RE = re.compile(r'(?: [ \t]|\t)[ \t]*')
+
+def _replace_link(match):
+    return f'{match.group(2)} ({match.group(1)})'
+
+def _replace_block(match):
+    kind = match.lastgroup
+    if kind == 'item':
+        return '\n• '
+    if kind == 'item_end':
+        return ''
+    return '\n'
 
 def clean_html_for_whatsapp(html):
-    
-    def replace_link(match):
-        url = match.group(1)
-        text = match.group(2)
-        return f'{text} ({url})'
-
     # Remove Windows Linebreaks
     html = html.replace('\r\n', '\n')
-    html = re.sub(r'<a\s+href=["\'](.*?)["\'].*?>(.*?)</a>', replace_link , html, flags=re.IGNORECASE | re.DOTALL)
-
-    # Line breaks and block elements
-    html = re.sub(r'<br\s*/?>', '\n', html, flags=re.IGNORECASE)
-    html = re.sub(r'<br\s*/?\s*>\\?', '\n', html, flags=re.IGNORECASE)
-    html = re.sub(r'</div>', '\n', html, flags=re.IGNORECASE)
-    html = re.sub(r'<div[^>]*>', '\n', html, flags=re.IGNORECASE)
-
-    # Paragraphs
-    html = re.sub(r'</p>', '\n', html, flags=re.IGNORECASE)
-    html = re.sub(r'<p[^>]*>', '\n', html, flags=re.IGNORECASE)
-
-    # Headings
-    html = re.sub(r'<h[1-2][^>]*>(.*?)</h[1-2]>', r'\n*\1*\n', html, flags=re.IGNORECASE | re.DOTALL)
-    html = re.sub(r'<h[3-4][^>]*>(.*?)</h[3-4]>', r'\n\1\n', html, flags=re.IGNORECASE | re.DOTALL)
-
-    # Lists
-    html = re.sub(r'<li[^>]*>', '\n• ', html, flags=re.IGNORECASE)
-    html = re.sub(r'</li>', '', html, flags=re.IGNORECASE)
-    html = re.sub(r'</?ul[^>]*>', '\n', html, flags=re.IGNORECASE)
 
-    # Text formatting
-    html = re.sub(r'<(b|strong)>(.*?)</\1>', r'*\2*', html, flags=re.IGNORECASE | re.DOTALL)
-    html = re.sub(r'<(i|em)>(.*?)</\1>', r'_\2_', html, flags=re.IGNORECASE | re.DOTALL)
+    # Plain text skips every tag pass: none of them can match without '<'.
+    if '<' in html:
+        html = _WA_LINK_RE.sub(_replace_link, html)
 
-    # Remove any other remaining tags
-    html = re.sub(r'<[^>]+>', '', html)
+        # Line breaks, block elements and lists
+        html = _WA_BLOCK_RE.sub(_replace_block, html)
 
-    #horizontal line
-    html = re.sub(r'<hr\s*/?>', '\n\n<hr>\n\n', html, flags=re.IGNORECASE)
+        # Headings
+        html = _WA_H12_RE.sub(r'\n*\1*\n', html)
+        html = _WA_H34_RE.sub(r'\n\1\n', html)
 
-    #microsoft office tags
-    html = re.sub(r'<o:p>', '', html, flags=re.IGNORECASE)
-    html = re.sub(r'</o:p>', '', html, flags=re.IGNORECASE)
-    html = re.sub(r'<!--.*?-->', '', html, flags=re.DOTALL)
-    html = re.sub(r'class="Mso[^"]*"', '', html, flags=re.IGNORECASE)
+        # Text formatting
+        html = _WA_BOLD_RE.sub(r'*\2*', html)
+        html = _WA_ITALIC_RE.sub(r'_\2_', html)
 
-    #<wbr> word break point 
-    html = re.sub(r'<wbr\s*/?>', '', html, flags=re.IGNORECASE)
+        # Remove any other remaining tags. This also drops <hr>, <wbr>,
+        # Office <o:p> and comments, so they need no pass of their own.
+        html = _WA_TAG_RE.sub('', html)
 
-    #remove inline styles
-    html = re.sub(r'style="[^"]*"', '', html, flags=re.IGNORECASE)
+    # Leftover attribute fragments (microsoft office classes, inline styles)
+    if '="' in html:
+        html = _WA_MSO_CLASS_RE.sub('', html)
+        html = _WA_STYLE_RE.sub('', html)
 
     # Decode HTML entities
     html = unescape(html)
 
     # Normalize whitespace
-    html = re.sub(r'\n\s*\n+', '\n\n', html)  # Collapse multiple blank lines
-    html = re.sub(r'[ \t]+', ' ', html)       # Multiple spaces/tabs → one space
+    html = _WA_BLANK_LINES_RE.sub('\n\n', html)  # Collapse multiple blank lines
+    html = _WA_SPACES_RE.sub(' ', html)           # Multiple spaces/tabs → one space
     html = html.replace('\xa0', '')
     html = html.strip()
 
@@ -64,34 +64,40 @@ class PortalB2BCustomerPortal(CustomerPortal):
             workorder_state_labels = dict(request.env['dropshipping.workorder']._fields['state'].selection)
             ticket_state_labels = dict(request.env['dropshipping.workorder.ticket']._fields['state'].selection)
 
+        orders = orders.sudo()
+        # Timelines and workorders for the whole page at once
+        order_timelines = helper.prepare_order_timelines(orders)
+        workorders_by_order = {}
+        ticket_timelines = {}
+        if selected_category_is_rmc:
+            workorders = helper.get_order_workorders(orders)
+            for workorder in workorders:
+                workorders_by_order.setdefault(workorder.sale_order_id.id, []).append(workorder)
+            ticket_timelines = helper.prepare_rmc_ticket_timelines(workorders.ticket_ids)
+
         orders_data = []
-        for order in orders:
-            order_sudo = order.sudo()
+        for order_sudo in orders:
             workorders_payload = []
-            if selected_category_is_rmc:
-                for workorder in helper.get_order_workorders(order_sudo):
-                    wo_sudo = workorder.sudo()
-                    tickets_data = []
-                    for ticket in wo_sudo.ticket_ids.sudo():
-                        ticket_timeline = helper.prepare_rmc_ticket_timeline(ticket)
-                        tickets_data.append({
-                            'record': ticket,
-                            'state_label': ticket_state_labels.get(ticket.state, ticket.state),
-                            'timeline': ticket_timeline,
-                        })
-                    workorders_payload.append({
-                        'record': wo_sudo,
-                        'state_label': workorder_state_labels.get(wo_sudo.state, wo_sudo.state),
-                        'ordered_qty': wo_sudo.total_qty or wo_sudo.quantity_ordered or 0.0,
-                        'delivered_qty': wo_sudo.quantity_delivered or 0.0,
-                        'remaining_qty': wo_sudo.quantity_remaining or 0.0,
-                        'delivery_date': wo_sudo.delivery_date,
-                        'tickets': tickets_data,
+            for wo_sudo in workorders_by_order.get(order_sudo.id, []):
+                tickets_data = []
+                for ticket in wo_sudo.ticket_ids.sudo():
+                    tickets_data.append({
+                        'record': ticket,
+                        'state_label': ticket_state_labels.get(ticket.state, ticket.state),
+                        'timeline': ticket_timelines.get(ticket.id, []),
                     })
-            timeline = helper.prepare_order_timeline(order_sudo)
+                workorders_payload.append({
+                    'record': wo_sudo,
+                    'state_label': workorder_state_labels.get(wo_sudo.state, wo_sudo.state),
+                    'ordered_qty': wo_sudo.total_qty or wo_sudo.quantity_ordered or 0.0,
+                    'delivered_qty': wo_sudo.quantity_delivered or 0.0,
+                    'remaining_qty': wo_sudo.quantity_remaining or 0.0,
+                    'delivery_date': wo_sudo.delivery_date,
+                    'tickets': tickets_data,
+                })
             orders_data.append({
                 'order': order_sudo,
-                'timeline': timeline,
+                'timeline': order_timelines[order_sudo.id],
                 'quality_lines': order_sudo.order_line,
                 'logistics_pickings': order_sudo.picking_ids.filtered(lambda p: p.picking_type_code == 'outgoing'),
                 'finance_invoices': order_sudo.invoice_ids.filtered(lambda inv: inv.move_type == 'out_invoice'),
@@ -1,3 +1,4 @@
 from . import res_partner
 from . import sale_order
+from . import portal_timeline
 from . import portal_helpers
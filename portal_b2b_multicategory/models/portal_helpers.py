@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
+from datetime import datetime, time as time_obj
+
 from odoo import api, models, _
 from odoo.tools import format_datetime
 
+from .portal_timeline import TIMELINE_CACHE
+
 
 class PortalB2BHelper(models.AbstractModel):
     _name = 'portal.b2b.helper'
@@ -30,181 +34,212 @@ class PortalB2BHelper(models.AbstractModel):
     def prepare_order_timeline(self, order):
         """Build the chronological timeline for the customer portal."""
         order = order.sudo()
-        is_rmc_order = bool(getattr(order, 'is_rmc_order', False))
-       
-        timeline = []
+        return self.prepare_order_timelines(order)[order.id]
+
+    @api.model
+    def prepare_order_timelines(self, orders):
+        """Timelines of a page of orders, ``{order_id: timeline}``.
+
+        Milestone dates come from one grouped query per source (pickings,
+        moves, invoices) for all orders and are cached per order.
+        """
+        orders = orders.sudo()
+        milestones = TIMELINE_CACHE.get_many(self.env, 'order', orders.ids, self._compute_order_milestones)
+        return {order.id: self._build_order_timeline(order, milestones[order.id]) for order in orders}
+
+    @api.model
+    def _compute_order_milestones(self, order_ids):
+        """Return ``{order_id: {milestone_key: date}}``; a milestone is reached when its key is present."""
+        for model_name in ('stock.picking', 'stock.picking.type', 'stock.move', 'account.move', 'account.move.line', 'sale.order.line'):
+            self.env[model_name].flush_model()
+        cr = self.env.cr
+        milestones = {order_id: {} for order_id in order_ids}
+        cr.execute("""
+            SELECT p.sale_id,
+                   MIN(COALESCE(p.scheduled_date, p.create_date)),
+                   MIN(COALESCE(p.date_done, p.scheduled_date, p.create_date))
+                       FILTER (WHERE t.code = 'outgoing' AND p.state IN ('assigned', 'done')),
+                   MIN(COALESCE(p.date_done, p.create_date))
+                       FILTER (WHERE t.code = 'outgoing' AND p.state = 'done')
+              FROM stock_picking p
+              JOIN stock_picking_type t ON t.id = p.picking_type_id
+             WHERE p.sale_id = ANY(%s)
+               AND p.state NOT IN ('draft', 'cancel')
+          GROUP BY p.sale_id
+        """, [order_ids])
+        for order_id, plant_date, dispatch_date, delivery_date in cr.fetchall():
+            milestones[order_id]['plant_check'] = plant_date
+            if dispatch_date:
+                milestones[order_id]['dispatched'] = dispatch_date
+            if delivery_date:
+                milestones[order_id]['delivered'] = delivery_date
+        cr.execute("""
+            SELECT p.sale_id, MIN(COALESCE(m.date_deadline, m.date, m.create_date))
+              FROM stock_move m
+              JOIN stock_picking p ON p.id = m.picking_id
+             WHERE p.sale_id = ANY(%s)
+               AND p.state NOT IN ('draft', 'cancel')
+               AND m.state IN ('assigned', 'done')
+          GROUP BY p.sale_id
+        """, [order_ids])
+        for order_id, production_date in cr.fetchall():
+            milestones[order_id]['production'] = production_date
+        cr.execute("""
+            SELECT sol.order_id, MIN(COALESCE(am.invoice_date, am.date))
+              FROM sale_order_line sol
+              JOIN sale_order_line_invoice_rel rel ON rel.order_line_id = sol.id
+              JOIN account_move_line aml ON aml.id = rel.invoice_line_id
+              JOIN account_move am ON am.id = aml.move_id
+             WHERE sol.order_id = ANY(%s)
+               AND am.move_type = 'out_invoice'
+               AND am.state = 'posted'
+          GROUP BY sol.order_id
+        """, [order_ids])
+        for order_id, invoice_date in cr.fetchall():
+            milestones[order_id]['invoiced'] = invoice_date
+        return milestones
 
+    @api.model
+    def _build_order_timeline(self, order, milestones):
         is_confirmed = order.state in ('sale', 'done')
-        timeline.append({
+        steps = [
+            ('plant_check', _('Plant Approval / Check'), _('Plant processing started.'), _('Awaiting plant approval.')),
+            ('production', _('In Production'), _('Stock moves reserved for production.'), _('Waiting for production scheduling.')),
+            ('dispatched', _('Dispatched'), _('Shipment prepared.'), _('Shipment pending dispatch.')),
+            ('delivered', _('Delivered'), _('Shipment delivered to customer.'), _('Delivery in transit.')),
+            ('invoiced', _('Invoiced'), _('Invoice posted.'), _('Awaiting invoice posting.')),
+        ]
+        timeline = [{
             'key': 'confirmed',
             'label': _('Order Confirmed'),
             'completed': is_confirmed,
             'date': order.date_order,
             'details': _('Order %s confirmed.') % (order.name,),
-        })
-
-        pickings = order.picking_ids.filtered(lambda p: p.state not in ('draft', 'cancel'))
-        plant_date = False
-        if pickings:
-            ordered_pickings = pickings.sorted(lambda p: p.scheduled_date or p.create_date or p.id)
-            plant_date = ordered_pickings[0].scheduled_date or ordered_pickings[0].create_date
-        timeline.append({
-            'key': 'plant_check',
-            'label': _('Plant Approval / Check'),
-            'completed': bool(pickings),
-            'date': plant_date,
-            'details': _('Awaiting plant approval.') if not pickings else _('Plant processing started.'),
-        })
-
-        picking_move_field = 'move_ids_without_package' if 'move_ids_without_package' in self.env['stock.picking']._fields else 'move_ids'
-        production_moves = pickings.mapped(picking_move_field).filtered(lambda m: m.state in ('assigned', 'done'))
-        production_date = False
-        if production_moves:
-            production_moves = production_moves.sorted(lambda m: m.date_deadline or m.date or m.create_date or m.id)
-            production_date = production_moves[0].date_deadline or production_moves[0].date or production_moves[0].create_date
-        timeline.append({
-            'key': 'production',
-            'label': _('In Production'),
-            'completed': bool(production_moves),
-            'date': production_date,
-            'details': _('Stock moves reserved for production.') if production_moves else _('Waiting for production scheduling.'),
-        })
-
-        outgoing_pickings = pickings.filtered(lambda p: p.picking_type_code == 'outgoing')
-        dispatched_pickings = outgoing_pickings.filtered(lambda p: p.state in ('assigned', 'done'))
-        dispatch_date = False
-        if dispatched_pickings:
-            dispatched_pickings = dispatched_pickings.sorted(lambda p: p.date_done or p.scheduled_date or p.create_date or p.id)
-            dispatch_date = dispatched_pickings[0].date_done or dispatched_pickings[0].scheduled_date or dispatched_pickings[0].create_date
-        timeline.append({
-            'key': 'dispatched',
-            'label': _('Dispatched'),
-            'completed': bool(dispatched_pickings),
-            'date': dispatch_date,
-            'details': _('Shipment prepared.') if dispatched_pickings else _('Shipment pending dispatch.'),
-        })
-
-        delivered_pickings = outgoing_pickings.filtered(lambda p: p.state == 'done')
-        delivery_date = False
-        if delivered_pickings:
-            delivered_pickings = delivered_pickings.sorted(lambda p: p.date_done or p.create_date or p.id)
-            delivery_date = delivered_pickings[0].date_done or delivered_pickings[0].create_date
-        timeline.append({
-            'key': 'delivered',
-            'label': _('Delivered'),
-            'completed': bool(delivered_pickings),
-            'date': delivery_date,
-            'details': _('Shipment delivered to customer.') if delivered_pickings else _('Delivery in transit.'),
-        })
-
-        invoices = order.invoice_ids.filtered(lambda inv: inv.move_type == 'out_invoice' and inv.state == 'posted')
-        invoice_date = False
-        if invoices:
-            invoices = invoices.sorted(lambda inv: inv.invoice_date or inv.date or inv.create_date or inv.id)
-            invoice_date = invoices[0].invoice_date or invoices[0].date or invoices[0].create_date
-        timeline.append({
-            'key': 'invoiced',
-            'label': _('Invoiced'),
-            'completed': bool(invoices),
-            'date': invoice_date,
-            'details': _('Invoice posted.') if invoices else _('Awaiting invoice posting.'),
-        })
-
+        }]
+        for key, label, done_details, pending_details in steps:
+            completed = key in milestones
+            timeline.append({
+                'key': key,
+                'label': label,
+                'completed': completed,
+                'date': milestones.get(key, False),
+                'details': done_details if completed else pending_details,
+            })
         return timeline
 
-  
-
     @api.model
     def prepare_rmc_ticket_timeline(self, ticket):
         """Specialised timeline for an RMC workorder ticket."""
         ticket = ticket.sudo()
-        TruckLoading = self.env['rmc.truck_loading'].sudo()
-        PlantCheck = self.env['rmc.plant_check'].sudo()
-        Docket = self.env['rmc.docket'].sudo()
-        AccountMove = self.env['account.move'].sudo()
+        return self.prepare_rmc_ticket_timelines(ticket)[ticket.id]
 
-        sale_order = ticket.workorder_id.sale_order_id.sudo() if ticket.workorder_id and ticket.workorder_id.sale_order_id else self.env['sale.order'].sudo()
-        helpdesk_ticket = ticket.helpdesk_ticket_id.sudo() if ticket.helpdesk_ticket_id else self.env['helpdesk.ticket'].sudo()
-        truck_loadings = helpdesk_ticket.truck_loading_ids.sudo() if helpdesk_ticket else TruckLoading.browse([])
-        plant_checks = truck_loadings.mapped('plant_check_id').sudo() if truck_loadings else PlantCheck.browse([])
-        dockets = helpdesk_ticket.docket_ids.sudo() if helpdesk_ticket else Docket.browse([])
-        invoices = dockets.mapped('invoice_id').sudo() if dockets else AccountMove.browse([])
+    @api.model
+    def prepare_rmc_ticket_timelines(self, tickets):
+        """Timelines of several RMC workorder tickets, ``{ticket_id: timeline}``.
 
-        def _earliest_datetime(records, *field_names):
-            values = []
-            for record in records:
-                for field_name in field_names:
-                    value = getattr(record, field_name, False)
-                    if value:
-                        values.append(value)
-            return min(values) if values else False
+        Loading, plant check, docket and invoice milestones are aggregated
+        per helpdesk ticket with one grouped query each and cached.
+        """
+        tickets = tickets.sudo()
+        milestones = TIMELINE_CACHE.get_many(
+            self.env, 'helpdesk', tickets.helpdesk_ticket_id.ids, self._compute_helpdesk_milestones)
+        return {
+            ticket.id: self._build_rmc_ticket_timeline(ticket, milestones.get(ticket.helpdesk_ticket_id.id, {}))
+            for ticket in tickets
+        }
 
-        timeline = []
+    @api.model
+    def _compute_helpdesk_milestones(self, helpdesk_ids):
+        """Return ``{helpdesk_ticket_id: {milestone_key: date}}`` from the ticket's loadings and dockets."""
+        for model_name in ('rmc.docket', 'rmc.truck_loading', 'rmc.plant_check', 'rmc.delivery_track', 'account.move'):
+            self.env[model_name].flush_model()
+        cr = self.env.cr
+        milestones = {helpdesk_id: {} for helpdesk_id in helpdesk_ids}
+        # Loadings of the ticket: from its delivery tracks and from its dockets
+        cr.execute("""
+            WITH loading AS (
+                SELECT d.helpdesk_ticket_id AS ticket_id, l.id AS loading_id
+                  FROM rmc_truck_loading l
+                  JOIN rmc_docket d ON d.id = l.docket_id
+                 WHERE d.helpdesk_ticket_id = ANY(%(ids)s) AND d.active
+                 UNION
+                SELECT t.helpdesk_ticket_id, t.truck_loading_id
+                  FROM rmc_delivery_track t
+                 WHERE t.helpdesk_ticket_id = ANY(%(ids)s) AND t.truck_loading_id IS NOT NULL
+            )
+            SELECT loading.ticket_id,
+                   BOOL_OR(l.loading_status IN ('in_progress', 'completed')),
+                   LEAST(MIN(l.loading_start_time) FILTER (WHERE l.loading_status IN ('in_progress', 'completed')),
+                         MIN(l.loading_date) FILTER (WHERE l.loading_status IN ('in_progress', 'completed'))),
+                   BOOL_OR(pc.check_status = 'completed'),
+                   LEAST(MIN(pc.completed_date) FILTER (WHERE pc.check_status = 'completed'),
+                         MIN(pc.check_date) FILTER (WHERE pc.check_status = 'completed'))
+              FROM loading
+              JOIN rmc_truck_loading l ON l.id = loading.loading_id
+         LEFT JOIN rmc_plant_check pc ON pc.id = l.plant_check_id
+          GROUP BY loading.ticket_id
+        """, {'ids': helpdesk_ids})
+        for ticket_id, loaded, loading_date, checked, check_date in cr.fetchall():
+            if loaded:
+                milestones[ticket_id]['truck_loading'] = loading_date
+            if checked:
+                milestones[ticket_id]['plant_check'] = check_date
+        cr.execute("""
+            SELECT d.helpdesk_ticket_id,
+                   MIN(d.write_date) FILTER (WHERE d.state IN ('dispatched', 'delivered')),
+                   MIN(d.write_date) FILTER (WHERE d.state = 'delivered'),
+                   BOOL_OR(am.state = 'posted'),
+                   LEAST(MIN(am.invoice_date) FILTER (WHERE am.state = 'posted'),
+                         MIN(am.date) FILTER (WHERE am.state = 'posted'))
+              FROM rmc_docket d
+         LEFT JOIN account_move am ON am.id = d.invoice_id
+             WHERE d.helpdesk_ticket_id = ANY(%s) AND d.active
+          GROUP BY d.helpdesk_ticket_id
+        """, [helpdesk_ids])
+        for ticket_id, dispatch_date, delivery_date, invoiced, invoice_date in cr.fetchall():
+            if dispatch_date:
+                milestones[ticket_id]['dispatched'] = dispatch_date
+            if delivery_date:
+                milestones[ticket_id]['delivered'] = delivery_date
+            if invoiced:
+                milestones[ticket_id]['invoiced'] = invoice_date
+        return milestones
 
-        order_confirmed = sale_order.filtered(lambda so: so.state in ('sale', 'done'))
-        timeline.append({
+    @api.model
+    def _build_rmc_ticket_timeline(self, ticket, milestones):
+        sale_order = ticket.workorder_id.sale_order_id
+        order_confirmed = sale_order.state in ('sale', 'done') if sale_order else False
+        ticket_confirmed = ticket.state in ('in_progress', 'completed')
+        timeline = [{
             'key': 'order_confirmed',
             'label': _('Order Confirmed'),
-            'completed': bool(order_confirmed),
+            'completed': order_confirmed,
             'date': sale_order.date_order if sale_order else False,
             'details': _('Order %s confirmed.') % sale_order.name if order_confirmed else _('Waiting for order confirmation.'),
-        })
-
-        confirmed_tickets = ticket.filtered(lambda t: t.state in ('in_progress', 'completed'))
-        timeline.append({
+        }, {
             'key': 'ticket_confirmed',
             'label': _('Ticket Confirmed'),
-            'completed': bool(confirmed_tickets),
-            'date': _earliest_datetime(confirmed_tickets, 'write_date', 'create_date'),
-            'details': _('Tickets are in progress or completed.') if confirmed_tickets else _('Awaiting ticket confirmation.'),
-        })
-
-        active_loadings = truck_loadings.filtered(lambda tl: tl.loading_status in ('in_progress', 'completed'))
-        timeline.append({
-            'key': 'truck_loading',
-            'label': _('Truck Loading'),
-            'completed': bool(active_loadings),
-            'date': _earliest_datetime(active_loadings, 'loading_start_time', 'loading_date'),
-            'details': _('Truck loading is underway.') if active_loadings else _('Truck loading not started yet.'),
-        })
-
-        completed_checks = plant_checks.filtered(lambda pc: pc.check_status == 'completed')
-        timeline.append({
-            'key': 'plant_check',
-            'label': _('Plant Approval / Check'),
-            'completed': bool(completed_checks),
-            'date': _earliest_datetime(completed_checks, 'completed_date', 'check_date'),
-            'details': _('Plant checks completed for at least one load.') if completed_checks else _('Plant checks pending.'),
-        })
-
-        dispatched_dockets = dockets.filtered(lambda d: d.state in ('dispatched', 'delivered'))
-        timeline.append({
-            'key': 'dispatched',
-            'label': _('Dispatched'),
-            'completed': bool(dispatched_dockets),
-            'date': _earliest_datetime(dispatched_dockets, 'write_date'),
-            'details': _('Loads dispatched to site.') if dispatched_dockets else _('Dispatch pending.'),
-        })
-
-        posted_invoices = invoices.filtered(lambda inv: inv.state == 'posted')
-        timeline.append({
-            'key': 'invoiced',
-            'label': _('Invoiced'),
-            'completed': bool(posted_invoices),
-            'date': _earliest_datetime(posted_invoices, 'invoice_date', 'date'),
-            'details': _('Customer invoice posted.') if posted_invoices else _('Invoice yet to be posted.'),
-        })
-
-        delivered_dockets = dockets.filtered(lambda d: d.state == 'delivered')
-        timeline.append({
-            'key': 'delivered',
-            'label': _('Delivered'),
-            'completed': bool(delivered_dockets),
-            'date': _earliest_datetime(delivered_dockets, 'write_date'),
-            'details': _('Delivery marked complete.') if delivered_dockets else _('Delivery outstanding.'),
-        })
+            'completed': ticket_confirmed,
+            'date': min(filter(None, (ticket.write_date, ticket.create_date)), default=False) if ticket_confirmed else False,
+            'details': _('Tickets are in progress or completed.') if ticket_confirmed else _('Awaiting ticket confirmation.'),
+        }]
+        steps = [
+            ('truck_loading', _('Truck Loading'), _('Truck loading is underway.'), _('Truck loading not started yet.')),
+            ('plant_check', _('Plant Approval / Check'), _('Plant checks completed for at least one load.'), _('Plant checks pending.')),
+            ('dispatched', _('Dispatched'), _('Loads dispatched to site.'), _('Dispatch pending.')),
+            ('invoiced', _('Invoiced'), _('Customer invoice posted.'), _('Invoice yet to be posted.')),
+            ('delivered', _('Delivered'), _('Delivery marked complete.'), _('Delivery outstanding.')),
+        ]
+        for key, label, done_details, pending_details in steps:
+            completed = key in milestones
+            timeline.append({
+                'key': key,
+                'label': label,
+                'completed': completed,
+                'date': milestones.get(key) or False,
+                'details': done_details if completed else pending_details,
+            })
 
-        from datetime import datetime, time as time_obj
         for step in timeline:
             dt_value = step.get('date')
             if dt_value and not isinstance(dt_value, datetime):
@@ -260,10 +295,10 @@ class PortalB2BHelper(models.AbstractModel):
 
     @api.model
     def get_order_workorders(self, order):
-        """Fetch RMC workorders linked to a sale order."""
+        """Fetch RMC workorders linked to one or several sale orders."""
         if not order:
             return self.env['dropshipping.workorder']
         return self.env['dropshipping.workorder'].sudo().search(
-            [('sale_order_id', '=', order.id)],
+            [('sale_order_id', 'in', order.ids)],
             order='date_order desc, id desc'
         )
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from odoo import models
+
+from odoo.addons.rmc_management_system.models.portal_cache import PortalCache
+
+# Milestone aggregates behind the portal timelines, per worker process;
+# kind is 'order' for sale.order and 'helpdesk' for the helpdesk.ticket of
+# RMC workorder tickets.
+TIMELINE_CACHE = PortalCache(ttl=300)
+
+
+class PortalB2BTimelineSource(models.AbstractModel):
+    """Drop the cached portal timelines a record contributes to once its change is committed."""
+    _name = 'portal.b2b.timeline.source'
+    _inherit = ['rmc.portal.cache.source']
+    _description = 'B2B Portal Timeline Source'
+
+    def _timeline_keys(self):
+        """Return ``[(kind, ids)]`` of the timelines built from ``self``."""
+        return []
+
+    def _portal_cache_keys(self):
+        return super()._portal_cache_keys() + [
+            (TIMELINE_CACHE, kind, ids) for kind, ids in self._timeline_keys()
+        ]
+
+
+class StockPicking(models.Model):
+    _name = 'stock.picking'
+    _inherit = ['stock.picking', 'portal.b2b.timeline.source']
+    _portal_cache_fields = ('state', 'scheduled_date', 'date_done', 'sale_id', 'picking_type_id')
+
+    def _timeline_keys(self):
+        return [('order', self.sale_id.ids)]
+
+
+class StockMove(models.Model):
+    _name = 'stock.move'
+    _inherit = ['stock.move', 'portal.b2b.timeline.source']
+    _portal_cache_fields = ('state', 'date', 'date_deadline', 'picking_id')
+
+    def _timeline_keys(self):
+        return [('order', self.picking_id.sale_id.ids)]
+
+
+class AccountMove(models.Model):
+    _name = 'account.move'
+    _inherit = ['account.move', 'portal.b2b.timeline.source']
+    _portal_cache_fields = ('state', 'move_type', 'invoice_date', 'date', 'invoice_line_ids', 'line_ids')
+
+    def _timeline_keys(self):
+        invoices = self.filtered(lambda move: move.move_type == 'out_invoice')
+        if not invoices:
+            return []
+        dockets = self.env['rmc.docket'].with_context(active_test=False).search([('invoice_id', 'in', invoices.ids)])
+        return [
+            ('order', invoices.line_ids.sale_line_ids.order_id.ids),
+            ('helpdesk', dockets.helpdesk_ticket_id.ids),
+        ]
+
+
+class RmcDocket(models.Model):
+    _name = 'rmc.docket'
+    _inherit = ['rmc.docket', 'portal.b2b.timeline.source']
+
+    # Every write counts: the dispatch and delivery milestones use write_date
+    def _timeline_keys(self):
+        return [('helpdesk', self.helpdesk_ticket_id.ids)]
+
+
+class RmcTruckLoading(models.Model):
+    _name = 'rmc.truck_loading'
+    _inherit = ['rmc.truck_loading', 'portal.b2b.timeline.source']
+    _portal_cache_fields = ('loading_status', 'loading_start_time', 'loading_date', 'plant_check_id', 'docket_id')
+
+    def _timeline_keys(self):
+        tracks = self.env['rmc.delivery_track'].search([('truck_loading_id', 'in', self.ids)])
+        return [('helpdesk', self.docket_id.helpdesk_ticket_id.ids + tracks.helpdesk_ticket_id.ids)]
+
+
+class RmcPlantCheck(models.Model):
+    _name = 'rmc.plant_check'
+    _inherit = ['rmc.plant_check', 'portal.b2b.timeline.source']
+    _portal_cache_fields = ('check_status', 'completed_date', 'check_date', 'truck_loading_id')
+
+    def _timeline_keys(self):
+        return self.truck_loading_id._timeline_keys()
+
+
+class RmcDeliveryTrack(models.Model):
+    _name = 'rmc.delivery_track'
+    _inherit = ['rmc.delivery_track', 'portal.b2b.timeline.source']
+    _portal_cache_fields = ('helpdesk_ticket_id', 'truck_loading_id')
+
+    def _timeline_keys(self):
+        return [('helpdesk', self.helpdesk_ticket_id.ids)]
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.portal_b2b_multicategory.models.portal_timeline import TIMELINE_CACHE
+
+
+@tagged('post_install', '-at_install')
+class TestPortalTimeline(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.helper = cls.env['portal.b2b.helper']
+        cls.customer = cls.env['res.partner'].create({'name': 'Timeline Customer'})
+        cls.product = cls.env['product.product'].create({'name': 'M25 Concrete', 'type': 'consu'})
+        cls.draft_order = cls._create_order()
+        cls.open_order = cls._create_order()
+        cls.open_order.action_confirm()
+        cls.delivered_order = cls._create_order()
+        cls.delivered_order.action_confirm()
+        for move in cls.delivered_order.picking_ids.move_ids:
+            move.write({'quantity': move.product_uom_qty, 'picked': True})
+        cls.delivered_order.picking_ids.button_validate()
+        cls.orders = cls.draft_order + cls.open_order + cls.delivered_order
+
+        workorder = cls.env['dropshipping.workorder'].create({
+            'sale_order_id': cls.open_order.id,
+            'product_id': cls.product.id,
+        })
+        cls.loaded_helpdesk = cls.env['helpdesk.ticket'].create({'name': 'Loaded pour', 'partner_id': cls.customer.id})
+        cls.idle_helpdesk = cls.env['helpdesk.ticket'].create({'name': 'Idle pour', 'partner_id': cls.customer.id})
+        docket = cls.env['rmc.docket'].create({
+            'sale_order_id': cls.open_order.id,
+            'helpdesk_ticket_id': cls.loaded_helpdesk.id,
+            'quantity_ordered': 6.0,
+            'state': 'delivered',
+        })
+        cls.env['rmc.truck_loading'].create({
+            'docket_id': docket.id,
+            'loading_status': 'in_progress',
+            'loading_start_time': fields.Datetime.now(),
+        })
+        cls.tickets = cls.env['dropshipping.workorder.ticket'].create([{
+            'workorder_id': workorder.id,
+            'name': 'Ticket %s' % index,
+            'helpdesk_ticket_id': helpdesk.id,
+        } for index, helpdesk in enumerate(cls.loaded_helpdesk + cls.idle_helpdesk + cls.loaded_helpdesk)])
+
+    @classmethod
+    def _create_order(cls):
+        return cls.env['sale.order'].create({
+            'partner_id': cls.customer.id,
+            'order_line': [(0, 0, {'product_id': cls.product.id, 'product_uom_qty': 6.0})],
+        })
+
+    def setUp(self):
+        super().setUp()
+        TIMELINE_CACHE.clear()
+        self.addCleanup(TIMELINE_CACHE.clear)
+
+    def _completed(self, timeline):
+        return {step['key'] for step in timeline if step['completed']}
+
+    def test_order_timelines_match_per_record(self):
+        """The timelines of a page of orders are the ones built order by order"""
+        batched = self.helper.prepare_order_timelines(self.orders)
+        self.assertEqual(set(batched), set(self.orders.ids))
+        for order in self.orders:
+            TIMELINE_CACHE.clear()
+            self.assertEqual(batched[order.id], self.helper.prepare_order_timeline(order))
+        self.assertFalse(self._completed(batched[self.draft_order.id]))
+        self.assertNotIn('delivered', self._completed(batched[self.open_order.id]))
+        self.assertLessEqual({'confirmed', 'plant_check', 'dispatched', 'delivered'},
+                             self._completed(batched[self.delivered_order.id]))
+
+    def test_rmc_ticket_timelines_match_per_record(self):
+        """Tickets sharing a helpdesk ticket get the same milestones as when built one by one"""
+        batched = self.helper.prepare_rmc_ticket_timelines(self.tickets)
+        self.assertEqual(set(batched), set(self.tickets.ids))
+        for ticket in self.tickets:
+            TIMELINE_CACHE.clear()
+            self.assertEqual(batched[ticket.id], self.helper.prepare_rmc_ticket_timeline(ticket))
+        loaded, idle, loaded_again = self.tickets
+        self.assertLessEqual({'truck_loading', 'dispatched', 'delivered'}, self._completed(batched[loaded.id]))
+        self.assertEqual(batched[loaded.id], batched[loaded_again.id])
+        self.assertFalse({'truck_loading', 'dispatched', 'delivered'} & self._completed(batched[idle.id]))
+
+    def test_write_drops_cached_timeline_on_commit(self):
+        """A relevant write queues the affected order for invalidation, an unrelated one does not"""
+        self.helper.prepare_order_timelines(self.orders)
+        data_key = ('rmc.portal.cache.dirty', id(TIMELINE_CACHE))
+        # Forget what the fixture records queued
+        self.env.cr.postcommit.data.get(data_key, set()).clear()
+        picking = self.open_order.picking_ids
+        picking.write({'origin': 'Unrelated'})
+        self.assertFalse(self.env.cr.postcommit.data.get(data_key))
+        picking.write({'scheduled_date': fields.Datetime.now()})
+        pending = self.env.cr.postcommit.data[data_key]
+        self.assertIn(('order', self.open_order.id), pending)
+        TIMELINE_CACHE.invalidate(self.env.cr.dbname, pending)
+        recomputed = []
+        TIMELINE_CACHE.get_many(self.env, 'order', self.orders.ids, lambda ids: recomputed.extend(ids) or {})
+        self.assertEqual(recomputed, [self.open_order.id])
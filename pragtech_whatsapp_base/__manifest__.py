@@ -11,11 +11,14 @@ Whatsapp base is a base module that handles the authentication process for the v
 Customer needs to install this module first and then they can use its dependent module developed by pragmatic
     """,
     'depends': ['base_setup'],
+    'external_dependencies': {'python': ['phonenumbers']},
     'data': [
         'security/security.xml',
         'security/ir.model.access.csv',
 
         'data/whatsapp_instance_sequence_data.xml',
+        'data/webhook_cron.xml',
+        'data/scheduled_action.xml',
 
         'wizard/export_template_wizard_view.xml',
         # 'wizard/connection_wizard.xml',
@@ -28,6 +31,7 @@ Customer needs to install this module first and then they can use its dependent
         'views/whatsapp_message_view.xml',
         'views/whatsapp_template_call_to_action_view.xml',
         'views/res_company_view.xml',
+        'views/whatsapp_webhook_event_view.xml',
 
     ],
 
@@ -7,4 +7,6 @@ from . import res_partner
 from . import res_company
 from . import terminal_log
 from . import whatsapp_template_button
-from . import whatsapp_template_parameter
\ No newline at end of file
+from . import whatsapp_template_parameter
+from . import whatsapp_webhook_event
+from . import whatsapp_media_job
@@ -1,4 +1,32 @@
-from odoo import fields, models
+import phonenumbers
+
+from odoo import api, fields, models
+
+
+def normalize_whatsapp_number(number, country_code=None):
+    """Return the E.164 key (``+<digits>``) of a phone number or WhatsApp chat id.
+
+    Chat ids (``<digits>@c.us``) are always international. Other numbers
+    without a leading ``+`` are read as national numbers of ``country_code``
+    (ISO 3166 alpha-2, e.g. ``'IN'``), so trunk prefixes are handled the way
+    each country dials them.
+    """
+    if not number:
+        return False
+    number = str(number).strip()
+    if '@' in number:
+        number = '+' + number.split('@')[0]
+    digits = ''.join(char for char in number if char.isdigit())
+    if not digits:
+        return False
+    try:
+        parsed = phonenumbers.parse(number, country_code.upper() if country_code else None)
+    except phonenumbers.NumberParseException:
+        try:
+            parsed = phonenumbers.parse('+' + digits, None)
+        except phonenumbers.NumberParseException:
+            return '+' + digits
+    return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
 
 
 class ResPartner(models.Model):
@@ -6,3 +34,21 @@ class ResPartner(models.Model):
 
     chatId = fields.Char(string='Whatsapp Chat ID')
     whatsapp_message_ids = fields.One2many('whatsapp.messages', 'partner_id', string='Whatsapp Messages')
+    whatsapp_phone_key = fields.Char(
+        string='Whatsapp Phone Key', compute='_compute_whatsapp_phone_key', store=True, index='btree_not_null',
+        help='Normalized E.164 number (chat id, else mobile, else phone) used to match WhatsApp senders')
+
+    @api.depends(lambda self: ['chatId', 'country_id'] + [name for name in ('mobile', 'phone') if name in self._fields])
+    def _compute_whatsapp_phone_key(self):
+        for partner in self:
+            mobile = partner.mobile if 'mobile' in partner._fields else False
+            number = partner.chatId or mobile or partner.phone
+            partner.whatsapp_phone_key = normalize_whatsapp_number(number, partner.country_id.code)
+
+    @api.model
+    def _whatsapp_find_partner(self, number):
+        """Resolve a phone number or chat id to a partner through the indexed key."""
+        key = normalize_whatsapp_number(number)
+        if not key:
+            return self.browse()
+        return self.search([('whatsapp_phone_key', '=', key)], limit=1, order='id')
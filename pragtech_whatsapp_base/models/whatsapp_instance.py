@@ -1,4 +1,5 @@
 import json
+from datetime import timedelta
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
 import requests
@@ -8,6 +9,15 @@ _logger = logging.getLogger(__name__)
 from requests.structures import CaseInsensitiveDict
 from werkzeug.urls import url_join
 
+META_GRAPH_URL = "https://graph.facebook.com/v17.0"
+META_TEMPLATE_PAGE_SIZE = 200
+META_TIMEOUT = 30
+# The cron leaves alone instances synced (by itself or a manual import) more recently than this
+META_TEMPLATE_SYNC_MIN_AGE = timedelta(hours=12)
+# Fields whose change requires rebuilding parameter mappings and buttons
+META_CONTENT_FIELDS = ('name', 'category', 'header', 'body', 'header_text', 'footer', 'template_id', 'active')
+META_STATUS_FIELDS = ('approval_state', 'state', 'status')
+
 
 class WhatsappInstance(models.Model):
     _name = "whatsapp.instance"
@@ -44,6 +54,9 @@ class WhatsappInstance(models.Model):
     meta_whatsapp_business_account_id = fields.Char('Meta WhatsApp Business Account ID', copy=False)
     meta_whatsapp_app_id = fields.Char('Meta Whatsapp App Id', copy=False)
 
+    template_sync_at = fields.Datetime('Last Template Sync', readonly=True, copy=False,
+                                       help="Checkpoint of the last successful Meta template synchronization")
+
     # For Logger Info adding
     terminal_log_ids = fields.One2many('terminal.log', 'terminal_log_id', string='Logger Info')
 
@@ -305,154 +318,246 @@ class WhatsappInstance(models.Model):
 
     def import_template_from_meta(self):
         # Import templates from Meta using business_account_id
-        business_account_id = self.meta_whatsapp_business_account_id
-        if not business_account_id:
+        self.ensure_one()
+        if not self.meta_whatsapp_business_account_id:
             raise ValidationError("Meta WhatsApp Business Account ID is required")
+        remote_templates = self._fetch_meta_templates()
+        self._apply_meta_templates(remote_templates)
+        self.template_sync_at = fields.Datetime.now()
+        return True
 
-        access_token = self.whatsapp_meta_api_token
-        url = f"https://graph.facebook.com/v15.0/{business_account_id}/message_templates"
-        req_headers = {
-            "Authorization": f"Bearer {access_token}",
+    def _fetch_meta_templates(self):
+        """Return every message template of the business account, following Graph API paging."""
+        self.ensure_one()
+        url = f"{META_GRAPH_URL}/{self.meta_whatsapp_business_account_id}/message_templates"
+        params = {'limit': META_TEMPLATE_PAGE_SIZE}
+        headers = {
+            "Authorization": f"Bearer {self.whatsapp_meta_api_token}",
             "Content-Type": "application/json"
         }
+        templates = []
+        while url:
+            response = requests.get(url, headers=headers, params=params, timeout=META_TIMEOUT)
+            if response.status_code != 200:
+                raise ValidationError(f"Failed to fetch templates from Meta: {response.text}")
+            json_data = response.json()
+            templates.extend(json_data.get("data", []))
+            # The "next" link already carries the cursor and page size
+            url = (json_data.get("paging") or {}).get("next")
+            params = None
+        return templates
+
+    @api.model
+    def _meta_template_values(self, template):
+        components = template.get('components', [])
+        body_message = ""
+        header_text = ""
+        footer_text = ""
+        for component in components:
+            if component.get('type') == 'BODY':
+                body_message = component.get('text', '')
+            elif component.get('type') == 'HEADER' and component.get('format') == 'TEXT':
+                header_text = component.get('text', '')
+            elif component.get('type') == 'FOOTER':
+                footer_text = component.get('text', '')
+
+        # Determine header type
+        template_header_type = components[0].get('format') if components else None
+        header = {
+            'DOCUMENT': 'media_document',
+            'TEXT': 'text',
+            'IMAGE': 'media_image',
+            'VIDEO': 'media_video',
+        }.get(template_header_type, 'none')
 
-        response = requests.get(url, headers=req_headers)
-        if response.status_code != 200:
-            raise ValidationError(f"Failed to fetch templates from Meta: {response.text}")
-
-        json_data = response.json()
-        _logger.info("Meta WhatsApp Templates JSON Response:\n%s", json.dumps(json_data, indent=4))
-        data_list = json_data.get("data", [])
-
-        for template in data_list:
-            components = template.get('components', [])
-
-            body_message = ""
-            header_text = ""
-            footer_text = ""
-
-            for component in components:
-                if component.get('type') == 'BODY':
-                    body_message = component.get('text', '')
-                elif component.get('type') == 'HEADER' and component.get('format') == 'TEXT':
-                    header_text = component.get('text', '')
-                elif component.get('type') == 'FOOTER':
-                    footer_text = component.get('text', '')
-
-            # Determine body message
-            # if components and len(components) > 1:
-            #     if components[0].get('text') and not components[1].get('text'):
-            #         body_message = components[0].get('text')
-            #     elif components[0].get('text') and components[1].get('text'):
-            #         body_message = components[0].get('text') + "\n" + components[1].get('text')
-            #     elif not components[0].get('text') and components[1].get('text'):
-            #         body_message = components[1].get('text')
-            # elif components:
-            #     body_message = components[0].get('text')
-
-            # Determine header type
-            template_header_type = components[0].get('format') if components else None
-            header = 'none'  # default
-            if template_header_type == 'DOCUMENT':
-                header = 'media_document'
-            elif template_header_type == 'TEXT':
-                header = 'text'
-            elif template_header_type == 'IMAGE':
-                header = 'media_image'
-            elif template_header_type == 'VIDEO':
-                header = 'media_video'
-            elif template_header_type == '':
-                header = 'none'
-
-            values = {
-                'provider': 'meta',
-                'whatsapp_instance_id': self.id,
-                'name': template.get('name'),
-                'category': template.get('category'),
-                'template_id': template.get('id'),
-                'header': header,
-                'body': body_message,
-                'header_text': header_text,
-                'footer': footer_text,
-                'approval_state': template.get('status'),
-                'state': 'post' if template.get('status') == 'APPROVED' else 'draft',
-                'status': 'imported'
-            }
-
-            # Create or update the template
-            whatsapp_templates_id = self.env['whatsapp.templates'].sudo().search(
-                [('name', '=', template.get('name')), ('whatsapp_instance_id', '=', self.id)], limit=1)
-            if whatsapp_templates_id:
-                whatsapp_templates_id.write(values)
-                template_record = whatsapp_templates_id
-                _logger.info(f"Updated WhatsApp Template: {template_record.name}")
-            else:
-                template_record = self.env['whatsapp.templates'].create(values)
-                _logger.info(f"Created WhatsApp Template: {template_record.name}")
-
-            # Create parameter mappings
-            self._create_parameter_mappings(template_record, components)
-
-            # Clear existing buttons before re-adding
-            template_record.button_ids.unlink()
-
-            # Process Buttons
-            for component in components:
-                if component.get('type') == 'BUTTONS':
-                    for button in component.get('buttons', []):
-                        button_type = button.get('type')  # URL or PHONE_NUMBER
-
-                        if button_type == 'URL':
-                            mapped_type = 'visit_website'
-                        elif button_type == 'PHONE_NUMBER':
-                            mapped_type = 'call_phone'
-                        else:
-                            mapped_type = 'copy_offer_code'  # default fallback
-
-                        button_vals = {
-                            'template_id': template_record.id,
-                            'type': mapped_type,
-                            'text': button.get('text'),
-                        }
-
-                        if mapped_type == 'visit_website':
-                            url = button.get('url', '')
-                            button_vals['url'] = url
-
-                            # Determine url_type
-                            if "{{" in url and "}}" in url:
-                                button_vals['url_type'] = 'dynamic'
-                            else:
-                                button_vals['url_type'] = 'static'
-
-                        elif mapped_type == 'call_phone':
-                            button_vals['phone_number'] = button.get('phone_number')
+        return {
+            'provider': 'meta',
+            'name': (template.get('name') or '').strip().lower().replace(' ', '_'),
+            'category': template.get('category'),
+            'template_id': template.get('id'),
+            'header': header,
+            'body': body_message,
+            'header_text': header_text,
+            'footer': footer_text,
+            'approval_state': template.get('status'),
+            'state': 'post' if template.get('status') == 'APPROVED' else 'draft',
+            'status': 'imported',
+            'active': True,
+        }
 
-                        self.env['whatsapp.templates.button'].create(button_vals)
+    def _apply_meta_templates(self, remote_templates):
+        """Diff ``remote_templates`` (raw Graph API dicts) against local templates and apply the changes.
+
+        Templates are matched by Meta template id, falling back to the name
+        and language for templates that were created locally before being
+        exported.
+        Status-only changes are grouped into one write per status; content
+        changes rebuild the parameter mappings and buttons of all affected
+        templates at once. Local Meta templates the provider no longer
+        returns are archived. Returns a dict of counters.
+        """
+        self.ensure_one()
+        Templates = self.env['whatsapp.templates'].sudo().with_context(active_test=False)
+        local = Templates.search([('whatsapp_instance_id', '=', self.id)])
+        by_template_id = {tpl.template_id: tpl for tpl in local if tpl.template_id}
+        # Meta keeps one template per name and language
+        by_name = {(tpl.name, tpl.languages.id): tpl for tpl in local}
+        languages = self._meta_template_languages(remote_templates)
+
+        to_create = []
+        to_update = []
+        status_groups = {}
+        components_by_id = {}
+        seen = Templates.browse()
+        for template in remote_templates:
+            values = self._meta_template_values(template)
+            values['whatsapp_instance_id'] = self.id
+            language = languages.get(template.get('language'), False)
+            if language:
+                values['languages'] = language
+            components_by_id[values['template_id']] = template.get('components', [])
+            record = by_template_id.get(values['template_id']) or by_name.get((values['name'], language))
+            if not record:
+                to_create.append(values)
+                continue
+            seen |= record
+            if _differs(record, values, META_CONTENT_FIELDS):
+                to_update.append((record, values))
+            elif _differs(record, values, META_STATUS_FIELDS):
+                key = tuple(values[field] for field in META_STATUS_FIELDS)
+                status_groups[key] = status_groups.get(key, Templates.browse()) | record
+
+        for key, records in status_groups.items():
+            records.with_context(skip_body_check=True).write(dict(zip(META_STATUS_FIELDS, key)))
+        rebuilt = Templates.browse()
+        for record, values in to_update:
+            record.with_context(skip_body_check=True).write(values)
+            rebuilt |= record
+        if to_create:
+            rebuilt |= Templates.with_context(skip_parameter_mapping=True).create(to_create)
+        if rebuilt:
+            rebuilt.parameter_mapping_ids.unlink()
+            rebuilt.button_ids.unlink()
+            mapping_vals, button_vals = [], []
+            for record in rebuilt:
+                components = components_by_id.get(record.template_id, [])
+                mapping_vals += self._parameter_mapping_vals(record, components)
+                button_vals += self._button_vals(record, components)
+            self.env['whatsapp.template.mapping'].sudo().create(mapping_vals)
+            self.env['whatsapp.templates.button'].sudo().create(button_vals)
+
+        stale = (local - seen).filtered(lambda tpl: tpl.active and tpl.provider == 'meta' and tpl.template_id)
+        if stale:
+            stale.with_context(skip_body_check=True).write({'active': False})
+
+        result = {
+            'created': len(to_create),
+            'updated': len(to_update),
+            'status_updated': sum(len(records) for records in status_groups.values()),
+            'archived': len(stale),
+        }
+        _logger.info("Meta template sync for instance %s: %s", self.name, result)
+        return result
+
+    @api.model
+    def _meta_template_languages(self, remote_templates):
+        """Map the language codes of ``remote_templates`` (``en_US``, ``fr``...) to ``res.lang`` ids."""
+        codes = list({template['language'] for template in remote_templates if template.get('language')})
+        if not codes:
+            return {}
+        langs = self.env['res.lang'].with_context(active_test=False).search(
+            ['|', ('code', 'in', codes), ('iso_code', 'in', codes)], order='active desc, id')
+        by_code = {}
+        for lang in langs:
+            by_code.setdefault(lang.iso_code, lang.id)
+        # An exact code wins over an ISO code shared by several languages
+        by_code.update({lang.code: lang.id for lang in langs})
+        return by_code
+
+    @api.model
+    def _button_vals(self, template_record, components):
+        button_vals_list = []
+        for component in components:
+            if component.get('type') != 'BUTTONS':
+                continue
+            for button in component.get('buttons', []):
+                button_type = button.get('type')  # URL or PHONE_NUMBER
+                if button_type == 'URL':
+                    mapped_type = 'visit_website'
+                elif button_type == 'PHONE_NUMBER':
+                    mapped_type = 'call_phone'
+                else:
+                    mapped_type = 'copy_offer_code'  # default fallback
 
-        return True
+                button_vals = {
+                    'template_id': template_record.id,
+                    'type': mapped_type,
+                    'text': button.get('text'),
+                }
+                if mapped_type == 'visit_website':
+                    url = button.get('url', '')
+                    button_vals['url'] = url
+                    # Determine url_type
+                    button_vals['url_type'] = 'dynamic' if "{{" in url and "}}" in url else 'static'
+                elif mapped_type == 'call_phone':
+                    button_vals['phone_number'] = button.get('phone_number')
+                button_vals_list.append(button_vals)
+        return button_vals_list
+
+    @api.model
+    def _cron_sync_meta_templates(self):
+        """Full Meta template sync, least recently synced instance first.
+
+        The Graph API cannot list only the templates changed since a date, so
+        every sync reads them all; ``template_sync_at`` keeps instances synced
+        within ``META_TEMPLATE_SYNC_MIN_AGE`` out of the run. Every instance
+        is committed on its own, so an interrupted run resumes with the
+        instances it did not reach.
+        """
+        instances = self.sudo().search([
+            ('status', '=', 'enable'),
+            ('whatsapp_meta_api_token', '!=', False),
+            ('meta_whatsapp_business_account_id', '!=', False),
+            '|', ('template_sync_at', '=', False),
+                 ('template_sync_at', '<', fields.Datetime.now() - META_TEMPLATE_SYNC_MIN_AGE),
+        ], order='template_sync_at asc nulls first, id')
+        if not instances:
+            _logger.info("No WhatsApp instance due for a Meta template sync.")
+            return
+        for instance in instances:
+            try:
+                remote_templates = instance._fetch_meta_templates()
+                with self.env.cr.savepoint():
+                    instance._apply_meta_templates(remote_templates)
+                    instance.template_sync_at = fields.Datetime.now()
+            except Exception as e:
+                _logger.exception("Error syncing Meta templates for instance %s: %s", instance.name, e)
+                continue
+            self.env['ir.cron']._commit_progress(1)
 
     def _create_parameter_mappings(self, template_record, components):
-        parameter_pattern = re.compile(r'\{\{(\d+)\}\}')
-
         # Clear existing mappings
         template_record.parameter_mapping_ids.unlink()
+        self.env['whatsapp.template.mapping'].create(self._parameter_mapping_vals(template_record, components))
+
+    @api.model
+    def _parameter_mapping_vals(self, template_record, components):
+        parameter_pattern = re.compile(r'\{\{(\d+)\}\}')
+        mapping_vals = []
 
-        # Process HEADER text
         for component in components:
+            # Process HEADER text
             if component.get('type') == 'HEADER' and component.get('format') == 'TEXT':
-                header_text = component.get('text', '')
-                for match in parameter_pattern.findall(header_text):
-                    self.env['whatsapp.template.mapping'].create({
+                for match in parameter_pattern.findall(component.get('text', '')):
+                    mapping_vals.append({
                         'template_id': template_record.id,
                         'parameter_name': f"Header_{{{{{match}}}}}",
                         'line_type': 'header',
                     })
 
             elif component.get('type') == 'BODY':
-                body_text = component.get('text', '')
-                for match in parameter_pattern.findall(body_text):
-                    self.env['whatsapp.template.mapping'].create({
+                for match in parameter_pattern.findall(component.get('text', '')):
+                    mapping_vals.append({
                         'template_id': template_record.id,
                         'parameter_name': f"Body_{{{{{match}}}}}",
                         'line_type': 'body',
@@ -461,13 +566,13 @@ class WhatsappInstance(models.Model):
             elif component.get('type') == 'BUTTONS':
                 for button in component.get('buttons', []):
                     if button.get('type') == 'URL':
-                        url = button.get('url', '')
-                        for match in parameter_pattern.findall(url):
-                            self.env['whatsapp.template.mapping'].create({
+                        for match in parameter_pattern.findall(button.get('url', '')):
+                            mapping_vals.append({
                                 'template_id': template_record.id,
                                 'parameter_name': f"Url_{{{{{match}}}}}",
                                 'line_type': 'url',
                             })
+        return mapping_vals
 
     def import_template_from_chat_api(self):
         # Import templates from 1msg
@@ -605,3 +710,8 @@ class WhatsappInstance(models.Model):
 
     def action_create_missing_templates(self):
         return True
+
+
+def _differs(record, values, field_names):
+    # Empty provider values (None, "") match empty Odoo values (False)
+    return any((record[name] or False) != (values[name] or False) for name in field_names)
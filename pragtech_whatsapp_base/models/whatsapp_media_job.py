@@ -0,0 +1,121 @@
+import base64
+import logging
+from datetime import timedelta
+
+import requests
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+DOWNLOAD_TIMEOUT = 30
+META_GRAPH_URL = "https://graph.facebook.com/v16.0/{}"
+
+
+class WhatsappMediaJob(models.Model):
+    """Deferred download of inbound WhatsApp media.
+
+    Webhook processing only records what has to be fetched; downloads run
+    here with a timeout and exponential back-off so a slow media host never
+    holds up message ingestion.
+    """
+    _name = 'whatsapp.media.job'
+    _description = 'Whatsapp Media Download Job'
+    _order = 'id'
+
+    # Finished downloads are kept this long for troubleshooting
+    _DONE_RETENTION_DAYS = 30
+
+    message_id = fields.Many2one('whatsapp.messages', string='Whatsapp Message', required=True, ondelete='cascade')
+    target = fields.Selection([('image', 'Message Image'), ('attachment', 'Attachment')], string='Target',
+                              required=True, default='attachment')
+    url = fields.Char('URL', help='Direct media URL (1msg, Gupshup)')
+    meta_media_id = fields.Char('Meta Media Id', help='Media id to resolve through the Graph API')
+    instance_id = fields.Many2one('whatsapp.instance', string='Whatsapp Instance', ondelete='set null')
+    filename = fields.Char('File Name')
+    state = fields.Selection([('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')],
+                             string='Status', default='pending', required=True, index=True)
+    attempts = fields.Integer('Attempts')
+    next_attempt_at = fields.Datetime('Next Attempt', default=fields.Datetime.now, index=True)
+    error = fields.Text('Error')
+
+    @api.model
+    def _enqueue(self, vals_list):
+        jobs = self.create(vals_list)
+        cron = self.env.ref('pragtech_whatsapp_base.ir_cron_process_whatsapp_media_jobs', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+        return jobs
+
+    @api.model
+    def _cron_process_jobs(self, batch_size=50):
+        while True:
+            self.env.cr.execute("""
+                SELECT id FROM whatsapp_media_job
+                 WHERE state = 'pending' AND next_attempt_at <= now() at time zone 'UTC'
+              ORDER BY id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+            """, [batch_size])
+            jobs = self.browse([row[0] for row in self.env.cr.fetchall()])
+            if not jobs:
+                break
+            for job in jobs:
+                job._run()
+            if not self.env['ir.cron']._commit_progress(len(jobs)):
+                break
+        return True
+
+    def _run(self):
+        self.ensure_one()
+        try:
+            content = self._download()
+            with self.env.cr.savepoint():
+                self._store(base64.b64encode(content))
+            self.write({'state': 'done', 'error': False})
+        except Exception as e:
+            attempts = self.attempts + 1
+            _logger.warning("Whatsapp media job %s failed (attempt %s): %s", self.id, attempts, e)
+            self.write({
+                'attempts': attempts,
+                'error': str(e),
+                'state': 'failed' if attempts >= MAX_ATTEMPTS else 'pending',
+                'next_attempt_at': fields.Datetime.now() + timedelta(minutes=2 ** attempts),
+            })
+
+    def _download(self):
+        if self.meta_media_id:
+            headers = {"Authorization": "Bearer {}".format(self.instance_id.whatsapp_meta_api_token)}
+            response = requests.get(META_GRAPH_URL.format(self.meta_media_id), headers=headers, timeout=DOWNLOAD_TIMEOUT)
+            response.raise_for_status()
+            response = requests.get(response.json()["url"], headers=headers, timeout=DOWNLOAD_TIMEOUT)
+        else:
+            response = requests.get(self.url.strip(), timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+    def _store(self, datas):
+        message = self.message_id.sudo()
+        if self.target == 'image':
+            message.write({'msg_image': datas.replace(b'\n', b'')})
+            return
+        attachment = self.env['ir.attachment'].sudo().create({
+            'name': self.filename or message.message_body or 'whatsapp_media',
+            'datas': datas,
+            'type': 'binary',
+            'res_model': 'whatsapp.messages',
+            'res_id': message.id,
+        })
+        message.write({'attachment_id': attachment.id})
+
+    def action_retry(self):
+        self.write({'state': 'pending', 'attempts': 0, 'error': False, 'next_attempt_at': fields.Datetime.now()})
+        return True
+
+    @api.autovacuum
+    def _gc_done_jobs(self):
+        self.env.cr.execute(
+            "DELETE FROM whatsapp_media_job WHERE state = 'done' AND write_date < %s",
+            [fields.Datetime.now() - timedelta(days=self._DONE_RETENTION_DAYS)],
+        )
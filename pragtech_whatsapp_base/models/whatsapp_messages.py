@@ -11,7 +11,7 @@ class WhatsappMessages(models.Model):
 
     name = fields.Char('Name', readonly=True, help='Whatsapp message')
     message_body = fields.Text('Message', readonly=True, help='If whatsapp message have caption (for image,video,document) else add message body')
-    message_id = fields.Text('Message Id', readonly=True, help='Whatsapp Message id')
+    message_id = fields.Text('Message Id', readonly=True, index=True, help='Whatsapp Message id')
     fromMe = fields.Boolean('Form Me', readonly=True, help="If message is sent then from me true else false")
     to = fields.Char('To', readonly=True, help='If message is sending from current instance then to contains To Me else add sender number')
     chatId = fields.Char('Chat ID', readonly=True, help="It contains number & @.us")
@@ -19,6 +19,7 @@ class WhatsappTemplates(models.Model):
         return language_id.id
 
     name = fields.Char(string='Name')
+    active = fields.Boolean(string='Active', default=True)
     languages = fields.Many2one('res.lang', string='Template Languages', default=_get_default)
     category = fields.Char(string='Category')
     header = fields.Selection([('none', 'None'),('text', 'Text'), ('media_image', 'Media:Image'), ('media_document', 'Media:Document'), ('media_video', 'Media:Video'), ('location', 'Location')],
@@ -186,27 +187,18 @@ class WhatsappTemplates(models.Model):
     #     record.with_context(skip_body_check=True).parameter_mapping_ids = mappings
     #     return record
 
-    @api.model
-    def create(self, vals):
-        # If creating multiple records at once
-        if isinstance(vals, list):
-            records = self.browse()
-            for val in vals:
-                if 'name' in val and val['name']:
-                    val['name'] = val['name'].strip().lower().replace(' ', '_')
-                record = super(WhatsappTemplates, self).create(val)
-                mappings = record._prepare_parameter_mappings(val.get('body'), val.get('header_text'))
-                record.with_context(skip_body_check=True).parameter_mapping_ids = mappings
-                records |= record
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if 'name' in vals and vals['name']:
+                vals['name'] = vals['name'].strip().lower().replace(' ', '_')
+        records = super(WhatsappTemplates, self).create(vals_list)
+        if self.env.context.get('skip_parameter_mapping'):
             return records
-
-        # Single record create
-        if 'name' in vals and vals['name']:
-            vals['name'] = vals['name'].strip().lower().replace(' ', '_')
-        record = super(WhatsappTemplates, self).create(vals)
-        mappings = record._prepare_parameter_mappings(vals.get('body'), vals.get('header_text'))
-        record.with_context(skip_body_check=True).parameter_mapping_ids = mappings
-        return record
+        for record, vals in zip(records, vals_list):
+            mappings = record._prepare_parameter_mappings(vals.get('body'), vals.get('header_text'))
+            record.with_context(skip_body_check=True).parameter_mapping_ids = mappings
+        return records
 
     def write(self, vals):
         if 'name' in vals and vals['name']:
@@ -693,45 +685,6 @@ class WhatsappTemplates(models.Model):
 
     @api.model
     def fetch_whatsapp_template_statuses(self):
-        # Fetch active WhatsApp instances
-        instances = self.env['whatsapp.instance'].sudo().search([('status', '=', 'enable')])
-        if not instances:
-            _logger.warning("No active WhatsApp instance found.")
-            return
-
-        for instance in instances:
-            access_token = instance.whatsapp_meta_api_token
-            phone_number_id = instance.meta_whatsapp_business_account_id
-
-            if not access_token or not phone_number_id:
-                _logger.warning("Access token or phone number ID missing in WhatsApp instance: %s", instance.name)
-                continue
-
-            url = f"https://graph.facebook.com/v17.0/{phone_number_id}/message_templates"
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-            }
-
-            try:
-                response = requests.get(url, headers=headers)
-                if response.status_code == 200:
-                    templates = response.json().get("data", [])
-                    if not templates:
-                        _logger.info("No templates found for instance %s", instance.name)
-                    for tpl in templates:
-                        # Search for existing template based on template_id
-                        existing = self.search([('template_id', '=', tpl.get('id'))], limit=1)
-                        values = {
-                            'name': tpl.get('name'),
-                            'approval_state': tpl.get('status'),
-                            'template_id': tpl.get('id'),  # Ensure template_id is also set
-                        }
-                        if existing:
-                            # Update the existing template
-                            existing.write(values)
-                            _logger.info("Updated existing template: %s", tpl.get('name'))
-                    _logger.info("Fetched and updated templates from Meta for instance: %s", instance.name)
-                else:
-                    _logger.error("Failed to fetch templates for instance %s: %s", instance.name, response.text)
-            except Exception as e:
-                _logger.exception("Error fetching template statuses for instance %s: %s", instance.name, e)
+        # Kept as the scheduled action entry point; the instance sync engine
+        # fetches every page and applies creates, updates and archives in bulk.
+        return self.env['whatsapp.instance']._cron_sync_meta_templates()
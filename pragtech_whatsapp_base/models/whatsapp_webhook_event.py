@@ -0,0 +1,482 @@
+import datetime
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+import phonenumbers
+
+from odoo import api, fields, models
+
+from .res_partner import normalize_whatsapp_number
+
+_logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+
+class WhatsappWebhookEvent(models.Model):
+    """Raw webhook payloads staged by the controllers.
+
+    Webhook endpoints only insert the request body here and answer straight
+    away; the processing cron turns pending events into whatsapp.messages,
+    partners and deferred media jobs.
+    """
+    _name = 'whatsapp.webhook.event'
+    _description = 'Whatsapp Webhook Event'
+    _order = 'id'
+
+    # Processed events are kept this long so late provider retries are still dropped as duplicates
+    _DONE_RETENTION_DAYS = 7
+
+    provider = fields.Selection([('whatsapp_chat_api', '1msg'), ('gupshup', 'Gupshup'), ('meta', 'Meta')],
+                                string='Provider', required=True, readonly=True)
+    payload = fields.Text('Payload', required=True, readonly=True)
+    payload_hash = fields.Char('Payload Hash', readonly=True, help='Used to drop provider retries of the same webhook')
+    state = fields.Selection([('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')],
+                             string='Status', default='pending', required=True, index=True, readonly=True)
+    attempts = fields.Integer('Attempts', readonly=True)
+    next_attempt_at = fields.Datetime('Next Attempt', default=fields.Datetime.now, index=True, readonly=True)
+    error = fields.Text('Error', readonly=True)
+    processed_at = fields.Datetime('Processed At', readonly=True)
+
+    _payload_hash_uniq = models.Constraint('UNIQUE(payload_hash)', 'This webhook payload has already been received.')
+
+    @api.model
+    def _stage(self, provider, raw):
+        """Persist a raw webhook body and wake the processing cron.
+
+        Duplicate deliveries (same provider and body) are ignored, so
+        provider retries never turn into duplicate work.
+        """
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8', 'replace')
+        digest = hashlib.sha1(f'{provider}:{raw}'.encode()).hexdigest()
+        self.env.cr.execute("""
+            INSERT INTO whatsapp_webhook_event
+                   (provider, payload, payload_hash, state, attempts, next_attempt_at,
+                    create_uid, write_uid, create_date, write_date)
+            VALUES (%s, %s, %s, 'pending', 0, now() at time zone 'UTC',
+                    %s, %s, now() at time zone 'UTC', now() at time zone 'UTC')
+            ON CONFLICT (payload_hash) DO NOTHING
+        """, [provider, raw, digest, self.env.uid, self.env.uid])
+        cron = self.env.ref('pragtech_whatsapp_base.ir_cron_process_whatsapp_webhook_events', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+        return True
+
+    # ------------------------------------------------------------
+    # Batched processing
+    # ------------------------------------------------------------
+
+    @api.model
+    def _cron_process_events(self, batch_size=200):
+        """Process the pending events that are due; failed ones are retried with an exponential backoff."""
+        while True:
+            self.env.cr.execute("""
+                SELECT id FROM whatsapp_webhook_event
+                 WHERE state = 'pending' AND next_attempt_at <= now() at time zone 'UTC'
+              ORDER BY id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+            """, [batch_size])
+            events = self.browse([row[0] for row in self.env.cr.fetchall()])
+            if not events:
+                break
+            events._process_batch()
+            if not self.env['ir.cron']._commit_progress(len(events)):
+                break
+        return True
+
+    def _process_batch(self):
+        ctx = _BatchContext(self.env)
+        ctx.prefetch_messages(self)
+        for event in self:
+            ctx.begin_event()
+            try:
+                with self.env.cr.savepoint():
+                    data = json.loads(event.payload)
+                    getattr(self, '_process_%s' % event.provider)(data, ctx)
+                event.write({'state': 'done', 'error': False, 'processed_at': fields.Datetime.now()})
+            except Exception as e:
+                _logger.exception("Failed to process whatsapp webhook event %s", event.id)
+                ctx.discard_event()
+                attempts = event.attempts + 1
+                event.write({
+                    'attempts': attempts,
+                    'error': str(e),
+                    'state': 'failed' if attempts >= MAX_ATTEMPTS else 'pending',
+                    'next_attempt_at': fields.Datetime.now() + timedelta(minutes=2 ** attempts),
+                })
+        ctx.flush_media_jobs()
+
+    def action_retry(self):
+        # Payloads are read-only for administrators, only the processing state is reset
+        self.check_access('read')
+        self.sudo().write({'state': 'pending', 'attempts': 0, 'error': False, 'next_attempt_at': fields.Datetime.now()})
+        return True
+
+    @api.autovacuum
+    def _gc_done_events(self):
+        self.env.cr.execute(
+            "DELETE FROM whatsapp_webhook_event WHERE state = 'done' AND processed_at < %s",
+            [fields.Datetime.now() - timedelta(days=self._DONE_RETENTION_DAYS)],
+        )
+        _logger.info("Purged %s processed whatsapp webhook events", self.env.cr.rowcount)
+
+    # ------------------------------------------------------------
+    # Providers
+    # ------------------------------------------------------------
+
+    @api.model
+    def _process_whatsapp_chat_api(self, data, ctx):
+        for whatsapp_message_dict in data.get('messages') or []:
+            message_dict = {}
+            instance = ctx.default_instance
+            if whatsapp_message_dict.get('quotedMsgId'):
+                quoted = ctx.find_message(whatsapp_message_dict.get('quotedMsgId'))
+                if quoted and quoted.partner_id:
+                    message_dict.update(self._quoted_vals(quoted, instance))
+                message_dict = self._1msg_message_vals(whatsapp_message_dict, message_dict)
+            elif not whatsapp_message_dict.get('fromMe') and '@c.us' in (whatsapp_message_dict.get('chatId') or ''):
+                # @c.us is for normal conversation & @g.us is for group conversation
+                chat_id = whatsapp_message_dict['chatId']
+                partner = ctx.partner_by_number(chat_id)
+                if not partner:
+                    country_code, mobile = _split_phone(chat_id)
+                    partner = ctx.create_partner({
+                        'name': whatsapp_message_dict.get('senderName'),
+                        'mobile': str(country_code) + str(mobile),
+                        'chatId': chat_id,
+                    }, country_code)
+                message_dict.update({'partner_id': partner.id, 'model': 'res.partner', 'res_id': partner.id})
+                message_dict = self._1msg_message_vals(whatsapp_message_dict, message_dict)
+
+            message = ctx.upsert_message(whatsapp_message_dict.get('id'), instance, message_dict)
+            if not message:
+                continue
+            body = (whatsapp_message_dict.get('body') or '').strip()
+            if whatsapp_message_dict.get('type') == 'image':
+                ctx.queue_media(message, 'image', url=body)
+            elif whatsapp_message_dict.get('type') == 'document':
+                ctx.queue_media(message, 'attachment', url=body, filename=whatsapp_message_dict.get('caption'))
+
+    @api.model
+    def _process_gupshup(self, data, ctx):
+        data_payload = data.get('payload')
+        if data.get('type') != 'message' or not data_payload or not data_payload.get('sender'):
+            return
+        message_dict = {}
+        instance = ctx.default_instance
+        sender = data_payload['sender']
+        if data_payload.get('context'):  # If quoted message id from response
+            quoted = ctx.find_message(data_payload['context'].get('gsId'))
+            if quoted and quoted.partner_id:
+                message_dict.update(self._quoted_vals(quoted, instance))
+                message_dict = self._gupshup_message_vals(data, message_dict)
+        else:
+            country_code, mobile = _split_phone(sender.get('phone'))
+            phone = str(country_code) + str(mobile)
+            partner = ctx.partner_by_number(phone)
+            if not partner:
+                partner = ctx.create_partner({'name': sender.get('name'), 'mobile': phone}, country_code)
+            message_dict.update({'partner_id': partner.id, 'model': 'res.partner', 'res_id': partner.id})
+            message_dict = self._gupshup_message_vals(data, message_dict)
+
+        message = ctx.upsert_message(data_payload.get('id'), instance, message_dict)
+        if not message:
+            return
+        media = data_payload.get('payload') or {}
+        media_type = data_payload.get('type')
+        if media_type in ('image', 'audio', 'video', 'file') and media.get('url'):
+            ctx.queue_media(message, 'image', url=media['url'].strip())
+            if media_type == 'file':
+                ctx.queue_media(message, 'attachment', url=media['url'].strip(), filename=media.get('caption'))
+
+    @api.model
+    def _process_meta(self, data, ctx):
+        Messages = self.env['whatsapp.messages'].sudo()
+        for entry in data.get('entry') or []:
+            for change in entry.get('changes') or []:
+                value = change.get('value') or {}
+                for status_data in value.get('statuses') or []:
+                    message = ctx.find_message(status_data.get('id'))
+                    if not message:
+                        _logger.info("Meta status for unknown message id %s", status_data.get('id'))
+                    elif 'msg_status' in Messages._fields:
+                        message.write({'msg_status': status_data.get('status')})
+
+                if change.get('field') == 'message_template_status_update':
+                    template_id = value.get('message_template_id')
+                    event = value.get('event')
+                    if template_id and event:
+                        template = self.env['whatsapp.templates'].sudo().search(
+                            [('template_id', '=', str(template_id))], limit=1)
+                        if template:
+                            template.write({'approval_state': event})
+                        else:
+                            _logger.warning("Template ID '%s' not found in Odoo database", template_id)
+
+                messages = value.get('messages') or []
+                if not messages:
+                    continue
+                contacts = value.get('contacts') or [{}]
+                sender_name = (contacts[0].get('profile') or {}).get('name')
+                phone_number_id = (value.get('metadata') or {}).get('phone_number_id')
+                instance = ctx.meta_instance(phone_number_id) or ctx.default_instance
+                for whatsapp_message_dict in messages:
+                    self._process_meta_message(whatsapp_message_dict, sender_name, instance, ctx)
+
+    @api.model
+    def _process_meta_message(self, whatsapp_message_dict, sender_name, instance, ctx):
+        message_dict = {}
+        context = whatsapp_message_dict.get('context')
+        if context:
+            quoted = ctx.find_message(context.get('id'))
+            if quoted and quoted.partner_id:
+                message_dict.update(self._quoted_vals(quoted, instance))
+        else:
+            chat_id = whatsapp_message_dict.get('from')
+            partner = ctx.partner_by_number(chat_id)
+            if not partner:
+                parsed = phonenumbers.parse('+' + chat_id, None)
+                country_code = parsed.country_code
+                partner = ctx.create_partner({
+                    'name': sender_name,
+                    'phone': '+' + str(country_code) + str(parsed.national_number),
+                    'chatId': str(chat_id),
+                }, country_code)
+            message_dict.update({'partner_id': partner.id, 'model': 'res.partner', 'res_id': partner.id})
+        message_dict = self._meta_message_vals(whatsapp_message_dict, message_dict, sender_name)
+
+        message = ctx.upsert_message(whatsapp_message_dict.get('id'), instance, message_dict)
+        if not message:
+            return
+        msg_type = whatsapp_message_dict.get('type')
+        if msg_type == 'image':
+            ctx.queue_media(message, 'image', meta_media_id=whatsapp_message_dict['image'].get('id'), instance=instance)
+        elif msg_type == 'document':
+            document = whatsapp_message_dict['document']
+            ctx.queue_media(message, 'attachment', meta_media_id=document.get('id'), instance=instance,
+                            filename=document.get('filename'))
+
+    # ------------------------------------------------------------
+    # Message values
+    # ------------------------------------------------------------
+
+    @api.model
+    def _quoted_vals(self, quoted, instance):
+        return {
+            'partner_id': quoted.partner_id.id,
+            'model': quoted.model,
+            'res_id': quoted.res_id,
+            'whatsapp_instance_id': instance.id,
+            'whatsapp_message_provider': instance.provider,
+        }
+
+    @api.model
+    def _1msg_message_vals(self, whatsapp_message_dict, message_dict):
+        message_dict.update({
+            'name': whatsapp_message_dict.get('body'),
+            'message_id': whatsapp_message_dict.get('id'),
+            'to': whatsapp_message_dict.get('chatName') if whatsapp_message_dict.get('fromMe') else 'To Me',
+            'chatId': whatsapp_message_dict.get('chatId'),
+            'type': whatsapp_message_dict.get('type'),
+            'senderName': whatsapp_message_dict.get('senderName'),
+            'chatName': whatsapp_message_dict.get('chatName'),
+            'author': whatsapp_message_dict.get('author'),
+            'time': _epoch_to_datetime(whatsapp_message_dict.get('time')),
+            'state': 'received',
+        })
+        msg_type = whatsapp_message_dict.get('type')
+        if msg_type == 'image':
+            message_dict['message_body'] = whatsapp_message_dict.get('caption')
+        if msg_type in ('chat', 'video', 'audio'):
+            message_dict['message_body'] = whatsapp_message_dict.get('body')
+        if msg_type == 'document':
+            message_dict['message_body'] = whatsapp_message_dict.get('caption')
+        return message_dict
+
+    @api.model
+    def _gupshup_message_vals(self, webhook_dict, message_dict):
+        webhook_payload = webhook_dict['payload']
+        sender = webhook_payload.get('sender')
+        message_dict.update({
+            'message_id': webhook_payload.get('id'),
+            'to': 'To Me',
+            'chatId': webhook_dict.get('chatId'),
+            'type': webhook_payload.get('type'),
+            'senderName': sender.get('name'),
+            'chatName': sender.get('phone'),
+            'author': sender.get('phone'),
+            'time': datetime.datetime.fromtimestamp(int(webhook_dict.get('timestamp')) / 1000),
+            'state': 'received',
+        })
+        media = webhook_payload.get('payload') or {}
+        if webhook_payload.get('type') in ('image', 'audio', 'video', 'file') and media.get('caption'):
+            message_dict['message_body'] = media.get('caption')
+        if webhook_payload.get('type') == 'text':
+            message_dict['message_body'] = media.get('text')
+        return message_dict
+
+    @api.model
+    def _meta_message_vals(self, whatsapp_message_dict, message_dict, sender_name):
+        msg_type = whatsapp_message_dict.get('type')
+        message_dict.update({
+            'name': whatsapp_message_dict.get('text').get('body') if whatsapp_message_dict.get('text') else '',
+            'message_id': whatsapp_message_dict.get('id'),
+            'chatId': whatsapp_message_dict.get('from'),
+            'type': msg_type,
+            'senderName': sender_name,
+            'chatName': whatsapp_message_dict.get('from'),
+            'time': _epoch_to_datetime(whatsapp_message_dict.get('timestamp')),
+            'state': 'received',
+        })
+        if msg_type == 'image':
+            message_dict['message_body'] = ''
+        if msg_type in ('text', 'video', 'audio'):
+            message_dict['message_body'] = (whatsapp_message_dict.get(msg_type) or {}).get('body')
+        if msg_type == 'document':
+            message_dict['message_body'] = whatsapp_message_dict.get('document').get('filename')
+        return message_dict
+
+
+class _BatchContext:
+    """Lookups shared by every event of one processing batch."""
+
+    def __init__(self, env):
+        self.env = env
+        self.Messages = env['whatsapp.messages'].sudo()
+        self.Instance = env['whatsapp.instance'].sudo()
+        self.default_instance = self.Instance.search([('status', '!=', 'disable')], limit=1)
+        self._meta_instances = {}
+        self._countries = {}
+        self._partners = {}
+        self._messages = {}
+        self._media_vals = []
+        self._event_start = None
+
+    def begin_event(self):
+        """Remember the cache state before an event, see ``discard_event``."""
+        self._event_start = (dict(self._partners), dict(self._messages), len(self._media_vals))
+
+    def discard_event(self):
+        """Drop what a failed event added: its partners, messages and media were rolled back with its savepoint."""
+        partners, messages, media_count = self._event_start
+        self._partners, self._messages = partners, messages
+        del self._media_vals[media_count:]
+
+    def prefetch_messages(self, events):
+        """Load every already-stored message referenced by the batch in one query."""
+        ids = set()
+        for event in events:
+            try:
+                data = json.loads(event.payload)
+            except ValueError:
+                continue
+            ids.update(_message_ids(event.provider, data))
+        ids.discard(None)
+        if ids:
+            for message in self.Messages.search([('message_id', 'in', list(ids))]):
+                self._messages.setdefault(message.message_id, message)
+
+    def find_message(self, message_id):
+        if not message_id:
+            return self.Messages
+        if message_id not in self._messages:
+            self._messages[message_id] = self.Messages.search([('message_id', '=', message_id)], limit=1)
+        return self._messages[message_id]
+
+    def upsert_message(self, message_id, instance, vals):
+        """Create or update the message keyed by provider message id."""
+        if not vals:
+            return self.Messages
+        if instance:
+            vals.update({'whatsapp_instance_id': instance.id, 'whatsapp_message_provider': instance.provider})
+        message = self.find_message(message_id)
+        if message and message.whatsapp_instance_id == instance:
+            message.write(vals)
+        else:
+            message = self.Messages.create(vals)
+            if message_id:
+                self._messages[message_id] = message
+        return message
+
+    def meta_instance(self, phone_number_id):
+        if not phone_number_id:
+            return self.Instance
+        if phone_number_id not in self._meta_instances:
+            self._meta_instances[phone_number_id] = self.Instance.search(
+                [('whatsapp_meta_phone_number_id', 'like', '%' + str(phone_number_id))], limit=1)
+        return self._meta_instances[phone_number_id]
+
+    def partner_by_number(self, number):
+        key = normalize_whatsapp_number(number)
+        if key not in self._partners:
+            self._partners[key] = self.env['res.partner'].sudo()._whatsapp_find_partner(number)
+        return self._partners[key]
+
+    def create_partner(self, vals, country_code):
+        if country_code not in self._countries:
+            self._countries[country_code] = self.env['res.country'].sudo().search(
+                [('phone_code', '=', country_code)], limit=1)
+        country = self._countries[country_code]
+        if country:
+            vals['country_id'] = country.id
+        Partner = self.env['res.partner'].sudo()
+        if 'mobile' in vals and 'mobile' not in Partner._fields:
+            vals['phone'] = vals.pop('mobile')
+        partner = Partner.create(vals)
+        key = partner.whatsapp_phone_key
+        if key:
+            self._partners[key] = partner
+        _logger.info("Res partner is created in odoo from whatsapp webhook partner id %s", partner.id)
+        return partner
+
+    def queue_media(self, message, target, url=None, meta_media_id=None, instance=None, filename=None):
+        if not (url or meta_media_id):
+            return
+        self._media_vals.append({
+            'message_id': message.id,
+            'target': target,
+            'url': url,
+            'meta_media_id': meta_media_id,
+            'instance_id': instance.id if instance else False,
+            'filename': filename,
+        })
+
+    def flush_media_jobs(self):
+        if self._media_vals:
+            self.env['whatsapp.media.job'].sudo()._enqueue(self._media_vals)
+            self._media_vals = []
+
+
+def _message_ids(provider, data):
+    if provider == 'whatsapp_chat_api':
+        for message in data.get('messages') or []:
+            yield message.get('id')
+            yield message.get('quotedMsgId')
+    elif provider == 'gupshup':
+        payload = data.get('payload') or {}
+        yield payload.get('id')
+        yield (payload.get('context') or {}).get('gsId')
+    elif provider == 'meta':
+        for entry in data.get('entry') or []:
+            for change in entry.get('changes') or []:
+                value = change.get('value') or {}
+                for message in value.get('messages') or []:
+                    yield message.get('id')
+                    yield (message.get('context') or {}).get('id')
+                for status in value.get('statuses') or []:
+                    yield status.get('id')
+
+
+def _split_phone(whatsapp_id):
+    number = (whatsapp_id or '').split('@')[0]
+    parsed = phonenumbers.parse('+' + number, None)
+    return parsed.country_code, parsed.national_number
+
+
+def _epoch_to_datetime(msg_time):
+    # Webhook times are epoch seconds, stored in server local time as before
+    return datetime.datetime.fromtimestamp(int(msg_time))
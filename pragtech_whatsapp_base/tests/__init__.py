@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+
+from . import test_whatsapp_webhook_event
+from . import test_res_partner
+from . import test_whatsapp_instance
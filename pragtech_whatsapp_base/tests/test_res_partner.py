@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.pragtech_whatsapp_base.models.res_partner import normalize_whatsapp_number
+
+
+@tagged('post_install', '-at_install')
+class TestWhatsappPartnerLookup(TransactionCase):
+
+    def test_normalize_whatsapp_number(self):
+        """Chat ids and international numbers keep their digits; national numbers use the partner country"""
+        self.assertEqual(normalize_whatsapp_number('919876543210@c.us'), '+919876543210')
+        self.assertEqual(normalize_whatsapp_number('+91 98765-43210'), '+919876543210')
+        self.assertEqual(normalize_whatsapp_number('098765 43210', 'IN'), '+919876543210')
+        self.assertEqual(normalize_whatsapp_number('020 7946 0958', 'GB'), '+442079460958')
+        self.assertFalse(normalize_whatsapp_number('no number'))
+
+    def test_partner_lookup_scales(self):
+        """A sender lookup is one indexed query, whatever the number of partners"""
+        india = self.env.ref('base.in')
+        Partner = self.env['res.partner']
+        partners = Partner.create([{
+            'name': 'WhatsApp Contact %s' % index,
+            'phone': '098765%05d' % index,
+            'country_id': india.id,
+        } for index in range(500)])
+        self.assertEqual(partners[42].whatsapp_phone_key, '+9198765%05d' % 42)
+        self.env.flush_all()
+
+        for chat_id in ('919876500042@c.us', '919876500499@c.us', '919999999999@c.us'):
+            with self.assertQueryCount(1):
+                Partner._whatsapp_find_partner(chat_id)
+        self.assertEqual(Partner._whatsapp_find_partner('919876500042@c.us'), partners[42])
+        self.assertFalse(Partner._whatsapp_find_partner('919999999999@c.us'))
+
+        partners[42].phone = '09876599999'
+        self.assertFalse(Partner._whatsapp_find_partner('919876500042@c.us'), 'A changed number is matched right away.')
+        self.assertEqual(Partner._whatsapp_find_partner('919876599999@c.us'), partners[42])
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from odoo import fields
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+
+
+# message_templates pages as returned by the Graph API
+GRAPH_TEMPLATE_PAGES = [
+    {
+        'data': [
+            {
+                'name': 'order_confirmation',
+                'parameter_format': 'POSITIONAL',
+                'components': [
+                    {'type': 'HEADER', 'format': 'TEXT', 'text': 'Order {{1}}',
+                     'example': {'header_text': ['SO042']}},
+                    {'type': 'BODY', 'text': 'Hi {{1}}, your order {{2}} is confirmed.',
+                     'example': {'body_text': [['Asha', 'SO042']]}},
+                    {'type': 'FOOTER', 'text': 'Thank you'},
+                    {'type': 'BUTTONS', 'buttons': [
+                        {'type': 'URL', 'text': 'Track', 'url': 'https://example.com/track/{{1}}',
+                         'example': ['https://example.com/track/SO042']},
+                    ]},
+                ],
+                'language': 'en_US',
+                'status': 'APPROVED',
+                'category': 'UTILITY',
+                'id': '1001',
+            },
+            {
+                'name': 'payment_reminder',
+                'parameter_format': 'POSITIONAL',
+                'components': [
+                    {'type': 'BODY', 'text': 'Please pay {{1}}', 'example': {'body_text': [['INV/001']]}},
+                ],
+                'language': 'en_US',
+                'status': 'APPROVED',
+                'category': 'UTILITY',
+                'id': '1002',
+            },
+        ],
+        'paging': {
+            'cursors': {'before': 'MAZDZD', 'after': 'MQZDZD'},
+            'next': 'https://graph.facebook.com/v17.0/1234/message_templates?limit=200&after=MQZDZD',
+        },
+    },
+    {
+        'data': [
+            {
+                'name': 'welcome',
+                'parameter_format': 'POSITIONAL',
+                'components': [{'type': 'BODY', 'text': 'Welcome!'}],
+                'language': 'en_US',
+                'status': 'PENDING',
+                'category': 'MARKETING',
+                'id': '1004',
+            },
+            {
+                'name': 'welcome',
+                'parameter_format': 'POSITIONAL',
+                'components': [{'type': 'BODY', 'text': 'Bienvenue !'}],
+                'language': 'fr',
+                'status': 'APPROVED',
+                'category': 'MARKETING',
+                'id': '1005',
+            },
+        ],
+        'paging': {'cursors': {'before': 'MgZDZD', 'after': 'MwZDZD'}},
+    },
+]
+
+
+@tagged('post_install', '-at_install')
+class TestWhatsappInstanceTemplateSync(TransactionCase):
+
+    def test_cron_skips_recently_synced_instances(self):
+        """Only instances whose last template sync is old enough are fetched from Meta again"""
+        Instance = self.env['whatsapp.instance']
+        now = fields.Datetime.now()
+        common = {
+            'provider': 'meta',
+            'status': 'enable',
+            'default_instance': False,
+            'whatsapp_meta_api_token': 'token',
+            'meta_whatsapp_business_account_id': '1234',
+        }
+        recent = Instance.create(dict(common, name='Recently Synced', template_sync_at=now - timedelta(hours=1)))
+        stale = Instance.create(dict(common, name='Stale', template_sync_at=now - timedelta(days=2)))
+        fetched = []
+
+        def fetch(instance):
+            fetched.append(instance.id)
+            return []
+
+        with patch.object(type(Instance), '_fetch_meta_templates', fetch), \
+                patch.object(type(Instance), '_apply_meta_templates', lambda instance, remote_templates: None):
+            Instance._cron_sync_meta_templates()
+        self.assertIn(stale.id, fetched)
+        self.assertNotIn(recent.id, fetched)
+        self.assertGreater(stale.template_sync_at, now - timedelta(minutes=1))
+
+    def test_apply_meta_templates(self):
+        """Recorded Graph API pages create, update, re-status and archive the local templates"""
+        instance = self.env['whatsapp.instance'].create({
+            'name': 'Meta Sync',
+            'provider': 'meta',
+            'status': 'enable',
+            'default_instance': False,
+            'whatsapp_meta_api_token': 'token',
+            'meta_whatsapp_business_account_id': '1234',
+        })
+        english = self.env['res.lang'].with_context(active_test=False).search([('code', '=', 'en_US')])
+        common = {
+            'provider': 'meta',
+            'whatsapp_instance_id': instance.id,
+            'languages': english.id,
+            'status': 'imported',
+        }
+        Templates = self.env['whatsapp.templates']
+        content_changed = Templates.create(dict(
+            common, name='order_confirmation', template_id='1001', category='UTILITY', header='text',
+            header_text='Order {{1}}', body='Hi {{1}}, your order is confirmed.', footer='Thank you',
+            approval_state='APPROVED', state='post',
+        ))
+        status_changed = Templates.create(dict(
+            common, name='payment_reminder', template_id='1002', category='UTILITY', header='none',
+            body='Please pay {{1}}', approval_state='PENDING', state='draft',
+        ))
+        removed = Templates.create(dict(
+            common, name='old_promo', template_id='1003', category='MARKETING', body='Sale!',
+            approval_state='APPROVED', state='post',
+        ))
+        # Created in Odoo and exported before Meta assigned it an id
+        exported = Templates.create(dict(
+            common, name='welcome', category='MARKETING', body='Welcome!', status=False,
+        ))
+        status_mappings = status_changed.parameter_mapping_ids
+
+        responses = []
+        for page in GRAPH_TEMPLATE_PAGES:
+            response = MagicMock(status_code=200)
+            response.json.return_value = page
+            responses.append(response)
+        with patch('odoo.addons.pragtech_whatsapp_base.models.whatsapp_instance.requests.get',
+                   side_effect=responses) as get:
+            remote_templates = instance._fetch_meta_templates()
+        self.assertEqual(get.call_count, 2, 'The "next" link of the first page should be followed.')
+        self.assertEqual(len(remote_templates), 4)
+
+        result = instance._apply_meta_templates(remote_templates)
+        self.assertEqual(result, {'created': 1, 'updated': 2, 'status_updated': 1, 'archived': 1})
+
+        self.assertEqual(content_changed.body, 'Hi {{1}}, your order {{2}} is confirmed.')
+        self.assertEqual(len(content_changed.parameter_mapping_ids.filtered(lambda m: m.line_type == 'body')), 2)
+        self.assertEqual(content_changed.button_ids.mapped('text'), ['Track'])
+        self.assertEqual(content_changed.button_ids.url_type, 'dynamic')
+
+        self.assertEqual((status_changed.approval_state, status_changed.state), ('APPROVED', 'post'))
+        self.assertEqual(status_changed.parameter_mapping_ids, status_mappings,
+                         'A status-only change should not rebuild the parameter mappings.')
+
+        self.assertFalse(removed.active)
+
+        self.assertEqual(exported.template_id, '1004', 'The exported template is matched by name and language.')
+        self.assertEqual(exported.languages, english)
+        french = Templates.search([('whatsapp_instance_id', '=', instance.id), ('template_id', '=', '1005')])
+        self.assertEqual(french.name, 'welcome')
+        self.assertEqual(french.languages.iso_code, 'fr')
+        self.assertNotEqual(french, exported)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+import json
+from datetime import timedelta
+
+from odoo import fields
+from odoo.exceptions import AccessError
+from odoo.tests import new_test_user, tagged
+from odoo.tests.common import TransactionCase
+
+from odoo.addons.pragtech_whatsapp_base.models.whatsapp_webhook_event import MAX_ATTEMPTS
+
+
+@tagged('post_install', '-at_install')
+class TestWhatsappWebhookEvent(TransactionCase):
+
+    def _stage_1msg(self, *messages):
+        Event = self.env['whatsapp.webhook.event']
+        Event._stage('whatsapp_chat_api', json.dumps({'messages': list(messages)}))
+        return Event.search([], order='id desc', limit=1)
+
+    def _image_message(self, message_id, chat_id):
+        return {
+            'id': message_id,
+            'chatId': chat_id,
+            'fromMe': False,
+            'senderName': 'Sender %s' % message_id,
+            'type': 'image',
+            'body': 'https://example.com/%s.jpg' % message_id,
+            'time': 1700000000,
+        }
+
+    def test_failed_event_does_not_leak_into_batch(self):
+        """A failing event is rolled back alone; the rest of the batch and its media jobs still go through"""
+        first = self._stage_1msg(self._image_message('MSG-OK-1', '919876543210@c.us'))
+        failing = self._stage_1msg(
+            self._image_message('MSG-BAD-1', '919812300000@c.us'),
+            dict(self._image_message('MSG-BAD-2', '919812300000@c.us'), type='chat', time='not-a-time'),
+        )
+        last = self._stage_1msg(self._image_message('MSG-OK-2', '919812300000@c.us'))
+
+        (first | failing | last)._process_batch()
+
+        self.assertEqual((first.state, last.state), ('done', 'done'))
+        self.assertEqual(failing.state, 'pending')
+        self.assertEqual(failing.attempts, 1)
+        Messages = self.env['whatsapp.messages'].sudo()
+        self.assertFalse(Messages.search([('message_id', 'in', ['MSG-BAD-1', 'MSG-BAD-2'])]))
+        ok_messages = Messages.search([('message_id', 'in', ['MSG-OK-1', 'MSG-OK-2'])])
+        self.assertEqual(len(ok_messages), 2)
+        # The partner created by the failed event was rolled back, so the last event creates its own
+        self.assertTrue(ok_messages.filtered(lambda message: message.message_id == 'MSG-OK-2').partner_id.exists())
+        jobs = self.env['whatsapp.media.job'].sudo().search([('message_id', 'in', ok_messages.ids)])
+        self.assertEqual(jobs.message_id, ok_messages)
+        self.assertEqual(self.env['whatsapp.media.job'].sudo().search_count([('message_id', 'not in', ok_messages.ids)]), 0)
+
+    def test_failed_event_backs_off_until_terminal_failure(self):
+        """A failing event waits longer after each attempt and is given up after MAX_ATTEMPTS"""
+        Event = self.env['whatsapp.webhook.event']
+        failing = self._stage_1msg(dict(self._image_message('MSG-RETRY', '919812300001@c.us'), time='not-a-time'))
+        delays = []
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            before = fields.Datetime.now()
+            Event._cron_process_events()
+            self.assertEqual(failing.attempts, attempt)
+            delays.append(failing.next_attempt_at - before)
+            # Not due yet: the next run leaves it alone
+            Event._cron_process_events()
+            self.assertEqual(failing.attempts, attempt)
+            failing.next_attempt_at = fields.Datetime.now() - timedelta(seconds=1)
+        self.assertEqual(failing.state, 'failed')
+        self.assertEqual(delays, sorted(delays))
+        self.assertGreaterEqual(delays[0], timedelta(minutes=2))
+
+        Event._cron_process_events()
+        self.assertEqual(failing.attempts, MAX_ATTEMPTS, 'A failed event is not processed again.')
+        admin = new_test_user(self.env, login='webhook_admin', groups='base.group_system')
+        failing.with_user(admin).action_retry()
+        self.assertEqual((failing.state, failing.attempts), ('pending', 0))
+
+    def test_payloads_are_read_only_for_administrators(self):
+        event = self._stage_1msg(self._image_message('MSG-ACL', '919812300002@c.us'))
+        employee = new_test_user(self.env, login='webhook_employee', groups='base.group_user')
+        with self.assertRaises(AccessError):
+            event.with_user(employee).read(['payload'])
+        admin = new_test_user(self.env, login='webhook_admin', groups='base.group_system')
+        self.assertTrue(event.with_user(admin).read(['payload']))
+        with self.assertRaises(AccessError):
+            event.with_user(admin).write({'payload': '{}'})
+        with self.assertRaises(AccessError):
+            event.with_user(admin).unlink()
+        with self.assertRaises(AccessError):
+            event.with_user(employee).action_retry()
@@ -81,67 +81,32 @@ class RmcSubcontractorPortal(CustomerPortal):
         return plant
 
     def _compute_subcontractor_dashboard(self, subcontractor):
-        transport_model = request.env['rmc.subcontractor.transport'].sudo()
-        docket_model = request.env['rmc.docket'].sudo()
-        fuel_log_model = request.env['rmc.transport.fuel.log'].sudo()
-        workorder_model = request.env['dropshipping.workorder'].sudo()
-        ticket_model = request.env['dropshipping.workorder.ticket'].sudo()
-        today_start = fields.Datetime.to_string(datetime.combine(fields.Date.context_today(request.env.user), time.min))
-        today_end = fields.Datetime.to_string(datetime.combine(fields.Date.context_today(request.env.user), time.max))
-
-        transports = transport_model.search([('subcontractor_id', '=', subcontractor.id), ('active', '=', True)])
-        plants = subcontractor.plant_ids.sudo()
-        pump_model = request.env['rmc.subcontractor.pump'].sudo()
-        pumps = pump_model.search([
-            ('subcontractor_id', '=', subcontractor.id),
-            ('active', '=', True),
-        ])
-        dockets_today = docket_model.search([
-            ('subcontractor_id', '=', subcontractor.id),
-            ('docket_date', '>=', today_start),
-            ('docket_date', '<=', today_end),
-        ])
+        env = request.env(su=True)
+        subcontractor = subcontractor.sudo()
+        data = subcontractor._portal_dashboard_values(fields.Date.context_today(request.env.user))
+        plants = subcontractor.plant_ids
+        transports = env['rmc.subcontractor.transport'].browse(data['transport_ids'])
+        pumps = env['rmc.subcontractor.pump'].browse(data['pump_ids'])
         operators = plants.filtered(lambda p: p.operator_portal_enabled and p.operator_user_id)
-        fleet_utilization = 0.0
-        if transports:
-            active_with_jobs = len(transports.filtered(lambda t: t.jobs_today > 0))
-            fleet_utilization = round((active_with_jobs / len(transports)) * 100, 2)
-        documents_due = sum(transports.mapped('documents_due_count'))
-        today_str = fields.Date.to_string(fields.Date.context_today(request.env.user))
-        fuel_litres = sum(fuel_log_model.search([
-            ('transport_id', 'in', transports.ids),
-            ('log_date', '=', today_str),
-        ]).mapped('litre_count')) if transports else 0.0
-
-        partner_id = subcontractor.partner_id.id if subcontractor.partner_id else False
-        workorder_domain = [('subcontractor_id', '=', partner_id)] if partner_id else []
-        workorders_active = workorder_model.search(workorder_domain + [('state', 'not in', ['completed', 'cancelled'])], order='date_order desc', limit=20) if workorder_domain else workorder_model.browse([])
-        workorders_count = workorder_model.search_count(workorder_domain) if workorder_domain else 0
-        workorders_active_count = workorder_model.search_count(workorder_domain + [('state', 'not in', ['completed', 'cancelled'])]) if workorder_domain else 0
-
-        ticket_domain = [('workorder_id.subcontractor_id', '=', partner_id)] if partner_id else []
-        tickets_open = ticket_model.search(ticket_domain + [('state', 'not in', ['completed', 'cancelled'])], order='delivery_date desc, id desc', limit=20) if ticket_domain else ticket_model.browse([])
-        tickets_open_count = ticket_model.search_count(ticket_domain + [('state', 'not in', ['completed', 'cancelled'])]) if ticket_domain else 0
         return {
             'plants': plants,
             'transports': transports,
             'pumps': pumps,
             'operators': operators,
-            'dockets_today': dockets_today,
-            'workorders_active': workorders_active,
-            'tickets_open': tickets_open,
-            'fleet_utilization': fleet_utilization,
-            'documents_due': documents_due,
-            'fuel_litres': fuel_litres,
+            'workorders_active': env['dropshipping.workorder'].browse(data['workorder_ids']),
+            'tickets_open': env['dropshipping.workorder.ticket'].browse(data['ticket_ids']),
+            'fleet_utilization': data['fleet_utilization'],
+            'documents_due': data['documents_due'],
+            'fuel_litres': data['fuel_litres'],
             'totals': {
                 'plants': len(plants),
                 'operators': len(operators),
                 'fleet': len(transports),
                 'pumps': len(pumps),
-                'jobs_today': len(dockets_today),
-                'workorders': workorders_count,
-                'active_workorders': workorders_active_count,
-                'open_tickets': tickets_open_count,
+                'jobs_today': data['jobs_today'],
+                'workorders': data['workorders'],
+                'active_workorders': data['active_workorders'],
+                'open_tickets': data['open_tickets'],
             },
         }
 
@@ -157,7 +122,6 @@ class RmcSubcontractorPortal(CustomerPortal):
             'transports': data['transports'],
             'pumps': data['pumps'],
             'operators': data['operators'],
-            'dockets_today': data['dockets_today'],
             'workorders_active': data['workorders_active'],
             'tickets_open': data['tickets_open'],
             'fleet_utilization': data['fleet_utilization'],
@@ -10,6 +10,7 @@ from . import helpdesk_ticket
 from . import workorder
 from . import quality_cube_test
 from . import rmc_report
+from . import rmc_report_refresh
 from . import rmc_subcontractor_assignment_wizard
 from . import stock_move
 from . import rmc_material_balance
@@ -30,4 +31,5 @@ from . import cube_test_wizard
 from . import quality_cube_sample
 from . import reporting_settings
 from . import reporting_cron
+from . import portal_cache
 from . import rmc_portal
@@ -14,7 +14,7 @@ class AccountMoveExt(models.Model):
 class AccountMove(models.Model):
     _inherit = 'account.move'
 
-    docket_id = fields.Many2one('rmc.docket', string='RMC Docket', readonly=True)
+    docket_id = fields.Many2one('rmc.docket', string='RMC Docket', readonly=True, index='btree_not_null')
     plant_check_id = fields.Many2one('rmc.plant_check', string='Plant Check', readonly=True)
     delivery_challan_number = fields.Char(string='Delivery Challan Number')
     delivery_date = fields.Date(string='Delivery Date')
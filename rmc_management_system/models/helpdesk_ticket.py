@@ -212,59 +212,71 @@ class HelpdeskTicket(models.Model):
         3) Else, sum of rmc.batch linked directly to this ticket (quantity_produced fallback quantity_ordered).
         4) Else, sum of rmc.docket.batch for linked dockets; fallback to docket quantity fields.
         Remaining = max(0, rmc_quantity - delivered)
+
+        Each source is read once for the whole recordset, and only for the
+        tickets the previous sources left without a delivered quantity.
         """
-        Batch = self.env['rmc.batch'].sudo()
-        TL = self.env['rmc.truck_loading'].sudo()
-        DocketBatch = self.env['rmc.docket.batch'].sudo()
-        for rec in self:
-            delivered = 0.0
-            # 1) Prefer docket.quantity_produced (sum across all dockets)
-            try:
-                if rec.docket_ids:
-                    total_produced = sum(float(d.quantity_produced or 0.0) for d in rec.docket_ids)
-                    if total_produced > 0.0:
-                        delivered = total_produced
-            except Exception:
-                pass
+        ticket_ids = [tid for tid in self._origin.ids if tid]
+        delivered = dict.fromkeys(ticket_ids, 0.0)
+        if ticket_ids:
+            dockets = self.env['rmc.docket'].sudo().search_read(
+                [('helpdesk_ticket_id', 'in', ticket_ids)],
+                ['helpdesk_ticket_id', 'quantity_produced', 'quantity_ordered'], load=None)
+            docket_ticket = {d['id']: d['helpdesk_ticket_id'] for d in dockets}
 
-            # 2) Truck loadings from dockets (fallback if produced not available)
-            try:
-                if delivered <= 0.0:
-                    docket_ids = rec.docket_ids.ids or []
-                    if docket_ids:
-                        tls = TL.search([('docket_id', 'in', docket_ids)])
-                        if tls:
-                            delivered = sum(float((tl.total_quantity or 0.0)) for tl in tls)
-                    # If no dockets or none delivered via TLs, try via computed truck_loading_ids (from delivery tracks)
-                    if delivered <= 0.0 and rec.truck_loading_ids:
-                        delivered = sum(float((tl.total_quantity or 0.0)) for tl in rec.truck_loading_ids)
-            except Exception:
-                pass
+            # 1) Prefer docket.quantity_produced (sum across all dockets)
+            for d in dockets:
+                delivered[d['helpdesk_ticket_id']] += float(d['quantity_produced'] or 0.0)
+            delivered = {tid: qty if qty > 0.0 else 0.0 for tid, qty in delivered.items()}
+
+            # 2) Truck loadings from dockets, else from the ticket's delivery tracks
+            pending = [tid for tid, qty in delivered.items() if qty <= 0.0]
+            pending_dockets = [did for did, tid in docket_ticket.items() if tid in pending]
+            if pending_dockets:
+                for docket, total in self.env['rmc.truck_loading'].sudo()._read_group(
+                        [('docket_id', 'in', pending_dockets)], ['docket_id'], ['total_quantity:sum']):
+                    delivered[docket_ticket[docket.id]] += float(total or 0.0)
+            pending = [tid for tid, qty in delivered.items() if qty <= 0.0]
+            if pending:
+                loadings_by_ticket = {}
+                for track in self.env['rmc.delivery_track'].sudo().search_read(
+                        [('helpdesk_ticket_id', 'in', pending), ('truck_loading_id', '!=', False)],
+                        ['helpdesk_ticket_id', 'truck_loading_id'], load=None):
+                    loadings_by_ticket.setdefault(track['helpdesk_ticket_id'], set()).add(track['truck_loading_id'])
+                loading_qty = {
+                    tl['id']: float(tl['total_quantity'] or 0.0)
+                    for tl in self.env['rmc.truck_loading'].sudo().browse(
+                        set().union(*loadings_by_ticket.values())).read(['total_quantity'])
+                } if loadings_by_ticket else {}
+                for tid, loading_ids in loadings_by_ticket.items():
+                    delivered[tid] += sum(loading_qty[lid] for lid in loading_ids)
 
             # 3) Direct rmc.batch linked to ticket
-            if delivered <= 0.0 and rec.id:
-                try:
-                    batches = Batch.search([('helpdesk_ticket_id', '=', rec.id)])
-                    for b in batches:
-                        delivered += (b.quantity_produced or 0.0) or (b.quantity_ordered or 0.0)
-                except Exception:
-                    pass
+            pending = [tid for tid, qty in delivered.items() if qty <= 0.0]
+            if pending:
+                for b in self.env['rmc.batch'].sudo().search_read(
+                        [('helpdesk_ticket_id', 'in', pending)],
+                        ['helpdesk_ticket_id', 'quantity_produced', 'quantity_ordered'], load=None):
+                    delivered[b['helpdesk_ticket_id']] += (b['quantity_produced'] or 0.0) or (b['quantity_ordered'] or 0.0)
 
             # 4) Docket batches or docket fields
-            if delivered <= 0.0 and rec.docket_ids:
-                try:
-                    for d in rec.docket_ids:
-                        dbatches = DocketBatch.search([('docket_id', '=', d.id)])
-                        if dbatches:
-                            delivered += sum(float(b.quantity_ordered or 0.0) for b in dbatches)
-                        else:
-                            delivered += float((d.quantity_produced or 0.0) or (d.quantity_ordered or 0.0))
-                except Exception:
-                    pass
+            pending = {tid for tid, qty in delivered.items() if qty <= 0.0}
+            pending_dockets = [d for d in dockets if d['helpdesk_ticket_id'] in pending]
+            if pending_dockets:
+                batch_qty = {
+                    docket.id: qty for docket, qty in self.env['rmc.docket.batch'].sudo()._read_group(
+                        [('docket_id', 'in', [d['id'] for d in pending_dockets])], ['docket_id'], ['quantity_ordered:sum'])
+                }
+                for d in pending_dockets:
+                    if d['id'] in batch_qty:
+                        delivered[d['helpdesk_ticket_id']] += float(batch_qty[d['id']] or 0.0)
+                    else:
+                        delivered[d['helpdesk_ticket_id']] += float((d['quantity_produced'] or 0.0) or (d['quantity_ordered'] or 0.0))
 
-            rec.rmc_qty_delivered = delivered
-            qty = float(rec.rmc_quantity or 0.0)
-            rec.rmc_qty_remaining = max(0.0, qty - delivered)
+        for rec in self:
+            qty_delivered = delivered.get(rec._origin.id, 0.0)
+            rec.rmc_qty_delivered = qty_delivered
+            rec.rmc_qty_remaining = max(0.0, float(rec.rmc_quantity or 0.0) - qty_delivered)
 
     def _compute_workorder_ticket_count(self):
         for ticket in self:
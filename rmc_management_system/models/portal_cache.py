@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import time
+
+from odoo import api, models
+
+
+class PortalCache:
+    """Per worker process cache of values computed for portal pages.
+
+    Entries are keyed ``(dbname, kind, id)`` and may hold several variants
+    (e.g. one per day). Writes to the source records drop the affected
+    entries once committed, see ``rmc.portal.cache.source``; the TTL bounds
+    staleness in the other workers.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+
+    def get_many(self, env, kind, ids, compute, variant=None):
+        """Return ``{id: value}``, calling ``compute(missing_ids)`` once for the ids not cached.
+
+        ``compute`` returns ``{id: value}``; ids it leaves out get ``{}``.
+        """
+        dbname = env.cr.dbname
+        now = time.monotonic()
+        result = {}
+        missing = []
+        for record_id in ids:
+            cached = self._entries.get((dbname, kind, record_id), {}).get(variant)
+            if cached and cached[0] > now:
+                result[record_id] = cached[1]
+            else:
+                missing.append(record_id)
+        if missing:
+            self._purge(now)
+            computed = compute(missing)
+            for record_id in missing:
+                result[record_id] = computed.get(record_id, {})
+                variants = self._entries.setdefault((dbname, kind, record_id), {})
+                variants[variant] = (now + self.ttl, result[record_id])
+        return result
+
+    def get(self, env, kind, record_id, compute, variant=None):
+        """Return the value of ``record_id``, calling ``compute()`` when it is not cached."""
+        return self.get_many(env, kind, [record_id], lambda ids: {record_id: compute()}, variant=variant)[record_id]
+
+    def _purge(self, now):
+        for key, variants in list(self._entries.items()):
+            for variant, (expiry, _value) in list(variants.items()):
+                if expiry <= now:
+                    variants.pop(variant, None)
+            if not variants:
+                self._entries.pop(key, None)
+
+    def invalidate(self, dbname, keys):
+        """Drop every variant of the ``(kind, id)`` entries of ``keys``."""
+        for kind, record_id in keys:
+            self._entries.pop((dbname, kind, record_id), None)
+
+    def invalidate_on_commit(self, env, kind, ids):
+        """Drop the entries of ``ids`` once the current transaction is committed."""
+        if not ids:
+            return
+        data = env.cr.postcommit.data
+        data_key = ('rmc.portal.cache.dirty', id(self))
+        pending = data.get(data_key)
+        if pending is None:
+            pending = data[data_key] = set()
+            dbname = env.cr.dbname
+            env.cr.postcommit.add(lambda: self.invalidate(dbname, pending))
+        pending.update((kind, record_id) for record_id in ids)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class RmcPortalCacheSource(models.AbstractModel):
+    """Drop the cached portal values a record contributes to once its change is committed."""
+    _name = 'rmc.portal.cache.source'
+    _description = 'RMC Portal Cache Source'
+
+    # Fields feeding the cached values; empty means every write counts
+    _portal_cache_fields = ()
+
+    def _portal_cache_keys(self):
+        """Return ``[(cache, kind, ids)]`` of the cached values built from ``self``."""
+        return []
+
+    def _portal_cache_invalidate(self):
+        if not self:
+            return
+        for cache, kind, ids in self.sudo()._portal_cache_keys():
+            cache.invalidate_on_commit(self.env, kind, ids)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._portal_cache_invalidate()
+        return records
+
+    def write(self, vals):
+        relevant = not self._portal_cache_fields or any(fname in vals for fname in self._portal_cache_fields)
+        if relevant:
+            # Old keys too, in case the record moves to another cached entry
+            self._portal_cache_invalidate()
+        res = super().write(vals)
+        if relevant:
+            self._portal_cache_invalidate()
+        return res
+
+    def unlink(self):
+        self._portal_cache_invalidate()
+        return super().unlink()
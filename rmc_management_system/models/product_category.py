@@ -1,4 +1,18 @@
-from odoo import models, fields
+from odoo import api, models, fields
+
+from .rmc_material_balance import MATERIAL_TYPES
+
+
+def classify_material_type(category_name):
+    """Map a product category name to an RMC material type, or ``False`` when it is not a material."""
+    name = (category_name or '').lower()
+    if 'cement' in name:
+        return 'cement'
+    if 'sand' in name:
+        return 'sand'
+    if 'aggregate' in name or 'gravel' in name:
+        return 'aggregate'
+    return False
 
 
 class ProductCategory(models.Model):
@@ -7,3 +21,13 @@ class ProductCategory(models.Model):
     is_rmc_category = fields.Boolean(
         string="Is RMC Category",
         help="Mark this category as RMC so any products under it are treated as RMC.")
+    rmc_material_type = fields.Selection(
+        MATERIAL_TYPES, string="RMC Material", compute='_compute_rmc_material_type',
+        store=True, readonly=False,
+        help="Material balance this category's products are booked on. Derived from the name, can be overridden. "
+             "Products of categories without one are not booked on receipt.")
+
+    @api.depends('name')
+    def _compute_rmc_material_type(self):
+        for categ in self:
+            categ.rmc_material_type = classify_material_type(categ.name)
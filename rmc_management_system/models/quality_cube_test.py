@@ -40,8 +40,8 @@ class QualityCubeTest(models.Model):
     ], compute='_compute_pass_fail', store=True)
     user_id = fields.Many2one('res.users', string='Assigned To')
     notes = fields.Text()
-    docket_id = fields.Many2one('rmc.docket', string='Docket', help='If created from a docket trigger, linked docket for dedup and traceability')
-    workorder_id = fields.Many2one('dropshipping.workorder', string='Workorder', help='If created from a workorder trigger, linked workorder for traceability')
+    docket_id = fields.Many2one('rmc.docket', string='Docket', index='btree_not_null', help='If created from a docket trigger, linked docket for dedup and traceability')
+    workorder_id = fields.Many2one('dropshipping.workorder', string='Workorder', index='btree_not_null', help='If created from a workorder trigger, linked workorder for traceability')
     # Trial Mix-centric metrics
     test_type = fields.Selection([('7d', '7 Days'), ('28d', '28 Days')], compute='_compute_test_type', store=True)
     required_strength = fields.Float(string='Required Strength (MPa)')
@@ -1,6 +1,35 @@
-from odoo import models, fields, api, _
+import json
+import logging
+import re
+from collections import defaultdict
+
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError
 
+_logger = logging.getLogger(__name__)
+
+MATERIAL_BUCKETS = [
+    ('ten_mm', '10mm Aggregate'),
+    ('twenty_mm', '20mm Aggregate'),
+    ('facs', 'Fine Aggregate'),
+    ('water_batch', 'Water'),
+    ('flyash', 'Fly Ash'),
+    ('adm_plast', 'Admixture Plasticizer'),
+    ('other', 'Other'),
+]
+# Keyword rules, first matching bucket wins. Override with the
+# rmc.batch.material_keywords system parameter (same JSON shape).
+DEFAULT_MATERIAL_KEYWORDS = [
+    ['ten_mm', ['10mm']],
+    ['twenty_mm', ['20mm']],
+    ['facs', ['fine', 'sand', 'facs']],
+    ['water_batch', ['water']],
+    ['flyash', ['fly']],
+    ['adm_plast', ['admixture', 'plasticizer', 'adm']],
+]
+MATERIAL_TOTAL_FIELDS = ['ten_mm', 'twenty_mm', 'facs', 'water_batch', 'flyash', 'adm_plast']
+
+
 class RmcBatch(models.Model):
     _name = 'rmc.batch'
     _description = 'RMC Batch Production'
@@ -10,8 +39,8 @@ class RmcBatch(models.Model):
     batch_number = fields.Char(string='Batch Number', required=True)
     batch_date = fields.Datetime(string='Batch Date', required=True, default=fields.Datetime.now)
     
-    sale_order_id = fields.Many2one('sale.order', string='Sale Order')
-    helpdesk_ticket_id = fields.Many2one('helpdesk.ticket', string='Ticket')
+    sale_order_id = fields.Many2one('sale.order', string='Sale Order', index='btree_not_null')
+    helpdesk_ticket_id = fields.Many2one('helpdesk.ticket', string='Ticket', index='btree_not_null')
     subcontractor_id = fields.Many2one('rmc.subcontractor', string='Subcontractor')
     plant_check_id = fields.Many2one('rmc.plant_check', string='Plant Check')
     docket_id = fields.Many2one('rmc.docket', string='Docket')
@@ -81,32 +110,82 @@ class RmcBatch(models.Model):
                 }))
             self.batch_line_ids = lines
 
-    @api.depends('batch_line_ids.actual_qty', 'batch_line_ids.material_name')
+    @api.depends('batch_line_ids.actual_qty', 'batch_line_ids.material_bucket')
     def _compute_material_totals(self):
+        totals = defaultdict(lambda: defaultdict(float))
+        stored = self.filtered(lambda batch: isinstance(batch.id, int))
+        if stored:
+            # One grouped aggregate for every batch being recomputed
+            for batch, bucket, qty in self.env['rmc.batch.line']._read_group(
+                    [('batch_id', 'in', stored.ids)], ['batch_id', 'material_bucket'], ['actual_qty:sum']):
+                totals[batch.id][bucket] = qty or 0.0
+        for record in self - stored:
+            # Unsaved form values: lines only exist in the cache
+            for line in record.batch_line_ids:
+                totals[record.id][line.material_bucket] += line.actual_qty
         for record in self:
-            record.ten_mm = sum(line.actual_qty for line in record.batch_line_ids 
-                               if '10mm' in (line.material_name or '').lower())
-            record.twenty_mm = sum(line.actual_qty for line in record.batch_line_ids 
-                                  if '20mm' in (line.material_name or '').lower())
-            record.facs = sum(line.actual_qty for line in record.batch_line_ids 
-                             if any(term in (line.material_name or '').lower() 
-                                   for term in ['fine', 'sand', 'facs']))
-            record.water_batch = sum(line.actual_qty for line in record.batch_line_ids 
-                                    if 'water' in (line.material_name or '').lower())
-            record.flyash = sum(line.actual_qty for line in record.batch_line_ids 
-                               if 'fly' in (line.material_name or '').lower())
-            record.adm_plast = sum(line.actual_qty for line in record.batch_line_ids 
-                                  if any(term in (line.material_name or '').lower() 
-                                        for term in ['admixture', 'plasticizer', 'adm']))
+            record_totals = totals[record.id]
+            for fname in MATERIAL_TOTAL_FIELDS:
+                record[fname] = record_totals.get(fname, 0.0)
             record.WATERR = record.water_batch  # Water ratio is same as water quantity for now
 
+    @api.model
+    def _backfill_material_totals(self, batch_ids=None):
+        """Bulk mode: reclassify batch lines and rebuild stored totals in SQL.
+
+        Meant for backfills after the keyword rules changed. Lines are
+        reclassified per distinct material name, then the totals of
+        ``batch_ids`` (all batches when None) come from a single grouped
+        UPDATE instead of the ORM recompute.
+        """
+        self.env.flush_all()
+        cr = self.env.cr
+        Line = self.env['rmc.batch.line']
+        batch_filter = "TRUE" if batch_ids is None else "batch_id = ANY(%(batch_ids)s)"
+        params = {'batch_ids': list(batch_ids or [])}
+        cr.execute("SELECT DISTINCT material_name FROM rmc_batch_line WHERE %s" % batch_filter, params)
+        names_by_bucket = defaultdict(list)
+        for (name,) in cr.fetchall():
+            names_by_bucket[Line._classify_material(name)].append(name)
+        for bucket, names in names_by_bucket.items():
+            cr.execute("""
+                UPDATE rmc_batch_line SET material_bucket = %%(bucket)s
+                 WHERE material_name = ANY(%%(names)s) AND material_bucket IS DISTINCT FROM %%(bucket)s AND %s
+            """ % batch_filter, dict(params, bucket=bucket, names=names))
+        sums = ", ".join(
+            "%s = COALESCE(t.%s, 0.0)" % (fname, fname) for fname in MATERIAL_TOTAL_FIELDS
+        )
+        aggregates = ", ".join(
+            "SUM(l.actual_qty) FILTER (WHERE l.material_bucket = '%s') AS %s" % (fname, fname)
+            for fname in MATERIAL_TOTAL_FIELDS
+        )
+        cr.execute("""
+            UPDATE rmc_batch b
+               SET %s,
+                   "WATERR" = COALESCE(t.water_batch, 0.0)
+              FROM (
+                    SELECT b.id AS batch_id, %s
+                      FROM rmc_batch b
+                 LEFT JOIN rmc_batch_line l ON l.batch_id = b.id
+                     WHERE %s
+                  GROUP BY b.id
+                   ) t
+             WHERE t.batch_id = b.id
+        """ % (sums, aggregates, "TRUE" if batch_ids is None else "b.id = ANY(%(batch_ids)s)"), params)
+        _logger.info("Rebuilt material totals of %s batches", cr.rowcount)
+        Line.invalidate_model(['material_bucket'])
+        self.invalidate_model(MATERIAL_TOTAL_FIELDS + ['WATERR'])
+        return True
+
 class RmcBatchLine(models.Model):
     _name = 'rmc.batch.line'
     _description = 'RMC Batch Line'
 
-    batch_id = fields.Many2one('rmc.batch', string='Batch', required=True, ondelete='cascade')
+    batch_id = fields.Many2one('rmc.batch', string='Batch', required=True, ondelete='cascade', index=True)
     material_name = fields.Char(string='Material Name', required=True)
     material_code = fields.Char(string='Material Code')
+    material_bucket = fields.Selection(MATERIAL_BUCKETS, string='Material Class',
+                                       compute='_compute_material_bucket', store=True, index=True)
     design_qty = fields.Float(string='Design Qty (Kg)', required=True)
     actual_qty = fields.Float(string='Actual Qty (Kg)')
     tolerance_percentage = fields.Float(string='Tolerance %', default=2.0)
@@ -114,6 +193,30 @@ class RmcBatchLine(models.Model):
     variance = fields.Float(string='Variance (Kg)', compute='_compute_variance', store=True)
     variance_percentage = fields.Float(string='Variance %', compute='_compute_variance', store=True)
     
+    @api.model
+    @tools.ormcache('rules')
+    def _compile_material_classifier(self, rules):
+        return [
+            (bucket, re.compile('|'.join(re.escape(keyword.lower()) for keyword in keywords)))
+            for bucket, keywords in json.loads(rules) if keywords
+        ]
+
+    @api.model
+    def _classify_material(self, material_name):
+        rules = self.env['ir.config_parameter'].sudo().get_param('rmc.batch.material_keywords')
+        if not rules:
+            rules = json.dumps(DEFAULT_MATERIAL_KEYWORDS)
+        name = (material_name or '').lower()
+        for bucket, pattern in self._compile_material_classifier(rules):
+            if pattern.search(name):
+                return bucket
+        return 'other'
+
+    @api.depends('material_name')
+    def _compute_material_bucket(self):
+        for record in self:
+            record.material_bucket = self._classify_material(record.material_name)
+
     @api.depends('design_qty', 'actual_qty')
     def _compute_variance(self):
         for record in self:
@@ -7,7 +7,7 @@ class RmcDeliveryTrack(models.Model):
     _description = 'RMC Delivery Tracking'
 
     name = fields.Char(string='Reference', required=True, default='New', copy=False)
-    helpdesk_ticket_id = fields.Many2one('helpdesk.ticket', string='Helpdesk Ticket', ondelete='cascade')
+    helpdesk_ticket_id = fields.Many2one('helpdesk.ticket', string='Helpdesk Ticket', ondelete='cascade', index='btree_not_null')
     workorder_ticket_id = fields.Many2one('dropshipping.workorder.ticket', string='Workorder Ticket')
     workorder_id = fields.Many2one('dropshipping.workorder', string='Workorder')
     batch_id = fields.Many2one('rmc.batch', string='Batch')
@@ -1,6 +1,10 @@
+import logging
+
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
 
+_logger = logging.getLogger(__name__)
+
 
 class RmcDeliveryVariance(models.Model):
     _name = 'rmc.delivery_variance'
@@ -198,8 +202,104 @@ class RmcDeliveryVariance(models.Model):
         self.ensure_one()
         if not self.approved or self.reconciliation_status != 'approved':
             raise ValidationError(_('Record must be Approved before reconciliation.'))
+        success, message = self._reconcile_batch()[self.id]
+        if not success:
+            raise UserError(message)
+
+    def action_reconcile_bulk(self):
+        """Reconcile the selected variances together, reporting the ones that could not be reconciled."""
+        outcomes = self._reconcile_batch()
+        failed = [message for success, message in outcomes.values() if not success]
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Delivery Variance Reconciliation'),
+                'message': _('%(done)s reconciled, %(failed)s failed. See the chatter of the failed variances.',
+                             done=len(outcomes) - len(failed), failed=len(failed)),
+                'type': 'warning' if failed else 'success',
+                'sticky': bool(failed),
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
+
+    def _reconcile_batch(self):
+        """Reconcile ``self`` in one pass and return ``{variance_id: (success, message)}``.
+
+        Journals, the solved helpdesk stage, plant checks and unit prices are
+        resolved once for the batch. Every variance is first planned into
+        document requests; the documents are then grouped per type, partner,
+        journal, currency and original document and created with a single
+        ``create``. If that fails, variances are retried one by one so a bad
+        variance is reported and left Approved without blocking the others.
+        """
+        batch = self._prepare_reconcile_batch()
+        outcomes = {}
+        plans = {}
+        for rec in self:
+            if not rec.approved or rec.reconciliation_status != 'approved':
+                outcomes[rec.id] = (False, _('Record must be Approved before reconciliation.'))
+                continue
+            try:
+                plans[rec] = rec._plan_reconciliation(batch)
+            except (UserError, ValidationError) as e:
+                outcomes[rec.id] = (False, e.args[0])
 
-        # Route to handlers
+        try:
+            with self.env.cr.savepoint():
+                self._reconcile_create_moves(plans, batch)
+        except Exception:
+            _logger.info("Bulk variance reconciliation failed, retrying variance by variance", exc_info=True)
+            for rec, requests in list(plans.items()):
+                try:
+                    with self.env.cr.savepoint():
+                        self._reconcile_create_moves({rec: requests}, batch)
+                except Exception as e:
+                    outcomes[rec.id] = (False, e.args[0] if isinstance(e, (UserError, ValidationError)) else str(e))
+                    del plans[rec]
+
+        reconciled = self.browse([rec.id for rec in plans])
+        if reconciled:
+            reconciled.write({
+                'reconciliation_status': 'reconciled',
+                'reconciliation_date': fields.Datetime.now(),
+                'reconciled_by': self.env.user.id,
+            })
+            # On Reconciled, set the related tickets stage to 'Solved/Done'
+            try:
+                with self.env.cr.savepoint():
+                    tickets = reconciled.truck_loading_id.docket_id.helpdesk_ticket_id
+                    stage = tickets and self._get_solved_helpdesk_stage()
+                    if stage:
+                        tickets.sudo().write({'stage_id': stage.id})
+            except Exception:
+                pass
+            outcomes.update(dict.fromkeys(reconciled.ids, (True, False)))
+        for rec in self - reconciled:
+            rec.message_post(body=_('Reconciliation failed: %s') % outcomes[rec.id][1])
+        return outcomes
+
+    def _prepare_reconcile_batch(self):
+        """Values shared by every variance of a reconciliation batch."""
+        plant_checks = {}
+        if self.docket_id:
+            # Latest plant check per docket, for variances whose truck loading has none
+            for pc in self.env['rmc.plant_check'].search([('docket_id', 'in', self.docket_id.ids)], order='check_date desc'):
+                plant_checks.setdefault(pc.docket_id.id, pc)
+        return {'journals': {}, 'plant_checks': plant_checks, 'unit_prices': {}}
+
+    @api.model
+    def _get_solved_helpdesk_stage(self):
+        stage_model = self.env['helpdesk.stage']
+        for name in ('solved', 'done', 'closed', 'complete'):
+            stage = stage_model.search([('name', 'ilike', name)], limit=1)
+            if stage:
+                return stage
+        return stage_model
+
+    def _plan_reconciliation(self, batch):
+        """Return the accounting document requests reconciling this variance (see ``_reconcile_request``)."""
+        self.ensure_one()
         handler_map = {
             'weight_variance': self._handle_weight_variance,
             'rejected_full': self._handle_rejected_full,
@@ -212,28 +312,60 @@ class RmcDeliveryVariance(models.Model):
             'payment_dispute': self._handle_payment_dispute,
         }
         handler = handler_map.get(self.situation or 'weight_variance', self._handle_weight_variance)
-        handler()
-
-        self.reconciliation_status = 'reconciled'
-        self.reconciliation_date = fields.Datetime.now()
-        self.reconciled_by = self.env.user
-
-        # On Reconciled, set the related ticket stage to 'Solved/Done'
-        try:
-            ticket = self.truck_loading_id and self.truck_loading_id.docket_id and self.truck_loading_id.docket_id.helpdesk_ticket_id
-            if ticket:
-                # Find a stage that matches Solved/Done/Closed/Complete
-                stage = ticket.env['helpdesk.stage'].search([('name', 'ilike', 'solved')], limit=1)
-                if not stage:
-                    stage = ticket.env['helpdesk.stage'].search([('name', 'ilike', 'done')], limit=1)
-                if not stage:
-                    stage = ticket.env['helpdesk.stage'].search([('name', 'ilike', 'closed')], limit=1)
-                if not stage:
-                    stage = ticket.env['helpdesk.stage'].search([('name', 'ilike', 'complete')], limit=1)
-                if stage:
-                    ticket.sudo().write({'stage_id': stage.id})
-        except Exception:
-            pass
+        return handler(batch) or []
+
+    def _reconcile_create_moves(self, plans, batch):
+        """Create the documents requested in ``plans`` (``{variance: [request]}``) and link them to the variances."""
+        move_model = self.env['account.move']
+        # Original vendor bills first: vendor adjustments are issued against them
+        bill_requests = [req for requests in plans.values() for req in requests if req['field'] == 'original_vendor_bill_id']
+        if bill_requests:
+            bills = move_model.create([req['variance']._prepare_reconcile_move_vals(req, batch) for req in bill_requests])
+            for req, bill in zip(bill_requests, bills):
+                req['variance'].original_vendor_bill_id = bill
+
+        groups = {}
+        for requests in plans.values():
+            for req in requests:
+                if req['field'] == 'original_vendor_bill_id':
+                    continue
+                vals = req['variance']._prepare_reconcile_move_vals(req, batch)
+                if req['sets_original_bill']:
+                    # May become the variance's original vendor bill, keep it on its own
+                    key = ('single', len(groups))
+                else:
+                    key = (vals['move_type'], vals['partner_id'], vals['journal_id'], vals['currency_id'],
+                           vals.get('reversed_entry_id') or vals.get('debit_origin_id'))
+                groups.setdefault(key, []).append((req, vals))
+        if not groups:
+            return
+        members_list = list(groups.values())
+        moves = move_model.create([self._merge_reconcile_move_vals(members) for members in members_list])
+        for members, move in zip(members_list, moves):
+            for req, _vals in members:
+                rec = req['variance']
+                rec[req['field']] = move
+                if req['sets_original_bill'] and not rec.original_vendor_bill_id:
+                    rec.original_vendor_bill_id = move
+
+    @api.model
+    def _merge_reconcile_move_vals(self, members):
+        """One move for several ``(request, vals)``: lines are concatenated, header values kept where all agree."""
+        if len(members) == 1:
+            return members[0][1]
+        vals_list = [vals for _req, vals in members]
+        merged = {
+            key: value for key, value in vals_list[0].items()
+            if key != 'line_ids' and all(vals.get(key) == value for vals in vals_list[1:])
+        }
+        merged['ref'] = '; '.join(dict.fromkeys(vals['ref'] for vals in vals_list))
+        merged['invoice_origin'] = ', '.join(dict.fromkeys(vals['invoice_origin'] for vals in vals_list if vals['invoice_origin']))
+        merged['line_ids'] = []
+        for req, vals in members:
+            for command in vals['line_ids']:
+                line_vals = dict(command[2], name='%s - %s' % (command[2]['name'], req['variance'].name))
+                merged['line_ids'].append((0, 0, line_vals))
+        return merged
 
     def write(self, vals):
         """Keep reconciliation_status in sync with 'diverted' on backend updates too."""
@@ -254,178 +386,251 @@ class RmcDeliveryVariance(models.Model):
     # -----------------------------
     # Situation Handlers
     # -----------------------------
-    def _handle_weight_variance(self):
+    def _handle_weight_variance(self, batch=None):
         self.ensure_one()
         # Determine variance using explicit fields if provided, else weight
         delta = self.variance_qty if (self.expected_qty or self.actual_qty) else self.variance_kg
         if not delta:
-            return
-        unit_price_client = self._get_client_unit_price()
-        unit_price_vendor = self._get_vendor_unit_price()
+            return []
+        unit_price_client = self._get_client_unit_price(batch)
+        unit_price_vendor = self._get_vendor_unit_price(batch)
         description = _('Weight Variance Adjustment')
+        requests = []
         if delta > 0:
             # Excess delivered at site
-            self.client_debit_note_id = self._create_client_move('out_invoice', description, delta, unit_price_client).id
+            requests.append(self._plan_client_move('client_debit_note_id', 'out_invoice', description, delta, unit_price_client))
             # Ensure we have an Original Vendor Bill; create one automatically if missing
-            self._ensure_original_vendor_bill()
+            requests += self._plan_original_vendor_bill(batch)
             # Create a vendor debit note linked to the original bill
-            self.vendor_credit_note_id = self._create_vendor_move('in_invoice', description, delta, unit_price_vendor).id
+            requests.append(self._plan_vendor_move('vendor_credit_note_id', 'in_invoice', description, delta, unit_price_vendor))
         elif delta < 0:
             # Shortage at site
             qty = abs(delta)
-            self.client_credit_note_id = self._create_client_move('out_refund', description, qty, unit_price_client).id
-            self._ensure_original_vendor_bill()
-            self.vendor_debit_note_id = self._create_vendor_move('in_refund', description, qty, unit_price_vendor).id
+            requests.append(self._plan_client_move('client_credit_note_id', 'out_refund', description, qty, unit_price_client))
+            requests += self._plan_original_vendor_bill(batch)
+            requests.append(self._plan_vendor_move('vendor_debit_note_id', 'in_refund', description, qty, unit_price_vendor))
 
         # Diversion handling for weight variance
-        if self.diverted and self.divert_to_partner_id and self.diverted_qty:
-            prod = self._get_product()
-            self.diverted_client_invoice_id = self._create_generic_move(
-                'out_invoice', self.divert_to_partner_id, _('Diversion Invoice (Weight Variance)'),
-                self.diverted_qty, unit_price_client, product=prod, origin_move=False
-            ).id
-            vendor = self._get_vendor_partner()
-            diverted_bill = self._create_generic_move(
-                'in_invoice', vendor, _('Diversion Vendor Bill (Weight Variance)'),
-                self.diverted_qty, unit_price_vendor, product=prod, origin_move=False
-            )
-            self.diverted_vendor_invoice_id = diverted_bill.id
-            if not self.original_vendor_bill_id:
-                self.original_vendor_bill_id = diverted_bill.id
-
-    def _handle_rejected_full(self):
+        requests += self._plan_diversion(_('Diversion Invoice (Weight Variance)'), _('Diversion Vendor Bill (Weight Variance)'),
+                                         unit_price_client, unit_price_vendor)
+        return requests
+
+    def _handle_rejected_full(self, batch=None):
         self.ensure_one()
-        unit_price_client = self._get_client_unit_price()
-        unit_price_vendor = self._get_vendor_unit_price()
+        unit_price_client = self._get_client_unit_price(batch)
+        unit_price_vendor = self._get_vendor_unit_price(batch)
         total_qty = self.actual_qty or self.net_weight or 0.0
         desc = _('Full Truck Rejection')
+        requests = []
         if total_qty:
-            self.client_credit_note_id = self._create_client_move('out_refund', desc, total_qty, unit_price_client).id
-            self._ensure_original_vendor_bill()
-            self.vendor_debit_note_id = self._create_vendor_move('in_refund', desc, total_qty, unit_price_vendor).id
+            requests.append(self._plan_client_move('client_credit_note_id', 'out_refund', desc, total_qty, unit_price_client))
+            requests += self._plan_original_vendor_bill(batch)
+            requests.append(self._plan_vendor_move('vendor_debit_note_id', 'in_refund', desc, total_qty, unit_price_vendor))
         # Diversion handling for rejected full
-        if self.diverted and self.divert_to_partner_id and self.diverted_qty:
-            prod = self._get_product()
-            self.diverted_client_invoice_id = self._create_generic_move(
-                'out_invoice', self.divert_to_partner_id, _('Diversion Invoice (Rejected)'),
-                self.diverted_qty, unit_price_client, product=prod, origin_move=False
-            ).id
-            vendor = self._get_vendor_partner()
-            diverted_bill = self._create_generic_move(
-                'in_invoice', vendor, _('Diversion Vendor Bill (Rejected)'),
-                self.diverted_qty, unit_price_vendor, product=prod, origin_move=False
-            )
-            self.diverted_vendor_invoice_id = diverted_bill.id
-            if not self.original_vendor_bill_id:
-                self.original_vendor_bill_id = diverted_bill.id
-
-    def _handle_partial_return(self):
+        requests += self._plan_diversion(_('Diversion Invoice (Rejected)'), _('Diversion Vendor Bill (Rejected)'),
+                                         unit_price_client, unit_price_vendor)
+        return requests
+
+    def _handle_partial_return(self, batch=None):
         self.ensure_one()
-        unit_price_client = self._get_client_unit_price()
-        unit_price_vendor = self._get_vendor_unit_price()
+        unit_price_client = self._get_client_unit_price(batch)
+        unit_price_vendor = self._get_vendor_unit_price(batch)
         qty = self.returned_qty or 0.0
         desc = _('Partial Return')
+        requests = []
         if qty:
-            self.client_credit_note_id = self._create_client_move('out_refund', desc, qty, unit_price_client).id
-            self._ensure_original_vendor_bill()
-            self.vendor_debit_note_id = self._create_vendor_move('in_refund', desc, qty, unit_price_vendor).id
-        if self.diverted and self.divert_to_partner_id and self.diverted_qty:
-            prod = self._get_product()
-            self.diverted_client_invoice_id = self._create_generic_move('out_invoice', self.divert_to_partner_id, _('Diversion Invoice'), self.diverted_qty, unit_price_client, product=prod, origin_move=False).id
-            vendor = self._get_vendor_partner()
-            diverted_bill = self._create_generic_move('in_invoice', vendor, _('Diversion Vendor Bill'), self.diverted_qty, unit_price_vendor, product=prod, origin_move=False)
-            self.diverted_vendor_invoice_id = diverted_bill.id
-            if not self.original_vendor_bill_id:
-                self.original_vendor_bill_id = diverted_bill.id
-
-    def _handle_quality_failure(self):
+            requests.append(self._plan_client_move('client_credit_note_id', 'out_refund', desc, qty, unit_price_client))
+            requests += self._plan_original_vendor_bill(batch)
+            requests.append(self._plan_vendor_move('vendor_debit_note_id', 'in_refund', desc, qty, unit_price_vendor))
+        requests += self._plan_diversion(_('Diversion Invoice'), _('Diversion Vendor Bill'), unit_price_client, unit_price_vendor)
+        return requests
+
+    def _handle_quality_failure(self, batch=None):
         self.ensure_one()
-        unit_price_client = self._get_client_unit_price()
-        unit_price_vendor = self._get_vendor_unit_price()
+        unit_price_client = self._get_client_unit_price(batch)
+        unit_price_vendor = self._get_vendor_unit_price(batch)
         qty = self.failed_qty or 0.0
         desc = _('Quality Failure')
+        requests = []
         if qty:
-            amount_override_client = self.failed_value if self.failed_value else False
-            amount_override_vendor = self.failed_value if self.failed_value else False
-            self.client_credit_note_id = self._create_client_move('out_refund', desc, qty, unit_price_client, amount_override=amount_override_client).id
-            self._ensure_original_vendor_bill()
-            self.vendor_debit_note_id = self._create_vendor_move('in_refund', desc, qty, unit_price_vendor, amount_override=amount_override_vendor).id
-        if self.diverted and self.divert_to_partner_id and self.diverted_qty:
-            prod = self._get_product()
-            self.diverted_client_invoice_id = self._create_generic_move('out_invoice', self.divert_to_partner_id, _('Diversion Invoice (Quality)'), self.diverted_qty, unit_price_client, product=prod, origin_move=False).id
-            vendor = self._get_vendor_partner()
-            diverted_bill = self._create_generic_move('in_invoice', vendor, _('Diversion Vendor Bill (Quality)'), self.diverted_qty, unit_price_vendor, product=prod, origin_move=False)
-            self.diverted_vendor_invoice_id = diverted_bill.id
-            if not self.original_vendor_bill_id:
-                self.original_vendor_bill_id = diverted_bill.id
-
-    def _handle_delay_unloading(self):
+            amount_override = self.failed_value if self.failed_value else False
+            requests.append(self._plan_client_move('client_credit_note_id', 'out_refund', desc, qty, unit_price_client, amount_override=amount_override))
+            requests += self._plan_original_vendor_bill(batch)
+            requests.append(self._plan_vendor_move('vendor_debit_note_id', 'in_refund', desc, qty, unit_price_vendor, amount_override=amount_override))
+        requests += self._plan_diversion(_('Diversion Invoice (Quality)'), _('Diversion Vendor Bill (Quality)'),
+                                         unit_price_client, unit_price_vendor)
+        return requests
+
+    def _handle_delay_unloading(self, batch=None):
         self.ensure_one()
         penalty = (self.wait_hours or 0.0) * (self.rate_per_hour or 0.0)
+        requests = []
         if penalty > 0:
             # Client debit: demurrage
-            self.client_debit_note_id = self._create_client_move('out_invoice', _('Demurrage (Unloading Delay)'), 1.0, penalty, is_service=True).id
+            requests.append(self._plan_client_move('client_debit_note_id', 'out_invoice', _('Demurrage (Unloading Delay)'), 1.0, penalty, is_service=True))
             # Vendor debit only if liability flagged
             if self.vendor_liability:
-                self._ensure_original_vendor_bill()
-                self.vendor_debit_note_id = self._create_vendor_move('in_refund', _('Penalty (Unloading Delay)'), 1.0, penalty, is_service=True).id
+                requests += self._plan_original_vendor_bill(batch)
+                requests.append(self._plan_vendor_move('vendor_debit_note_id', 'in_refund', _('Penalty (Unloading Delay)'), 1.0, penalty))
+        return requests
 
-    def _handle_site_not_ready(self):
+    def _handle_site_not_ready(self, batch=None):
         self.ensure_one()
-        unit_price_client = self._get_client_unit_price()
-        unit_price_vendor = self._get_vendor_unit_price()
+        unit_price_client = self._get_client_unit_price(batch)
+        unit_price_vendor = self._get_vendor_unit_price(batch)
         qty = self.actual_qty or self.net_weight or 0.0
         desc = _('Site Not Ready - Full Return')
+        requests = []
         if qty:
-            self.client_credit_note_id = self._create_client_move('out_refund', desc, qty, unit_price_client).id
-            self._ensure_original_vendor_bill()
-            self.vendor_debit_note_id = self._create_vendor_move('in_refund', desc, qty, unit_price_vendor).id
-        if self.diverted and self.divert_to_partner_id and self.diverted_qty:
-            prod = self._get_product()
-            self.diverted_client_invoice_id = self._create_generic_move('out_invoice', self.divert_to_partner_id, _('Diversion Invoice (Site Not Ready)'), self.diverted_qty, unit_price_client, product=prod, origin_move=False).id
-            vendor = self._get_vendor_partner()
-            diverted_bill = self._create_generic_move('in_invoice', vendor, _('Diversion Vendor Bill (Site Not Ready)'), self.diverted_qty, unit_price_vendor, product=prod, origin_move=False)
-            self.diverted_vendor_invoice_id = diverted_bill.id
-            if not self.original_vendor_bill_id:
-                self.original_vendor_bill_id = diverted_bill.id
-
-    def _handle_weather_issue(self):
+            requests.append(self._plan_client_move('client_credit_note_id', 'out_refund', desc, qty, unit_price_client))
+            requests += self._plan_original_vendor_bill(batch)
+            requests.append(self._plan_vendor_move('vendor_debit_note_id', 'in_refund', desc, qty, unit_price_vendor))
+        requests += self._plan_diversion(_('Diversion Invoice (Site Not Ready)'), _('Diversion Vendor Bill (Site Not Ready)'),
+                                         unit_price_client, unit_price_vendor)
+        return requests
+
+    def _handle_weather_issue(self, batch=None):
         self.ensure_one()
-        unit_price_client = self._get_client_unit_price()
-        unit_price_vendor = self._get_vendor_unit_price()
+        unit_price_client = self._get_client_unit_price(batch)
+        unit_price_vendor = self._get_vendor_unit_price(batch)
         qty = self.failed_qty or self.returned_qty or 0.0
+        requests = []
         if qty:
-            self.client_credit_note_id = self._create_client_move('out_refund', _('Weather Damage'), qty, unit_price_client).id
+            requests.append(self._plan_client_move('client_credit_note_id', 'out_refund', _('Weather Damage'), qty, unit_price_client))
             if self.vendor_liability:
-                self._ensure_original_vendor_bill()
-                self.vendor_debit_note_id = self._create_vendor_move('in_refund', _('Weather Damage - Vendor Liability'), qty, unit_price_vendor).id
+                requests += self._plan_original_vendor_bill(batch)
+                requests.append(self._plan_vendor_move('vendor_debit_note_id', 'in_refund', _('Weather Damage - Vendor Liability'), qty, unit_price_vendor))
+        return requests
 
-    def _handle_doc_error(self):
+    def _handle_doc_error(self, batch=None):
         # No automatic debit/credit; just log
         self.message_post(body=_('Documentation error recorded. No accounting document created automatically.'))
+        return []
 
-    def _handle_payment_dispute(self):
+    def _handle_payment_dispute(self, batch=None):
         self.message_post(body=_('Payment dispute recorded. No automatic accounting; follow escalation workflow.'))
+        return []
 
     # -----------------------------
-    # Move creators and helpers
+    # Document planning
     # -----------------------------
-    def _get_client_unit_price(self):
-        inv = self.original_invoice_id
-        if inv and inv.invoice_line_ids:
-            qty_sum = sum(l.quantity for l in inv.invoice_line_ids if l.quantity)
-            amt_sum = sum(l.price_subtotal for l in inv.invoice_line_ids)
-            return (amt_sum / qty_sum) if qty_sum else 0.0
-        return 0.0
-
-    def _get_vendor_unit_price(self):
+    def _reconcile_request(self, field, move_type, partner, description, qty, unit_price, amount_override=False,
+                           product=False, origin=False, sets_original_bill=False):
+        """Describe an accounting document to create for this variance and store in ``field``.
+
+        ``origin`` names the document it is issued against: ``'invoice'``
+        (original client invoice), ``'vendor_bill'`` (original vendor bill,
+        possibly created in the same batch) or False.
+        """
+        if not partner:
+            raise UserError(_('Missing partner to create accounting document.'))
+        return {
+            'variance': self,
+            'field': field,
+            'move_type': move_type,
+            'partner': partner,
+            'description': description,
+            'qty': qty,
+            'unit_price': unit_price,
+            'amount_override': amount_override,
+            'product': product,
+            'origin': origin,
+            'sets_original_bill': sets_original_bill,
+        }
+
+    def _plan_client_move(self, field, move_type, description, qty, unit_price, amount_override=False, is_service=False):
+        # For client notes, prefer using the same product as the original client invoice
+        product = False
+        if not is_service:
+            inv = self.original_invoice_id
+            if inv and inv.invoice_line_ids:
+                product = inv.invoice_line_ids[0].product_id
+            if not product:
+                product = self._get_product()
+        return self._reconcile_request(field, move_type, self._get_client_partner(), description, qty, unit_price,
+                                       amount_override, product, origin='invoice')
+
+    def _plan_vendor_move(self, field, move_type, description, qty, unit_price, amount_override=False):
+        # Always attempt to set a concrete product for vendor documents, even for service-type adjustments.
+        product = False
         bill = self.original_vendor_bill_id
-        if bill and bill.invoice_line_ids:
-            qty_sum = sum(l.quantity for l in bill.invoice_line_ids if l.quantity)
-            amt_sum = sum(l.price_subtotal for l in bill.invoice_line_ids)
-            return (amt_sum / qty_sum) if qty_sum else 0.0
+        if bill and bill.invoice_line_ids and bill.invoice_line_ids[0].product_id:
+            product = bill.invoice_line_ids[0].product_id
+        if not product:
+            product = self._get_product()
+        return self._reconcile_request(field, move_type, self._get_vendor_partner(), description, qty, unit_price,
+                                       amount_override, product, origin='vendor_bill')
+
+    def _plan_original_vendor_bill(self, batch=None):
+        """Request a minimal vendor bill when original_vendor_bill_id is missing.
+
+        It is based on the delivery context (partner/product/qty/price) and
+        avoids blocking the reconciliation when a vendor bill hasn't been
+        created upstream.
+        """
+        if self.original_vendor_bill_id:
+            return []
+        partner = self._get_vendor_partner()
+        if not partner:
+            raise ValidationError(_('Missing vendor partner to create the Original Vendor Bill.'))
+        product = self._get_product()
+        base_qty = self.actual_qty or self.net_weight or 0.0
+        if base_qty <= 0.0:
+            # fallback to site weight if others unavailable
+            base_qty = self.site_weight or 0.0
+        if base_qty <= 0.0:
+            raise ValidationError(_('Cannot determine a base quantity to create the Original Vendor Bill.'))
+        unit_price_vendor = self._get_vendor_unit_price(batch) or 0.0
+        # If vendor price is zero, fallback to client unit price
+        if unit_price_vendor == 0.0:
+            unit_price_vendor = self._get_client_unit_price(batch) or 0.0
+        return [self._reconcile_request('original_vendor_bill_id', 'in_invoice', partner, _('Original Vendor Bill (Auto)'),
+                                        base_qty, unit_price_vendor, product=product)]
+
+    def _plan_diversion(self, client_description, vendor_description, unit_price_client, unit_price_vendor):
+        if not (self.diverted and self.divert_to_partner_id and self.diverted_qty):
+            return []
+        prod = self._get_product()
+        return [
+            self._reconcile_request('diverted_client_invoice_id', 'out_invoice', self.divert_to_partner_id,
+                                    client_description, self.diverted_qty, unit_price_client, product=prod),
+            self._reconcile_request('diverted_vendor_invoice_id', 'in_invoice', self._get_vendor_partner(),
+                                    vendor_description, self.diverted_qty, unit_price_vendor, product=prod,
+                                    sets_original_bill=True),
+        ]
+
+    def _prepare_reconcile_move_vals(self, request, batch=None):
+        origin = {
+            'invoice': self.original_invoice_id,
+            'vendor_bill': self.original_vendor_bill_id,
+        }.get(request['origin']) or False
+        return self._prepare_generic_move_vals(
+            request['move_type'], request['partner'], request['description'], request['qty'], request['unit_price'],
+            request['amount_override'], request['product'], origin_move=origin, batch=batch,
+        )
+
+    # -----------------------------
+    # Move creators and helpers
+    # -----------------------------
+    def _move_unit_price(self, move, batch=None):
+        if not move or not move.invoice_line_ids:
+            return 0.0
+        cache = batch['unit_prices'] if batch is not None else {}
+        if move.id not in cache:
+            lines = move.invoice_line_ids
+            qty_sum = sum(l.quantity for l in lines if l.quantity)
+            amt_sum = sum(l.price_subtotal for l in lines)
+            cache[move.id] = (amt_sum / qty_sum) if qty_sum else 0.0
+        return cache[move.id]
+
+    def _get_client_unit_price(self, batch=None):
+        return self._move_unit_price(self.original_invoice_id, batch)
+
+    def _get_vendor_unit_price(self, batch=None):
+        if self.original_vendor_bill_id and self.original_vendor_bill_id.invoice_line_ids:
+            return self._move_unit_price(self.original_vendor_bill_id, batch)
         # Fallback to client unit price if vendor bill not linked
-        return self._get_client_unit_price()
+        return self._get_client_unit_price(batch)
 
     def _get_client_partner(self):
         if self.original_invoice_id:
@@ -459,63 +664,12 @@ class RmcDeliveryVariance(models.Model):
                 return sol.product_id
         return False
 
-    def _ensure_original_vendor_bill(self):
-        """Ensure original_vendor_bill_id is set. If missing, create a minimal vendor bill
-        based on the delivery context (partner/product/qty/price) and set it.
-        This avoids blocking positive variance when a vendor bill hasn't been created upstream.
-        """
-        if self.original_vendor_bill_id:
-            return
-        partner = self._get_vendor_partner()
-        if not partner:
-            raise ValidationError(_('Missing vendor partner to create the Original Vendor Bill.'))
-        product = self._get_product()
-        base_qty = self.actual_qty or self.net_weight or 0.0
-        if base_qty <= 0.0:
-            # fallback to site weight if others unavailable
-            base_qty = self.site_weight or 0.0
-        if base_qty <= 0.0:
-            raise ValidationError(_('Cannot determine a base quantity to create the Original Vendor Bill.'))
-        unit_price_vendor = self._get_vendor_unit_price() or 0.0
-        # If vendor price is zero, fallback to client unit price
-        if unit_price_vendor == 0.0:
-            unit_price_vendor = self._get_client_unit_price() or 0.0
-        desc = _('Original Vendor Bill (Auto)')
-        bill = self._create_generic_move('in_invoice', partner, desc, base_qty, unit_price_vendor, product=product, origin_move=False)
-        self.original_vendor_bill_id = bill.id
-
-    def _create_client_move(self, move_type, description, qty, unit_price, amount_override=False, is_service=False, link_origin=True):
-        partner = self._get_client_partner()
-        # For client notes, prefer using the same product as the original client invoice
-        if is_service:
-            product = False
-        else:
-            product = False
-            inv = self.original_invoice_id
-            if inv and inv.invoice_line_ids:
-                product = inv.invoice_line_ids[0].product_id
-            if not product:
-                product = self._get_product()
-        origin = self.original_invoice_id if link_origin else False
-        return self._create_generic_move(move_type, partner, description, qty, unit_price, amount_override, product, origin_move=origin)
-
-    def _create_vendor_move(self, move_type, description, qty, unit_price, amount_override=False, is_service=False, link_origin=True):
-        partner = self._get_vendor_partner()
-        # Always attempt to set a concrete product for vendor documents, even for service-type adjustments.
-        product = False
-        bill = self.original_vendor_bill_id
-        if bill and bill.invoice_line_ids and bill.invoice_line_ids[0].product_id:
-            product = bill.invoice_line_ids[0].product_id
-        if not product:
-            product = self._get_product()
-        origin = self.original_vendor_bill_id if link_origin else False
-        move = self._create_generic_move(move_type, partner, description, qty, unit_price, amount_override, product, origin_move=origin)
-        # If a new vendor bill is created and original is not set yet, set it immediately
-        if move_type == 'in_invoice' and not self.original_vendor_bill_id:
-            self.original_vendor_bill_id = move.id
-        return move
-
     def _create_generic_move(self, move_type, partner, description, qty, unit_price, amount_override=False, product=False, origin_move=False):
+        return self.env['account.move'].create(self._prepare_generic_move_vals(
+            move_type, partner, description, qty, unit_price, amount_override, product, origin_move))
+
+    def _prepare_generic_move_vals(self, move_type, partner, description, qty, unit_price, amount_override=False,
+                                   product=False, origin_move=False, batch=None):
         if not partner:
             raise UserError(_('Missing partner to create accounting document.'))
         # Prefer the specific origin move (client/vendor) for currency, taxes, and journal
@@ -533,9 +687,12 @@ class RmcDeliveryVariance(models.Model):
         # Prefer plant check on truck loading; else latest completed on docket
         pc = tl.plant_check_id if tl and tl.plant_check_id else False
         if not pc and docket:
-            pc = self.env['rmc.plant_check'].search([
-                ('docket_id', '=', docket.id)
-            ], limit=1, order='check_date desc')
+            if batch is not None:
+                pc = batch['plant_checks'].get(docket.id, False)
+            else:
+                pc = self.env['rmc.plant_check'].search([
+                    ('docket_id', '=', docket.id)
+                ], limit=1, order='check_date desc')
         # Helper formatters
         def _fmt_dt(dt):
             return fields.Datetime.to_string(dt) if dt else False
@@ -573,7 +730,10 @@ class RmcDeliveryVariance(models.Model):
             journal = source_move_for_journal.journal_id.id
         else:
             jtype = 'sale' if move_type in ('out_invoice', 'out_refund') else 'purchase'
-            journal = self.env['account.journal'].search([('type', '=', jtype)], limit=1).id
+            journals = batch['journals'] if batch is not None else {}
+            if jtype not in journals:
+                journals[jtype] = self.env['account.journal'].search([('type', '=', jtype)], limit=1).id
+            journal = journals[jtype]
         move_vals = {
             'move_type': move_type,
             'partner_id': partner.id,
@@ -656,19 +816,14 @@ class RmcDeliveryVariance(models.Model):
             elif move_type in ('out_invoice', 'in_invoice') and origin_move.partner_id.id == partner.id:
                 # Mark as debit note linked to original (only if same partner)
                 move_vals['debit_origin_id'] = origin_move.id
-        move = self.env['account.move'].create(move_vals)
-        # Set pump fields explicitly on the move for consistent visibility
-        try:
-            if docket and docket.workorder_id and getattr(docket.workorder_id, 'pump_required', False):
-                wo = docket.workorder_id
-                move.write({
-                    'pump_required': True,
-                    'pump_provider_name': getattr(wo.pump_provider_id, 'name', False) or False,
-                    'pump_code': getattr(wo.pump_id, 'pump_code', False) or False,
-                })
-        except Exception:
-            pass
-        return move
+        # Pump fields on the move for consistent visibility
+        if wo and getattr(wo, 'pump_required', False):
+            move_vals.update({
+                'pump_required': True,
+                'pump_provider_name': getattr(wo.pump_provider_id, 'name', False) or False,
+                'pump_code': getattr(wo.pump_id, 'pump_code', False) or False,
+            })
+        return move_vals
 
     @api.constrains('site_weight')
     def _check_site_weight(self):
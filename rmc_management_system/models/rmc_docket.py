@@ -6,6 +6,68 @@ from odoo.exceptions import UserError, ValidationError
 from datetime import timedelta
 
 
+# Batch material columns, matched on the lowercased material name in this order;
+# anything unmatched is booked on facs.
+BATCH_MATERIAL_COLUMNS = ('ten_mm', 'twenty_mm', 'facs', 'water_batch', 'flyash', 'adm_plast', 'WATERR')
+_BATCH_MATERIAL_KEYWORDS = (
+    ('10', 'ten_mm'),
+    ('20', 'twenty_mm'),
+    ('fly', 'flyash'),
+    ('water', 'WATERR'),
+    ('adm', 'adm_plast'),
+    ('fac', 'facs'),
+)
+
+
+def _batch_material_column(name):
+    lname = (name or '').lower()
+    for keyword, column in _BATCH_MATERIAL_KEYWORDS:
+        if keyword in lname:
+            return column
+    return 'facs'
+
+
+def _split_batch_volumes(total_qty, batch_capacity, tol_pct, rng):
+    """Split ``total_qty`` into batches of ``batch_capacity`` +/- ``tol_pct``; the last one takes the rest."""
+    num_batches = int(ceil(total_qty / batch_capacity))
+    if tol_pct > 0:
+        volumes = [batch_capacity * (1.0 + rng.uniform(-tol_pct, tol_pct)) for _i in range(num_batches - 1)]
+    else:
+        volumes = [batch_capacity] * (num_batches - 1)
+    volumes = [vol if vol > 0 else batch_capacity for vol in volumes]
+    last_vol = max(0.0, total_qty - sum(volumes))
+    # if last_vol is zero (due to rounding), set to batch_capacity
+    volumes.append(last_vol if last_vol > 0 else batch_capacity)
+    # If due to randomness sum exceeds total_qty, scale down proportionally
+    total_vol_sum = sum(volumes)
+    if total_vol_sum != total_qty and total_vol_sum > 0:
+        scale = total_qty / total_vol_sum
+        volumes = [vol * scale for vol in volumes]
+    return volumes
+
+
+def _batch_material_columns(recipe_lines, volumes, total_qty):
+    """Return ``{column: [qty per batch]}`` for ``recipe_lines`` (``(name, per_cum_qty)`` pairs).
+
+    Every material's last batch gets the exact remainder of its total, so
+    the batches always add up to ``per_cum_qty * total_qty``.
+    """
+    columns = {column: [0.0] * len(volumes) for column in BATCH_MATERIAL_COLUMNS}
+    per_cum_by_name = {}
+    for name, per_cum in recipe_lines:
+        per_cum_by_name[name] = per_cum_by_name.get(name, 0.0) + per_cum
+    last = len(volumes) - 1
+    for name, per_cum in per_cum_by_name.items():
+        target = columns[_batch_material_column(name)]
+        running = 0.0
+        for idx, vol in enumerate(volumes):
+            qty = per_cum * vol if idx < last else per_cum * total_qty - running
+            running += qty
+            target[idx] += qty
+    return columns
+
+
+
 class RmcDocket(models.Model):
     _name = 'rmc.docket'
     _description = 'RMC Docket Production'
@@ -16,8 +78,8 @@ class RmcDocket(models.Model):
     docket_number = fields.Char(string='Docket Number', required=False)
     docket_date = fields.Datetime(string='Docket Date', required=True, default=fields.Datetime.now)
     
-    sale_order_id = fields.Many2one('sale.order', string='Sale Order')
-    helpdesk_ticket_id = fields.Many2one('helpdesk.ticket', string='Ticket')
+    sale_order_id = fields.Many2one('sale.order', string='Sale Order', index='btree_not_null')
+    helpdesk_ticket_id = fields.Many2one('helpdesk.ticket', string='Ticket', index='btree_not_null')
     subcontractor_id = fields.Many2one('rmc.subcontractor', string='Subcontractor')    
     recipe_id = fields.Many2one('mrp.bom', string="Recipe", domain=lambda self: self._get_recipe_domain())
     concrete_grade = fields.Char(string='Concrete Grade', compute='_compute_concrete_grade', store=True)
@@ -27,7 +89,7 @@ class RmcDocket(models.Model):
     is_rmc_product = fields.Boolean(string='Is RMC Product', compute='_compute_is_rmc_product', store=True)
     # Link to Workorder and show its tickets
     workorder_id = fields.Many2one('dropshipping.workorder', string='Workorder', domain="[('sale_order_id','=',sale_order_id)]",
-                                   help='Workorder for this docket (filtered by Sale Order)')
+                                   index='btree_not_null', help='Workorder for this docket (filtered by Sale Order)')
     workorder_ticket_ids = fields.One2many(related='workorder_id.ticket_ids', string='Workorder Tickets', readonly=True)
     
     quantity_ordered = fields.Float(string='Quantity Ordered (M3)', required=True)
@@ -551,7 +613,13 @@ class RmcDocket(models.Model):
         - last batch volume = remaining to ensure totals exact
         - for each recipe line, compute per-batch material = per_cum_qty * batch_volume
         - apply variance percent from field batch_variance_tolerance (default 2%)
+
+        Recipe lines are mapped to their batch column once per docket and all
+        batches of all dockets are created in a single ``create``. Pass
+        ``rmc_batch_seed`` in the context for a reproducible split.
         """
+        rng = random.Random(self.env.context.get('rmc_batch_seed'))
+        to_generate = []
         for rec in self:
             total_qty = float(rec.quantity_ordered or 0.0)
             batch_capacity = float(rec.current_capacity or 0.0)
@@ -562,128 +630,40 @@ class RmcDocket(models.Model):
             if batch_capacity <= 0:
                 raise UserError(_('Batch capacity must be set and greater than zero to generate batches.'))
 
-            num_batches = int(ceil(total_qty / batch_capacity))
-
             # gather recipe lines: prefer docket_line_ids (per-cum), else use recipe_id.bom_line_ids
-            recipe_lines = []
             if rec.docket_line_ids:
-                for line in rec.docket_line_ids:
-                    recipe_lines.append({
-                        'name': line.material_name or (line.material_code or ''),
-                        'product_id': False,
-                        'per_cum_qty': float(line.design_qty or 0.0),
-                    })
+                recipe_lines = [
+                    (line.material_name or (line.material_code or ''), float(line.design_qty or 0.0))
+                    for line in rec.docket_line_ids
+                ]
             elif rec.recipe_id:
-                for bl in rec.recipe_id.bom_line_ids:
-                    recipe_lines.append({
-                        'name': bl.product_id.name,
-                        'product_id': bl.product_id.id,
-                        'per_cum_qty': float(bl.product_qty or 0.0),
-                    })
+                recipe_lines = [
+                    (bl.product_id.name, float(bl.product_qty or 0.0))
+                    for bl in rec.recipe_id.bom_line_ids
+                ]
             else:
                 raise UserError(_('No recipe found on the docket. Please set a recipe or docket lines before generating batches.'))
-
-            # compute total material expected per product (for exact balancing)
-            total_materials = {}
-            for rl in recipe_lines:
-                total_materials[rl.get('name')] = total_materials.get(rl.get('name'), 0.0) + rl.get('per_cum_qty', 0.0) * total_qty
-
-            # remove existing batches for this docket
-            existing = self.env['rmc.docket.batch'].search([('docket_id', '=', rec.id)])
-            if existing:
-                existing.unlink()
-
-            created_batches = []
-            volumes = []
-
-            # For first n-1 batches apply variance
-            for i in range(1, num_batches + 1):
-                if i < num_batches:
-                    # variance factor in [1 - tol, 1 + tol]
-                    var_factor = 1.0 + random.uniform(-tol_pct, tol_pct) if tol_pct > 0 else 1.0
-                    vol = batch_capacity * var_factor
-                    # don't exceed remaining total drastically; cap to reasonable
-                    if vol <= 0:
-                        vol = batch_capacity
-                    volumes.append(vol)
-                else:
-                    # placeholder for last batch, compute later
-                    volumes.append(0.0)
-
-            # compute last batch as remainder to make exact total
-            sum_prev = sum(volumes[:-1]) if len(volumes) > 1 else 0.0
-            last_vol = max(0.0, total_qty - sum_prev)
-            # if last_vol is zero (due to rounding), set to batch_capacity
-            if last_vol <= 0:
-                last_vol = batch_capacity
-            volumes[-1] = last_vol
-
-            # If due to randomness sum exceeds total_qty, scale down proportionally
-            total_vol_sum = sum(volumes)
-            if total_vol_sum != total_qty and total_vol_sum > 0:
-                scale = total_qty / total_vol_sum
-                volumes = [v * scale for v in volumes]
-
-            # For material quantities per batch, compute using per_cum_qty * vol; keep running sums to ensure exact last-batch balancing
-            material_running = {k: 0.0 for k in total_materials.keys()}
-
-            for idx, vol in enumerate(volumes, start=1):
+            to_generate.append((rec, total_qty, batch_capacity, tol_pct, recipe_lines))
+
+        # remove existing batches of these dockets
+        existing = self.env['rmc.docket.batch'].search([('docket_id', 'in', [item[0].id for item in to_generate])])
+        if existing:
+            existing.unlink()
+
+        vals_list = []
+        for rec, total_qty, batch_capacity, tol_pct, recipe_lines in to_generate:
+            volumes = _split_batch_volumes(total_qty, batch_capacity, tol_pct, rng)
+            materials = _batch_material_columns(recipe_lines, volumes, total_qty)
+            for idx, vol in enumerate(volumes):
                 batch_vals = {
                     'docket_id': rec.id,
-                    'batch_code': 'Batch-%03d' % idx,
-                    'batch_id': str(idx),
-                }
-
-                # compute per-material qty for this batch
-                mat_values_for_fields = {
-                    'ten_mm': 0.0,
-                    'twenty_mm': 0.0,
-                    'facs': 0.0,
-                    'water_batch': 0.0,
-                    'flyash': 0.0,
-                    'adm_plast': 0.0,
-                    'WATERR': 0.0,
+                    'batch_code': 'Batch-%03d' % (idx + 1),
+                    'batch_id': str(idx + 1),
+                    'quantity_ordered': vol,
                 }
-
-                # accumulate material quantities
-                for rl in recipe_lines:
-                    name = rl.get('name')
-                    per_cum = rl.get('per_cum_qty', 0.0)
-                    qty = per_cum * vol
-
-                    # For last batch, adjust to exact remaining for this material
-                    if idx == num_batches:
-                        remaining = total_materials.get(name, 0.0) - material_running.get(name, 0.0)
-                        qty = remaining
-
-                    material_running[name] = material_running.get(name, 0.0) + qty
-
-                    lname = (name or '').lower()
-                    # naive mapping by name keywords
-                    if '10' in lname or '10mm' in lname or 'ca10' in lname or 'ca10mm' in lname:
-                        mat_values_for_fields['ten_mm'] += qty
-                    elif '20' in lname or '20mm' in lname or 'ca20' in lname or 'ca20mm' in lname:
-                        mat_values_for_fields['twenty_mm'] += qty
-                    elif 'fly' in lname or 'flyash' in lname:
-                        mat_values_for_fields['flyash'] += qty
-                    elif 'water' in lname or 'waterr' in lname:
-                        mat_values_for_fields['WATERR'] += qty
-                    elif 'adm' in lname or 'admix' in lname or 'admixture' in lname:
-                        mat_values_for_fields['adm_plast'] += qty
-                    elif 'fac' in lname or 'facs' in lname:
-                        mat_values_for_fields['facs'] += qty
-                    else:
-                        # default map to facs if unknown
-                        mat_values_for_fields['facs'] += qty
-
-                # set batch material fields
-                batch_vals.update(mat_values_for_fields)
-                batch_vals['quantity_ordered'] = vol
-                batch = self.env['rmc.docket.batch'].create(batch_vals)
-                created_batches.append(batch)
-
-            # link created batches to docket via relation (already set by docket_id)
-            return created_batches
+                batch_vals.update({column: quantities[idx] for column, quantities in materials.items()})
+                vals_list.append(batch_vals)
+        return self.env['rmc.docket.batch'].create(vals_list)
 
     def action_generate_batches(self):
         """Button wrapper to generate batches from the UI."""
@@ -947,7 +927,7 @@ class RmcDocketBatch(models.Model):
     _name = 'rmc.docket.batch'
     _description = 'RMC Docket Batch'
 
-    docket_id = fields.Many2one('rmc.docket', string='Docket', required=True, ondelete='cascade')
+    docket_id = fields.Many2one('rmc.docket', string='Docket', required=True, ondelete='cascade', index=True)
     batch_code = fields.Char(string='Batch Code')
     batch_id = fields.Char(string='Batch ID')
     ten_mm = fields.Float(string='CA10MM')
@@ -1,71 +1,162 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+MATERIAL_TYPES = [('cement', 'Cement'), ('sand', 'Sand'), ('aggregate', 'Aggregate'), ('other', 'Other')]
+MOVE_TYPES = [('opening', 'Opening Balance'), ('receipt', 'Receipt'), ('consumption', 'Consumption')]
+
 
 class RmcMaterialBalance(models.Model):
+    """Running material balance per partner and material.
+
+    The balance is a summary of the append-only ``rmc.material.move``
+    ledger: every movement is posted together with an atomic SQL increment
+    of its summary row, so concurrent deliveries never lose updates.
+    """
     _name = 'rmc.material.balance'
     _description = 'RMC Material Balance'
 
     partner_id = fields.Many2one('res.partner', string='Customer/Subcontractor')
-    material_type = fields.Selection([('cement', 'Cement'), ('sand', 'Sand'), ('aggregate', 'Aggregate'), ('other', 'Other')], string='Material')
-    balance_qty = fields.Float(string='Balance Quantity (kg)', default=0.0)
+    material_type = fields.Selection(MATERIAL_TYPES, string='Material')
+    balance_qty = fields.Float(string='Balance Quantity (kg)', default=0.0, readonly=True)
     workorder_id = fields.Many2one('dropshipping.workorder', string='Workorder')
     sale_order_id = fields.Many2one('sale.order', string='Sale Order')
     last_updated = fields.Datetime(string='Last Updated', default=fields.Datetime.now)
+    move_ids = fields.One2many('rmc.material.move', 'balance_id', string='Movements')
+    # Ledger position already folded into checkpoint_qty by action_recalculate_balance
+    checkpoint_move_id = fields.Many2one('rmc.material.move', string='Checkpoint Movement', readonly=True)
+    checkpoint_qty = fields.Float(string='Checkpoint Balance (kg)', readonly=True)
+
+    def init(self):
+        cr = self.env.cr
+        # Merge duplicate summary rows left by the old search-then-create update
+        cr.execute("""
+            WITH dup AS (
+                SELECT partner_id, material_type, MIN(id) AS keep_id, SUM(balance_qty) AS total
+                  FROM rmc_material_balance
+                 WHERE partner_id IS NOT NULL AND material_type IS NOT NULL
+              GROUP BY partner_id, material_type
+                HAVING COUNT(*) > 1
+            ), merged AS (
+                UPDATE rmc_material_balance b
+                   SET balance_qty = dup.total
+                  FROM dup
+                 WHERE b.id = dup.keep_id
+            )
+            DELETE FROM rmc_material_balance b
+             USING dup
+             WHERE b.partner_id = dup.partner_id
+               AND b.material_type = dup.material_type
+               AND b.id != dup.keep_id
+        """)
+        cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS rmc_material_balance_partner_material_uniq
+                ON rmc_material_balance (partner_id, material_type)
+        """)
 
     def action_recalculate_balance(self):
-        """Recalculate balance based on all workorders and sale orders for this partner"""
+        """Rebuild the balance from the ledger, starting at the last checkpoint.
+
+        Only movements posted since the previous recalculation are summed;
+        the result becomes the new checkpoint. The summary row is locked so
+        a delivery posted meanwhile either lands before or after the fold.
+        """
+        self.flush_model()
+        self.env['rmc.material.move'].flush_model()
+        cr = self.env.cr
         for record in self:
-            total_balance = 0.0
-            
-            # Calculate from sale orders (materials received)
-            sale_orders = self.env['sale.order'].search([('partner_id', '=', record.partner_id.id)])
-            for so in sale_orders:
-                for line in so.order_line:
-                    if line.product_id and line.product_id.categ_id:
-                        categ_name = line.product_id.categ_id.name.lower()
-                        material_type = 'other'
-                        if 'cement' in categ_name:
-                            material_type = 'cement'
-                        elif 'sand' in categ_name:
-                            material_type = 'sand'
-                        elif 'aggregate' in categ_name or 'gravel' in categ_name:
-                            material_type = 'aggregate'
-                        
-                        if material_type == record.material_type:
-                            # If customer provides cement, don't add to balance
-                            if not (material_type == 'cement' and so.customer_provides_cement):
-                                total_balance += line.product_uom_qty
-            
-            # Calculate from workorders (materials used)
-            workorders = self.env['dropshipping.workorder'].search([('partner_id', '=', record.partner_id.id)])
-            for wo in workorders:
-                for line in wo.workorder_line_ids:
-                    if line.product_id and line.product_id.categ_id:
-                        categ_name = line.product_id.categ_id.name.lower()
-                        material_type = 'other'
-                        if 'cement' in categ_name:
-                            material_type = 'cement'
-                        elif 'sand' in categ_name:
-                            material_type = 'sand'
-                        elif 'aggregate' in categ_name or 'gravel' in categ_name:
-                            material_type = 'aggregate'
-                        
-                        if material_type == record.material_type:
-                            total_balance -= line.quantity_ordered
-            
-            record.balance_qty = total_balance
-            record.last_updated = fields.Datetime.now()
+            cr.execute(
+                "SELECT checkpoint_move_id, checkpoint_qty FROM rmc_material_balance WHERE id = %s FOR UPDATE",
+                [record.id],
+            )
+            checkpoint_move_id, checkpoint_qty = cr.fetchone()
+            cr.execute(
+                "SELECT COALESCE(SUM(qty), 0.0), MAX(id) FROM rmc_material_move WHERE balance_id = %s AND id > %s",
+                [record.id, checkpoint_move_id or 0],
+            )
+            delta, last_move_id = cr.fetchone()
+            checkpoint_qty = (checkpoint_qty or 0.0) + delta
+            cr.execute("""
+                UPDATE rmc_material_balance
+                   SET checkpoint_move_id = COALESCE(%s, checkpoint_move_id),
+                       checkpoint_qty = %s,
+                       balance_qty = %s,
+                       last_updated = now() at time zone 'UTC'
+                 WHERE id = %s
+            """, [last_move_id, checkpoint_qty, checkpoint_qty, record.id])
+        self.invalidate_recordset(['checkpoint_move_id', 'checkpoint_qty', 'balance_qty', 'last_updated'])
+        return True
 
     @api.model
-    def _update_balance(self, partner, material_type, qty_change):
-        balance = self.search([('partner_id', '=', partner.id), ('material_type', '=', material_type)], limit=1)
-        if balance:
-            balance.balance_qty += qty_change
-            balance.last_updated = fields.Datetime.now()
-        else:
-            self.create({'partner_id': partner.id, 'material_type': material_type, 'balance_qty': qty_change})
-        return True
+    def _update_balance(self, partner, material_type, qty_change, workorder=None, sale_order=None, reference=None,
+                        move_type=None):
+        """Post a movement and add it to the partner's balance atomically."""
+        if not partner:
+            return self.browse()
+        self.flush_model()
+        self.env.cr.execute("""
+            INSERT INTO rmc_material_balance (partner_id, material_type, balance_qty, checkpoint_qty, last_updated,
+                                              create_uid, create_date, write_uid, write_date)
+            VALUES (%(partner)s, %(material)s, %(qty)s, 0.0, now() at time zone 'UTC',
+                    %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC')
+            ON CONFLICT (partner_id, material_type) DO UPDATE
+               SET balance_qty = rmc_material_balance.balance_qty + EXCLUDED.balance_qty,
+                   last_updated = EXCLUDED.last_updated,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+            RETURNING id
+        """, {'partner': partner.id, 'material': material_type, 'qty': qty_change, 'uid': self.env.uid})
+        balance = self.browse(self.env.cr.fetchone()[0])
+        self.env['rmc.material.move'].sudo().create({
+            'balance_id': balance.id,
+            'partner_id': partner.id,
+            'material_type': material_type,
+            'qty': qty_change,
+            'move_type': move_type or ('receipt' if qty_change >= 0 else 'consumption'),
+            'workorder_id': workorder.id if workorder else False,
+            'sale_order_id': sale_order.id if sale_order else False,
+            'reference': reference,
+        })
+        balance.invalidate_recordset(['balance_qty', 'last_updated', 'write_uid', 'write_date'])
+        return balance
 
     def action_test_multiple_updates(self):
         self.env['rmc.material.balance']._update_balance(self.partner_id, 'cement', 300)
         self.env['rmc.material.balance']._update_balance(self.partner_id, 'cement', -150)
-        self.env['rmc.material.balance']._update_balance(self.env['res.partner'].search([('name', '=', 'New Partner')], limit=1), 'cement', 100)
\ No newline at end of file
+        self.env['rmc.material.balance']._update_balance(self.env['res.partner'].search([('name', '=', 'New Partner')], limit=1), 'cement', 100)
+
+
+class RmcMaterialMove(models.Model):
+    """Append-only material ledger; corrections are posted as new movements."""
+    _name = 'rmc.material.move'
+    _description = 'RMC Material Movement'
+    _order = 'id desc'
+
+    balance_id = fields.Many2one('rmc.material.balance', string='Balance', required=True, ondelete='cascade', index=True)
+    partner_id = fields.Many2one('res.partner', string='Customer/Subcontractor', required=True)
+    material_type = fields.Selection(MATERIAL_TYPES, string='Material', required=True)
+    qty = fields.Float(string='Quantity (kg)')
+    move_type = fields.Selection(MOVE_TYPES, string='Type', required=True, default='receipt')
+    date = fields.Datetime(string='Date', default=fields.Datetime.now, required=True)
+    workorder_id = fields.Many2one('dropshipping.workorder', string='Workorder', index='btree_not_null')
+    sale_order_id = fields.Many2one('sale.order', string='Sale Order', index='btree_not_null')
+    reference = fields.Char(string='Reference')
+
+    def init(self):
+        # Open the ledger of balances that predate it
+        self.env.cr.execute("""
+            INSERT INTO rmc_material_move (balance_id, partner_id, material_type, qty, move_type, date, reference,
+                                           create_uid, create_date, write_uid, write_date)
+            SELECT b.id, b.partner_id, b.material_type, b.balance_qty, 'opening', now() at time zone 'UTC', 'Opening balance',
+                   1, now() at time zone 'UTC', 1, now() at time zone 'UTC'
+              FROM rmc_material_balance b
+             WHERE b.balance_qty != 0
+               AND b.partner_id IS NOT NULL
+               AND b.material_type IS NOT NULL
+               AND NOT EXISTS (SELECT 1 FROM rmc_material_move m WHERE m.balance_id = b.id)
+        """)
+
+    def write(self, vals):
+        raise UserError(_("Material movements cannot be modified; post a correcting movement instead."))
+
+    def unlink(self):
+        raise UserError(_("Material movements cannot be deleted; post a correcting movement instead."))
@@ -9,7 +9,7 @@ class RmcPlantCheck(models.Model):
 
     name = fields.Char(string='Plant Check Reference', required=True, copy=False, readonly=True, default='New')
     truck_loading_id = fields.Many2one('rmc.truck_loading', string='Truck Loading', required=True)
-    docket_id = fields.Many2one('rmc.docket', string='Docket', related='truck_loading_id.docket_id', store=True)
+    docket_id = fields.Many2one('rmc.docket', string='Docket', related='truck_loading_id.docket_id', store=True, index='btree_not_null')
 
     # Weighbridge Information
     weighbridge_weight = fields.Float(string='Weighbridge Weight (KG)', digits=(10, 2))
@@ -5,9 +5,98 @@ from odoo import api, fields, models, _
 from odoo.fields import Command
 from odoo.exceptions import ValidationError
 
+from .portal_cache import PortalCache
+
 
 _logger = logging.getLogger(__name__)
 
+# Subcontractor portal dashboard figures, per worker process and day
+DASHBOARD_CACHE = PortalCache(ttl=60)
+
+
+class RmcPortalDashboardSource(models.AbstractModel):
+    """Drop the cached portal dashboard of the subcontractors a record feeds once its change is committed."""
+    _name = 'rmc.portal.dashboard.source'
+    _inherit = ['rmc.portal.cache.source']
+    _description = 'RMC Portal Dashboard Source'
+
+    def _portal_dashboard_subcontractor_ids(self):
+        """Return the ``rmc.subcontractor`` ids whose dashboard shows ``self``."""
+        return set()
+
+    def _portal_cache_keys(self):
+        # Before and after every write, in case the record moves to another subcontractor
+        return super()._portal_cache_keys() + [
+            (DASHBOARD_CACHE, 'subcontractor', self._portal_dashboard_subcontractor_ids()),
+        ]
+
+
+class RmcSubcontractor(models.Model):
+    _inherit = 'rmc.subcontractor'
+
+    def _portal_dashboard_values(self, today):
+        """Dashboard figures and record ids for the portal, cached for ``DASHBOARD_CACHE.ttl`` seconds."""
+        self.ensure_one()
+        return DASHBOARD_CACHE.get(
+            self.env, 'subcontractor', self.id, lambda: self._compute_portal_dashboard_values(today), variant=today)
+
+    def _compute_portal_dashboard_values(self, today):
+        self.ensure_one()
+        env = self.sudo().env
+        today_start = fields.Datetime.to_string(datetime.combine(today, datetime.min.time()))
+        today_end = fields.Datetime.to_string(datetime.combine(today, datetime.max.time()))
+        closed_states = ('completed', 'cancelled')
+        transports = env['rmc.subcontractor.transport'].search([('subcontractor_id', '=', self.id), ('active', '=', True)])
+        pumps = env['rmc.subcontractor.pump'].search([('subcontractor_id', '=', self.id), ('active', '=', True)])
+        jobs_today = env['rmc.docket'].search_count([
+            ('subcontractor_id', '=', self.id),
+            ('docket_date', '>=', today_start),
+            ('docket_date', '<=', today_end),
+        ])
+        busy_transports = fuel_litres = 0
+        if transports:
+            busy_transports = len(env['rmc.docket']._read_group([
+                ('subcontractor_transport_id', 'in', transports.ids),
+                ('state', 'in', ('ready', 'dispatched', 'delivered')),
+                ('docket_date', '>=', today_start),
+                ('docket_date', '<=', today_end),
+            ], ['subcontractor_transport_id'], ['__count']))
+            [(fuel_litres,)] = env['rmc.transport.fuel.log']._read_group([
+                ('transport_id', 'in', transports.ids),
+                ('log_date', '=', today),
+            ], [], ['litre_count:sum'])
+
+        values = {
+            'transport_ids': transports.ids,
+            'pump_ids': pumps.ids,
+            'jobs_today': jobs_today,
+            'fleet_utilization': round((busy_transports / len(transports)) * 100, 2) if transports else 0.0,
+            'documents_due': sum(transports.mapped('documents_due_count')),
+            'fuel_litres': fuel_litres or 0.0,
+            'workorder_ids': [],
+            'workorders': 0,
+            'active_workorders': 0,
+            'ticket_ids': [],
+            'open_tickets': 0,
+        }
+        partner_id = self.partner_id.id
+        if not partner_id:
+            return values
+        workorder_model = env['dropshipping.workorder']
+        workorder_domain = [('subcontractor_id', '=', partner_id)]
+        for state, count in workorder_model._read_group(workorder_domain, ['state'], ['__count']):
+            values['workorders'] += count
+            if state not in closed_states:
+                values['active_workorders'] += count
+        values['workorder_ids'] = workorder_model.search(
+            workorder_domain + [('state', 'not in', closed_states)], order='date_order desc', limit=20).ids
+        ticket_model = env['dropshipping.workorder.ticket']
+        ticket_domain = [('workorder_id.subcontractor_id', '=', partner_id), ('state', 'not in', closed_states)]
+        values['open_tickets'] = ticket_model.search_count(ticket_domain)
+        values['ticket_ids'] = ticket_model.search(ticket_domain, order='delivery_date desc, id desc', limit=20).ids
+        return values
+
+
 class RmcSubcontractorPlant(models.Model):
     _inherit = 'rmc.subcontractor.plant'
 
@@ -90,22 +179,43 @@ class RmcSubcontractorTransport(models.Model):
 
     @api.depends('docket_ids.state', 'docket_ids.docket_date', 'docket_ids.quantity_ordered', 'docket_ids.quantity_produced', 'fuel_log_ids.litre_count', 'fuel_log_ids.cost_amount')
     def _compute_driver_metrics(self):
+        # Aggregated in the database for the whole recordset, the portal lists every transport
         today = date.today()
+        transport_ids = [tid for tid in self._origin.ids if tid]
+        docket_stats = {}
+        fuel_stats = {}
+        if transport_ids:
+            self.env['rmc.docket'].flush_model(['subcontractor_transport_id', 'state', 'docket_date',
+                                                'quantity_ordered', 'quantity_produced'])
+            self.env.cr.execute("""
+                SELECT subcontractor_transport_id,
+                       COUNT(*) FILTER (WHERE state = 'delivered'),
+                       COUNT(*) FILTER (WHERE docket_date >= %(start)s AND docket_date < %(end)s),
+                       AVG(LEAST(COALESCE(quantity_produced, 0) / quantity_ordered, 2.0))
+                           FILTER (WHERE quantity_ordered > 0 AND COALESCE(quantity_produced, 0) >= 0)
+                  FROM rmc_docket
+                 WHERE subcontractor_transport_id = ANY(%(ids)s)
+                   AND state IN ('ready', 'dispatched', 'delivered')
+              GROUP BY subcontractor_transport_id
+            """, {
+                'ids': transport_ids,
+                'start': datetime.combine(today, datetime.min.time()),
+                'end': datetime.combine(today + timedelta(days=1), datetime.min.time()),
+            })
+            docket_stats = {row[0]: row[1:] for row in self.env.cr.fetchall()}
+            fuel_stats = {
+                transport.id: (litres, cost)
+                for transport, litres, cost in self.env['rmc.transport.fuel.log']._read_group(
+                    [('transport_id', 'in', transport_ids)], ['transport_id'], ['litre_count:sum', 'cost_amount:sum'])
+            }
         for transport in self:
-            dockets = transport.docket_ids.filtered(lambda d: d.state in ('ready', 'dispatched', 'delivered'))
-            completed = dockets.filtered(lambda d: d.state == 'delivered')
-            transport.jobs_completed = len(completed)
-            transport.jobs_today = len(dockets.filtered(lambda d: fields.Datetime.to_datetime(d.docket_date).date() == today if d.docket_date else False))
-            ratios = []
-            for docket in dockets:
-                ordered = docket.quantity_ordered or 0
-                produced = docket.quantity_produced or 0
-                if ordered > 0 and produced >= 0:
-                    ratios.append(min(produced / ordered, 2.0))
-            transport.efficiency_score = sum(ratios) / len(ratios) if ratios else 0.0
-            fuel_litre = sum(transport.fuel_log_ids.mapped('litre_count'))
-            transport.fuel_consumed_litres = fuel_litre
-            transport.fuel_cost_total = sum(transport.fuel_log_ids.mapped('cost_amount'))
+            completed, jobs_today, efficiency = docket_stats.get(transport._origin.id, (0, 0, None))
+            litres, cost = fuel_stats.get(transport._origin.id, (0.0, 0.0))
+            transport.jobs_completed = completed
+            transport.jobs_today = jobs_today
+            transport.efficiency_score = float(efficiency or 0.0)
+            transport.fuel_consumed_litres = litres or 0.0
+            transport.fuel_cost_total = cost or 0.0
 
     @api.depends('document_ids.expiry_date', 'document_ids.is_expired', 'document_ids.reminder_days')
     def _compute_document_alerts(self):
@@ -125,6 +235,7 @@ class RmcSubcontractorTransport(models.Model):
 
 class RmcTransportFuelLog(models.Model):
     _name = 'rmc.transport.fuel.log'
+    _inherit = ['rmc.portal.dashboard.source']
     _description = 'Transport Fuel Log'
     _order = 'log_date desc'
 
@@ -135,6 +246,9 @@ class RmcTransportFuelLog(models.Model):
     driver_id = fields.Many2one('res.partner', string='Driver')
     note = fields.Char(string='Note')
 
+    def _portal_dashboard_subcontractor_ids(self):
+        return set(self.transport_id.subcontractor_id.ids)
+
 
 class RmcTransportDocument(models.Model):
     _name = 'rmc.transport.document'
@@ -323,3 +437,30 @@ class RmcOperatorDayReport(models.Model):
         if created_count:
             _logger.info("Auto generated %s operator day reports for %s", created_count, report_date)
         return True
+
+
+class RmcDocketDashboard(models.Model):
+    _name = 'rmc.docket'
+    _inherit = ['rmc.docket', 'rmc.portal.dashboard.source']
+
+    def _portal_dashboard_subcontractor_ids(self):
+        return set(self.subcontractor_id.ids) | set(self.subcontractor_transport_id.subcontractor_id.ids)
+
+
+class DropshippingWorkorderDashboard(models.Model):
+    _name = 'dropshipping.workorder'
+    _inherit = ['dropshipping.workorder', 'rmc.portal.dashboard.source']
+
+    def _portal_dashboard_subcontractor_ids(self):
+        partners = self.subcontractor_id
+        if not partners:
+            return set()
+        return set(self.env['rmc.subcontractor'].search([('partner_id', 'in', partners.ids)]).ids)
+
+
+class DropshippingWorkorderTicketDashboard(models.Model):
+    _name = 'dropshipping.workorder.ticket'
+    _inherit = ['dropshipping.workorder.ticket', 'rmc.portal.dashboard.source']
+
+    def _portal_dashboard_subcontractor_ids(self):
+        return self.workorder_id._portal_dashboard_subcontractor_ids()
@@ -1,11 +1,95 @@
-from odoo import models, fields, tools
+import logging
+
+from odoo import api, models, fields
+
+_logger = logging.getLogger(__name__)
+
+
+class RmcMaterializedReport(models.AbstractModel):
+    """Reporting model backed by a table instead of a SQL view.
+
+    ``init`` creates the table from ``_report_query`` and fills it; after
+    that rows are rebuilt per key (``_report_key``) when source records
+    change, see ``rmc.report.source.mixin``. ``_cron_refresh_reports``
+    rebuilds everything as a fallback for changes made outside the ORM.
+    """
+    _name = 'rmc.materialized.report'
+    _description = 'RMC Materialized Report'
+
+    # Column of the report table the incremental refresh is keyed on
+    _report_key = None
+    # SQL expression of the same key inside ``_report_query``
+    _report_key_expr = None
+    # Columns to index (pivot/graph grouping columns)
+    _report_indexes = ()
+
+    def _report_query(self, key_filter):
+        """Return the SELECT building the report rows matching ``key_filter``."""
+        raise NotImplementedError()
+
+    def init(self):
+        if self._abstract:
+            return
+        cr = self.env.cr
+        cr.execute("SELECT relkind FROM pg_class WHERE relname = %s", [self._table])
+        row = cr.fetchone()
+        if row and row[0] == 'v':
+            cr.execute(f'DROP VIEW IF EXISTS "{self._table}" CASCADE')
+        elif row:
+            cr.execute(f'DROP TABLE IF EXISTS "{self._table}" CASCADE')
+        query = self._report_query('TRUE')
+        cr.execute(f'CREATE TABLE "{self._table}" AS ({query}) WITH NO DATA')
+        cr.execute("SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = 'id'", [self._table])
+        if cr.fetchone():
+            cr.execute(f'ALTER TABLE "{self._table}" ADD PRIMARY KEY (id)')
+        else:
+            cr.execute(f'ALTER TABLE "{self._table}" ADD COLUMN id SERIAL PRIMARY KEY')
+        for column in {self._report_key, *self._report_indexes}:
+            cr.execute(f'CREATE INDEX "{self._table}_{column}_idx" ON "{self._table}" ("{column}")')
+        self._refresh_report()
+
+    def _refresh_report(self, keys=None):
+        """Rebuild the rows of ``keys`` (all rows when ``keys`` is None)."""
+        cr = self.env.cr
+        self.env.flush_all()
+        if keys is None:
+            cr.execute(f'DELETE FROM "{self._table}"')
+            cr.execute(f'INSERT INTO "{self._table}" {self._report_query("TRUE")}')
+        else:
+            keys = sorted({key for key in keys if key})
+            if not keys:
+                return
+            cr.execute(f'DELETE FROM "{self._table}" WHERE "{self._report_key}" = ANY(%s)', [keys])
+            cr.execute(
+                f'INSERT INTO "{self._table}" {self._report_query(f"{self._report_key_expr} = ANY(%(keys)s)")}',
+                {'keys': keys},
+            )
+        self.invalidate_model()
+
+    def _refresh_dirty_reports(self):
+        """Precommit hook: rebuild the report rows marked dirty in this transaction."""
+        dirty = self.env.cr.precommit.data.pop('rmc.report.dirty', {})
+        for model_name, keys in dirty.items():
+            self.env[model_name].sudo()._refresh_report(keys)
+
+    @api.model
+    def _cron_refresh_reports(self):
+        for model_name in ('rmc.consolidated.report', 'rmc.docket.report',
+                           'rmc.workorder.report', 'rmc.saleorder.report'):
+            self.env[model_name].sudo()._refresh_report()
+            _logger.info("Refreshed %s", model_name)
 
 
 class RmcConsolidatedReport(models.Model):
     _name = 'rmc.consolidated.report'
+    _inherit = 'rmc.materialized.report'
     _description = 'RMC Consolidated Report'
     _auto = False
+    _report_key = 'sale_order_id'
+    _report_key_expr = 'so.id'
+    _report_indexes = ('date', 'customer_id', 'concrete_grade')
 
+    sale_order_id = fields.Many2one('sale.order', string='Sale Order', readonly=True)
     date = fields.Date(string='Date')
     customer_id = fields.Many2one('res.partner', string='Customer')
     concrete_grade = fields.Selection([
@@ -26,8 +110,7 @@ class RmcConsolidatedReport(models.Model):
     customer_weight = fields.Float(string='Customer Weight (Kg)')
     weight_variance = fields.Float(string='Weight Variance (Kg)')
 
-    def init(self):
-        tools.drop_view_if_exists(self.env.cr, self._table)
+    def _report_query(self, key_filter):
         cr = self.env.cr
 
         # Check if required tables exist
@@ -40,26 +123,20 @@ class RmcConsolidatedReport(models.Model):
         table_count = cr.fetchone()[0]
 
         if table_count < 2:
-            cr.execute(
-                """
-                CREATE OR REPLACE VIEW %s AS (
-                    SELECT
-                        row_number() OVER () AS id,
-                        DATE(so.date_order) AS date,
-                        so.partner_id AS customer_id,
-                        'm20' AS concrete_grade,
-                        0.0 AS quantity_delivered,
-                        so.customer_provides_cement,
-                        0.0 AS plant_weight,
-                        0.0 AS customer_weight,
-                        0.0 AS weight_variance
-                    FROM sale_order so
-                    WHERE so.state = 'sale'
-                )
-                """
-                % self._table
-            )
-            return
+            return """
+                SELECT
+                    so.id AS sale_order_id,
+                    DATE(so.date_order) AS date,
+                    so.partner_id AS customer_id,
+                    'm20'::varchar AS concrete_grade,
+                    0.0 AS quantity_delivered,
+                    so.customer_provides_cement,
+                    0.0 AS plant_weight,
+                    0.0 AS customer_weight,
+                    0.0 AS weight_variance
+                FROM sale_order so
+                WHERE so.state = 'sale' AND %s
+            """ % key_filter
 
         # Check columns in weighbridge
         cr.execute(
@@ -82,57 +159,53 @@ class RmcConsolidatedReport(models.Model):
         date_field = 'confirmation_date' if has_conf else 'date_order'
         date_expr = "DATE(so.%s)" % date_field
 
+        # Weighbridge averages are taken per sale order so they don't fan out the batch sums
         if column_count >= 3:
-            cr.execute(
-                """
-                CREATE OR REPLACE VIEW %s AS (
-                    SELECT
-                        row_number() OVER () AS id,
-                        %s AS date,
-                        so.partner_id AS customer_id,
-                        COALESCE(b.concrete_grade, 'm20') AS concrete_grade,
-                        COALESCE(SUM(b.quantity_produced), 0.0) AS quantity_delivered,
-                        so.customer_provides_cement,
-                        COALESCE(AVG(w.plant_net_weight), 0.0) AS plant_weight,
-                        COALESCE(AVG(w.customer_net_weight), 0.0) AS customer_weight,
-                        COALESCE(AVG(w.weight_variance), 0.0) AS weight_variance
-                    FROM sale_order so
-                    LEFT JOIN rmc_batch b ON b.sale_order_id = so.id
-                    LEFT JOIN rmc_weighbridge w ON w.sale_order_id = so.id
-                    WHERE so.state = 'sale'
-                    GROUP BY %s, so.partner_id, b.concrete_grade, so.customer_provides_cement
-                )
-                """
-                % (self._table, date_expr, date_expr)
+            weight_join = """
+                LEFT JOIN LATERAL (
+                    SELECT AVG(w.plant_net_weight) AS plant_weight,
+                           AVG(w.customer_net_weight) AS customer_weight,
+                           AVG(w.weight_variance) AS weight_variance
+                    FROM rmc_weighbridge w
+                    WHERE w.sale_order_id = so.id
+                ) w ON TRUE
+            """
+            weight_cols = (
+                "COALESCE(w.plant_weight, 0.0) AS plant_weight, "
+                "COALESCE(w.customer_weight, 0.0) AS customer_weight, "
+                "COALESCE(w.weight_variance, 0.0) AS weight_variance"
             )
+            weight_group = ", w.plant_weight, w.customer_weight, w.weight_variance"
         else:
-            cr.execute(
-                """
-                CREATE OR REPLACE VIEW %s AS (
-                    SELECT
-                        row_number() OVER () AS id,
-                        %s AS date,
-                        so.partner_id AS customer_id,
-                        COALESCE(b.concrete_grade, 'm20') AS concrete_grade,
-                        COALESCE(SUM(b.quantity_produced), 0.0) AS quantity_delivered,
-                        so.customer_provides_cement,
-                        0.0 AS plant_weight,
-                        0.0 AS customer_weight,
-                        0.0 AS weight_variance
-                    FROM sale_order so
-                    LEFT JOIN rmc_batch b ON b.sale_order_id = so.id
-                    WHERE so.state = 'sale'
-                    GROUP BY %s, so.partner_id, b.concrete_grade, so.customer_provides_cement
-                )
-                """
-                % (self._table, date_expr, date_expr)
-            )
+            weight_join = ""
+            weight_cols = "0.0 AS plant_weight, 0.0 AS customer_weight, 0.0 AS weight_variance"
+            weight_group = ""
+        return """
+            SELECT
+                so.id AS sale_order_id,
+                %s AS date,
+                so.partner_id AS customer_id,
+                COALESCE(b.concrete_grade, 'm20') AS concrete_grade,
+                COALESCE(SUM(b.quantity_produced), 0.0) AS quantity_delivered,
+                so.customer_provides_cement,
+                %s
+            FROM sale_order so
+            LEFT JOIN rmc_batch b ON b.sale_order_id = so.id
+            %s
+            WHERE so.state = 'sale' AND %s
+            GROUP BY so.id, b.concrete_grade%s
+        """ % (date_expr, weight_cols, weight_join, key_filter, weight_group)
 
 
 class RmcDocketReport(models.Model):
     _name = 'rmc.docket.report'
+    _inherit = 'rmc.materialized.report'
     _description = 'RMC Docket-wise Report'
     _auto = False
+    _report_key = 'docket_id'
+    _report_key_expr = 'd.id'
+    _report_indexes = ('docket_date', 'sale_order_id', 'customer_id', 'workorder_id',
+                       'subcontractor_id', 'product_id', 'state')
 
     docket_id = fields.Many2one('rmc.docket', string='Docket', readonly=True)
     docket_number = fields.Char(string='Docket Number', readonly=True)
@@ -162,39 +235,41 @@ class RmcDocketReport(models.Model):
     vendor_bill_count = fields.Integer(string='Vendor Bills', readonly=True)
     cube_test_count = fields.Integer(string='Cube Tests', readonly=True)
 
-    def init(self):
-        tools.drop_view_if_exists(self.env.cr, self._table)
-        cr = self.env.cr
-        cr.execute(
-            """
-            CREATE OR REPLACE VIEW %s AS (
-                SELECT
-                    row_number() OVER () AS id,
-                    d.id AS docket_id,
-                    d.docket_number,
-                    d.docket_date,
-                    d.sale_order_id,
-                    so.partner_id AS customer_id,
-                    d.workorder_id,
-                    d.helpdesk_ticket_id,
-                    d.subcontractor_id,
-                    d.product_id,
-                    COALESCE(d.quantity_ordered, 0.0) AS quantity_ordered,
-                    COALESCE(d.quantity_produced, 0.0) AS quantity_produced,
-                    d.state,
-                    COALESCE((SELECT COUNT(*) FROM rmc_truck_loading tl WHERE tl.docket_id = d.id), 0) AS truck_loading_count,
-                    COALESCE((SELECT COUNT(*) FROM rmc_plant_check pc WHERE pc.docket_id = d.id), 0) AS plant_check_count,
-                    COALESCE((SELECT COUNT(*) FROM rmc_docket_batch db WHERE db.docket_id = d.id), 0) AS batch_count,
-                    COALESCE((SELECT COUNT(*) FROM mail_message mm WHERE mm.model = 'rmc.docket' AND mm.res_id = d.id), 0) AS log_count,
-                    d.invoice_id AS invoice_id,
-                    COALESCE((SELECT COUNT(*) FROM account_move am JOIN dropshipping_workorder wo ON wo.id = d.workorder_id WHERE am.move_type = 'in_invoice' AND am.invoice_origin ILIKE wo.name), 0) AS vendor_bill_count,
-                    COALESCE((SELECT COUNT(*) FROM quality_cube_test qct WHERE qct.docket_id = d.id), 0) AS cube_test_count
-                FROM rmc_docket d
-                LEFT JOIN sale_order so ON so.id = d.sale_order_id
-            )
-            """
-            % self._table
-        )
+    def _report_query(self, key_filter):
+        return """
+            SELECT
+                d.id AS id,
+                d.id AS docket_id,
+                d.docket_number,
+                d.docket_date,
+                d.sale_order_id,
+                so.partner_id AS customer_id,
+                d.workorder_id,
+                d.helpdesk_ticket_id,
+                d.subcontractor_id,
+                d.product_id,
+                COALESCE(d.quantity_ordered, 0.0) AS quantity_ordered,
+                COALESCE(d.quantity_produced, 0.0) AS quantity_produced,
+                d.state,
+                COALESCE((SELECT COUNT(*) FROM rmc_truck_loading tl WHERE tl.docket_id = d.id), 0) AS truck_loading_count,
+                COALESCE((SELECT COUNT(*) FROM rmc_plant_check pc WHERE pc.docket_id = d.id), 0) AS plant_check_count,
+                COALESCE((SELECT COUNT(*) FROM rmc_docket_batch db WHERE db.docket_id = d.id), 0) AS batch_count,
+                COALESCE((SELECT COUNT(*) FROM mail_message mm WHERE mm.model = 'rmc.docket' AND mm.res_id = d.id), 0) AS log_count,
+                d.invoice_id AS invoice_id,
+                COALESCE(vb.vendor_bill_count, 0) AS vendor_bill_count,
+                COALESCE((SELECT COUNT(*) FROM quality_cube_test qct WHERE qct.docket_id = d.id), 0) AS cube_test_count
+            FROM rmc_docket d
+            LEFT JOIN sale_order so ON so.id = d.sale_order_id
+            -- Vendor bills are matched on the workorder name once per workorder, not per docket
+            LEFT JOIN (
+                SELECT wo.id AS workorder_id, COUNT(am.id) AS vendor_bill_count
+                FROM dropshipping_workorder wo
+                JOIN account_move am ON am.move_type = 'in_invoice' AND am.invoice_origin ILIKE wo.name
+                WHERE wo.id IN (SELECT d.workorder_id FROM rmc_docket d WHERE %s)
+                GROUP BY wo.id
+            ) vb ON vb.workorder_id = d.workorder_id
+            WHERE %s
+        """ % (key_filter, key_filter)
 
     # Drilldown helpers
     def action_open_docket(self):
@@ -273,8 +348,12 @@ class RmcDocketReport(models.Model):
 
 class RmcWorkorderReport(models.Model):
     _name = 'rmc.workorder.report'
+    _inherit = 'rmc.materialized.report'
     _description = 'RMC Workorder-wise Report'
     _auto = False
+    _report_key = 'workorder_id'
+    _report_key_expr = 'wo.id'
+    _report_indexes = ('date_order', 'sale_order_id', 'partner_id')
 
     workorder_id = fields.Many2one('dropshipping.workorder', string='Workorder', readonly=True)
     name = fields.Char(string='Workorder Number', readonly=True)
@@ -294,8 +373,7 @@ class RmcWorkorderReport(models.Model):
     invoice_count = fields.Integer(string='Customer Invoices', readonly=True)
     cube_test_count = fields.Integer(string='Cube Tests', readonly=True)
 
-    def init(self):
-        tools.drop_view_if_exists(self.env.cr, self._table)
+    def _report_query(self, key_filter):
         cr = self.env.cr
         cr.execute("""
             SELECT COUNT(*) FROM information_schema.columns
@@ -303,41 +381,40 @@ class RmcWorkorderReport(models.Model):
         """)
         has_invoice_docket = cr.fetchone()[0] > 0
 
-        delivered_expr = "COALESCE((SELECT SUM(COALESCE(d.quantity_produced, 0.0)) FROM dockets d WHERE d.workorder_id = wo.id), 0.0)"
-        remaining_expr = f"GREATEST(COALESCE(wo.quantity_ordered, 0.0) - {delivered_expr}, 0.0)"
         invoice_count_expr = (
-            "COALESCE((SELECT COUNT(DISTINCT am.id) FROM account_move am WHERE am.move_type = 'out_invoice' AND am.docket_id IN (SELECT d.id FROM dockets d WHERE d.workorder_id = wo.id)), 0)"
+            "COALESCE((SELECT COUNT(DISTINCT am.id) FROM account_move am WHERE am.move_type = 'out_invoice' AND am.docket_id IN (SELECT d.id FROM rmc_docket d WHERE d.workorder_id = wo.id)), 0)"
             if has_invoice_docket
             else "COALESCE((SELECT COUNT(DISTINCT am.id) FROM account_move am WHERE am.move_type = 'out_invoice' AND am.invoice_origin ILIKE wo.name), 0)"
         )
 
-        sql = f"""
-            CREATE OR REPLACE VIEW {self._table} AS (
-                WITH dockets AS (
-                    SELECT d.* FROM rmc_docket d
-                )
-                SELECT
-                    row_number() OVER () AS id,
-                    wo.id AS workorder_id,
-                    wo.name,
-                    wo.date_order,
-                    wo.sale_order_id,
-                    wo.partner_id,
-                    COALESCE(wo.quantity_ordered, 0.0) AS quantity_ordered,
-                    {delivered_expr} AS quantity_delivered,
-                    {remaining_expr} AS quantity_remaining,
-                    COALESCE((SELECT COUNT(*) FROM dockets d WHERE d.workorder_id = wo.id), 0) AS docket_count,
-                    COALESCE((SELECT COUNT(*) FROM dropshipping_workorder_ticket t WHERE t.workorder_id = wo.id), 0) AS ticket_count,
-                    COALESCE((SELECT COUNT(*) FROM rmc_truck_loading tl WHERE tl.docket_id IN (SELECT d.id FROM dockets d WHERE d.workorder_id = wo.id)), 0) AS truck_loading_count,
-                    COALESCE((SELECT COUNT(*) FROM rmc_docket_batch db WHERE db.docket_id IN (SELECT d.id FROM dockets d WHERE d.workorder_id = wo.id)), 0) AS batch_count,
-                    COALESCE((SELECT COUNT(*) FROM purchase_order po WHERE po.origin = wo.name), 0) AS po_count,
-                    COALESCE((SELECT COUNT(*) FROM account_move am WHERE am.move_type = 'in_invoice' AND (am.invoice_origin ILIKE wo.name)), 0) AS vendor_bill_count,
-                    {invoice_count_expr} AS invoice_count,
-                    COALESCE((SELECT COUNT(*) FROM quality_cube_test qct WHERE qct.workorder_id = wo.id), 0) AS cube_test_count
-                FROM dropshipping_workorder wo
-            )
+        # Docket figures are aggregated once per workorder and joined in
+        return f"""
+            SELECT
+                wo.id AS id,
+                wo.id AS workorder_id,
+                wo.name,
+                wo.date_order,
+                wo.sale_order_id,
+                wo.partner_id,
+                COALESCE(wo.quantity_ordered, 0.0) AS quantity_ordered,
+                COALESCE(dk.quantity_delivered, 0.0) AS quantity_delivered,
+                GREATEST(COALESCE(wo.quantity_ordered, 0.0) - COALESCE(dk.quantity_delivered, 0.0), 0.0) AS quantity_remaining,
+                COALESCE(dk.docket_count, 0) AS docket_count,
+                COALESCE((SELECT COUNT(*) FROM dropshipping_workorder_ticket t WHERE t.workorder_id = wo.id), 0) AS ticket_count,
+                COALESCE((SELECT COUNT(*) FROM rmc_truck_loading tl WHERE tl.docket_id IN (SELECT d.id FROM rmc_docket d WHERE d.workorder_id = wo.id)), 0) AS truck_loading_count,
+                COALESCE((SELECT COUNT(*) FROM rmc_docket_batch db WHERE db.docket_id IN (SELECT d.id FROM rmc_docket d WHERE d.workorder_id = wo.id)), 0) AS batch_count,
+                COALESCE((SELECT COUNT(*) FROM purchase_order po WHERE po.origin = wo.name), 0) AS po_count,
+                COALESCE((SELECT COUNT(*) FROM account_move am WHERE am.move_type = 'in_invoice' AND (am.invoice_origin ILIKE wo.name)), 0) AS vendor_bill_count,
+                {invoice_count_expr} AS invoice_count,
+                COALESCE((SELECT COUNT(*) FROM quality_cube_test qct WHERE qct.workorder_id = wo.id), 0) AS cube_test_count
+            FROM dropshipping_workorder wo
+            LEFT JOIN LATERAL (
+                SELECT COUNT(*) AS docket_count, SUM(COALESCE(d.quantity_produced, 0.0)) AS quantity_delivered
+                FROM rmc_docket d
+                WHERE d.workorder_id = wo.id
+            ) dk ON TRUE
+            WHERE {key_filter}
         """
-        cr.execute(sql)
 
     # Drilldown helpers
     def action_open_workorder(self):
@@ -401,8 +478,12 @@ class RmcWorkorderReport(models.Model):
 
 class RmcSaleOrderReport(models.Model):
     _name = 'rmc.saleorder.report'
+    _inherit = 'rmc.materialized.report'
     _description = 'RMC Sale Order-wise Report'
     _auto = False
+    _report_key = 'sale_order_id'
+    _report_key_expr = 'so.id'
+    _report_indexes = ('date_order', 'partner_id')
 
     sale_order_id = fields.Many2one('sale.order', string='Sale Order', readonly=True)
     name = fields.Char(string='Order', readonly=True)
@@ -416,8 +497,7 @@ class RmcSaleOrderReport(models.Model):
     cube_test_count = fields.Integer(string='Cube Tests', readonly=True)
     trial_mix_count = fields.Integer(string='Trial Mixes', readonly=True)
 
-    def init(self):
-        tools.drop_view_if_exists(self.env.cr, self._table)
+    def _report_query(self, key_filter):
         cr = self.env.cr
 
         # Determine which date field to use for sale orders
@@ -443,8 +523,7 @@ class RmcSaleOrderReport(models.Model):
             if has_trial_mix_link else "0"
         )
 
-        sql = f"""
-            CREATE OR REPLACE VIEW {self._table} AS (
+        return f"""
                 SELECT
                     so.id as id,
                     so.id as sale_order_id,
@@ -458,10 +537,8 @@ class RmcSaleOrderReport(models.Model):
                     COALESCE((SELECT COUNT(*) FROM quality_cube_test qct WHERE qct.sale_order_id = so.id), 0) AS cube_test_count,
                     {trial_mix_expr} AS trial_mix_count
                 FROM sale_order so
-                WHERE so.state IN ('sale','done')
-            )
+                WHERE so.state IN ('sale','done') AND {key_filter}
         """
-        cr.execute(sql)
 
     # Drilldowns
     def action_open_sale_order(self):
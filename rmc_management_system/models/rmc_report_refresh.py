@@ -0,0 +1,164 @@
+from collections import defaultdict
+
+from odoo import api, models
+
+
+class RmcReportSourceMixin(models.AbstractModel):
+    """Keep the materialized RMC reports in sync with their source records.
+
+    Creating, writing or deleting a source record marks the report rows it
+    contributes to (see ``_rmc_report_keys``) as dirty; the rows are rebuilt
+    once per transaction, right before commit.
+    """
+    _name = 'rmc.report.source.mixin'
+    _description = 'RMC Report Source'
+
+    # Fields feeding the reports; writes touching none of them are ignored
+    _rmc_report_fields = ()
+
+    def _rmc_report_keys(self):
+        """Return ``[(report_model, ids)]`` of report rows built from ``self``."""
+        return []
+
+    def _rmc_report_mark_dirty(self):
+        if not self:
+            return
+        data = self.env.cr.precommit.data
+        dirty = data.get('rmc.report.dirty')
+        if dirty is None:
+            dirty = data['rmc.report.dirty'] = defaultdict(set)
+            self.env.cr.precommit.add(self.env['rmc.materialized.report']._refresh_dirty_reports)
+        for model_name, ids in self.sudo()._rmc_report_keys():
+            dirty[model_name].update(ids)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._rmc_report_mark_dirty()
+        return records
+
+    def write(self, vals):
+        relevant = not self._rmc_report_fields or any(fname in vals for fname in self._rmc_report_fields)
+        if relevant:
+            # Old keys too, in case the record moves to another docket/workorder/order
+            self._rmc_report_mark_dirty()
+        res = super().write(vals)
+        if relevant:
+            self._rmc_report_mark_dirty()
+        return res
+
+    def unlink(self):
+        self._rmc_report_mark_dirty()
+        return super().unlink()
+
+
+class SaleOrder(models.Model):
+    _name = 'sale.order'
+    _inherit = ['sale.order', 'rmc.report.source.mixin']
+    _rmc_report_fields = ('state', 'partner_id', 'date_order', 'name', 'currency_id',
+                          'customer_provides_cement', 'order_line')
+
+    def _rmc_report_keys(self):
+        return [
+            ('rmc.consolidated.report', self.ids),
+            ('rmc.saleorder.report', self.ids),
+        ]
+
+
+class RmcBatch(models.Model):
+    _name = 'rmc.batch'
+    _inherit = ['rmc.batch', 'rmc.report.source.mixin']
+    _rmc_report_fields = ('sale_order_id', 'recipe_id', 'quantity_produced')
+
+    def _rmc_report_keys(self):
+        return [('rmc.consolidated.report', self.sale_order_id.ids)]
+
+
+class RmcWeighbridge(models.Model):
+    _name = 'rmc.weighbridge'
+    _inherit = ['rmc.weighbridge', 'rmc.report.source.mixin']
+
+    def _rmc_report_keys(self):
+        return [('rmc.consolidated.report', self.sale_order_id.ids)]
+
+
+class RmcDocket(models.Model):
+    _name = 'rmc.docket'
+    _inherit = ['rmc.docket', 'rmc.report.source.mixin']
+    _rmc_report_fields = ('docket_number', 'docket_date', 'sale_order_id', 'workorder_id',
+                          'helpdesk_ticket_id', 'subcontractor_id', 'product_id', 'quantity_ordered',
+                          'quantity_produced', 'state', 'invoice_id')
+
+    def _rmc_report_keys(self):
+        return [
+            ('rmc.docket.report', self.ids),
+            ('rmc.workorder.report', self.workorder_id.ids),
+            ('rmc.saleorder.report', self.sale_order_id.ids),
+        ]
+
+
+class DropshippingWorkorder(models.Model):
+    _name = 'dropshipping.workorder'
+    _inherit = ['dropshipping.workorder', 'rmc.report.source.mixin']
+    _rmc_report_fields = ('name', 'date_order', 'sale_order_id', 'quantity_ordered')
+
+    def _rmc_report_keys(self):
+        return [
+            ('rmc.workorder.report', self.ids),
+            ('rmc.saleorder.report', self.sale_order_id.ids),
+        ]
+
+
+class DropshippingWorkorderTicket(models.Model):
+    _name = 'dropshipping.workorder.ticket'
+    _inherit = ['dropshipping.workorder.ticket', 'rmc.report.source.mixin']
+    _rmc_report_fields = ('workorder_id',)
+
+    def _rmc_report_keys(self):
+        return [('rmc.workorder.report', self.workorder_id.ids)]
+
+
+class RmcTruckLoading(models.Model):
+    _name = 'rmc.truck_loading'
+    _inherit = ['rmc.truck_loading', 'rmc.report.source.mixin']
+    _rmc_report_fields = ('docket_id',)
+
+    def _rmc_report_keys(self):
+        return [
+            ('rmc.docket.report', self.docket_id.ids),
+            ('rmc.workorder.report', self.docket_id.workorder_id.ids),
+        ]
+
+
+class RmcPlantCheck(models.Model):
+    _name = 'rmc.plant_check'
+    _inherit = ['rmc.plant_check', 'rmc.report.source.mixin']
+    _rmc_report_fields = ('truck_loading_id',)
+
+    def _rmc_report_keys(self):
+        return [('rmc.docket.report', self.docket_id.ids)]
+
+
+class RmcDocketBatch(models.Model):
+    _name = 'rmc.docket.batch'
+    _inherit = ['rmc.docket.batch', 'rmc.report.source.mixin']
+    _rmc_report_fields = ('docket_id',)
+
+    def _rmc_report_keys(self):
+        return [
+            ('rmc.docket.report', self.docket_id.ids),
+            ('rmc.workorder.report', self.docket_id.workorder_id.ids),
+        ]
+
+
+class QualityCubeTest(models.Model):
+    _name = 'quality.cube.test'
+    _inherit = ['quality.cube.test', 'rmc.report.source.mixin']
+    _rmc_report_fields = ('docket_id', 'workorder_id', 'sale_order_id')
+
+    def _rmc_report_keys(self):
+        return [
+            ('rmc.docket.report', self.docket_id.ids),
+            ('rmc.workorder.report', self.workorder_id.ids),
+            ('rmc.saleorder.report', self.sale_order_id.ids),
+        ]
@@ -7,7 +7,7 @@ class RmcTruckLoading(models.Model):
     _order = 'loading_date desc'
 
     name = fields.Char(string='Loading Reference', required=True, copy=False, readonly=True, default='New')
-    docket_id = fields.Many2one('rmc.docket', string='Docket', required=True)
+    docket_id = fields.Many2one('rmc.docket', string='Docket', required=True, index=True)
     vehicle_id = fields.Many2one('fleet.vehicle', string='Vehicle', required=False)
     
     # Subcontractor Transport Integration
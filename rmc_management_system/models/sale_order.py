@@ -82,10 +82,32 @@ class SaleOrder(models.Model):
         if any(line.product_id.categ_id.name == 'RMC' for line in self.order_line):
             self._create_rmc_ticket()
 
+        self._post_material_receipts()
+
     # Cube tests are created by triggers (workorder/docket) only
 
         return result
 
+    def _post_material_receipts(self):
+        """Book the ordered materials on the customer's material balance ledger (once per order)."""
+        posted = set(self.env['rmc.material.move'].sudo().search([
+            ('sale_order_id', 'in', self.ids), ('move_type', '=', 'receipt'),
+        ]).sale_order_id.ids)
+        balance_model = self.env['rmc.material.balance']
+        for order in self:
+            if order.id in posted or not order.partner_id:
+                continue
+            for line in order.order_line:
+                # Only materials are booked; concrete, pumping and services are not
+                material_type = line.product_id.categ_id.rmc_material_type
+                if not material_type:
+                    continue
+                # If customer provides cement, don't add to balance
+                if material_type == 'cement' and order.customer_provides_cement:
+                    continue
+                balance_model._update_balance(order.partner_id, material_type, line.product_uom_qty,
+                                              sale_order=order, reference=order.name, move_type='receipt')
+
     def action_create_rmc_workorder(self):
         """Manually create RMC workorder from sale order"""
         self.ensure_one()
@@ -201,20 +223,13 @@ class SaleOrder(models.Model):
         for order in self:
             if order.partner_id:
                 for line in order.order_line:
-                    if line.product_id and line.product_id.categ_id:
-                        categ_name = line.product_id.categ_id.name.lower()
-                        material_type = 'other'
-                        if 'cement' in categ_name:
-                            material_type = 'cement'
-                        elif 'sand' in categ_name:
-                            material_type = 'sand'
-                        elif 'aggregate' in categ_name or 'gravel' in categ_name:
-                            material_type = 'aggregate'
-                        
-                        # Add materials received from sale order (unless customer provides cement)
-                        if not (material_type == 'cement' and order.customer_provides_cement):
-                            self.env['rmc.material.balance']._update_balance(
-                                order.partner_id, material_type, line.product_uom_qty)
+                    material_type = line.product_id.categ_id.rmc_material_type
+                    if not material_type:
+                        continue
+                    # Add materials received from sale order (unless customer provides cement)
+                    if not (material_type == 'cement' and order.customer_provides_cement):
+                        self.env['rmc.material.balance']._update_balance(
+                            order.partner_id, material_type, line.product_uom_qty)
 
     def _create_rmc_ticket(self):
         """Create helpdesk ticket for RMC order"""
@@ -32,6 +32,12 @@ class SaleOrder(models.Model):
     last_sent_30d = fields.Datetime(string='Last 30-day Summary Sent')
     last_sent_7d = fields.Datetime(string='Last 7-day Summary Sent')
     last_sent_15d = fields.Datetime(string='Last 15-day Summary Sent')
+    report_next_due_at = fields.Datetime(string='Next Periodic Summary', compute='_compute_report_next_due_at',
+                                         store=True, readonly=False, index='btree_not_null')
+    # Day of the pending summary, counted from confirmation. Kept apart from
+    # report_next_due_at, which the cron pushes forward when a run fails.
+    report_due_day = fields.Integer(string='Pending Summary Day', compute='_compute_report_next_due_at',
+                                    store=True, readonly=False)
 
     # ----------------------------
     # Computes / helpers
@@ -48,6 +54,52 @@ class SaleOrder(models.Model):
                         break
             order.is_rmc_order = is_rmc
 
+    @api.depends('state', 'reporting_enabled', 'reporting_period', 'date_order')
+    def _compute_report_next_due_at(self):
+        now = fields.Datetime.now()
+        for order in self:
+            day = 0
+            if order.state in ('sale', 'done') and order.reporting_enabled:
+                day = order._next_periodic_report_day(now, include_today=True)
+            order._set_periodic_report_day(day)
+
+    def _periodic_report_origin(self):
+        self.ensure_one()
+        return getattr(self, 'confirmation_date', False) or self.date_order
+
+    def _next_periodic_report_day(self, after, include_today=False):
+        """Next summary day from confirmation: every ``reporting_period`` days and every 30 days."""
+        self.ensure_one()
+        conf_dt = self._periodic_report_origin()
+        if not conf_dt:
+            return 0
+        period = int(self.reporting_period or 7)
+        elapsed = max((after - conf_dt).days, 0)
+        start = max(elapsed if include_today else elapsed + 1, 1)
+        return min(-(-start // step) * step for step in (period, 30))
+
+    def _set_periodic_report_day(self, day):
+        self.ensure_one()
+        self.report_due_day = day
+        self.report_next_due_at = self._periodic_report_origin() + timedelta(days=day) if day else False
+
+    def _run_periodic_report(self):
+        """Send the summary that is due (30-day first, then the periodic one) and schedule the next.
+
+        The summary is picked from ``report_due_day``, so a run retried after
+        ``report_next_due_at`` was pushed forward still sends it.
+        """
+        self.ensure_one()
+        day = self.report_due_day
+        period = int(self.reporting_period or 7)
+        sent = False
+        if day and day % 30 == 0:
+            sent = self._send_sale_order_summary(30, 'rmc_management_system.mail_tmpl_so_summary_30')
+        if not sent and day and day % period == 0:
+            tmpl = 'rmc_management_system.mail_tmpl_so_summary_7' if period == 7 else 'rmc_management_system.mail_tmpl_so_summary_15'
+            self._send_sale_order_summary(period, tmpl)
+        self._set_periodic_report_day(self._next_periodic_report_day(fields.Datetime.now()))
+
     @api.depends('workorder_ids')
     def _compute_workorder_count(self):
         for order in self:
@@ -162,17 +214,11 @@ class SaleOrder(models.Model):
         for order in self:
             if order.partner_id:
                 for line in order.order_line:
-                    if line.product_id and line.product_id.categ_id:
-                        categ_name = (line.product_id.categ_id.name or '').lower()
-                        material_type = 'other'
-                        if 'cement' in categ_name:
-                            material_type = 'cement'
-                        elif 'sand' in categ_name:
-                            material_type = 'sand'
-                        elif 'aggregate' in categ_name or 'gravel' in categ_name:
-                            material_type = 'aggregate'
-                        if not (material_type == 'cement' and order.customer_provides_cement):
-                            self.env['rmc.material.balance']._update_balance(order.partner_id, material_type, line.product_uom_qty)
+                    material_type = line.product_id.categ_id.rmc_material_type
+                    if not material_type:
+                        continue
+                    if not (material_type == 'cement' and order.customer_provides_cement):
+                        self.env['rmc.material.balance']._update_balance(order.partner_id, material_type, line.product_uom_qty)
 
     # ----------------------------
     # Reporting helpers
@@ -11,7 +11,7 @@ class DropshippingWorkorder(models.Model):
 
     name = fields.Char(string='Workorder Number', required=True, copy=False, readonly=True, default='New')
     date_order = fields.Datetime(string='Order Date', required=True, default=fields.Datetime.now)
-    sale_order_id = fields.Many2one('sale.order', string='Sale Order', required=True)
+    sale_order_id = fields.Many2one('sale.order', string='Sale Order', required=True, index=True)
     partner_id = fields.Many2one('res.partner', string='Customer', related='sale_order_id.partner_id', store=True)
     product_id = fields.Many2one('product.product', string='Product', required=True)
     quantity_ordered = fields.Float(string='Quantity Ordered')
@@ -51,6 +51,11 @@ class DropshippingWorkorder(models.Model):
     wo_report_root_message_id = fields.Many2one('mail.message', string='WO Report Root Message', readonly=True)
     cube7_last_sent = fields.Datetime(string='Cube 7-Day Sent On', readonly=True)
     cube28_last_sent = fields.Datetime(string='Cube 28-Day Sent On', readonly=True)
+    # Next time the cube follow-up cron has to handle this workorder (empty once sent)
+    cube7_due_at = fields.Datetime(string='Cube 7-Day Due', compute='_compute_cube_due_at', store=True,
+                                   readonly=False, index='btree_not_null')
+    cube28_due_at = fields.Datetime(string='Cube 28-Day Due', compute='_compute_cube_due_at', store=True,
+                                    readonly=False, index='btree_not_null')
     report_cc_emails = fields.Char(string='Report CC Emails')
     report_bcc_emails = fields.Char(string='Report BCC Emails')
     completion_template_id = fields.Many2one('mail.template', string='Completion Email Template')
@@ -221,28 +226,59 @@ class DropshippingWorkorder(models.Model):
             self.env['dropshipping.workorder.ticket'].create(workorder_ticket_vals)
             # Update RMC material balance for cement
             if workorder.partner_id:
-                self.env['rmc.material.balance']._update_balance(workorder.partner_id, 'cement', -qty * 0.05)
+                self.env['rmc.material.balance']._update_balance(
+                    workorder.partner_id, 'cement', -qty * 0.05, workorder=workorder, reference=ticket.name)
         if tickets_created:
             workorder.helpdesk_ticket_id = tickets_created[0]
         return tickets_created
 
+    def _docket_totals_by_workorder(self, workorder_ids):
+        """Return ``{workorder_id: (docket_ids, quantity_produced)}`` from one grouped query."""
+        if not workorder_ids:
+            return {}
+        groups = self.env['rmc.docket']._read_group(
+            [('workorder_id', 'in', list(workorder_ids))],
+            ['workorder_id'], ['id:array_agg', 'quantity_produced:sum'],
+        )
+        return {workorder.id: (docket_ids, quantity or 0.0) for workorder, docket_ids, quantity in groups}
+
     def _compute_so_delivered_to_date(self):
+        # Delivered quantity of every workorder sharing a sale order, summed per sale order
+        so_ids = self.sale_order_id.ids
+        siblings = self.search([('sale_order_id', 'in', so_ids)]) if so_ids else self.browse()
+        delivered_by_wo = {wo_id: qty for wo_id, (_dockets, qty) in self._docket_totals_by_workorder(siblings.ids).items()}
+        delivered_by_so = {}
+        for sibling in siblings:
+            so_id = sibling.sale_order_id.id
+            delivered_by_so[so_id] = delivered_by_so.get(so_id, 0.0) + delivered_by_wo.get(sibling.id, 0.0)
         for wo in self:
             total = 0.0
             if wo.sale_order_id:
-                others = self.search([('sale_order_id', '=', wo.sale_order_id.id), ('id', '!=', wo.id)])
-                total = sum(others.mapped('quantity_delivered'))
+                # Exclude the current workorder's own deliveries
+                total = delivered_by_so.get(wo.sale_order_id.id, 0.0) - delivered_by_wo.get(wo._origin.id, 0.0)
             wo.so_delivered_to_date = total
 
     @api.depends('quantity_ordered')
     def _compute_delivered_and_remaining(self):
+        totals = self._docket_totals_by_workorder(self.ids)
         for record in self:
             # Sum of Quantity Produced across linked dockets
-            dockets = self.env['rmc.docket'].search([('workorder_id', '=', record.id)])
-            delivered = sum(float(d.quantity_produced or 0.0) for d in dockets)
+            delivered = float(totals.get(record._origin.id, ((), 0.0))[1])
             record.quantity_delivered = delivered
             record.quantity_remaining = float(record.quantity_ordered or 0.0) - delivered
 
+    @api.depends('state', 'date_completed', 'cube7_last_sent', 'cube28_last_sent')
+    def _compute_cube_due_at(self):
+        for wo in self:
+            for days, due_field, last_sent in ((7, 'cube7_due_at', wo.cube7_last_sent),
+                                               (28, 'cube28_due_at', wo.cube28_last_sent)):
+                due = False
+                if wo.state == 'completed' and wo.date_completed:
+                    due = wo.date_completed + timedelta(days=days)
+                    if last_sent and last_sent >= due:
+                        due = False
+                wo[due_field] = due
+
     @api.depends('quantity_ordered', 'unit_price')
     def _compute_total(self):
         for record in self:
@@ -298,25 +334,74 @@ class DropshippingWorkorder(models.Model):
         return True
 
     def _compute_counts(self):
-        for wo in self:
-            # Dockets linked to this workorder
-            dockets = self.env['rmc.docket'].search([('workorder_id', '=', wo.id)])
-            wo.docket_count = len(dockets)
-            # Tickets
-            wo.ticket_count_btn = len(wo.ticket_ids)
-            # Truck loadings via dockets
-            wo.truck_loading_count = self.env['rmc.truck_loading'].search_count([('docket_id', 'in', dockets.ids)])
-            # Docket batches via dockets
-            wo.batch_count_btn = self.env['rmc.docket.batch'].search_count([('docket_id', 'in', dockets.ids)])
+        """Smart button counters, computed with one grouped query per related model.
+
+        The number of queries does not depend on the size of the recordset:
+        counts are aggregated by docket (or truck loading, origin, ...) and
+        scattered back to the workorders.
+        """
+        totals = self._docket_totals_by_workorder(self.ids)
+        wo_by_docket = {docket_id: wo_id for wo_id, (docket_ids, _qty) in totals.items() for docket_id in docket_ids}
+        docket_ids = list(wo_by_docket)
+
+        def count_by_docket(model, domain=()):
+            if not docket_ids:
+                return {}
+            counts = {}
+            for docket, count in self.env[model]._read_group(
+                    [('docket_id', 'in', docket_ids), *domain], ['docket_id'], ['__count']):
+                wo_id = wo_by_docket[docket.id]
+                counts[wo_id] = counts.get(wo_id, 0) + count
+            return counts
+
+        batch_counts = count_by_docket('rmc.docket.batch')
+        invoice_counts = count_by_docket('account.move', [('move_type', '=', 'out_invoice')])
+        # Delivery variances via truck loadings under these dockets
+        truck_loading_counts = {}
+        variance_counts = {}
+        if docket_ids:
+            loadings = self.env['rmc.truck_loading'].search_read([('docket_id', 'in', docket_ids)], ['docket_id'], load=None)
+            wo_by_loading = {loading['id']: wo_by_docket[loading['docket_id']] for loading in loadings}
+            for wo_id in wo_by_loading.values():
+                truck_loading_counts[wo_id] = truck_loading_counts.get(wo_id, 0) + 1
+            if wo_by_loading:
+                for loading, count in self.env['rmc.delivery_variance']._read_group(
+                        [('truck_loading_id', 'in', list(wo_by_loading))], ['truck_loading_id'], ['__count']):
+                    wo_id = wo_by_loading[loading.id]
+                    variance_counts[wo_id] = variance_counts.get(wo_id, 0) + count
+
+        ticket_counts = {}
+        po_counts = {}
+        vendor_bill_counts = {}
+        if self.ids:
+            ticket_counts = {
+                workorder.id: count for workorder, count in self.env['dropshipping.workorder.ticket']._read_group(
+                    [('workorder_id', 'in', self.ids)], ['workorder_id'], ['__count'])
+            }
+        names = {wo.name for wo in self if wo.name}
+        if names:
             # Purchase Orders by origin
-            wo.po_count = self.env['purchase.order'].search_count([('origin', '=', wo.name)])
-            # Vendor Bills linked by invoice_origin
-            wo.vendor_bill_count = self.env['account.move'].search_count([('move_type', '=', 'in_invoice'), ('invoice_origin', 'ilike', wo.name or '')])
-            # Customer invoices via docket link
-            wo.invoice_count = self.env['account.move'].search_count([('move_type', '=', 'out_invoice'), ('docket_id', 'in', dockets.ids)])
-            # Delivery variances via truck loadings under these dockets
-            tl_ids = self.env['rmc.truck_loading'].search([('docket_id', 'in', dockets.ids)]).ids
-            wo.delivery_variance_count = self.env['rmc.delivery_variance'].search_count([('truck_loading_id', 'in', tl_ids)])
+            po_counts = dict(self.env['purchase.order']._read_group(
+                [('origin', 'in', list(names))], ['origin'], ['__count']))
+            # Vendor Bills linked by invoice_origin (substring match, grouped per distinct origin)
+            origin_domain = ['|'] * (len(names) - 1) + [('invoice_origin', 'ilike', name) for name in names]
+            bill_origins = self.env['account.move']._read_group(
+                [('move_type', '=', 'in_invoice'), *origin_domain], ['invoice_origin'], ['__count'])
+            for name in names:
+                needle = name.lower()
+                vendor_bill_counts[name] = sum(
+                    count for origin, count in bill_origins if origin and needle in origin.lower())
+
+        for wo in self:
+            wo_id = wo._origin.id
+            wo.docket_count = len(totals.get(wo_id, ((), 0.0))[0])
+            wo.ticket_count_btn = ticket_counts.get(wo_id, 0) if wo_id else len(wo.ticket_ids)
+            wo.truck_loading_count = truck_loading_counts.get(wo_id, 0)
+            wo.batch_count_btn = batch_counts.get(wo_id, 0)
+            wo.po_count = po_counts.get(wo.name, 0)
+            wo.vendor_bill_count = vendor_bill_counts.get(wo.name, 0)
+            wo.invoice_count = invoice_counts.get(wo_id, 0)
+            wo.delivery_variance_count = variance_counts.get(wo_id, 0)
 
     def _compute_helpdesk_tickets(self):
         for wo in self:
@@ -1129,10 +1214,12 @@ class DropshippingWorkorder(models.Model):
         if sender:
             mail_values['email_from'] = sender
         mail = self.env['mail.mail'].create(mail_values)
-        try:
-            mail.send()
-        except Exception as mail_exc:
-            self.message_post(body=_('Cube %s-day email failed to send: %s') % (day_type, mail_exc))
+        # The follow-up cron leaves the mail to the outgoing mail queue
+        if not self.env.context.get('rmc_queue_mail'):
+            try:
+                mail.send()
+            except Exception as mail_exc:
+                self.message_post(body=_('Cube %s-day email failed to send: %s') % (day_type, mail_exc))
 
         if str(day_type) == '7':
             self.cube7_last_sent = fields.Datetime.now()
@@ -1144,7 +1231,7 @@ class DropshippingWorkorder(models.Model):
         for record in self:
             if record.partner_id:
                 # Update cement balance in RMC material balances
-                self.env['rmc.material.balance']._update_balance(record.partner_id, 'cement', -200)
+                self.env['rmc.material.balance']._update_balance(record.partner_id, 'cement', -200, workorder=record)
         return True
 
     def action_update_qc(self):
@@ -1156,19 +1243,14 @@ class DropshippingWorkorder(models.Model):
         for record in self:
             if record.partner_id:
                 for line in record.workorder_line_ids:
-                    if line.product_id and line.product_id.categ_id:
-                        categ_name = line.product_id.categ_id.name.lower()
-                        material_type = 'other'
-                        if 'cement' in categ_name:
-                            material_type = 'cement'
-                        elif 'sand' in categ_name:
-                            material_type = 'sand'
-                        elif 'aggregate' in categ_name or 'gravel' in categ_name:
-                            material_type = 'aggregate'
-                        
-                        # Deduct materials used in workorder
-                        self.env['rmc.material.balance']._update_balance(
-                            record.partner_id, material_type, -line.quantity_ordered)
+                    # Only materials are booked, like the receipts of the sale order
+                    material_type = line.product_id.categ_id.rmc_material_type
+                    if not material_type:
+                        continue
+                    # Deduct materials used in workorder
+                    self.env['rmc.material.balance']._update_balance(
+                        record.partner_id, material_type, -line.quantity_ordered,
+                        workorder=record, reference=record.name)
 
     def action_test_move(self):
         origin_loc = self.env.ref('stock.stock_location_stock')
@@ -1235,7 +1317,7 @@ class DropshippingWorkorderTicket(models.Model):
     _name = 'dropshipping.workorder.ticket'
     _description = 'Dropshipping Workorder Ticket'
 
-    workorder_id = fields.Many2one('dropshipping.workorder', string='Workorder')
+    workorder_id = fields.Many2one('dropshipping.workorder', string='Workorder', index='btree_not_null')
     name = fields.Char(string='Ticket Name')
     quantity = fields.Float(string='Quantity')
     helpdesk_ticket_id = fields.Many2one('helpdesk.ticket', string='Helpdesk Ticket')
@@ -1288,7 +1370,7 @@ class RmcWeighbridge(models.Model):
 
     name = fields.Char(string='Name', required=True)
     transaction_date = fields.Datetime(string='Transaction Date', default=fields.Datetime.now)
-    sale_order_id = fields.Many2one('sale.order', string='Sale Order')
+    sale_order_id = fields.Many2one('sale.order', string='Sale Order', index='btree_not_null')
     batch_id = fields.Many2one('rmc.batch', string='Batch')
     subcontractor_id = fields.Many2one('res.partner', string='Subcontractor')
     vehicle_number = fields.Char(string='Vehicle Number')
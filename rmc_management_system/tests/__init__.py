@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+from . import test_workorder_counters
+from . import test_portal_dashboard
+from . import test_material_balance
+from . import test_delivery_variance
+from . import test_periodic_report
+from . import test_rmc_reports
+from . import test_docket_batches
+from . import test_batch_totals
+from . import test_helpdesk_qty_stats
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.rmc_management_system.models.rmc_batch import MATERIAL_TOTAL_FIELDS
+
+LINES = [
+    ('10mm Aggregate', 600.0), ('20MM Aggregate', 700.0), ('River Sand', 750.0),
+    ('Water', 170.0), ('Fly Ash', 80.0), ('Admixture Plasticizer', 3.5), ('OPC Cement', 320.0),
+]
+
+
+@tagged('post_install', '-at_install')
+class TestBatchTotals(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.recipe = cls.env['rmc.recipe'].create({
+            'name': 'M30 Totals', 'concrete_grade': 'm30',
+            'min_cement_content': 320.0, 'max_aggregate_size': 20.0, 'max_water_ratio': 0.45,
+        })
+        cls.batches = cls._create_batches(3)
+
+    @classmethod
+    def _create_batches(cls, count):
+        return cls.env['rmc.batch'].create([{
+            'batch_number': 'TOT-%s' % index,
+            'recipe_id': cls.recipe.id,
+            'quantity_ordered': 1.0,
+            'batch_line_ids': [(0, 0, {
+                'material_name': name, 'design_qty': qty, 'actual_qty': qty * (1 + index / 100.0),
+            }) for name, qty in LINES],
+        } for index in range(count)])
+
+    def _totals(self, batches):
+        return batches.read(MATERIAL_TOTAL_FIELDS + ['WATERR'])
+
+    def test_totals_follow_line_classes(self):
+        """Each total sums the lines of its class; unmatched materials are left out"""
+        self.assertEqual(
+            self.batches.batch_line_ids.mapped('material_bucket'),
+            ['ten_mm', 'twenty_mm', 'facs', 'water_batch', 'flyash', 'adm_plast', 'other'] * 3,
+        )
+        for batch in self.batches:
+            lines = batch.batch_line_ids
+            for fname in MATERIAL_TOTAL_FIELDS:
+                expected = sum(lines.filtered(lambda line: line.material_bucket == fname).mapped('actual_qty'))
+                self.assertAlmostEqual(batch[fname], expected, msg=fname)
+            self.assertEqual(batch.WATERR, batch.water_batch)
+
+    def test_backfill_matches_orm_compute(self):
+        """The bulk SQL backfill rebuilds the same totals as the ORM recompute"""
+        expected = self._totals(self.batches)
+        self.env.flush_all()
+        self.env.cr.execute("UPDATE rmc_batch_line SET material_bucket = NULL WHERE batch_id = ANY(%s)", [self.batches.ids])
+        self.env.cr.execute("UPDATE rmc_batch SET ten_mm = 0, facs = 0, \"WATERR\" = 0 WHERE id = ANY(%s)", [self.batches.ids])
+        self.env.invalidate_all()
+        self.env['rmc.batch']._backfill_material_totals(self.batches.ids)
+        self.assertEqual(self._totals(self.batches), expected)
+
+    def _recompute(self, batches):
+        total_fields = [batches._fields[fname] for fname in MATERIAL_TOTAL_FIELDS + ['WATERR']]
+        with self.env.protecting(total_fields, batches):
+            batches._compute_material_totals()
+
+    def test_recompute_query_count_does_not_grow(self):
+        """Recomputing the totals of many batches costs the same queries as for one"""
+        more = self._create_batches(12)
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start = self.cr.sql_log_count
+        self._recompute(self.batches[:1])
+        single = self.cr.sql_log_count - start
+        self.env.invalidate_all()
+        with self.assertQueryCount(single):
+            self._recompute(more)
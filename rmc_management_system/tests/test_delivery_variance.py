@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+from odoo.tests import tagged
+
+
+@tagged('post_install', '-at_install')
+class TestDeliveryVarianceReconcile(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.subcontractor = cls.env['rmc.subcontractor'].create({
+            'name': 'Variance Plant Partner', 'partner_id': cls.partner_b.id,
+        })
+        cls.order = cls.env['sale.order'].create({
+            'partner_id': cls.partner_a.id,
+            'order_line': [(0, 0, {'product_id': cls.product_a.id, 'product_uom_qty': 12.0})],
+        })
+        cls.docket = cls._create_docket(cls.subcontractor)
+
+    @classmethod
+    def _create_docket(cls, subcontractor=False):
+        return cls.env['rmc.docket'].create({
+            'sale_order_id': cls.order.id,
+            'subcontractor_id': subcontractor and subcontractor.id,
+            'quantity_ordered': 12.0,
+        })
+
+    def _create_variance(self, docket=None, **vals):
+        loading = self.env['rmc.truck_loading'].create({'docket_id': (docket or self.docket).id})
+        return self.env['rmc.delivery_variance'].create(dict({
+            'truck_loading_id': loading.id,
+            'approved': True,
+            'reconciliation_status': 'approved',
+        }, **vals))
+
+    def test_same_grouping_key_gives_one_move(self):
+        """Client debit notes for the same partner, journal and currency are issued as one move"""
+        first = self._create_variance(situation='delay_unloading', wait_hours=2.0, rate_per_hour=100.0)
+        second = self._create_variance(situation='delay_unloading', wait_hours=3.0, rate_per_hour=100.0)
+        outcomes = (first + second)._reconcile_batch()
+        self.assertEqual(outcomes, {first.id: (True, False), second.id: (True, False)})
+        move = first.client_debit_note_id
+        self.assertTrue(move)
+        self.assertEqual(second.client_debit_note_id, move)
+        self.assertEqual(move.move_type, 'out_invoice')
+        self.assertEqual(move.partner_id, self.partner_a)
+        self.assertEqual(sorted(move.invoice_line_ids.mapped('price_unit')), [200.0, 300.0])
+        self.assertEqual(move.amount_untaxed, 500.0)
+        self.assertTrue(all(
+            variance.name in line.name
+            for variance, line in zip(first + second, move.invoice_line_ids.sorted('price_unit'))
+        ))
+        self.assertEqual(set((first + second).mapped('reconciliation_status')), {'reconciled'})
+
+    def test_failing_variance_does_not_block_the_batch(self):
+        """A variance whose handler raises stays Approved, the others of the batch are reconciled"""
+        good = self._create_variance(situation='delay_unloading', wait_hours=1.0, rate_per_hour=250.0)
+        # No subcontractor on the docket: the vendor liability has no partner to bill
+        bad = self._create_variance(docket=self._create_docket(), situation='delay_unloading',
+                                    wait_hours=1.0, rate_per_hour=250.0, vendor_liability=True, actual_qty=6.0)
+        outcomes = (good + bad)._reconcile_batch()
+        self.assertEqual(outcomes[good.id], (True, False))
+        self.assertFalse(outcomes[bad.id][0])
+        self.assertTrue(outcomes[bad.id][1])
+        self.assertEqual(good.reconciliation_status, 'reconciled')
+        self.assertEqual(good.client_debit_note_id.amount_untaxed, 250.0)
+        self.assertEqual(bad.reconciliation_status, 'approved')
+        self.assertFalse(bad.client_debit_note_id or bad.original_vendor_bill_id or bad.vendor_debit_note_id)
+
+    def test_auto_created_bill_precedes_its_adjustment(self):
+        """The original vendor bill created on the fly exists before the vendor note issued against it"""
+        variances = (
+            self._create_variance(situation='delay_unloading', wait_hours=1.0, rate_per_hour=80.0,
+                                  vendor_liability=True, actual_qty=6.0)
+            + self._create_variance(situation='delay_unloading', wait_hours=2.0, rate_per_hour=80.0,
+                                    vendor_liability=True, actual_qty=4.0)
+        )
+        self.assertFalse(variances.original_vendor_bill_id)
+        variances._reconcile_batch()
+        for variance in variances:
+            bill = variance.original_vendor_bill_id
+            note = variance.vendor_debit_note_id
+            self.assertEqual(variance.reconciliation_status, 'reconciled')
+            self.assertEqual(bill.move_type, 'in_invoice')
+            self.assertEqual(bill.partner_id, self.partner_b)
+            self.assertEqual(note.move_type, 'in_refund')
+            self.assertEqual(note.reversed_entry_id, bill)
+            self.assertLess(bill.id, note.id)
+        self.assertEqual(len(variances.original_vendor_bill_id), 2)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import TransactionCase, tagged
+
+# Design quantities per cubic metre
+RECIPE = [('10mm Aggregate', 600.0), ('20mm Aggregate', 700.0), ('Fly Ash', 80.0), ('Water', 170.0), ('Admixture', 3.5)]
+
+
+@tagged('post_install', '-at_install')
+class TestDocketBatches(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        customer = cls.env['res.partner'].create({'name': 'Batching Customer'})
+        cls.sale_order = cls.env['sale.order'].create({'partner_id': customer.id})
+
+    def _create_dockets(self, count, quantity=20.0, capacity=1.5):
+        dockets = self.env['rmc.docket'].create([{
+            'sale_order_id': self.sale_order.id,
+            'quantity_ordered': quantity,
+            'docket_line_ids': [(0, 0, {'material_name': name, 'design_qty': qty}) for name, qty in RECIPE],
+        } for _index in range(count)])
+        # Set afterwards, so that create does not generate the batches already
+        dockets.current_capacity = capacity
+        return dockets
+
+    def _volumes(self, docket):
+        return self.env['rmc.docket.batch'].search([('docket_id', '=', docket.id)], order='id').mapped('quantity_ordered')
+
+    def test_batches_add_up_to_the_docket(self):
+        docket = self._create_dockets(1)
+        batches = docket.with_context(rmc_batch_seed=7)._generate_batches()
+        self.assertEqual(len(batches), 14)
+        self.assertAlmostEqual(sum(batches.mapped('quantity_ordered')), 20.0)
+        for column, per_cum in (('ten_mm', 600.0), ('twenty_mm', 700.0), ('flyash', 80.0), ('WATERR', 170.0), ('adm_plast', 3.5)):
+            self.assertAlmostEqual(sum(batches.mapped(column)), per_cum * 20.0, msg=column)
+        first = batches[0]
+        self.assertAlmostEqual(first.ten_mm, 600.0 * first.quantity_ordered)
+
+    def test_seed_gives_reproducible_split(self):
+        docket = self._create_dockets(1)
+        docket.with_context(rmc_batch_seed=7)._generate_batches()
+        volumes = self._volumes(docket)
+        docket.with_context(rmc_batch_seed=7)._generate_batches()
+        self.assertEqual(self._volumes(docket), volumes)
+        self.assertEqual(len(set(volumes[:-1])), len(volumes) - 1, 'The split varies within the tolerance.')
+
+    def test_query_count_does_not_grow_with_dockets(self):
+        """Generating the batches of several dockets costs the same queries as for one"""
+        one, several = self._create_dockets(1), self._create_dockets(4)
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start = self.cr.sql_log_count
+        one._generate_batches()
+        self.env.flush_all()
+        single = self.cr.sql_log_count - start
+        self.env.invalidate_all()
+        with self.assertQueryCount(single):
+            several._generate_batches()
+            self.env.flush_all()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestHelpdeskQtyStats(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.customer = cls.env['res.partner'].create({'name': 'Stats Customer'})
+        cls.sale_order = cls.env['sale.order'].create({'partner_id': cls.customer.id})
+        cls.recipe = cls.env['rmc.recipe'].create({
+            'name': 'M25 Stats', 'concrete_grade': 'm25',
+            'min_cement_content': 300.0, 'max_aggregate_size': 20.0, 'max_water_ratio': 0.5,
+        })
+        cls.tickets = cls._create_tickets(cls.env['helpdesk.ticket'])
+
+    @classmethod
+    def _create_tickets(cls, Ticket):
+        """One ticket per source of the delivered quantity, in priority order"""
+        produced, loaded, tracked, batched, docket_batched, fallback = Ticket.create([
+            {'name': name, 'partner_id': cls.customer.id, 'rmc_quantity': 10.0}
+            for name in ('Produced', 'Loaded', 'Tracked', 'Batched', 'Docket batched', 'Fallback')
+        ])
+        cls._docket(produced, quantity_produced=6.0)
+        cls._loading(cls._docket(loaded), 4.0)
+        # A loading reached through a delivery track of the ticket, not through its dockets
+        tracked_loading = cls._loading(cls._docket(Ticket), 3.0)
+        cls.env['rmc.delivery_track'].create({'helpdesk_ticket_id': tracked.id, 'truck_loading_id': tracked_loading.id})
+        cls.env['rmc.batch'].create({
+            'batch_number': 'B-1', 'recipe_id': cls.recipe.id, 'helpdesk_ticket_id': batched.id, 'quantity_ordered': 2.0,
+        })
+        cls.env['rmc.docket.batch'].create({'docket_id': cls._docket(docket_batched).id, 'quantity_ordered': 1.5})
+        cls._docket(fallback, quantity_ordered=7.0)
+        return produced + loaded + tracked + batched + docket_batched + fallback
+
+    @classmethod
+    def _loading(cls, docket, quantity):
+        return cls.env['rmc.truck_loading'].create({'docket_id': docket.id, 'batch_ids': [(0, 0, {
+            'batch_number': 'TL-%s' % docket.id, 'recipe_id': cls.recipe.id,
+            'quantity_ordered': quantity, 'quantity_produced': quantity,
+        })]})
+
+    @classmethod
+    def _docket(cls, ticket, quantity_ordered=8.0, **vals):
+        return cls.env['rmc.docket'].create(dict({
+            'sale_order_id': cls.sale_order.id,
+            'helpdesk_ticket_id': ticket.id,
+            'quantity_ordered': quantity_ordered,
+        }, **vals))
+
+    def test_delivered_quantity_per_source(self):
+        self.assertEqual(self.tickets.mapped('rmc_qty_delivered'), [6.0, 4.0, 3.0, 2.0, 1.5, 7.0])
+        self.assertEqual(self.tickets.mapped('rmc_qty_remaining'), [4.0, 6.0, 7.0, 8.0, 8.5, 3.0])
+
+    def test_recordset_matches_per_ticket(self):
+        """Computing the stats for all tickets at once gives what each ticket gets alone"""
+        self.env.invalidate_all()
+        batched = {ticket.id: (ticket.rmc_qty_delivered, ticket.rmc_qty_remaining) for ticket in self.tickets}
+        for ticket in self.tickets:
+            self.env.invalidate_all()
+            single = self.env['helpdesk.ticket'].browse(ticket.id)
+            self.assertEqual((single.rmc_qty_delivered, single.rmc_qty_remaining), batched[ticket.id])
+
+    def test_query_count_does_not_grow_with_tickets(self):
+        """A page of tickets costs the same number of queries as a single ticket"""
+        more = self.tickets | self._create_tickets(self.env['helpdesk.ticket'])
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start = self.cr.sql_log_count
+        self.tickets.mapped('rmc_qty_delivered')
+        single = self.cr.sql_log_count - start
+        self.env.invalidate_all()
+        with self.assertQueryCount(single):
+            more.mapped('rmc_qty_delivered')
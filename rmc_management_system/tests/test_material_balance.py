@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from odoo import api
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestMaterialBalance(TransactionCase):
+
+    def test_receipts_skip_lines_without_material(self):
+        """Only lines whose category maps to a material are booked on the customer's balance"""
+        Category = self.env['product.category']
+        cement = self.env['product.product'].create({
+            'name': 'OPC 53 Cement', 'categ_id': Category.create({'name': 'Cement'}).id,
+        })
+        concrete = self.env['product.product'].create({
+            'name': 'M25 Concrete', 'categ_id': Category.create({'name': 'Concrete Mixes'}).id,
+        })
+        self.assertFalse(concrete.categ_id.rmc_material_type)
+        order = self.env['sale.order'].create({
+            'partner_id': self.env['res.partner'].create({'name': 'Receipt Customer'}).id,
+            'order_line': [
+                (0, 0, {'product_id': cement.id, 'product_uom_qty': 500.0}),
+                (0, 0, {'product_id': concrete.id, 'product_uom_qty': 30.0}),
+            ],
+        })
+        order._post_material_receipts()
+        moves = self.env['rmc.material.move'].search([('sale_order_id', '=', order.id)])
+        self.assertEqual(moves.mapped('material_type'), ['cement'])
+        self.assertEqual(moves.qty, 500.0)
+
+    def test_non_material_lines_touch_no_balance(self):
+        """A product without a material category is neither received nor consumed"""
+        Category = self.env['product.category']
+        cement = self.env['product.product'].create({
+            'name': 'PPC Cement', 'categ_id': Category.create({'name': 'Cement'}).id,
+        })
+        concrete = self.env['product.product'].create({
+            'name': 'M30 Concrete', 'categ_id': Category.create({'name': 'Ready Mix'}).id,
+        })
+        partner = self.env['res.partner'].create({'name': 'Non Material Customer'})
+        order = self.env['sale.order'].create({
+            'partner_id': partner.id,
+            'order_line': [
+                (0, 0, {'product_id': cement.id, 'product_uom_qty': 400.0}),
+                (0, 0, {'product_id': concrete.id, 'product_uom_qty': 20.0}),
+            ],
+        })
+        order._post_material_receipts()
+        self.env['dropshipping.workorder'].create({
+            'sale_order_id': order.id,
+            'product_id': concrete.id,
+            'workorder_line_ids': [
+                (0, 0, {'product_id': cement.id, 'quantity_ordered': 100.0}),
+                (0, 0, {'product_id': concrete.id, 'quantity_ordered': 20.0}),
+            ],
+        })
+        balances = self.env['rmc.material.balance'].search([('partner_id', '=', partner.id)])
+        self.assertEqual(balances.mapped('material_type'), ['cement'])
+        self.assertFalse(self.env['rmc.material.move'].search_count([
+            ('partner_id', '=', partner.id), ('material_type', '=', 'other'),
+        ]))
+
+    def test_concurrent_updates_are_not_lost(self):
+        """Deliveries posted from parallel transactions all end up in the balance"""
+        registry = self.env.registry
+        with registry.cursor() as cr:
+            partner_id = api.Environment(cr, self.env.uid, {})['res.partner'].create({'name': 'Concurrent Site'}).id
+
+        def cleanup():
+            with registry.cursor() as cr:
+                cr.execute("DELETE FROM rmc_material_move WHERE partner_id = %s", [partner_id])
+                cr.execute("DELETE FROM rmc_material_balance WHERE partner_id = %s", [partner_id])
+                cr.execute("DELETE FROM res_partner WHERE id = %s", [partner_id])
+        self.addCleanup(cleanup)
+
+        threads_count, updates = 4, 5
+        barrier = threading.Barrier(threads_count)
+        errors = []
+
+        def deliver():
+            try:
+                barrier.wait(timeout=10)
+                for _update in range(updates):
+                    with registry.cursor() as cr:
+                        env = api.Environment(cr, self.env.uid, {})
+                        env['rmc.material.balance']._update_balance(env['res.partner'].browse(partner_id), 'cement', 10.0)
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=deliver) for _index in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+        self.assertFalse(errors)
+
+        with registry.cursor() as cr:
+            cr.execute(
+                "SELECT COUNT(*), SUM(balance_qty) FROM rmc_material_balance WHERE partner_id = %s AND material_type = 'cement'",
+                [partner_id],
+            )
+            self.assertEqual(cr.fetchone(), (1, threads_count * updates * 10.0))
+            cr.execute("SELECT COUNT(*) FROM rmc_material_move WHERE partner_id = %s", [partner_id])
+            self.assertEqual(cr.fetchone()[0], threads_count * updates)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from unittest.mock import patch
+
+from freezegun import freeze_time
+
+from odoo import fields
+from odoo.exceptions import UserError
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestPeriodicReport(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.now = fields.Datetime.now()
+        partner = cls.env['res.partner'].create({'name': 'Periodic Customer', 'email': 'periodic@example.com'})
+        product = cls.env['product.product'].create({'name': 'M20 Concrete', 'type': 'service'})
+        cls.order = cls.env['sale.order'].create({
+            'partner_id': partner.id,
+            'reporting_enabled': True,
+            'reporting_period': '7',
+            'order_line': [(0, 0, {'product_id': product.id, 'product_uom_qty': 3.0})],
+        })
+        cls.order.action_confirm()
+        cls.order.date_order = cls.now - timedelta(days=7, hours=1)
+
+    def _run_cron(self, sends, failing):
+        order_id = self.order.id
+
+        def send(order, window_days, template_xmlid):
+            if order.id == order_id:
+                sends.append(window_days)
+                if failing:
+                    raise UserError("SMTP down")
+            return True
+
+        SaleOrder = type(self.env['sale.order'])
+        with patch.object(SaleOrder, '_send_sale_order_summary', send), \
+                patch.object(type(self.env['ir.cron']), '_commit_progress', lambda cron, processed=0, **kw: 1):
+            self.env['rmc.reporting.cron'].run_sale_order_periodic()
+
+    def test_failed_summary_is_sent_on_retry(self):
+        """A 7-day summary that failed is still sent the next day, then the 14-day one is scheduled"""
+        self.assertEqual(self.order.report_due_day, 7)
+        self.assertEqual(self.order.report_next_due_at, self.now - timedelta(hours=1))
+        sends = []
+        self._run_cron(sends, failing=True)
+        self.assertEqual(sends, [7])
+        self.assertEqual(self.order.report_due_day, 7)
+        self.assertGreater(self.order.report_next_due_at, self.now)
+
+        with freeze_time(self.now + timedelta(days=1, minutes=1)):
+            self._run_cron(sends, failing=False)
+        self.assertEqual(sends, [7, 7])
+        self.assertEqual(self.order.report_due_day, 14)
+        self.assertEqual(self.order.report_next_due_at, self.order.date_order + timedelta(days=14))
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+from odoo import fields
+from odoo.tests import HttpCase, TransactionCase, new_test_user, tagged
+
+from odoo.addons.rmc_management_system.models.rmc_portal import DASHBOARD_CACHE
+
+
+class PortalDashboardCommon(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.today = fields.Date.context_today(cls.env.user)
+        brand = cls.env['fleet.vehicle.model.brand'].create({'name': 'Dashboard Brand'})
+        cls.vehicle_model = cls.env['fleet.vehicle.model'].create({'name': 'Transit Mixer', 'brand_id': brand.id})
+        cls.customer = cls.env['res.partner'].create({'name': 'Dashboard Customer'})
+        cls.product = cls.env['product.product'].create({'name': 'M30 Concrete', 'type': 'service'})
+        cls.sale_order = cls.env['sale.order'].create({'partner_id': cls.customer.id})
+        cls.small = cls._create_subcontractor('Small Fleet', transports=1, workorders=1)
+        cls.large = cls._create_subcontractor('Large Fleet', transports=8, workorders=10)
+
+    @classmethod
+    def _create_subcontractor(cls, name, transports, workorders):
+        partner = cls.env['res.partner'].create({'name': name, 'supplier_rank': 1})
+        subcontractor = cls.env['rmc.subcontractor'].create({'name': name, 'partner_id': partner.id})
+        vehicles = cls.env['fleet.vehicle'].create([{
+            'model_id': cls.vehicle_model.id,
+            'license_plate': '%s-%s' % (name, index),
+        } for index in range(transports)])
+        fleet = cls.env['rmc.subcontractor.transport'].create([{
+            'subcontractor_id': subcontractor.id,
+            'transport_code': vehicle.license_plate,
+            'fleet_vehicle_id': vehicle.id,
+        } for vehicle in vehicles])
+        cls.env['rmc.docket'].create([{
+            'sale_order_id': cls.sale_order.id,
+            'subcontractor_id': subcontractor.id,
+            'subcontractor_transport_id': transport.id,
+            'quantity_ordered': 7.0,
+            'state': 'dispatched',
+        } for transport in fleet])
+        cls.env['rmc.transport.fuel.log'].create([{
+            'transport_id': transport.id,
+            'log_date': cls.today,
+            'litre_count': 40.0,
+        } for transport in fleet])
+        orders = cls.env['dropshipping.workorder'].create([{
+            'sale_order_id': cls.sale_order.id,
+            'product_id': cls.product.id,
+            'subcontractor_id': partner.id,
+        } for _index in range(workorders)])
+        cls.env['dropshipping.workorder.ticket'].create([{
+            'workorder_id': workorder.id,
+            'name': 'Ticket 1',
+        } for workorder in orders])
+        return subcontractor
+
+    def setUp(self):
+        super().setUp()
+        DASHBOARD_CACHE.clear()
+        self.addCleanup(DASHBOARD_CACHE.clear)
+
+
+@tagged('post_install', '-at_install')
+class TestPortalDashboard(PortalDashboardCommon):
+
+    def _dashboard(self, subcontractor):
+        return self.env['rmc.subcontractor'].browse(subcontractor.id)._compute_portal_dashboard_values(self.today)
+
+    def test_dashboard_values(self):
+        values = self._dashboard(self.large)
+        self.assertEqual(len(values['transport_ids']), 8)
+        self.assertEqual(values['jobs_today'], 8)
+        self.assertEqual(values['fleet_utilization'], 100.0)
+        self.assertEqual(values['fuel_litres'], 320.0)
+        self.assertEqual((values['workorders'], values['active_workorders'], values['open_tickets']), (10, 10, 10))
+
+    def test_dashboard_query_count_does_not_grow(self):
+        """A subcontractor with a larger fleet and more workorders costs the same number of queries"""
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start = self.cr.sql_log_count
+        self._dashboard(self.small)
+        single = self.cr.sql_log_count - start
+        self.env.invalidate_all()
+        with self.assertQueryCount(single):
+            self._dashboard(self.large)
+
+    def test_dashboard_served_from_cache(self):
+        subcontractor = self.large.with_env(self.env)
+        values = subcontractor._portal_dashboard_values(self.today)
+        with self.assertQueryCount(0):
+            self.assertEqual(subcontractor._portal_dashboard_values(self.today), values)
+
+
+@tagged('post_install', '-at_install')
+class TestPortalDashboardRoute(HttpCase, PortalDashboardCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for subcontractor in (cls.small, cls.large):
+            new_test_user(
+                cls.env, login='dashboard-%s' % subcontractor.id,
+                groups='base.group_portal,rmc_management_system.group_rmc_subcontractor_portal',
+                partner_id=subcontractor.partner_id.id,
+            )
+
+    def _open_dashboard(self, subcontractor):
+        """Log in as the subcontractor and load the dashboard once, so that only the figures are cold"""
+        login = 'dashboard-%s' % subcontractor.id
+        self.authenticate(login, login)
+        response = self.url_open('/my/rmc/subcontractor')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(subcontractor.name, response.text)
+        DASHBOARD_CACHE.clear()
+
+    def test_dashboard_route_query_count_does_not_grow(self):
+        """The dashboard page of a larger subcontractor costs the same number of queries"""
+        self._open_dashboard(self.small)
+        start = self.cr.sql_log_count
+        self.url_open('/my/rmc/subcontractor')
+        single = self.cr.sql_log_count - start
+        self._open_dashboard(self.large)
+        with self.assertQueryCount(single):
+            self.url_open('/my/rmc/subcontractor')
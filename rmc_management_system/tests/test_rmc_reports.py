@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import TransactionCase, tagged
+
+REPORTS = ('rmc.consolidated.report', 'rmc.docket.report', 'rmc.workorder.report', 'rmc.saleorder.report')
+
+
+@tagged('post_install', '-at_install')
+class TestMaterializedReports(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        customer = cls.env['res.partner'].create({'name': 'Report Customer'})
+        cls.product = cls.env['product.product'].create({'name': 'M35 Concrete', 'type': 'service'})
+        cls.sale_order = cls.env['sale.order'].create({
+            'partner_id': customer.id,
+            'order_line': [(0, 0, {'product_id': cls.product.id, 'product_uom_qty': 16.0})],
+        })
+        cls.sale_order.action_confirm()
+        cls.workorder = cls.env['dropshipping.workorder'].create({
+            'sale_order_id': cls.sale_order.id,
+            'product_id': cls.product.id,
+        })
+        cls.dockets = cls.env['rmc.docket'].create([{
+            'sale_order_id': cls.sale_order.id,
+            'workorder_id': cls.workorder.id,
+            'quantity_ordered': 8.0,
+        } for _index in range(2)])
+
+    def _refresh_dirty(self):
+        self.env['rmc.materialized.report']._refresh_dirty_reports()
+
+    def _rows(self):
+        """Rows of every report for the test records, without their ids (the consolidated report numbers them)"""
+        rows = {}
+        for model_name in REPORTS:
+            Report = self.env[model_name]
+            fnames = [fname for fname, field in Report._fields.items() if field.store and fname != 'id']
+            records = Report.search_read([(Report._report_key, 'in', self._keys(Report))], fnames)
+            rows[model_name] = sorted(({fname: row[fname] for fname in fnames} for row in records), key=repr)
+        return rows
+
+    def _keys(self, Report):
+        return {
+            'sale_order_id': self.sale_order.ids,
+            'workorder_id': self.workorder.ids,
+            'docket_id': self.dockets.ids,
+        }[Report._report_key]
+
+    def test_source_changes_refresh_their_rows(self):
+        self._refresh_dirty()
+        docket = self.dockets[0]
+        docket.write({'quantity_produced': 7.5, 'state': 'dispatched'})
+        self.env['rmc.truck_loading'].create({'docket_id': docket.id})
+        self._refresh_dirty()
+        row = self.env['rmc.docket.report'].search([('docket_id', '=', docket.id)])
+        self.assertEqual((row.quantity_produced, row.state, row.truck_loading_count), (7.5, 'dispatched', 1))
+        workorder_row = self.env['rmc.workorder.report'].search([('workorder_id', '=', self.workorder.id)])
+        self.assertEqual((workorder_row.docket_count, workorder_row.truck_loading_count), (2, 1))
+        self.assertEqual(self.env['rmc.saleorder.report'].search([('sale_order_id', '=', self.sale_order.id)]).docket_count, 2)
+
+    def test_incremental_refresh_matches_full_refresh(self):
+        """Rows rebuilt per dirty key are the rows a full rebuild gives"""
+        self._refresh_dirty()
+        self.dockets[1].write({'quantity_produced': 8.0, 'state': 'delivered'})
+        self.env['rmc.docket.batch'].create({'docket_id': self.dockets[1].id, 'quantity_ordered': 8.0})
+        self.env['rmc.batch'].create({
+            'batch_number': 'REP-1',
+            'sale_order_id': self.sale_order.id,
+            'recipe_id': self.env['rmc.recipe'].create({
+                'name': 'M35 Report', 'concrete_grade': 'm35',
+                'min_cement_content': 340.0, 'max_aggregate_size': 20.0, 'max_water_ratio': 0.45,
+            }).id,
+            'quantity_ordered': 8.0,
+            'quantity_produced': 8.0,
+        })
+        self._refresh_dirty()
+        incremental = self._rows()
+        for model_name in REPORTS:
+            self.env[model_name]._refresh_report()
+        self.assertEqual(self._rows(), incremental)
+        self.assertTrue(all(incremental.values()), 'Every report has rows for the order.')
+        self.assertEqual([row['quantity_delivered'] for row in incremental['rmc.consolidated.report']], [8.0])
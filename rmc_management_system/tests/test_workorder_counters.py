@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestWorkorderCounters(TransactionCase):
+
+    COUNTER_FIELDS = [
+        'docket_count', 'ticket_count_btn', 'truck_loading_count', 'batch_count_btn', 'po_count',
+        'vendor_bill_count', 'invoice_count', 'delivery_variance_count',
+        'quantity_delivered', 'quantity_remaining', 'so_delivered_to_date',
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.customer = cls.env['res.partner'].create({'name': 'Counter Customer'})
+        cls.product = cls.env['product.product'].create({'name': 'M25 Concrete', 'type': 'service'})
+        cls.sale_order = cls.env['sale.order'].create({'partner_id': cls.customer.id})
+        cls.workorders = cls.env['dropshipping.workorder'].create([{
+            'sale_order_id': cls.sale_order.id,
+            'product_id': cls.product.id,
+            'quantity_ordered': 20.0,
+        } for _index in range(12)])
+        cls.env['rmc.docket'].create([{
+            'workorder_id': workorder.id,
+            'sale_order_id': cls.sale_order.id,
+            'quantity_ordered': 7.0,
+            'quantity_produced': 6.0,
+        } for workorder in cls.workorders for _docket in range(2)])
+        cls.env['dropshipping.workorder.ticket'].create([{
+            'workorder_id': workorder.id,
+            'name': 'Ticket 1',
+            'quantity': 7.0,
+        } for workorder in cls.workorders])
+
+    def _read_counters(self, workorder_ids):
+        workorders = self.env['dropshipping.workorder'].browse(workorder_ids)
+        return {field: workorders.mapped(field) for field in self.COUNTER_FIELDS}
+
+    def _count_queries(self, workorder_ids):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start = self.cr.sql_log_count
+        self._read_counters(workorder_ids)
+        return self.cr.sql_log_count - start
+
+    def test_counters_values(self):
+        """Counters and delivered quantities are scattered back to each workorder"""
+        counters = self._read_counters(self.workorders.ids)
+        size = len(self.workorders)
+        self.assertEqual(counters['docket_count'], [2] * size)
+        self.assertEqual(counters['ticket_count_btn'], [1] * size)
+        self.assertEqual(counters['quantity_delivered'], [12.0] * size)
+        self.assertEqual(counters['quantity_remaining'], [8.0] * size)
+        self.assertEqual(counters['so_delivered_to_date'], [12.0 * (size - 1)] * size)
+
+    def test_counters_query_count_does_not_grow(self):
+        """Computing the counters of a list costs as many queries as for a single workorder"""
+        single = self._count_queries(self.workorders[:1].ids)
+        self.env.invalidate_all()
+        with self.assertQueryCount(single):
+            self._read_counters(self.workorders.ids)
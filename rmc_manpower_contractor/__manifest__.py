@@ -54,6 +54,8 @@
         'views/breakdown_event_views.xml',
         'views/inventory_handover_views.xml',
         'views/billing_prepare_log_views.xml',
+        'views/billing_batch_run_views.xml',
+        'views/agreement_kpi_snapshot_views.xml',
         'views/agreement_views.xml',
         'wizards/billing_prepare_wizard_views.xml',
         'wizards/agreement_send_preview_wizard_views.xml',
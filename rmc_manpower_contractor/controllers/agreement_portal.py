@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 from odoo import http, _
-from odoo.http import request
+from odoo.http import content_disposition, request
 from odoo.exceptions import AccessError, UserError
 from odoo.addons.portal.controllers.portal import CustomerPortal, pager as portal_pager
 
@@ -96,6 +96,22 @@ class AgreementPortalController(http.Controller):
         except Exception as e:
             return request.render('website.404')
 
+    @http.route(['/contract/agreement/<int:agreement_id>/preview.pdf'], type='http', auth='user', website=True)
+    def agreement_preview_pdf(self, agreement_id, **kw):
+        """Contract preview PDF for the contractor or a manager, served from the prerendered preview store"""
+        agreement = request.env['rmc.contract.agreement'].sudo().browse(agreement_id)
+        if not agreement.exists():
+            return request.not_found()
+        if request.env.user.partner_id != agreement.contractor_id:
+            if not request.env.user.has_group('rmc_manpower_contractor.group_rmc_manager'):
+                return request.render('website.403')
+        pdf_bytes, filename = agreement._get_cached_preview_pdf()
+        return request.make_response(pdf_bytes, headers=[
+            ('Content-Type', 'application/pdf'),
+            ('Content-Length', len(pdf_bytes)),
+            ('Content-Disposition', content_disposition(filename, disposition_type='inline')),
+        ])
+
     @http.route(['/contract/agreement/<int:agreement_id>/send_for_sign'], type='http', auth='user', website=True, csrf=False)
     def agreement_send_for_sign(self, agreement_id, **kw):
         """Send agreement for signature"""
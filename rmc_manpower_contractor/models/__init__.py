@@ -4,6 +4,8 @@
 from . import manpower_matrix
 from . import agreement_signer
 from . import agreement
+from . import agreement_kpi_snapshot
+from . import agreement_preview
 from . import agreement_clause
 from . import diesel_log
 from . import maintenance
@@ -11,7 +13,9 @@ from . import attendance_compliance
 from . import breakdown_event
 from . import inventory_handover
 from . import payment
+from . import agreement_attendance_daily
 from . import hr_attendance
 from . import billing_prepare_log
+from . import billing_batch_run
 from . import fleet_vehicle
 from . import retention
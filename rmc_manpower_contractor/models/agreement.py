@@ -22,6 +22,16 @@ from . import retention_common
 
 _logger = logging.getLogger(__name__)
 
+# Attendance entries listed on the agreement form; totals come from the daily summary
+ATTENDANCE_PREVIEW_LIMIT = 50
+# Agreement fields the contract preview (see _compute_preview_cache_key) is built from
+PREVIEW_FIELDS = frozenset({
+    'name', 'contract_type', 'contractor_id', 'sign_request_id', 'validity_start', 'validity_end',
+    'mgq_target', 'part_a_fixed', 'part_b_variable', 'notes', 'currency_id', 'company_id',
+    'sign_template_id', 'state', 'manpower_matrix_ids', 'clause_ids', 'inventory_handover_ids',
+    'total_amount', 'manpower_matrix_total_amount',
+})
+
 class RmcContractAgreement(models.Model):
     _name = 'rmc.contract.agreement'
     _description = 'RMC Contract Agreement'
@@ -94,18 +104,17 @@ class RmcContractAgreement(models.Model):
         compute='_compute_is_signed',
         store=True
     )
-    preview_pdf = fields.Binary(
-        string='Cached Preview PDF',
-        attachment=True,
-        copy=False
-    )
-    preview_pdf_filename = fields.Char(
-        string='Preview Filename',
-        copy=False
-    )
     preview_cache_key = fields.Char(
         string='Preview Cache Key',
-        copy=False
+        copy=False,
+        help='Fingerprint of the latest preview PDF stored for this agreement.'
+    )
+    preview_stale = fields.Boolean(
+        string='Preview Outdated',
+        default=True,
+        copy=False,
+        index=True,
+        help='Set when the agreement changes; the preview cron then renders the new preview.'
     )
 
     # Website/Portal
@@ -281,6 +290,11 @@ class RmcContractAgreement(models.Model):
         compute='_compute_attendance_kpi',
         store=True
     )
+    kpi_snapshot_ids = fields.One2many(
+        'rmc.agreement.kpi.snapshot',
+        'agreement_id',
+        string='Monthly KPI Snapshots'
+    )
     prime_output_qty = fields.Float(
         string='Prime Output (m³)',
         digits='Product Unit of Measure',
@@ -498,11 +512,20 @@ class RmcContractAgreement(models.Model):
         'hr.attendance',
         string='Employee Attendance',
         compute='_compute_employee_attendance',
-        help='HR attendance entries corresponding to agreement employees.'
+        help='Latest HR attendance entries of agreement employees; use the smart button for the full list.'
     )
     employee_attendance_count = fields.Integer(
         string='Attendance Records',
-        compute='_compute_counts'
+        compute='_compute_employee_attendance_metrics'
+    )
+    employee_attendance_hours = fields.Float(
+        string='Attendance Hours',
+        compute='_compute_employee_attendance_metrics'
+    )
+    employee_attendance_days = fields.Integer(
+        string='Attendance Days',
+        compute='_compute_employee_attendance_metrics',
+        help='Employee-days with at least one attendance since the activity start.'
     )
     billing_prepare_log_ids = fields.One2many(
         'rmc.billing.prepare.log',
@@ -604,12 +627,24 @@ class RmcContractAgreement(models.Model):
             employees = (agreement.driver_ids | agreement.manpower_matrix_ids.mapped('employee_id')).filtered(lambda e: e)
             if employees:
                 start_dt = agreement._get_activity_start_datetime()
-                attendances = Attendance.search([('employee_id', 'in', employees.ids)])
-                attendances = attendances.filtered(lambda a: (a.check_in and a.check_in >= start_dt) or (a.check_out and a.check_out >= start_dt))
+                # Bounded by the (employee_id, check_in) index, whatever the history size
+                attendances = Attendance.search([
+                    ('employee_id', 'in', employees.ids),
+                    '|', ('check_in', '>=', start_dt), ('check_out', '>=', start_dt),
+                ], order='check_in desc', limit=ATTENDANCE_PREVIEW_LIMIT)
             else:
                 attendances = Attendance.browse()
             agreement.employee_attendance_ids = attendances
 
+    @api.depends('driver_ids', 'validity_start', 'sign_request_id.completion_date')
+    def _compute_employee_attendance_metrics(self):
+        metrics = self.env['rmc.agreement.attendance.daily']._agreement_metrics(self)
+        for agreement in self:
+            count, hours, days = metrics.get(agreement.id, (0, 0.0, 0))
+            agreement.employee_attendance_count = count
+            agreement.employee_attendance_hours = hours
+            agreement.employee_attendance_days = days
+
     def _compute_vehicle_diesel_logs(self):
         for agreement in self:
             logs = self.env['diesel.log']
@@ -637,7 +672,10 @@ class RmcContractAgreement(models.Model):
         payload = {
             'agreement': {
                 'id': self.id,
-                'write_date': self.write_date,
+                'name': self.name,
+                'contract_type': self.contract_type,
+                'contractor_id': self.contractor_id.id,
+                'sign_request_id': self.sign_request_id.id,
                 'validity_start': self.validity_start,
                 'validity_end': self.validity_end,
                 'mgq_target': self.mgq_target,
@@ -648,6 +686,8 @@ class RmcContractAgreement(models.Model):
                 'company_id': self.company_id.id,
                 'sign_template_id': self.sign_template_id.id,
                 'state': self.state,
+                'total_amount': self.total_amount,
+                'manpower_matrix_total_amount': self.manpower_matrix_total_amount,
             },
             'manpower_matrix': [
                 {
@@ -657,10 +697,35 @@ class RmcContractAgreement(models.Model):
                     'vehicle_id': line.vehicle_id.id,
                     'shift': line.shift,
                     'remark': line.remark,
+                    'designation': line.designation,
                     'total_amount': line.total_amount,
                 }
                 for line in self.manpower_matrix_ids.sorted(key=lambda r: r.id)
             ],
+            'inventory_handovers': [
+                {
+                    'id': handover.id,
+                    'write_date': handover.write_date or handover.create_date,
+                    'name': handover.name,
+                    'date': handover.date,
+                    'item_id': handover.item_id.id,
+                    'issued_qty': handover.issued_qty,
+                    'uom_id': handover.uom_id.id,
+                    'state': handover.state,
+                    'notes': handover.notes,
+                }
+                for handover in self.inventory_handover_ids.sorted(key=lambda r: r.id)
+            ],
+            'sign_items': [
+                {
+                    'id': item.id,
+                    'write_date': item.write_date or item.create_date,
+                    'partner_id': item.partner_id.id,
+                    'role_id': item.role_id.id,
+                    'signing_date': item.signing_date,
+                }
+                for item in self.sign_request_id.request_item_ids.sorted(key=lambda r: r.id)
+            ],
             'clauses': [
                 {
                     'id': clause.id,
@@ -677,24 +742,94 @@ class RmcContractAgreement(models.Model):
         """Persist the generated preview PDF for subsequent requests."""
         self.ensure_one()
         cache_key = cache_key or self._compute_preview_cache_key()
-        encoded = base64.b64encode(pdf_bytes).decode('utf-8')
+        self.env['rmc.agreement.preview'].sudo()._store(self, cache_key, pdf_bytes, filename)
         self.write({
-            'preview_pdf': encoded,
-            'preview_pdf_filename': filename,
             'preview_cache_key': cache_key,
+            'preview_stale': False,
         })
 
+    def _render_preview_pdf(self):
+        """Render the contract now, bypassing the store, and keep the result as the current preview."""
+        self.ensure_one()
+        self._update_manpower_totals_from_matrix()
+        pdf_bytes, filename = self._generate_contract_pdf()
+        self._store_preview_pdf(pdf_bytes, filename)
+        return pdf_bytes, filename
+
     def _get_cached_preview_pdf(self):
         self.ensure_one()
         self._update_manpower_totals_from_matrix()
         cache_key = self._compute_preview_cache_key()
-        if self.preview_pdf and self.preview_cache_key == cache_key:
-            filename = self.preview_pdf_filename or f"{self.name or 'agreement'}.pdf"
-            return base64.b64decode(self.preview_pdf), filename
+        preview = self.env['rmc.agreement.preview'].sudo()._lookup(cache_key)
+        if preview:
+            if self.preview_stale or self.preview_cache_key != cache_key:
+                self.write({'preview_cache_key': cache_key, 'preview_stale': False})
+            return preview._get_pdf()
+        # Not prerendered yet, e.g. changed a moment ago: render it once here
         pdf_bytes, filename = self._generate_contract_pdf()
         self._store_preview_pdf(pdf_bytes, filename, cache_key=cache_key)
         return pdf_bytes, filename
 
+    def _mark_preview_stale(self):
+        """Flag the agreements for the preview cron and wake it up."""
+        agreements = self.filtered('id')
+        if not agreements:
+            return
+        self.flush_model(['preview_stale'])
+        self.env.cr.execute(
+            "UPDATE rmc_contract_agreement SET preview_stale = TRUE WHERE id IN %s AND preview_stale IS NOT TRUE",
+            [tuple(agreements.ids)],
+        )
+        agreements.invalidate_recordset(['preview_stale'])
+        data = self.env.cr.precommit.data
+        if not data.get('rmc.preview.cron_triggered'):
+            data['rmc.preview.cron_triggered'] = True
+            cron = self.env.ref('rmc_manpower_contractor.cron_agreement_preview_prerender', raise_if_not_found=False)
+            if cron:
+                cron.sudo()._trigger()
+
+    @api.model
+    def cron_prerender_previews(self, batch_size=10):
+        """Render the previews of changed agreements ahead of the next request.
+
+        Agreements are claimed in batches with ``SKIP LOCKED``: the claim
+        clears their flag and is committed before anything is rendered, so
+        concurrent runs never render the same agreement and no row lock is
+        held during the slow PDF rendering. An agreement changed while it is
+        rendered is flagged again and picked up by the next batch.
+        """
+        Cron = self.env['ir.cron']
+        self.flush_model(['preview_stale'])
+        while True:
+            self.env.cr.execute("""
+                UPDATE rmc_contract_agreement
+                   SET preview_stale = FALSE
+                 WHERE id IN (SELECT id FROM rmc_contract_agreement
+                               WHERE preview_stale
+                            ORDER BY id
+                               LIMIT %s
+                                 FOR UPDATE SKIP LOCKED)
+             RETURNING id
+            """, [batch_size])
+            agreements = self.browse(sorted(row[0] for row in self.env.cr.fetchall()))
+            if not agreements:
+                break
+            agreements.invalidate_recordset(['preview_stale'])
+            # Release the row locks of the claim before rendering
+            Cron._commit_progress(remaining=len(agreements))
+            time_left = True
+            for agreement in agreements:
+                try:
+                    with self.env.cr.savepoint():
+                        agreement._get_cached_preview_pdf()
+                except Exception:
+                    # Left to the on-demand rendering instead of retrying forever
+                    _logger.exception("Prerendering the preview of agreement %s failed", agreement.name)
+                time_left = Cron._commit_progress(1)
+            if not time_left:
+                break
+        return True
+
     def _refresh_sign_template(self, pdf_bytes, filename):
         self.ensure_one()
         if not self.sign_template_id:
@@ -1024,6 +1159,7 @@ class RmcContractAgreement(models.Model):
         agreements = super(RmcContractAgreement, self).create(vals_list)
         agreements._ensure_clause_defaults()
         agreements._update_manpower_totals_from_matrix()
+        agreements._mark_preview_stale()
         return agreements
 
     def write(self, vals):
@@ -1034,6 +1170,8 @@ class RmcContractAgreement(models.Model):
             self._ensure_clause_defaults()
         if matrix_updated:
             self._update_manpower_totals_from_matrix()
+        if not PREVIEW_FIELDS.isdisjoint(vals):
+            self._mark_preview_stale()
         return res
 
     @api.depends('sign_request_id', 'sign_request_id.state')
@@ -1088,51 +1226,78 @@ class RmcContractAgreement(models.Model):
                 ).mapped('id').__len__()
             record.pending_items_count = count
 
-    @api.depends('diesel_log_ids', 'diesel_log_ids.diesel_efficiency',
-                 'diesel_log_ids.state')
+    @api.model
+    def _kpi_scoring_params(self):
+        """Score weights and star thresholds, read once per transaction"""
+        data = self.env.cr.precommit.data
+        params = data.get('rmc.kpi.scoring_params')
+        if params is None:
+            ICP = self.env['ir.config_parameter'].sudo()
+            params = data['rmc.kpi.scoring_params'] = {
+                'weight_diesel': float(ICP.get_param('rmc_score.weight_diesel', 0.5)),
+                'weight_maintenance': float(ICP.get_param('rmc_score.weight_maintenance', 0.3)),
+                'weight_attendance': float(ICP.get_param('rmc_score.weight_attendance', 0.2)),
+                'star_thresholds': [
+                    ('5', float(ICP.get_param('rmc_score.star_5_threshold', 90))),
+                    ('4', float(ICP.get_param('rmc_score.star_4_threshold', 75))),
+                    ('3', float(ICP.get_param('rmc_score.star_3_threshold', 60))),
+                    ('2', float(ICP.get_param('rmc_score.star_2_threshold', 40))),
+                ],
+            }
+        return params
+
+    @api.model
+    def _kpi_score(self, contract_type, diesel_efficiency, maintenance_compliance, attendance_compliance):
+        """Weighted performance score of the given KPIs for a contract type"""
+        params = self._kpi_scoring_params()
+        weight_diesel = params['weight_diesel']
+        weight_maint = params['weight_maintenance']
+        weight_attend = params['weight_attendance']
+        score = 0.0
+        if contract_type == 'driver_transport':
+            # Diesel is primary (normalize to 0-100 assuming 5km/l = 100%)
+            diesel_norm = min(diesel_efficiency * 20, 100)
+            score = diesel_norm * weight_diesel + maintenance_compliance * weight_maint
+        elif contract_type == 'pump_ops':
+            # Maintenance is primary
+            score = maintenance_compliance * weight_maint + \
+                    (diesel_efficiency * 20 * weight_diesel if diesel_efficiency else 0)
+        elif contract_type == 'accounts_audit':
+            # Attendance is primary
+            score = attendance_compliance * weight_attend + maintenance_compliance * weight_maint
+        return min(score, 100.0)
+
+    @api.model
+    def _kpi_stars(self, score):
+        """Star rating of a performance score"""
+        for stars, threshold in self._kpi_scoring_params()['star_thresholds']:
+            if score >= threshold:
+                return stars
+        return '1'
+
+    @api.depends('kpi_snapshot_ids.diesel_efficiency_total', 'kpi_snapshot_ids.diesel_log_count')
     def _compute_diesel_kpi(self):
-        """Calculate average diesel efficiency from validated logs"""
+        """Calculate average diesel efficiency of validated logs from the monthly snapshots"""
+        totals = self.env['rmc.agreement.kpi.snapshot'].sudo()._agreement_totals(self, 'diesel')
         for record in self:
-            validated_logs = record.diesel_log_ids.filtered(
-                lambda x: x.state == 'validated' and x.diesel_efficiency > 0
-            )
-            if validated_logs:
-                record.avg_diesel_efficiency = sum(
-                    validated_logs.mapped('diesel_efficiency')
-                ) / len(validated_logs)
-            else:
-                record.avg_diesel_efficiency = 0.0
+            total, count = totals.get(record._origin.id, (0.0, 0))
+            record.avg_diesel_efficiency = total / count if count else 0.0
 
-    @api.depends('maintenance_check_ids', 'maintenance_check_ids.checklist_ok',
-                 'maintenance_check_ids.state')
+    @api.depends('kpi_snapshot_ids.maintenance_total', 'kpi_snapshot_ids.maintenance_check_count')
     def _compute_maintenance_kpi(self):
-        """Calculate average maintenance compliance from validated checks"""
+        """Calculate average maintenance compliance of validated checks from the monthly snapshots"""
+        totals = self.env['rmc.agreement.kpi.snapshot'].sudo()._agreement_totals(self, 'maintenance')
         for record in self:
-            validated_checks = record.maintenance_check_ids.filtered(
-                lambda x: x.state == 'validated'
-            )
-            if validated_checks:
-                record.maintenance_compliance = sum(
-                    validated_checks.mapped('checklist_ok')
-                ) / len(validated_checks)
-            else:
-                record.maintenance_compliance = 0.0
+            total, count = totals.get(record._origin.id, (0.0, 0))
+            record.maintenance_compliance = total / count if count else 0.0
 
-    @api.depends('attendance_compliance_ids',
-                 'attendance_compliance_ids.compliance_percentage',
-                 'attendance_compliance_ids.state')
+    @api.depends('kpi_snapshot_ids.attendance_total', 'kpi_snapshot_ids.attendance_record_count')
     def _compute_attendance_kpi(self):
-        """Calculate average attendance compliance"""
+        """Calculate average attendance compliance from the monthly snapshots"""
+        totals = self.env['rmc.agreement.kpi.snapshot'].sudo()._agreement_totals(self, 'attendance')
         for record in self:
-            validated_attendance = record.attendance_compliance_ids.filtered(
-                lambda x: x.state == 'validated'
-            )
-            if validated_attendance:
-                record.attendance_compliance = sum(
-                    validated_attendance.mapped('compliance_percentage')
-                ) / len(validated_attendance)
-            else:
-                record.attendance_compliance = 0.0
+            total, count = totals.get(record._origin.id, (0.0, 0))
+            record.attendance_compliance = total / count if count else 0.0
 
     @api.depends('avg_diesel_efficiency', 'maintenance_compliance',
                  'attendance_compliance', 'contract_type')
@@ -1141,29 +1306,13 @@ class RmcContractAgreement(models.Model):
         Compute weighted performance score based on contract type
         Weights from ir.config_parameter
         """
-        ICP = self.env['ir.config_parameter'].sudo()
-        weight_diesel = float(ICP.get_param('rmc_score.weight_diesel', 0.5))
-        weight_maint = float(ICP.get_param('rmc_score.weight_maintenance', 0.3))
-        weight_attend = float(ICP.get_param('rmc_score.weight_attendance', 0.2))
-
         for record in self:
-            score = 0.0
-            
-            if record.contract_type == 'driver_transport':
-                # Diesel is primary (normalize to 0-100 assuming 5km/l = 100%)
-                diesel_norm = min(record.avg_diesel_efficiency * 20, 100)
-                score = diesel_norm * weight_diesel + \
-                        record.maintenance_compliance * weight_maint
-            elif record.contract_type == 'pump_ops':
-                # Maintenance is primary
-                score = record.maintenance_compliance * weight_maint + \
-                        (record.avg_diesel_efficiency * 20 * weight_diesel if record.avg_diesel_efficiency else 0)
-            elif record.contract_type == 'accounts_audit':
-                # Attendance is primary
-                score = record.attendance_compliance * weight_attend + \
-                        record.maintenance_compliance * weight_maint
-
-            record.performance_score = min(score, 100.0)
+            record.performance_score = self._kpi_score(
+                record.contract_type,
+                record.avg_diesel_efficiency,
+                record.maintenance_compliance,
+                record.attendance_compliance,
+            )
 
     @api.depends('performance_score')
     def _compute_stars(self):
@@ -1171,23 +1320,8 @@ class RmcContractAgreement(models.Model):
         Convert performance score to star rating
         Thresholds from ir.config_parameter
         """
-        ICP = self.env['ir.config_parameter'].sudo()
-        star_5 = float(ICP.get_param('rmc_score.star_5_threshold', 90))
-        star_4 = float(ICP.get_param('rmc_score.star_4_threshold', 75))
-        star_3 = float(ICP.get_param('rmc_score.star_3_threshold', 60))
-        star_2 = float(ICP.get_param('rmc_score.star_2_threshold', 40))
-
         for record in self:
-            if record.performance_score >= star_5:
-                record.stars = '5'
-            elif record.performance_score >= star_4:
-                record.stars = '4'
-            elif record.performance_score >= star_3:
-                record.stars = '3'
-            elif record.performance_score >= star_2:
-                record.stars = '2'
-            else:
-                record.stars = '1'
+            record.stars = self._kpi_stars(record.performance_score)
 
     def _compute_payment_hold(self):
         """Override to disable payment hold logic entirely."""
@@ -1207,7 +1341,6 @@ class RmcContractAgreement(models.Model):
         'vehicle_diesel_log_ids',
         'equipment_ids',
         'equipment_request_ids',
-        'employee_attendance_ids'
     )
     def _compute_counts(self):
         """Compute smart button counts"""
@@ -1225,7 +1358,6 @@ class RmcContractAgreement(models.Model):
             record.fleet_vehicle_count = len(record.vehicle_ids)
             record.equipment_count = len(record.equipment_ids)
             record.equipment_request_count = len(record.equipment_request_ids)
-            record.employee_attendance_count = len(record.employee_attendance_ids)
             record.billing_prepare_log_count = len(record.billing_prepare_log_ids)
 
     @api.model
@@ -1240,8 +1372,13 @@ class RmcContractAgreement(models.Model):
             ('driver_ids', 'in', employees.ids)
         ])
         if agreements:
-            agreements._compute_employee_attendance()
-            agreements._compute_counts()
+            # Attendance data is computed on read from the daily summary
+            agreements.invalidate_recordset([
+                'employee_attendance_ids',
+                'employee_attendance_count',
+                'employee_attendance_hours',
+                'employee_attendance_days',
+            ])
 
     @api.constrains('validity_start', 'validity_end')
     def _check_validity_dates(self):
@@ -1586,18 +1723,17 @@ class RmcContractAgreement(models.Model):
     def compute_performance(self):
         """
         Public method to manually trigger performance computation
-        Called by monthly cron
+        Called by monthly cron. The KPI snapshots are rebuilt from the source
+        records, which also catches values that changed without a write on
+        the record itself.
         """
-        self._compute_diesel_kpi()
-        self._compute_maintenance_kpi()
-        self._compute_attendance_kpi()
-        self._compute_performance()
-        self._compute_stars()
-        
-        _logger.info(
-            f'Performance computed for {self.name}: '
-            f'Score={self.performance_score:.2f}, Stars={self.stars}'
-        )
+        self.env['rmc.agreement.kpi.snapshot']._rebuild(self)
+
+        for record in self:
+            _logger.info(
+                f'Performance computed for {record.name}: '
+                f'Score={record.performance_score:.2f}, Stars={record.stars}'
+            )
 
     # Smart Button Actions
     def action_view_diesel_logs(self):
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+
+
+class RmcAgreementAttendanceDaily(models.Model):
+    """Daily attendance totals per employee, summarizing ``hr.attendance``.
+
+    Rows are keyed on the UTC day of ``check_in`` and rebuilt for the
+    touched (employee, day) pairs whenever attendance is created, changed
+    or deleted, so agreement metrics never scan the attendance history.
+    """
+    _name = 'rmc.agreement.attendance.daily'
+    _description = 'Agreement Attendance Daily Summary'
+    _order = 'day DESC, employee_id'
+
+    employee_id = fields.Many2one('hr.employee', string='Employee', required=True, ondelete='cascade', readonly=True)
+    day = fields.Date(string='Day', required=True, readonly=True)
+    attendance_count = fields.Integer(string='Attendances', readonly=True)
+    worked_hours = fields.Float(string='Worked Hours', readonly=True)
+    first_check_in = fields.Datetime(string='First Check In', readonly=True)
+    last_check_out = fields.Datetime(string='Last Check Out', readonly=True)
+
+    _employee_day_uniq = models.Constraint(
+        'UNIQUE(employee_id, day)',
+        'Only one attendance summary per employee and day is allowed.',
+    )
+
+    _INSERT_SUMMARY = """
+        INSERT INTO rmc_agreement_attendance_daily (employee_id, day, attendance_count, worked_hours,
+                                                    first_check_in, last_check_out,
+                                                    create_uid, create_date, write_uid, write_date)
+        SELECT a.employee_id, a.check_in::date, COUNT(*), COALESCE(SUM(a.worked_hours), 0.0),
+               MIN(a.check_in), MAX(a.check_out),
+               %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+          FROM hr_attendance a
+          {join}
+         WHERE a.employee_id IS NOT NULL
+           AND a.check_in IS NOT NULL
+      GROUP BY a.employee_id, a.check_in::date
+    """
+
+    def init(self):
+        # Composite index serving both the summary rebuilds and the
+        # window-bounded reads of recent attendance per employee
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS hr_attendance_employee_id_check_in_idx
+                ON hr_attendance (employee_id, check_in)
+        """)
+        # Backfill on install; afterwards the attendance hooks keep it current
+        self.env.cr.execute("SELECT 1 FROM rmc_agreement_attendance_daily LIMIT 1")
+        if not self.env.cr.fetchone():
+            self.env.cr.execute(self._INSERT_SUMMARY.format(join=''), {'uid': self.env.uid})
+
+    @api.model
+    def _refresh_days(self, employee_days):
+        """Rebuild the summary rows of the given ``(employee_id, day)`` pairs."""
+        employee_days = {(employee_id, day) for employee_id, day in employee_days if employee_id and day}
+        if not employee_days:
+            return
+        self.env['hr.attendance'].flush_model(['employee_id', 'check_in', 'check_out', 'worked_hours'])
+        employee_ids, days = zip(*employee_days)
+        params = {'employee_ids': list(employee_ids), 'days': list(days), 'uid': self.env.uid}
+        cr = self.env.cr
+        cr.execute("""
+            DELETE FROM rmc_agreement_attendance_daily s
+             USING unnest(%(employee_ids)s::int[], %(days)s::date[]) AS k(employee_id, day)
+             WHERE s.employee_id = k.employee_id
+               AND s.day = k.day
+        """, params)
+        cr.execute(self._INSERT_SUMMARY.format(join="""
+            JOIN unnest(%(employee_ids)s::int[], %(days)s::date[]) AS k(employee_id, day)
+              ON a.employee_id = k.employee_id
+             AND a.check_in >= k.day
+             AND a.check_in < k.day + 1
+        """), params)
+        self.invalidate_model()
+
+    @api.model
+    def _agreement_metrics(self, agreements):
+        """Return ``{agreement_id: (attendance_count, worked_hours, days_present)}``.
+
+        Attendance is grouped per (agreement, employee, day) from the first
+        activity day onwards: whole days come from the summary table, while
+        the boundary day is read from ``hr.attendance`` so entries checked
+        out after the activity start still count, as on the attendance list.
+        """
+        agreements = agreements.filtered('id')
+        if not agreements:
+            return {}
+        self.flush_model()
+        agreements.flush_model(['driver_ids'])
+        self.env['hr.attendance'].flush_model(['employee_id', 'check_in', 'check_out', 'worked_hours'])
+        starts = [agreement._get_activity_start_datetime() for agreement in agreements]
+        self.env.cr.execute("""
+            WITH scope AS (
+                SELECT rel.agreement_id, rel.employee_id, ag.start_at, ag.start_at::date AS start_day
+                  FROM unnest(%(ids)s::int[], %(starts)s::timestamp[]) AS ag(agreement_id, start_at)
+                  JOIN rmc_agreement_employee_rel rel ON rel.agreement_id = ag.agreement_id
+            ), daily AS (
+                SELECT scope.agreement_id, s.employee_id, s.day,
+                       s.attendance_count AS attendance_count, s.worked_hours AS worked_hours
+                  FROM scope
+                  JOIN rmc_agreement_attendance_daily s
+                    ON s.employee_id = scope.employee_id
+                   AND s.day > scope.start_day
+                 UNION ALL
+                SELECT scope.agreement_id, a.employee_id, a.check_in::date,
+                       COUNT(*), COALESCE(SUM(a.worked_hours), 0.0)
+                  FROM scope
+                  JOIN hr_attendance a
+                    ON a.employee_id = scope.employee_id
+                   AND a.check_in >= scope.start_day - 1
+                   AND a.check_in < scope.start_day + 1
+                   AND (a.check_in >= scope.start_at OR a.check_out >= scope.start_at)
+              GROUP BY scope.agreement_id, a.employee_id, a.check_in::date
+            )
+            SELECT agreement_id, SUM(attendance_count), SUM(worked_hours), COUNT(DISTINCT (employee_id, day))
+              FROM daily
+          GROUP BY agreement_id
+        """, {'ids': agreements.ids, 'starts': starts})
+        return {agreement_id: (int(count), hours, days) for agreement_id, count, hours, days in self.env.cr.fetchall()}
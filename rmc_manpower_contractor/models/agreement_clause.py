@@ -5,7 +5,7 @@ Agreement clause models
 - Agreement-specific clauses are copied from templates and remain editable
 """
 
-from odoo import fields, models, _
+from odoo import api, fields, models, _
 
 
 class AgreementClauseTemplate(models.Model):
@@ -53,3 +53,21 @@ class AgreementClause(models.Model):
         string='Contract Type',
         store=True
     )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        clauses = super().create(vals_list)
+        clauses.agreement_id._mark_preview_stale()
+        return clauses
+
+    def write(self, vals):
+        agreements = self.agreement_id
+        res = super().write(vals)
+        (agreements | self.agreement_id)._mark_preview_stale()
+        return res
+
+    def unlink(self):
+        agreements = self.agreement_id
+        res = super().unlink()
+        agreements._mark_preview_stale()
+        return res
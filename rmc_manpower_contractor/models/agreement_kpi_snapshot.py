@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+
+from odoo import api, fields, models
+from odoo.tools import sql
+
+STAR_RATINGS = [
+    ('1', '⭐'),
+    ('2', '⭐⭐'),
+    ('3', '⭐⭐⭐'),
+    ('4', '⭐⭐⭐⭐'),
+    ('5', '⭐⭐⭐⭐⭐'),
+]
+
+
+class RmcAgreementKpiSnapshot(models.Model):
+    """Monthly KPI totals per agreement.
+
+    Each row holds the sum and count of the validated diesel efficiencies,
+    maintenance checklist scores and attendance compliances of one month.
+    Source records add their change to these totals with an atomic SQL
+    increment when they are created, written or deleted, so the agreement
+    KPIs are sums over a few monthly rows instead of the full history.
+    """
+    _name = 'rmc.agreement.kpi.snapshot'
+    _description = 'Agreement KPI Monthly Snapshot'
+    _order = 'month DESC, agreement_id'
+    _rec_name = 'agreement_id'
+
+    # (total column, count column) fed by each source kind
+    _KPI_COLUMNS = {
+        'diesel': ('diesel_efficiency_total', 'diesel_log_count'),
+        'maintenance': ('maintenance_total', 'maintenance_check_count'),
+        'attendance': ('attendance_total', 'attendance_record_count'),
+    }
+
+    agreement_id = fields.Many2one(
+        'rmc.contract.agreement',
+        string='Agreement',
+        required=True,
+        ondelete='cascade',
+        readonly=True
+    )
+    contractor_id = fields.Many2one(related='agreement_id.contractor_id', string='Contractor', store=True)
+    contract_type = fields.Selection(related='agreement_id.contract_type', string='Contract Type', store=True)
+    month = fields.Date(string='Month', required=True, readonly=True)
+    diesel_efficiency_total = fields.Float(string='Diesel Efficiency Total', readonly=True)
+    diesel_log_count = fields.Integer(string='Validated Diesel Logs', readonly=True)
+    maintenance_total = fields.Float(string='Checklist Completion Total', readonly=True)
+    maintenance_check_count = fields.Integer(string='Validated Maintenance Checks', readonly=True)
+    attendance_total = fields.Float(string='Attendance Compliance Total', readonly=True)
+    attendance_record_count = fields.Integer(string='Validated Attendance Records', readonly=True)
+    avg_diesel_efficiency = fields.Float(
+        string='Avg Diesel Efficiency (km/l or m³/l)',
+        digits=(5, 2),
+        compute='_compute_averages',
+        store=True,
+        aggregator='avg'
+    )
+    maintenance_compliance = fields.Float(
+        string='Maintenance Compliance (%)',
+        digits=(5, 2),
+        compute='_compute_averages',
+        store=True,
+        aggregator='avg'
+    )
+    attendance_compliance = fields.Float(
+        string='Attendance Compliance (%)',
+        digits=(5, 2),
+        compute='_compute_averages',
+        store=True,
+        aggregator='avg'
+    )
+    performance_score = fields.Float(
+        string='Performance Score',
+        digits=(5, 2),
+        compute='_compute_performance',
+        store=True,
+        aggregator='avg'
+    )
+    stars = fields.Selection(STAR_RATINGS, string='Star Rating', compute='_compute_performance', store=True)
+
+    def init(self):
+        # Required by the ON CONFLICT upserts of _apply_deltas
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS rmc_agreement_kpi_snapshot_agreement_month_uniq
+                ON rmc_agreement_kpi_snapshot (agreement_id, month)
+        """)
+        # Backfill on upgrade; afterwards the source hooks keep it current.
+        # A fresh install has no source tables yet, hence nothing to backfill.
+        tables = ('rmc_diesel_log', 'rmc_maintenance_check', 'rmc_attendance_compliance')
+        if not all(sql.table_exists(self.env.cr, table) for table in tables):
+            return
+        self.env.cr.execute("SELECT 1 FROM rmc_agreement_kpi_snapshot LIMIT 1")
+        if not self.env.cr.fetchone():
+            self._rebuild()
+
+    @api.depends('diesel_efficiency_total', 'diesel_log_count', 'maintenance_total',
+                 'maintenance_check_count', 'attendance_total', 'attendance_record_count')
+    def _compute_averages(self):
+        for snapshot in self:
+            snapshot.avg_diesel_efficiency = (
+                snapshot.diesel_efficiency_total / snapshot.diesel_log_count if snapshot.diesel_log_count else 0.0
+            )
+            snapshot.maintenance_compliance = (
+                snapshot.maintenance_total / snapshot.maintenance_check_count if snapshot.maintenance_check_count else 0.0
+            )
+            snapshot.attendance_compliance = (
+                snapshot.attendance_total / snapshot.attendance_record_count if snapshot.attendance_record_count else 0.0
+            )
+
+    @api.depends('avg_diesel_efficiency', 'maintenance_compliance', 'attendance_compliance', 'contract_type')
+    def _compute_performance(self):
+        Agreement = self.env['rmc.contract.agreement']
+        for snapshot in self:
+            snapshot.performance_score = Agreement._kpi_score(
+                snapshot.contract_type,
+                snapshot.avg_diesel_efficiency,
+                snapshot.maintenance_compliance,
+                snapshot.attendance_compliance,
+            )
+            snapshot.stars = Agreement._kpi_stars(snapshot.performance_score)
+
+    @api.model
+    def _agreement_totals(self, agreements, kind):
+        """Return ``{agreement_id: (total, count)}`` of ``kind`` over all months."""
+        agreement_ids = agreements._origin.ids
+        if not agreement_ids:
+            return {}
+        total_column, count_column = self._KPI_COLUMNS[kind]
+        groups = self._read_group(
+            [('agreement_id', 'in', agreement_ids)],
+            ['agreement_id'],
+            [f'{total_column}:sum', f'{count_column}:sum'],
+        )
+        return {agreement.id: (total, count) for agreement, total, count in groups}
+
+    @api.model
+    def _apply_deltas(self, kind, after, before=None):
+        """Add ``after - before`` to the ``kind`` totals.
+
+        Both arguments map ``(agreement_id, month)`` to ``(total, count)``,
+        as returned by ``_kpi_contributions`` of the source records.
+        """
+        before = before or {}
+        rows = []
+        for key in set(after) | set(before):
+            total_after, count_after = after.get(key, (0.0, 0))
+            total_before, count_before = before.get(key, (0.0, 0))
+            if count_after != count_before or total_after != total_before:
+                rows.append((key[0], key[1], total_after - total_before, count_after - count_before))
+        if not rows:
+            return
+        total_column, count_column = self._KPI_COLUMNS[kind]
+        agreement_ids, months, totals, counts = (list(column) for column in zip(*rows))
+        self.flush_model()
+        self.env.cr.execute("""
+            INSERT INTO rmc_agreement_kpi_snapshot (agreement_id, month, {total}, {count},
+                                                    create_uid, create_date, write_uid, write_date)
+            SELECT d.agreement_id, d.month, d.total, d.count,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM unnest(%(agreement_ids)s::int[], %(months)s::date[], %(totals)s::float8[], %(counts)s::int[])
+                   AS d(agreement_id, month, total, count)
+            ON CONFLICT (agreement_id, month) DO UPDATE
+               SET {total} = COALESCE(rmc_agreement_kpi_snapshot.{total}, 0.0) + EXCLUDED.{total},
+                   {count} = COALESCE(rmc_agreement_kpi_snapshot.{count}, 0) + EXCLUDED.{count},
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+            RETURNING id
+        """.format(total=total_column, count=count_column), {
+            'agreement_ids': agreement_ids,
+            'months': months,
+            'totals': totals,
+            'counts': counts,
+            'uid': self.env.uid,
+        })
+        snapshots = self.browse(row[0] for row in self.env.cr.fetchall())
+        self._notify_changed(snapshots, self.env['rmc.contract.agreement'].browse(agreement_ids), [total_column, count_column])
+
+    @api.model
+    def _rebuild(self, agreements=None):
+        """Recompute the snapshots of ``agreements`` (all when None) from their source records."""
+        for model_name, fnames in (
+            ('rmc.diesel.log', ['agreement_id', 'date', 'state', 'diesel_efficiency']),
+            ('rmc.maintenance.check', ['agreement_id', 'date', 'state', 'checklist_ok']),
+            ('rmc.attendance.compliance', ['agreement_id', 'date', 'state', 'compliance_percentage']),
+        ):
+            self.env[model_name].flush_model(fnames)
+        self.flush_model()
+        cr = self.env.cr
+        scope = ''
+        params = {'uid': self.env.uid}
+        if agreements is not None:
+            if not agreements._origin:
+                return
+            scope = 'AND agreement_id = ANY(%(agreement_ids)s)'
+            params['agreement_ids'] = agreements._origin.ids
+        cr.execute("DELETE FROM rmc_agreement_kpi_snapshot WHERE TRUE {scope} RETURNING agreement_id".format(
+            scope=scope), params)
+        agreement_ids = {row[0] for row in cr.fetchall()} | set(params.get('agreement_ids', ()))
+        cr.execute("""
+            INSERT INTO rmc_agreement_kpi_snapshot (agreement_id, month,
+                                                    diesel_efficiency_total, diesel_log_count,
+                                                    maintenance_total, maintenance_check_count,
+                                                    attendance_total, attendance_record_count,
+                                                    create_uid, create_date, write_uid, write_date)
+            SELECT src.agreement_id, src.month,
+                   SUM(src.diesel_total), SUM(src.diesel_count),
+                   SUM(src.maintenance_total), SUM(src.maintenance_count),
+                   SUM(src.attendance_total), SUM(src.attendance_count),
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM (
+                    SELECT agreement_id, date_trunc('month', date)::date AS month,
+                           diesel_efficiency AS diesel_total, 1 AS diesel_count,
+                           0.0 AS maintenance_total, 0 AS maintenance_count,
+                           0.0 AS attendance_total, 0 AS attendance_count
+                      FROM rmc_diesel_log
+                     WHERE state = 'validated' AND diesel_efficiency > 0 {scope}
+                 UNION ALL
+                    SELECT agreement_id, date_trunc('month', date)::date,
+                           0.0, 0, COALESCE(checklist_ok, 0.0), 1, 0.0, 0
+                      FROM rmc_maintenance_check
+                     WHERE state = 'validated' {scope}
+                 UNION ALL
+                    SELECT agreement_id, date_trunc('month', date)::date,
+                           0.0, 0, 0.0, 0, COALESCE(compliance_percentage, 0.0), 1
+                      FROM rmc_attendance_compliance
+                     WHERE state = 'validated' {scope}
+                   ) src
+             WHERE src.agreement_id IS NOT NULL
+               AND src.month IS NOT NULL
+          GROUP BY src.agreement_id, src.month
+            RETURNING id, agreement_id
+        """.format(scope=scope), params)
+        rows = cr.fetchall()
+        agreement_ids.update(row[1] for row in rows)
+        snapshots = self.browse(row[0] for row in rows)
+        columns = [column for pair in self._KPI_COLUMNS.values() for column in pair]
+        self._notify_changed(snapshots, self.env['rmc.contract.agreement'].browse(agreement_ids), columns)
+
+    @api.model
+    def _notify_changed(self, snapshots, agreements, columns):
+        """Let the ORM recompute what depends on snapshot columns written in SQL."""
+        self.invalidate_model()
+        agreements.invalidate_recordset(['kpi_snapshot_ids'])
+        agreements.modified(['kpi_snapshot_ids'])
+        snapshots.modified(columns)
+
+
+class RmcAgreementKpiSource(models.AbstractModel):
+    """Keep the monthly KPI snapshots in sync with a source record.
+
+    Each validated record contributes its KPI value to the snapshot of its
+    agreement and month; creating, writing or deleting records applies the
+    difference between their old and new contributions.
+    """
+    _name = 'rmc.agreement.kpi.source'
+    _description = 'Agreement KPI Source'
+
+    # Snapshot totals fed by the model, see RmcAgreementKpiSnapshot._KPI_COLUMNS
+    _kpi_kind = None
+    # Field holding the KPI value of a record
+    _kpi_value_field = None
+    # Fields the contribution depends on; writes touching none of them are ignored
+    _kpi_fields = ('agreement_id', 'date', 'state')
+
+    def _kpi_counts(self):
+        """Whether the (single) record contributes to the snapshots."""
+        return self.state == 'validated' and bool(self.agreement_id) and bool(self.date)
+
+    def _kpi_contributions(self):
+        """Return ``{(agreement_id, month): (total, count)}`` of ``self``."""
+        contributions = defaultdict(lambda: (0.0, 0))
+        for record in self:
+            if not record._kpi_counts():
+                continue
+            key = (record.agreement_id.id, record.date.replace(day=1))
+            total, count = contributions[key]
+            contributions[key] = (total + (record[self._kpi_value_field] or 0.0), count + 1)
+        return contributions
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['rmc.agreement.kpi.snapshot']._apply_deltas(self._kpi_kind, records._kpi_contributions())
+        return records
+
+    def write(self, vals):
+        relevant = any(fname in vals for fname in self._kpi_fields)
+        if relevant:
+            before = self._kpi_contributions()
+        res = super().write(vals)
+        if relevant:
+            self.env['rmc.agreement.kpi.snapshot']._apply_deltas(self._kpi_kind, self._kpi_contributions(), before)
+        return res
+
+    def unlink(self):
+        self.env['rmc.agreement.kpi.snapshot']._apply_deltas(self._kpi_kind, {}, self._kpi_contributions())
+        return super().unlink()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import base64
+from datetime import timedelta
+
+from psycopg2 import IntegrityError
+
+from odoo import api, fields, models
+
+
+class RmcAgreementPreview(models.Model):
+    """Rendered agreement preview PDFs, addressed by content fingerprint.
+
+    A row is stored per ``_compute_preview_cache_key`` of its agreement, so
+    an unchanged agreement is always served from the store; the PDF itself
+    lives in the (checksum-deduplicated) attachment filestore. Rows whose
+    fingerprint is no longer the agreement's current one are removed by
+    the daily autovacuum.
+    """
+    _name = 'rmc.agreement.preview'
+    _description = 'Agreement Preview PDF'
+    _order = 'create_date DESC, id DESC'
+    _rec_name = 'filename'
+
+    # Superseded previews are kept this long for wizards still showing them
+    _GC_GRACE_DAYS = 1
+
+    agreement_id = fields.Many2one(
+        'rmc.contract.agreement',
+        string='Agreement',
+        required=True,
+        ondelete='cascade',
+        index=True,
+        readonly=True
+    )
+    fingerprint = fields.Char(string='Fingerprint', required=True, readonly=True)
+    pdf = fields.Binary(string='Preview PDF', attachment=True, readonly=True)
+    filename = fields.Char(string='Filename', readonly=True)
+
+    _fingerprint_uniq = models.Constraint(
+        'UNIQUE(fingerprint)',
+        'Only one preview per fingerprint is stored.',
+    )
+
+    @api.model
+    def _lookup(self, fingerprint):
+        return self.search([('fingerprint', '=', fingerprint)], limit=1)
+
+    @api.model
+    def _store(self, agreement, fingerprint, pdf_bytes, filename):
+        """Keep ``pdf_bytes`` as the preview of ``fingerprint`` unless it is stored already."""
+        preview = self._lookup(fingerprint)
+        if preview:
+            return preview
+        try:
+            with self.env.cr.savepoint():
+                return self.create({
+                    'agreement_id': agreement.id,
+                    'fingerprint': fingerprint,
+                    'pdf': base64.b64encode(pdf_bytes),
+                    'filename': filename,
+                })
+        except IntegrityError:
+            # Rendered concurrently by the prerender cron or another request
+            return self._lookup(fingerprint)
+
+    def _get_pdf(self):
+        self.ensure_one()
+        return base64.b64decode(self.with_context(bin_size=False).pdf), self.filename
+
+    @api.autovacuum
+    def _gc_superseded_previews(self):
+        """Drop the previews of fingerprints agreements have moved away from."""
+        self.env['rmc.contract.agreement'].flush_model(['preview_cache_key'])
+        self.env.cr.execute("""
+            SELECT p.id
+              FROM rmc_agreement_preview p
+              JOIN rmc_contract_agreement a ON a.id = p.agreement_id
+             WHERE p.fingerprint IS DISTINCT FROM a.preview_cache_key
+               AND p.create_date < %s
+        """, [fields.Datetime.now() - timedelta(days=self._GC_GRACE_DAYS)])
+        self.browse(row[0] for row in self.env.cr.fetchall()).unlink()
@@ -44,3 +44,26 @@ class RmcAgreementSigner(models.Model):
                     _('Signer %s must have an email address to receive the signature request.') %
                     signer.partner_id.display_name
                 )
+
+
+class SignRequestItem(models.Model):
+    _inherit = 'sign.request.item'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        items = super().create(vals_list)
+        items._mark_agreement_previews_stale()
+        return items
+
+    def write(self, vals):
+        res = super().write(vals)
+        self._mark_agreement_previews_stale()
+        return res
+
+    def _mark_agreement_previews_stale(self):
+        """Signers and signing dates are printed in the contract PDF."""
+        requests = self.sign_request_id
+        if requests:
+            self.env['rmc.contract.agreement'].sudo().search(
+                [('sign_request_id', 'in', requests.ids)]
+            )._mark_preview_stale()
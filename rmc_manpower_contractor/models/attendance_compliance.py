@@ -12,9 +12,16 @@ _logger = logging.getLogger(__name__)
 class RmcAttendanceCompliance(models.Model):
     _name = 'rmc.attendance.compliance'
     _description = 'RMC Attendance Compliance'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'rmc.agreement.kpi.source']
     _order = 'date desc'
+    _kpi_kind = 'attendance'
+    _kpi_value_field = 'compliance_percentage'
+    _kpi_fields = ('agreement_id', 'date', 'state', 'headcount_present', 'documents_ok', 'supervisor_ok')
     _ATTENDANCE_SYNC_PARAM = 'rmc.attendance.last_sync_date'
+    # Last day synced by a run that did not finish; the next run resumes after it
+    _ATTENDANCE_SYNC_RESUME_PARAM = 'rmc.attendance.sync_resume_date'
+    # Days synced, and committed, per step of the cron
+    _ATTENDANCE_SYNC_CHUNK_DAYS = 7
     _SUPERVISOR_KEYWORDS_PARAM = 'rmc.attendance.supervisor_keywords'
 
     name = fields.Char(string='Reference', required=True, copy=False, readonly=True, default=lambda self: _('New'))
@@ -71,7 +78,8 @@ class RmcAttendanceCompliance(models.Model):
         records = super(RmcAttendanceCompliance, self).create(vals_list)
         for record in records:
             record._check_agreement_signature()
-            record._sync_present_from_employees()
+            if not self.env.context.get('rmc_attendance_skip_sync'):
+                record._sync_present_from_employees()
         return records
 
     def write(self, vals):
@@ -136,21 +144,29 @@ class RmcAttendanceCompliance(models.Model):
     # ------------------------------------------------------------------
 
     def _auto_validate_from_sync(self):
-        """Validate record when attendance + compliance signals are ready."""
-        for record in self:
-            if record.state == 'validated':
-                continue
-            if not (record.documents_ok and record.supervisor_ok):
-                continue
-            if record.headcount_present != len(record.employee_ids):
-                continue
+        """Validate records when attendance + compliance signals are ready."""
+        ready = self.filtered(
+            lambda r: r.state != 'validated'
+            and r.documents_ok and r.supervisor_ok
+            and r.headcount_present == len(r.employee_ids)
+        )
+        signed_agreements = self.env['rmc.contract.agreement']
+        failed_agreements = self.env['rmc.contract.agreement']
+        for agreement in ready.agreement_id:
             try:
-                if record.agreement_id and record.agreement_id.is_signed():
-                    record.state = 'validated'
-                else:
-                    record.state = 'pending_agreement'
+                if agreement.is_signed():
+                    signed_agreements |= agreement
             except Exception as exc:
-                _logger.warning("Auto-validation skipped for %s: %s", record.name, exc)
+                _logger.warning("Auto-validation skipped for agreement %s: %s", agreement.name, exc)
+                failed_agreements |= agreement
+        # Records of agreements whose signature could not be checked are left as they are
+        ready = ready.filtered(lambda r: r.agreement_id not in failed_agreements)
+        validated = ready.filtered(lambda r: r.agreement_id in signed_agreements)
+        pending = (ready - validated).filtered(lambda r: r.state != 'pending_agreement')
+        if validated:
+            validated.write({'state': 'validated'})
+        if pending:
+            pending.write({'state': 'pending_agreement'})
 
     @api.model
     def _attendance_sync_window(self):
@@ -193,20 +209,24 @@ class RmcAttendanceCompliance(models.Model):
                 mapping.setdefault(employee.id, agreement)
         return mapping
 
+    @api.model
+    def _employees_with_documents(self, employees):
+        """Return the ids of ``employees`` having an attachment on their profile."""
+        if not employees:
+            return set()
+        groups = self.env['ir.attachment'].sudo()._read_group([
+            ('res_model', '=', 'hr.employee'),
+            ('res_id', 'in', employees.ids)
+        ], ['res_id'])
+        return {res_id for res_id, in groups}
+
     @api.model
     def _derive_documents_flag(self, employees):
         """Set documents_ok if each employee has an attachment on their profile."""
         employees = employees.filtered(lambda e: e)
         if not employees:
             return False
-        Attachment = self.env['ir.attachment'].sudo()
-        attachments = Attachment.search([
-            ('res_model', '=', 'hr.employee'),
-            ('res_id', 'in', employees.ids)
-        ])
-        employees_with_docs = set(attachments.mapped('res_id'))
-        missing = employees.filtered(lambda e: e.id not in employees_with_docs)
-        return not missing
+        return set(employees.ids) <= self._employees_with_documents(employees)
 
     @api.model
     def _get_supervisor_keywords(self):
@@ -215,14 +235,12 @@ class RmcAttendanceCompliance(models.Model):
         return [kw.strip().lower() for kw in raw.split(',') if kw.strip()]
 
     @api.model
-    def _derive_supervisor_flag(self, employees):
-        """Heuristic: supervisor present if any employee title/category matches keywords."""
-        employees = employees.filtered(lambda e: e)
-        if not employees:
-            return False
+    def _supervisor_employees(self, employees):
+        """Return the ids of ``employees`` whose title/department/tags match the supervisor keywords."""
         keywords = self._get_supervisor_keywords()
         if not keywords:
-            return True
+            return set(employees.ids)
+        supervisor_ids = set()
         for employee in employees:
             parts = [
                 employee.job_title or '',
@@ -231,8 +249,16 @@ class RmcAttendanceCompliance(models.Model):
             parts.extend(employee.category_ids.mapped('name'))
             haystack = ' '.join(parts).lower()
             if any(keyword in haystack for keyword in keywords):
-                return True
-        return False
+                supervisor_ids.add(employee.id)
+        return supervisor_ids
+
+    @api.model
+    def _derive_supervisor_flag(self, employees):
+        """Heuristic: supervisor present if any employee title/category matches keywords."""
+        employees = employees.filtered(lambda e: e)
+        if not employees:
+            return False
+        return bool(self._supervisor_employees(employees))
 
     def _localize_attendance_date(self, dt_value):
         if not dt_value:
@@ -268,85 +294,134 @@ class RmcAttendanceCompliance(models.Model):
             open_range,
         ])
 
+    @api.model
+    def _attendance_sync_rows(self, start_date, end_date):
+        """Return attendance overlapping the window, grouped per (agreement, employee, local day).
+
+        Rows are ``(agreement_id, employee_id, day, first_check_in, last_check_out)``;
+        the day is the check-in (or check-out) date in the user's timezone and
+        ``agreement_id`` is the one stamped on the attendance, if any.
+        """
+        self.env['hr.attendance'].flush_model(['employee_id', 'agreement_id', 'check_in', 'check_out'])
+        self.env.cr.execute("""
+            SELECT a.agreement_id, a.employee_id,
+                   (COALESCE(a.check_in, a.check_out) AT TIME ZONE 'UTC' AT TIME ZONE %(tz)s)::date,
+                   MIN(a.check_in), MAX(a.check_out)
+              FROM hr_attendance a
+             WHERE a.employee_id IS NOT NULL
+               AND ((a.check_in >= %(start)s AND a.check_in < %(end)s AND a.check_out IS NULL)
+                 OR (a.check_out >= %(start)s AND a.check_out < %(end)s AND a.check_in IS NULL)
+                 OR (a.check_in < %(end)s AND a.check_out > %(start)s))
+          GROUP BY 1, 2, 3
+        """, {
+            'tz': self.env.context.get('tz') or self.env.user.tz or 'UTC',
+            'start': datetime.combine(start_date, datetime.min.time()),
+            'end': datetime.combine(end_date + timedelta(days=1), datetime.min.time()),
+        })
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _sync_attendance_days(self, start_date, end_date):
+        """Create or update the compliance rows of ``start_date``..``end_date``.
+
+        Attendance is fetched one extra day on each side, since a local day
+        can start or end on a neighbouring UTC date, and then kept by local
+        day only, so each day is synced with all of its employees by the step
+        it belongs to. Returns ``(created, updated)``.
+        """
+        rows = [
+            row for row in self._attendance_sync_rows(start_date - timedelta(days=1), end_date + timedelta(days=1))
+            if start_date <= row[2] <= end_date
+        ]
+        agreement_map = self._build_employee_agreement_map([row[1] for row in rows if not row[0]])
+        buckets = defaultdict(lambda: {'employee_ids': set(), 'first_check_in': False, 'last_check_out': False})
+        for agreement_id, employee_id, day, first_check_in, last_check_out in rows:
+            agreement_id = agreement_id or agreement_map.get(employee_id, self.env['rmc.contract.agreement']).id
+            if not agreement_id:
+                continue
+            bucket = buckets[(agreement_id, day)]
+            bucket['employee_ids'].add(employee_id)
+            if first_check_in and (not bucket['first_check_in'] or first_check_in < bucket['first_check_in']):
+                bucket['first_check_in'] = first_check_in
+            if last_check_out and (not bucket['last_check_out'] or last_check_out > bucket['last_check_out']):
+                bucket['last_check_out'] = last_check_out
+        if not buckets:
+            return 0, 0
+
+        existing = {}
+        for record in self.search([
+            ('agreement_id', 'in', list({agreement_id for agreement_id, _day in buckets})),
+            ('date', 'in', list({day for _agreement_id, day in buckets})),
+        ]):
+            existing.setdefault((record.agreement_id.id, record.date), record)
+        employees = self.env['hr.employee'].browse(set().union(*(b['employee_ids'] for b in buckets.values())))
+        with_documents = self._employees_with_documents(employees)
+        supervisors = self._supervisor_employees(employees)
+
+        ctx = dict(self.env.context, rmc_attendance_skip_sync=True)
+        to_create = []
+        synced_ids = []
+        updated = 0
+        for (agreement_id, day), bucket in buckets.items():
+            employee_ids = bucket['employee_ids']
+            vals = {
+                'headcount_present': len(employee_ids),
+                'documents_ok': employee_ids <= with_documents,
+                'supervisor_ok': bool(employee_ids & supervisors),
+                'first_check_in': bucket['first_check_in'],
+                'last_check_out': bucket['last_check_out'],
+            }
+            record = existing.get((agreement_id, day))
+            if not record:
+                to_create.append(dict(vals, agreement_id=agreement_id, date=day,
+                                      employee_ids=[(6, 0, sorted(employee_ids))]))
+                continue
+            synced_ids.append(record.id)
+            if set(record.employee_ids.ids) != employee_ids or any(record[fname] != value for fname, value in vals.items()):
+                record.with_context(ctx).write(dict(vals, employee_ids=[(6, 0, sorted(employee_ids))]))
+                updated += 1
+        synced = self.browse(synced_ids)
+        if to_create:
+            synced |= self.with_context(ctx).create(to_create)
+        synced._auto_validate_from_sync()
+        return len(to_create), updated
+
     @api.model
     def cron_sync_from_hr_attendance(self):
-        """Daily cron that auto-creates attendance compliance entries."""
+        """Daily cron that auto-creates attendance compliance entries.
+
+        The window is synced a few days at a time; each step is committed
+        together with its progress, so an interrupted run resumes after the
+        last synced day instead of starting over.
+        """
         self = self.sudo()
         window = self._attendance_sync_window()
         if not window or not all(window):
             _logger.debug("Attendance auto-sync skipped: empty window %s", window)
             return
-        start_date, end_date = window
-        Attendance = self.env['hr.attendance'].sudo()
-        attendances = Attendance.search(self._attendance_domain(start_date, end_date))
-        if not attendances:
-            ICP = self.env['ir.config_parameter'].sudo()
-            ICP.set_param(self._ATTENDANCE_SYNC_PARAM, fields.Date.to_string(end_date))
-            _logger.info("Attendance auto-sync: no records between %s and %s", start_date, end_date)
-            return
-        employee_ids = attendances.filtered(lambda a: not a.agreement_id).mapped('employee_id').ids
-        agreement_map = self._build_employee_agreement_map(employee_ids)
-        bucket = defaultdict(lambda: {
-            'agreement': False,
-            'employees': self.env['hr.employee'],
-            'first_check_in': False,
-            'last_check_out': False,
-        })
-        for attendance in attendances:
-            employee = attendance.employee_id
-            if not employee:
-                continue
-            agreement = attendance.agreement_id or agreement_map.get(employee.id)
-            if not agreement:
-                continue
-            date_value = self._localize_attendance_date(attendance.check_in or attendance.check_out)
-            if not date_value:
-                continue
-            key = (agreement.id, date_value)
-            bucket[key]['agreement'] = agreement
-            bucket[key]['employees'] |= employee
-            if attendance.check_in:
-                first_ci = bucket[key]['first_check_in']
-                if not first_ci or attendance.check_in < first_ci:
-                    bucket[key]['first_check_in'] = attendance.check_in
-            if attendance.check_out:
-                last_co = bucket[key]['last_check_out']
-                if not last_co or attendance.check_out > last_co:
-                    bucket[key]['last_check_out'] = attendance.check_out
-            # record employees for the target day/agreement
-        ctx = dict(self.env.context, rmc_attendance_skip_sync=True)
+        window_start, window_end = window
+        ICP = self.env['ir.config_parameter'].sudo()
+        start_date = window_start
+        resume_str = ICP.get_param(self._ATTENDANCE_SYNC_RESUME_PARAM)
+        if resume_str:
+            resume_date = fields.Date.from_string(resume_str)
+            if window_start <= resume_date < window_end:
+                start_date = resume_date + timedelta(days=1)
         created = updated = 0
-        for (agreement_id, day), payload in bucket.items():
-            employees = payload['employees']
-            if not employees:
-                continue
-            documents_ok = self._derive_documents_flag(employees)
-            supervisor_ok = self._derive_supervisor_flag(employees)
-            vals = {
-                'agreement_id': agreement_id,
-                'date': day,
-                'employee_ids': [(6, 0, employees.ids)],
-                'headcount_present': len(employees),
-                'documents_ok': documents_ok,
-                'supervisor_ok': supervisor_ok,
-                'first_check_in': payload['first_check_in'],
-                'last_check_out': payload['last_check_out'],
-            }
-            record = self.search([
-                ('agreement_id', '=', agreement_id),
-                ('date', '=', day),
-            ], limit=1)
-            if record:
-                record.with_context(ctx).write(vals)
-                updated += 1
-            else:
-                record = self.with_context(ctx).create(vals)
-                created += 1
-            record._auto_validate_from_sync()
-        self.env['ir.config_parameter'].sudo().set_param(self._ATTENDANCE_SYNC_PARAM, fields.Date.to_string(end_date))
+        chunk_start = start_date
+        while chunk_start <= window_end:
+            chunk_end = min(chunk_start + timedelta(days=self._ATTENDANCE_SYNC_CHUNK_DAYS - 1), window_end)
+            chunk_created, chunk_updated = self._sync_attendance_days(chunk_start, chunk_end)
+            created += chunk_created
+            updated += chunk_updated
+            ICP.set_param(self._ATTENDANCE_SYNC_RESUME_PARAM, fields.Date.to_string(chunk_end))
+            self.env['ir.cron']._commit_progress((chunk_end - chunk_start).days + 1)
+            chunk_start = chunk_end + timedelta(days=1)
+        ICP.set_param(self._ATTENDANCE_SYNC_PARAM, fields.Date.to_string(window_end))
+        ICP.set_param(self._ATTENDANCE_SYNC_RESUME_PARAM, False)
         _logger.info(
             "Attendance auto-sync done for %s-%s (created=%s, updated=%s)",
-            start_date, end_date, created, updated
+            start_date, window_end, created, updated
         )
 
     _sql_constraints = [
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+
+class RmcBillingBatchRun(models.Model):
+    """Month-end billing of many agreements in one run.
+
+    Amounts and source datasets are prepared for all agreements with one
+    query per dataset, supporting reports are rendered by a bounded pool of
+    wkhtmltopdf workers, and every agreement is billed in its own savepoint
+    so a failure only affects its line; each chunk is committed once billed.
+    Runs are billed by a cron the start button wakes up; lines already
+    billed are skipped when a run is picked up again.
+    """
+    _name = 'rmc.billing.batch.run'
+    _description = 'RMC Batch Billing Run'
+    _inherit = ['mail.thread']
+    _order = 'create_date desc, id desc'
+
+    # Agreements prepared, rendered and billed per step
+    _RENDER_CHUNK_SIZE = 20
+
+    name = fields.Char(string='Description', compute='_compute_name', store=True)
+    period_start = fields.Date(
+        string='Period Start',
+        required=True,
+        default=lambda self: fields.Date.context_today(self).replace(day=1)
+    )
+    period_end = fields.Date(string='Period End', required=True)
+    agreement_ids = fields.Many2many(
+        'rmc.contract.agreement',
+        'rmc_billing_batch_run_agreement_rel',
+        'run_id',
+        'agreement_id',
+        string='Agreements'
+    )
+    line_ids = fields.One2many('rmc.billing.batch.run.line', 'run_id', string='Agreements Billed')
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='Status', default='draft', required=True, tracking=True)
+    message = fields.Text(string='Error', readonly=True)
+    started_at = fields.Datetime(string='Started On', readonly=True)
+    finished_at = fields.Datetime(string='Finished On', readonly=True)
+    duration = fields.Float(string='Duration (s)', readonly=True, digits=(12, 1))
+    bill_count = fields.Integer(string='Bills', compute='_compute_totals')
+    failed_count = fields.Integer(string='Failed', compute='_compute_totals')
+    total_amount = fields.Monetary(string='Net Payable', compute='_compute_totals', currency_field='currency_id')
+    currency_id = fields.Many2one(
+        'res.currency',
+        string='Currency',
+        default=lambda self: self.env.company.currency_id
+    )
+
+    @api.depends('period_start', 'period_end')
+    def _compute_name(self):
+        for run in self:
+            run.name = _('Batch Billing %(start)s - %(end)s') % {
+                'start': run.period_start or '',
+                'end': run.period_end or '',
+            }
+
+    @api.depends('line_ids.state', 'line_ids.total_amount')
+    def _compute_totals(self):
+        for run in self:
+            done = run.line_ids.filtered(lambda line: line.state == 'done')
+            run.bill_count = len(done)
+            run.failed_count = len(run.line_ids.filtered(lambda line: line.state == 'failed'))
+            run.total_amount = sum(done.mapped('total_amount'))
+
+    @api.model
+    def action_open_for_agreements(self, agreements):
+        """Open a new run preset with ``agreements`` (list server action)."""
+        today = fields.Date.context_today(self)
+        period_end = today.replace(day=1) - timedelta(days=1)
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'view_mode': 'form',
+            'target': 'current',
+            'context': {
+                'default_agreement_ids': [(6, 0, agreements.ids)],
+                'default_period_start': fields.Date.to_string(period_end.replace(day=1)),
+                'default_period_end': fields.Date.to_string(period_end),
+            },
+        }
+
+    def action_run(self):
+        for run in self:
+            if not run.agreement_ids:
+                raise UserError(_('Select at least one agreement to bill.'))
+            if run.period_end < run.period_start:
+                raise UserError(_('Period end must be after period start.'))
+        self.write({'state': 'running', 'message': False, 'started_at': fields.Datetime.now(), 'finished_at': False})
+        cron = self.env.ref('rmc_manpower_contractor.cron_billing_batch_run', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+        return True
+
+    @api.model
+    def cron_process_runs(self):
+        """Bill the runs started from the form, resuming any left running by an interrupted worker.
+
+        A run failing outside of its lines is marked failed with the error
+        and the next run is processed.
+        """
+        for run in self.search([('state', '=', 'running')], order='started_at, id'):
+            try:
+                run._run()
+            except Exception as exc:
+                _logger.exception("Batch billing run %s failed", run.display_name)
+                run.write({'state': 'failed', 'message': str(exc), 'finished_at': fields.Datetime.now()})
+            self.env['ir.cron']._commit_progress(1)
+
+    def _run(self):
+        """Bill the pending lines of the run chunk by chunk, committing each chunk.
+
+        Every step runs in a savepoint, so a failure leaves the cursor usable
+        and only undoes the step that failed.
+        """
+        self.ensure_one()
+        Cron = self.env['ir.cron']
+        started = time.monotonic()
+        with self.env.cr.savepoint():
+            billed_agreements = self.line_ids.agreement_id
+            new_agreements = self.agreement_ids - billed_agreements
+            if new_agreements:
+                self.env['rmc.billing.batch.run.line'].create([
+                    {'run_id': self.id, 'agreement_id': agreement.id} for agreement in new_agreements
+                ])
+        Cron._commit_progress()
+
+        pending = self.line_ids.filtered(lambda line: line.state != 'done')
+        for start in range(0, len(pending), self._RENDER_CHUNK_SIZE):
+            with self.env.cr.savepoint():
+                self._bill_lines(pending[start:start + self._RENDER_CHUNK_SIZE])
+            Cron._commit_progress()
+
+        with self.env.cr.savepoint():
+            self.write({
+                'state': 'done',
+                'message': False,
+                'finished_at': fields.Datetime.now(),
+                'duration': time.monotonic() - started,
+            })
+            self.message_post(body=_(
+                'Batch billing finished: %(bills)s bills, %(failed)s failures, net payable %(total)s, in %(duration).1fs.'
+            ) % {
+                'bills': self.bill_count,
+                'failed': self.failed_count,
+                'total': self.total_amount,
+                'duration': self.duration,
+            })
+
+    def _bill_lines(self, lines):
+        """Prepare, render and bill one chunk of run lines.
+
+        Draft bills are created first so the supporting reports are rendered
+        for them, then completed with their report. A chunk whose preparation
+        fails is retried line by line; a line failing afterwards loses its
+        draft bill and is marked failed with the error.
+        """
+        try:
+            with self.env.cr.savepoint():
+                wizards, sources = self._prepare_wizards(lines)
+        except Exception as exc:
+            if len(lines) > 1:
+                _logger.info("Preparing a batch billing chunk failed, retrying agreement by agreement", exc_info=True)
+                for line in lines:
+                    self._bill_lines(line)
+            else:
+                _logger.warning("Batch billing of agreement %s failed: %s", lines.agreement_id.name, exc)
+                lines.write({'state': 'failed', 'message': str(exc)})
+            return
+
+        bills, durations, html_by_wizard = {}, {}, {}
+        for line, wizard in zip(lines, wizards):
+            started = time.monotonic()
+            try:
+                with self.env.cr.savepoint():
+                    bill = wizard._create_bill_move()
+                    html = wizard._supporting_report_html(sources[wizard.id], bill=bill)
+            except Exception as exc:
+                _logger.warning("Batch billing of agreement %s failed: %s", line.agreement_id.name, exc)
+                line.write({'state': 'failed', 'message': str(exc), 'wizard_id': wizard.id})
+            else:
+                bills[wizard.id] = bill
+                if html:
+                    html_by_wizard[wizard.id] = html
+            durations[wizard.id] = time.monotonic() - started
+        pdfs, errors = self._render_reports(html_by_wizard)
+
+        for line, wizard in zip(lines, wizards):
+            bill = bills.get(wizard.id)
+            if not bill:
+                continue
+            started = time.monotonic()
+            message = errors.get(wizard.id)
+            if not message:
+                try:
+                    with self.env.cr.savepoint():
+                        wizard._complete_bill(bill, source_records=sources[wizard.id], report_pdf=pdfs.get(wizard.id))
+                except Exception as exc:
+                    _logger.warning("Batch billing of agreement %s failed: %s", line.agreement_id.name, exc)
+                    message = str(exc)
+            if message:
+                # Resuming the run bills the agreement again: drop its draft bill
+                bill.unlink()
+                line.write({'state': 'failed', 'message': message, 'wizard_id': wizard.id})
+            else:
+                log = self.env['rmc.billing.prepare.log'].search([('bill_id', '=', bill.id)], limit=1)
+                line.write({
+                    'state': 'done',
+                    'message': False,
+                    'wizard_id': wizard.id,
+                    'bill_id': bill.id,
+                    'log_id': log.id,
+                    'total_amount': wizard.total_amount,
+                })
+            line.duration = durations[wizard.id] + time.monotonic() - started
+
+    def _prepare_wizards(self, lines):
+        """Return the billing wizards of ``lines`` with their amounts computed, and their source records."""
+        wizards = self.env['rmc.billing.prepare.wizard'].create([{
+            'agreement_id': line.agreement_id.id,
+            'period_start': self.period_start,
+            'period_end': self.period_end,
+            'prime_output_qty': line.agreement_id.prime_output_qty or 0.0,
+            'optimized_standby_qty': line.agreement_id.optimized_standby_qty or 0.0,
+            'notes': self.name,
+        } for line in lines])
+        wizards._sync_mgq_with_prime_output()
+        wizards._apply_attendance_proration()
+        wizards._compute_billing_amounts()
+        return wizards, wizards._collect_source_records_batch()
+
+    def _render_reports(self, html_by_wizard):
+        """Render supporting reports, running at most ``rmc_billing.render_workers`` wkhtmltopdf at once.
+
+        Each worker thread uses its own cursor. Returns ``(pdfs, errors)``,
+        both keyed by wizard id.
+        """
+        Wizard = self.env['rmc.billing.prepare.wizard']
+        workers = int(self.env['ir.config_parameter'].sudo().get_param('rmc_billing.render_workers', 2) or 1)
+        pdfs, errors = {}, {}
+        if workers <= 1 or len(html_by_wizard) <= 1 or getattr(threading.current_thread(), 'testing', False):
+            for wizard_id, html in html_by_wizard.items():
+                try:
+                    pdfs[wizard_id] = Wizard._render_supporting_report(html)
+                except Exception as exc:
+                    _logger.warning("Supporting report rendering failed for billing wizard %s: %s", wizard_id, exc)
+                    errors[wizard_id] = str(exc)
+            return pdfs, errors
+
+        registry = self.env.registry
+        uid, context = self.env.uid, dict(self.env.context)
+
+        def render(html):
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                return env['rmc.billing.prepare.wizard']._render_supporting_report(html)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(render, html): wizard_id for wizard_id, html in html_by_wizard.items()}
+            for future in as_completed(futures):
+                wizard_id = futures[future]
+                try:
+                    pdfs[wizard_id] = future.result()
+                except Exception as exc:
+                    _logger.warning("Supporting report rendering failed for billing wizard %s: %s", wizard_id, exc)
+                    errors[wizard_id] = str(exc)
+        return pdfs, errors
+
+
+class RmcBillingBatchRunLine(models.Model):
+    _name = 'rmc.billing.batch.run.line'
+    _description = 'RMC Batch Billing Run Line'
+    _order = 'id'
+
+    run_id = fields.Many2one('rmc.billing.batch.run', string='Run', required=True, ondelete='cascade', index=True)
+    agreement_id = fields.Many2one('rmc.contract.agreement', string='Agreement', required=True, ondelete='cascade')
+    contractor_id = fields.Many2one(related='agreement_id.contractor_id', string='Contractor')
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Billed'),
+        ('failed', 'Failed'),
+    ], string='Status', default='pending', required=True)
+    wizard_id = fields.Many2one('rmc.billing.prepare.wizard', string='Billing Wizard', ondelete='set null')
+    bill_id = fields.Many2one('account.move', string='Vendor Bill', ondelete='set null')
+    log_id = fields.Many2one('rmc.billing.prepare.log', string='Billing Log', ondelete='set null')
+    total_amount = fields.Monetary(string='Net Payable', currency_field='currency_id')
+    currency_id = fields.Many2one(related='agreement_id.currency_id', string='Currency')
+    duration = fields.Float(string='Duration (s)', digits=(12, 2))
+    message = fields.Text(string='Message')
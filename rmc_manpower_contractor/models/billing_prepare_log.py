@@ -208,13 +208,11 @@ class RmcBillingPrepareLog(models.Model):
     )
     def _compute_performance_dashboard(self):
         ICP = self.env['ir.config_parameter'].sudo()
-        weight_diesel = float(ICP.get_param('rmc_score.weight_diesel', 0.5))
-        weight_maint = float(ICP.get_param('rmc_score.weight_maintenance', 0.3))
-        weight_attend = float(ICP.get_param('rmc_score.weight_attendance', 0.2))
-        star_5 = float(ICP.get_param('rmc_score.star_5_threshold', 90))
-        star_4 = float(ICP.get_param('rmc_score.star_4_threshold', 75))
-        star_3 = float(ICP.get_param('rmc_score.star_3_threshold', 60))
-        star_2 = float(ICP.get_param('rmc_score.star_2_threshold', 40))
+        scoring = self.env['rmc.contract.agreement']._kpi_scoring_params()
+        weight_diesel = scoring['weight_diesel']
+        weight_maint = scoring['weight_maintenance']
+        weight_attend = scoring['weight_attendance']
+        star_5, star_4, star_3, star_2 = (threshold for _stars, threshold in scoring['star_thresholds'])
         prime_per_liter_field = self._fields.get('dashboard_diesel_efficiency')
         alias = prime_per_liter_field and prime_per_liter_field.name or 'dashboard_diesel_efficiency'
 
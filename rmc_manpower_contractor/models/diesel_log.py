@@ -8,14 +8,23 @@ from datetime import timedelta
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
 
+from . import sync_common
+
 _logger = logging.getLogger(__name__)
 
 class RmcDieselLog(models.Model):
     _name = 'rmc.diesel.log'
     _description = 'RMC Diesel Log'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'rmc.agreement.kpi.source']
     _order = 'date desc, id desc'
+    _kpi_kind = 'diesel'
+    _kpi_value_field = 'diesel_efficiency'
+    _kpi_fields = ('agreement_id', 'date', 'state', 'issued_ltr', 'work_done_m3', 'work_done_km')
     _DIESEL_SYNC_PARAM = 'rmc.diesel.log.last_sync'
+    # "write_date,id" of the last fleet log mirrored by a run that did not finish
+    _DIESEL_SYNC_RESUME_PARAM = 'rmc.diesel.log.sync_resume'
+    # Fleet logs mirrored, and committed, per step of the cron
+    _DIESEL_SYNC_CHUNK_SIZE = 200
 
     name = fields.Char(
         string='Reference',
@@ -110,6 +119,25 @@ class RmcDieselLog(models.Model):
         string='Company',
         default=lambda self: self.env.company
     )
+    source_diesel_log_id = fields.Many2one(
+        'diesel.log',
+        string='Fleet Diesel Log',
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        ondelete='set null',
+        help='Fleet diesel issue this entry is mirrored from.'
+    )
+
+    def init(self):
+        # Link the entries mirrored before the source log was stored
+        self.env.cr.execute("""
+            UPDATE rmc_diesel_log r
+               SET source_diesel_log_id = d.id
+              FROM diesel_log d
+             WHERE r.source_diesel_log_id IS NULL
+               AND r.name = 'SYNC-DL-' || d.id
+        """)
 
     @api.model_create_multi
     def create(self, vals_list):
@@ -210,6 +238,10 @@ class RmcDieselLog(models.Model):
                 record.diesel_efficiency = 0.0
                 record.efficiency_unit = ''
 
+    def _kpi_counts(self):
+        # Logs without work done do not weigh on the efficiency average
+        return super()._kpi_counts() and self.diesel_efficiency > 0
+
     @api.constrains('opening_ltr', 'issued_ltr', 'closing_ltr')
     def _check_positive_liters(self):
         """Ensure non-negative liter values"""
@@ -255,6 +287,34 @@ class RmcDieselLog(models.Model):
         ]
         return Agreement.search(domain, limit=1)
 
+    @api.model
+    def _resolve_agreements_for_vehicles(self, vehicles):
+        """Return ``{vehicle_id: agreement}`` for all ``vehicles`` in one query.
+
+        Each vehicle gets the agreement :meth:`_resolve_agreement_for_vehicle`
+        would pick, i.e. the most recent one listing it.
+        """
+        if not vehicles:
+            return {}
+        Agreement = self.env['rmc.contract.agreement'].sudo()
+        Agreement.flush_model(['vehicle_ids'])
+        self.env['rmc.manpower.matrix'].flush_model(['agreement_id', 'vehicle_id'])
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (link.vehicle_id) link.vehicle_id, agreement.id
+              FROM (
+                    SELECT agreement_id, vehicle_id
+                      FROM rmc_agreement_vehicle_rel
+                     WHERE vehicle_id = ANY(%(vehicle_ids)s)
+                     UNION
+                    SELECT agreement_id, vehicle_id
+                      FROM rmc_manpower_matrix
+                     WHERE vehicle_id = ANY(%(vehicle_ids)s)
+                   ) link
+              JOIN rmc_contract_agreement agreement ON agreement.id = link.agreement_id
+          ORDER BY link.vehicle_id, agreement.create_date DESC, agreement.id DESC
+        """, {'vehicle_ids': vehicles.ids})
+        return {vehicle_id: Agreement.browse(agreement_id) for vehicle_id, agreement_id in self.env.cr.fetchall()}
+
     @api.model
     def _resolve_driver_employee(self, vehicle, agreement):
         Employee = self.env['hr.employee'].sudo()
@@ -267,6 +327,17 @@ class RmcDieselLog(models.Model):
             return Employee.browse()
         return employee
 
+    @api.model
+    def _resolve_driver_employees(self, vehicles):
+        """Return ``{partner_id: employee}`` for the drivers of ``vehicles``, in one search."""
+        partners = vehicles.driver_id
+        if not partners:
+            return {}
+        employees_by_partner = {}
+        for employee in self.env['hr.employee'].sudo().search([('address_home_id', 'in', partners.ids)]):
+            employees_by_partner.setdefault(employee.address_home_id.id, employee)
+        return employees_by_partner
+
     @api.model
     def _extract_work_payload(self, log):
         work_m3 = 0.0
@@ -287,7 +358,7 @@ class RmcDieselLog(models.Model):
         return work_m3, work_km
 
     @api.model
-    def _prepare_sync_vals(self, log, agreement):
+    def _prepare_sync_vals(self, log, agreement, driver=None):
         work_m3, work_km = self._extract_work_payload(log)
         date_value = fields.Date.to_date(log.date) if log.date else fields.Date.context_today(self)
         vals = {
@@ -300,7 +371,10 @@ class RmcDieselLog(models.Model):
             'work_done_m3': work_m3,
             'work_done_km': work_km,
         }
-        driver = self._resolve_driver_employee(log.vehicle_id, agreement)
+        if driver is None:
+            driver = self._resolve_driver_employee(log.vehicle_id, agreement)
+        elif driver and agreement.driver_ids and driver not in agreement.driver_ids:
+            driver = driver.browse()
         if driver:
             vals['driver_id'] = driver.id
         # Allow zero-quantity logs to sync as well so Operations view mirrors
@@ -311,28 +385,78 @@ class RmcDieselLog(models.Model):
         vals = self._prepare_sync_vals(log, agreement)
         if not vals:
             return False
-        sync_name = f"SYNC-DL-{log.id}"
-        record = self.search([('name', '=', sync_name)], limit=1)
+        record = self.search([('source_diesel_log_id', '=', log.id)], limit=1)
         if record:
             record.write(vals)
             return record
-        vals['name'] = sync_name
-        vals.setdefault('notes', _('Auto-synced from diesel log %s') % (log.name or log.id))
-        return self.create(vals)
+        return self.create(self._prepare_sync_create_vals(log, vals))
+
+    @api.model
+    def _prepare_sync_create_vals(self, log, vals):
+        return dict(
+            vals,
+            name=f"SYNC-DL-{log.id}",
+            source_diesel_log_id=log.id,
+            notes=vals.get('notes') or _('Auto-synced from diesel log %s') % (log.name or log.id),
+        )
+
+    @api.model
+    def _sync_fleet_logs(self, logs):
+        """Mirror the fleet ``logs`` in bulk; return the number of logs mirrored.
+
+        Agreements, drivers and the already mirrored entries are resolved
+        for the whole batch up front. New entries are created in one call
+        and existing ones are only written when their values changed.
+        """
+        agreements = self._resolve_agreements_for_vehicles(logs.vehicle_id)
+        drivers = self._resolve_driver_employees(logs.vehicle_id)
+        existing = {}
+        for record in self.search([('source_diesel_log_id', 'in', logs.ids)]):
+            existing.setdefault(record.source_diesel_log_id.id, record)
+        Employee = self.env['hr.employee'].sudo()
+        to_create = []
+        processed = 0
+        for log in logs:
+            agreement = agreements.get(log.vehicle_id.id)
+            if not agreement:
+                continue
+            driver = drivers.get(log.vehicle_id.driver_id.id, Employee)
+            vals = self._prepare_sync_vals(log, agreement, driver=driver)
+            if not vals:
+                continue
+            processed += 1
+            record = existing.get(log.id)
+            if not record:
+                to_create.append(self._prepare_sync_create_vals(log, vals))
+            elif sync_common.sync_vals_differ(record, vals):
+                record.write(vals)
+        if to_create:
+            self.create(to_create)
+        return processed
 
     @api.model
     def cron_sync_from_fleet_issues(self):
-        """Mirror approved/done diesel.log entries into RMC diesel log."""
+        """Mirror approved/done diesel.log entries into RMC diesel log.
+
+        Logs are mirrored in chunks ordered by (write_date, id). Every chunk
+        is committed with its position, so an interrupted run resumes right
+        after the last mirrored log; a finished run moves the watermark.
+        """
         self = self.sudo()
         DieselLog = self.env['diesel.log'].sudo()
         ICP = self.env['ir.config_parameter'].sudo()
-        last_sync_str = ICP.get_param(self._DIESEL_SYNC_PARAM)
-        last_sync = fields.Datetime.from_string(last_sync_str) if last_sync_str else None
         domain = [
             ('log_type', '=', 'diesel'),
             ('state', 'in', ('approved', 'done')),
         ]
-        if last_sync:
+        resume_str = ICP.get_param(self._DIESEL_SYNC_RESUME_PARAM)
+        last_sync_str = ICP.get_param(self._DIESEL_SYNC_PARAM)
+        last_sync = fields.Datetime.from_string(last_sync_str) if last_sync_str else None
+        if resume_str:
+            resume_date, resume_id = resume_str.split(',')
+            domain += ['|', ('write_date', '>', resume_date),
+                       '&', ('write_date', '=', resume_date), ('id', '>', int(resume_id))]
+        elif last_sync:
             domain.append(('write_date', '>', fields.Datetime.to_string(last_sync - timedelta(hours=1))))
         else:
             baseline = fields.Datetime.from_string(fields.Datetime.now())
@@ -342,20 +466,18 @@ class RmcDieselLog(models.Model):
             return
         latest = last_sync
         processed = 0
-        for log in logs:
-            agreement = self._resolve_agreement_for_vehicle(log.vehicle_id)
-            if not agreement:
-                continue
-            record = self._upsert_from_diesel_log(log, agreement)
-            if record:
-                processed += 1
-                timestamp = fields.Datetime.from_string(log.write_date) if log.write_date else False
-                if not timestamp and log.create_date:
-                    timestamp = fields.Datetime.from_string(log.create_date)
-                if timestamp:
-                    latest = timestamp if not latest else max(latest, timestamp)
+        for start in range(0, len(logs), self._DIESEL_SYNC_CHUNK_SIZE):
+            chunk = logs[start:start + self._DIESEL_SYNC_CHUNK_SIZE]
+            processed += self._sync_fleet_logs(chunk)
+            last_log = chunk[-1]
+            timestamp = last_log.write_date or last_log.create_date
+            if timestamp:
+                latest = timestamp if not latest else max(latest, timestamp)
+                ICP.set_param(self._DIESEL_SYNC_RESUME_PARAM, '%s,%s' % (fields.Datetime.to_string(timestamp), last_log.id))
+            self.env['ir.cron']._commit_progress(len(chunk), remaining=len(logs) - start - len(chunk))
         if latest:
             ICP.set_param(self._DIESEL_SYNC_PARAM, fields.Datetime.to_string(latest))
+        ICP.set_param(self._DIESEL_SYNC_RESUME_PARAM, False)
         _logger.info("Diesel auto-sync processed %s fleet issues.", processed)
 
     _sql_constraints = [
@@ -30,30 +30,45 @@ class HrAttendance(models.Model):
                 continue
             existing_attendance.with_context(ctx_skip).write({'agreement_id': target_agreement_id})
 
+    # Fields feeding rmc.agreement.attendance.daily
+    _DAILY_SUMMARY_FIELDS = ('employee_id', 'check_in', 'check_out')
+
+    def _attendance_days(self):
+        return {(attendance.employee_id.id, attendance.check_in.date()) for attendance in self if attendance.check_in}
+
     @api.model_create_multi
     def create(self, vals_list):
-        if self.env.context.get('skip_agreement_notify'):
-            return super().create(vals_list)
         attendances = super().create(vals_list)
-        attendances._notify_agreements(attendances.mapped('employee_id'))
+        self.env['rmc.agreement.attendance.daily']._refresh_days(attendances._attendance_days())
+        if not self.env.context.get('skip_agreement_notify'):
+            attendances._notify_agreements(attendances.mapped('employee_id'))
         return attendances
 
     def write(self, vals):
+        summary_days = set()
+        if any(fname in vals for fname in self._DAILY_SUMMARY_FIELDS):
+            summary_days = self._attendance_days()
         if self.env.context.get('skip_agreement_notify'):
-            return super().write(vals)
-        employees_before = self.mapped('employee_id')
-        result = super().write(vals)
-        employees_after = self.mapped('employee_id')
-        employees = (employees_before | employees_after)
-        if employees:
-            self._notify_agreements(employees)
+            result = super().write(vals)
+        else:
+            employees_before = self.mapped('employee_id')
+            result = super().write(vals)
+            employees_after = self.mapped('employee_id')
+            employees = (employees_before | employees_after)
+            if employees:
+                self._notify_agreements(employees)
+        if summary_days:
+            self.env['rmc.agreement.attendance.daily']._refresh_days(summary_days | self._attendance_days())
         return result
 
     def unlink(self):
+        summary_days = self._attendance_days()
         if self.env.context.get('skip_agreement_notify'):
-            return super().unlink()
-        employees = self.mapped('employee_id')
-        result = super().unlink()
-        if employees:
-            self._notify_agreements(employees)
+            result = super().unlink()
+        else:
+            employees = self.mapped('employee_id')
+            result = super().unlink()
+            if employees:
+                self._notify_agreements(employees)
+        self.env['rmc.agreement.attendance.daily']._refresh_days(summary_days)
         return result
@@ -52,6 +52,8 @@ class RmcInventoryHandover(models.Model):
         for record in records:
             record._validate_agreement_employee()
             record._default_employee_from_agreement()
+        # Handovers are listed in the contract PDF
+        records.agreement_id._mark_preview_stale()
         return records
 
     @api.depends('issued_qty', 'returned_qty', 'unit_price')
@@ -131,11 +133,19 @@ class RmcInventoryHandover(models.Model):
         }
 
     def write(self, vals):
+        old_agreements = self.agreement_id if 'agreement_id' in vals else self.env['rmc.contract.agreement']
         res = super(RmcInventoryHandover, self).write(vals)
         if 'employee_id' in vals:
             self._validate_agreement_employee()
         if 'employee_id' not in vals and 'agreement_id' in vals:
             self._default_employee_from_agreement()
+        (old_agreements | self.agreement_id)._mark_preview_stale()
+        return res
+
+    def unlink(self):
+        agreements = self.agreement_id
+        res = super(RmcInventoryHandover, self).unlink()
+        agreements._mark_preview_stale()
         return res
 
     @api.constrains('issued_qty', 'returned_qty')
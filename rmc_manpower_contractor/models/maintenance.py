@@ -1,18 +1,31 @@
 # -*- coding: utf-8 -*-
 import logging
+import time
+from collections import defaultdict
 from datetime import timedelta
 
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
+from odoo.osv import expression
+
+from . import sync_common
 
 _logger = logging.getLogger(__name__)
 
 class RmcMaintenanceCheck(models.Model):
     _name = 'rmc.maintenance.check'
     _description = 'RMC Maintenance Check'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'rmc.agreement.kpi.source']
     _order = 'date desc'
+    _kpi_kind = 'maintenance'
+    _kpi_value_field = 'checklist_ok'
+    _kpi_fields = ('agreement_id', 'date', 'state', 'checklist_ok')
     _MAINTENANCE_SYNC_PARAM = 'rmc.maintenance.last_sync'
+    # Synced source model -> (field linking the check to it, name of the check)
+    _MAINTENANCE_SYNC_SOURCES = {
+        'maintenance.request': ('maintenance_request_id', 'SYNC-MR-%s'),
+        'rmc.breakdown.event': ('breakdown_event_id', 'SYNC-BD-%s'),
+    }
 
     name = fields.Char(string='Reference', required=True, copy=False, readonly=True, default=lambda self: _('New'))
     agreement_id = fields.Many2one('rmc.contract.agreement', string='Agreement', required=True, ondelete='restrict', tracking=True)
@@ -32,6 +45,41 @@ class RmcMaintenanceCheck(models.Model):
     state = fields.Selection([('draft', 'Draft'), ('pending_agreement', 'Pending Agreement'), ('validated', 'Validated')], default='draft', required=True, tracking=True)
     notes = fields.Text(string='Notes')
     company_id = fields.Many2one('res.company', string='Company', default=lambda self: self.env.company)
+    maintenance_request_id = fields.Many2one(
+        'maintenance.request',
+        string='Maintenance Request',
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        ondelete='set null',
+        help='Maintenance request this check is synced from.'
+    )
+    breakdown_event_id = fields.Many2one(
+        'rmc.breakdown.event',
+        string='Breakdown Event',
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        ondelete='set null',
+        help='Breakdown event this check is synced from.'
+    )
+
+    def init(self):
+        # Link the checks synced before their source was stored
+        self.env.cr.execute("""
+            UPDATE rmc_maintenance_check c
+               SET maintenance_request_id = r.id
+              FROM maintenance_request r
+             WHERE c.maintenance_request_id IS NULL
+               AND c.name = 'SYNC-MR-' || r.id
+        """)
+        self.env.cr.execute("""
+            UPDATE rmc_maintenance_check c
+               SET breakdown_event_id = b.id
+              FROM rmc_breakdown_event b
+             WHERE c.breakdown_event_id IS NULL
+               AND c.name = 'SYNC-BD-' || b.id
+        """)
 
     @api.model_create_multi
     def create(self, vals_list):
@@ -129,32 +177,47 @@ class RmcMaintenanceCheck(models.Model):
         return employee
 
     def _copy_attachments_from_source(self, source_model, source_id, target_record):
+        self._copy_attachments_from_sources([(self.env[source_model].browse(source_id), target_record)])
+
+    @api.model
+    def _copy_attachments_from_sources(self, pairs):
+        """Copy to each check of ``[(source, check)]`` the source attachments it lacks."""
+        checks_by_source = {(source._name, source.id): check for source, check in pairs}
+        if not checks_by_source:
+            return
+        ids_by_model = defaultdict(list)
+        for model_name, source_id in checks_by_source:
+            ids_by_model[model_name].append(source_id)
         Attachment = self.env['ir.attachment'].sudo()
-        source_attachments = Attachment.search([
-            ('res_model', '=', source_model),
-            ('res_id', '=', source_id)
-        ])
+        source_attachments = Attachment.search(expression.OR([
+            [('res_model', '=', model_name), ('res_id', 'in', source_ids)]
+            for model_name, source_ids in ids_by_model.items()
+        ]))
         if not source_attachments:
             return
-        dest_attachments = Attachment.search([
-            ('res_model', '=', target_record._name),
-            ('res_id', '=', target_record.id)
-        ])
-        existing_checksums = set(filter(None, dest_attachments.mapped('checksum')))
+        target_ids = {checks_by_source[(attachment.res_model, attachment.res_id)].id for attachment in source_attachments}
+        existing_checksums = defaultdict(set)
+        for attachment in Attachment.search([('res_model', '=', self._name), ('res_id', 'in', list(target_ids))]):
+            if attachment.checksum:
+                existing_checksums[attachment.res_id].add(attachment.checksum)
+        vals_list = []
         for attachment in source_attachments:
+            target = checks_by_source[(attachment.res_model, attachment.res_id)]
             checksum = attachment.checksum
-            if checksum and checksum in existing_checksums:
+            if checksum and checksum in existing_checksums[target.id]:
                 continue
-            Attachment.create({
+            vals_list.append({
                 'name': attachment.name,
                 'datas': attachment.datas,
                 'mimetype': attachment.mimetype,
-                'res_model': target_record._name,
-                'res_id': target_record.id,
+                'res_model': target._name,
+                'res_id': target.id,
                 'type': attachment.type,
             })
             if checksum:
-                existing_checksums.add(checksum)
+                existing_checksums[target.id].add(checksum)
+        if vals_list:
+            Attachment.create(vals_list)
 
     @api.model
     def _prepare_request_vals(self, request, agreement, employee_map):
@@ -195,23 +258,6 @@ class RmcMaintenanceCheck(models.Model):
         }
         return vals
 
-    def _upsert_request(self, request, employee_map):
-        agreement = request.agreement_id or employee_map.get(request.employee_id.id if request.employee_id else False)
-        vals = self._prepare_request_vals(request, agreement, employee_map)
-        if not vals:
-            return False, False
-        sync_name = f"SYNC-MR-{request.id}"
-        record = self.search([('name', '=', sync_name)], limit=1)
-        created = False
-        if record:
-            record.write(vals)
-        else:
-            vals['name'] = sync_name
-            record = self.create(vals)
-            created = True
-        self._copy_attachments_from_source('maintenance.request', request.id, record)
-        return record, created
-
     @api.model
     def _prepare_breakdown_vals(self, breakdown):
         checklist = 100.0 if breakdown.state == 'closed' else 60.0
@@ -229,19 +275,63 @@ class RmcMaintenanceCheck(models.Model):
             'notes': _('Auto-synced from breakdown %s') % (breakdown.name or breakdown.id),
         }
 
-    def _upsert_breakdown(self, breakdown):
-        vals = self._prepare_breakdown_vals(breakdown)
-        sync_name = f"SYNC-BD-{breakdown.id}"
-        record = self.search([('name', '=', sync_name)], limit=1)
-        created = False
-        if record:
-            record.write(vals)
-        else:
-            vals['name'] = sync_name
-            record = self.create(vals)
-            created = True
-        self._copy_attachments_from_source('rmc.breakdown.event', breakdown.id, record)
-        return record, created
+    @api.model
+    def _stage_maintenance_changes(self, requests, breakdowns):
+        """Return the change set ``[(source, vals)]`` of both synced sources."""
+        employee_map = self._build_employee_agreement_map(
+            requests.mapped('employee_id').ids + requests.mapped('equipment_id.employee_id').ids
+        )
+        has_agreement = 'agreement_id' in requests._fields
+        staged = []
+        for request in requests:
+            agreement = request.agreement_id if has_agreement else False
+            if not agreement and request.employee_id:
+                agreement = employee_map.get(request.employee_id.id)
+            vals = self._prepare_request_vals(request, agreement, employee_map)
+            if vals:
+                staged.append((request, vals))
+        for breakdown in breakdowns:
+            staged.append((breakdown, self._prepare_breakdown_vals(breakdown)))
+        return staged
+
+    @api.model
+    def _apply_maintenance_changes(self, staged):
+        """Apply a change set from :meth:`_stage_maintenance_changes` in bulk.
+
+        The existing checks of all sources are matched in one query; new
+        checks are created in one call and existing ones are only written
+        when their values changed. Returns ``(created, updated)``.
+        """
+        source_ids = defaultdict(list)
+        for source, _vals in staged:
+            source_ids[source._name].append(source.id)
+        existing = {}
+        if staged:
+            for check in self.search(expression.OR([
+                [(self._MAINTENANCE_SYNC_SOURCES[model_name][0], 'in', ids)]
+                for model_name, ids in source_ids.items()
+            ])):
+                source = check.maintenance_request_id or check.breakdown_event_id
+                existing.setdefault((source._name, source.id), check)
+        to_create = []
+        created_sources = []
+        synced = []
+        updated = 0
+        for source, vals in staged:
+            check = existing.get((source._name, source.id))
+            if not check:
+                link_field, name_pattern = self._MAINTENANCE_SYNC_SOURCES[source._name]
+                to_create.append(dict(vals, name=name_pattern % source.id, **{link_field: source.id}))
+                created_sources.append(source)
+                continue
+            if sync_common.sync_vals_differ(check, vals):
+                check.write(vals)
+                updated += 1
+            synced.append((source, check))
+        if to_create:
+            synced += list(zip(created_sources, self.create(to_create)))
+        self._copy_attachments_from_sources(synced)
+        return len(to_create), updated
 
     @api.model
     def _timestamp_from_record(self, record):
@@ -250,8 +340,15 @@ class RmcMaintenanceCheck(models.Model):
 
     @api.model
     def cron_sync_from_maintenance(self):
-        """Create/update maintenance checks from maintenance requests & breakdowns."""
+        """Create/update maintenance checks from maintenance requests & breakdowns.
+
+        Both sources are staged into one change set and applied in bulk.
+        Returns the run statistics, which are also logged: throughput and,
+        per source, the lag between the oldest synced change and the run.
+        """
         self = self.sudo()
+        started = time.monotonic()
+        now = fields.Datetime.now()
         Request = self.env['maintenance.request'].sudo()
         Breakdown = self.env['rmc.breakdown.event'].sudo()
         ICP = self.env['ir.config_parameter'].sudo()
@@ -262,43 +359,42 @@ class RmcMaintenanceCheck(models.Model):
             request_domain = [('write_date', '>', fields.Datetime.to_string(buffer_start))]
             breakdown_domain = [('write_date', '>', fields.Datetime.to_string(buffer_start))]
         else:
-            baseline = fields.Datetime.from_string(fields.Datetime.now())
-            cutoff = fields.Datetime.to_string(baseline - timedelta(days=30))
+            cutoff = fields.Datetime.to_string(now - timedelta(days=30))
             request_domain = [('create_date', '>=', cutoff)]
             breakdown_domain = [('create_date', '>=', cutoff)]
         requests = Request.search(request_domain, order='write_date asc, id asc')
         breakdowns = Breakdown.search(breakdown_domain, order='write_date asc, id asc')
-        employees = requests.mapped('employee_id').ids
-        equipment_employees = requests.mapped('equipment_id.employee_id').ids
-        employee_map = self._build_employee_agreement_map(employees + equipment_employees)
+        staged = self._stage_maintenance_changes(requests, breakdowns)
+        created, updated = self._apply_maintenance_changes(staged)
+
         latest = last_sync
-        created = updated = 0
-        for request in requests:
-            record, is_created = self._upsert_request(request, employee_map)
-            if not record:
-                continue
-            if is_created:
-                created += 1
-            else:
-                updated += 1
-            timestamp = self._timestamp_from_record(request)
-            if timestamp:
-                latest = timestamp if not latest else max(latest, timestamp)
-        for breakdown in breakdowns:
-            record, is_created = self._upsert_breakdown(breakdown)
-            if not record:
-                continue
-            if is_created:
-                created += 1
-            else:
-                updated += 1
-            timestamp = self._timestamp_from_record(breakdown)
-            if timestamp:
-                latest = timestamp if not latest else max(latest, timestamp)
+        lag = {}
+        for sources in (requests, breakdowns):
+            timestamps = [ts for ts in (self._timestamp_from_record(source) for source in sources) if ts]
+            if timestamps:
+                latest = max([latest] + timestamps) if latest else max(timestamps)
+                lag[sources._name] = (now - min(timestamps)).total_seconds()
         if latest:
             ICP.set_param(self._MAINTENANCE_SYNC_PARAM, fields.Datetime.to_string(latest))
-        if created or updated:
-            _logger.info("Maintenance auto-sync: created=%s, updated=%s", created, updated)
+
+        duration = time.monotonic() - started
+        stats = {
+            'requests': len(requests),
+            'breakdowns': len(breakdowns),
+            'created': created,
+            'updated': updated,
+            'duration': duration,
+            'throughput': (len(requests) + len(breakdowns)) / duration if duration else 0.0,
+            'lag': lag,
+        }
+        if requests or breakdowns:
+            _logger.info(
+                "Maintenance auto-sync: %s requests, %s breakdowns in %.2fs (%.1f/s), created=%s, updated=%s, "
+                "lag requests=%.0fs breakdowns=%.0fs",
+                stats['requests'], stats['breakdowns'], duration, stats['throughput'], created, updated,
+                lag.get('maintenance.request', 0.0), lag.get('rmc.breakdown.event', 0.0),
+            )
+        return stats
 
     _sql_constraints = [
         (
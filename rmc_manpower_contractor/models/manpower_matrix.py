@@ -175,11 +175,18 @@ class RmcManpowerMatrix(models.Model):
     def create(self, vals_list):
         records = super().create(vals_list)
         records._update_parent_agreements()
+        records.agreement_id._mark_preview_stale()
+        # The expected headcount, hence every attendance compliance of the agreement, changed
+        self.env['rmc.agreement.kpi.snapshot']._rebuild(records.agreement_id)
         return records
 
     def write(self, vals):
+        old_agreements = self.agreement_id if 'agreement_id' in vals else self.env['rmc.contract.agreement']
         res = super().write(vals)
         self._update_parent_agreements()
+        (old_agreements | self.agreement_id)._mark_preview_stale()
+        if old_agreements:
+            self.env['rmc.agreement.kpi.snapshot']._rebuild(old_agreements | self.agreement_id)
         return res
 
     def unlink(self):
@@ -187,6 +194,8 @@ class RmcManpowerMatrix(models.Model):
         res = super().unlink()
         if agreements:
             agreements._update_manpower_totals_from_matrix()
+            agreements._mark_preview_stale()
+            self.env['rmc.agreement.kpi.snapshot']._rebuild(agreements)
         return res
 
     @api.depends(
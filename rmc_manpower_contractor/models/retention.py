@@ -17,6 +17,9 @@ class RmcAgreementRetention(models.Model):
     _inherit = ['mail.thread', 'mail.activity.mixin']
     _order = 'scheduled_release_date ASC, id DESC'
 
+    # Release groups (company and vendor or agreement) posted and committed together
+    _RELEASE_CHUNK_SIZE = 100
+
     name = fields.Char(string='Reference', default=lambda self: _('Retention Hold'), tracking=True, required=True)
     agreement_id = fields.Many2one(
         'rmc.contract.agreement',
@@ -112,6 +115,21 @@ class RmcAgreementRetention(models.Model):
         copy=False
     )
 
+    def init(self):
+        # Partial indexes behind the due detection of cron_release_due_entries
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS account_move_line_rmc_retention_due_idx
+                ON account_move_line (rmc_retention_release_due_date)
+             WHERE rmc_retention_entry_id IS NOT NULL
+               AND reconciled IS NOT TRUE
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS rmc_agreement_retention_pending_auto_idx
+                ON rmc_agreement_retention (id)
+             WHERE release_state = 'pending'
+               AND auto_release
+        """)
+
     @api.model_create_multi
     def create(self, vals_list):
         for vals in vals_list:
@@ -148,35 +166,41 @@ class RmcAgreementRetention(models.Model):
 
     @api.model
     def cron_release_due_entries(self):
-        """Cron job to auto release due retentions with accounting moves."""
+        """Cron job to auto release due retentions with accounting moves.
+
+        Due hold lines are found with one query and grouped per company and
+        vendor (or agreement). The groups are released in chunks whose
+        release moves are created, posted and reconciled together, and each
+        chunk is committed: a run that is interrupted leaves the remaining
+        retentions pending, and the next run picks up exactly those.
+        """
         today = fields.Date.context_today(self)
-        aml = self.env['account.move.line']
-        domain = [
-            ('rmc_retention_entry_id', '!=', False),
-            ('rmc_retention_release_due_date', '!=', False),
-            ('rmc_retention_release_due_date', '<=', today),
-            ('reconciled', '=', False),
-            ('company_id', '!=', False),
-            ('parent_state', '=', 'posted'),
-        ]
-        due_lines = aml.search(domain)
-        due_lines = due_lines.filtered(
-            lambda line: line.rmc_retention_entry_id
-            and line.rmc_retention_entry_id.release_state == 'pending'
-            and line.rmc_retention_entry_id.auto_release
-        )
-        if not due_lines:
-            return
         group_by_agreement = self._should_group_release_by_agreement()
-        grouped_lines = self._group_lines_for_release(due_lines, group_by_agreement)
-        for key, lines in grouped_lines.items():
+        groups = list(self._due_release_groups(today, group_by_agreement).items())
+        if not groups:
+            return
+        released = failed = 0
+        for start in range(0, len(groups), self._RELEASE_CHUNK_SIZE):
+            chunk = groups[start:start + self._RELEASE_CHUNK_SIZE]
             try:
-                self._process_release_group(lines, today, group_by_agreement)
+                with self.env.cr.savepoint():
+                    released += self._release_groups(chunk, today, group_by_agreement)
             except ValidationError:
                 # Bubble up so cron logs the configuration issue.
                 raise
             except Exception:
-                _logger.exception('Failed to auto-release retention group %s', key)
+                # Retry the groups one by one so a single bad group does not block the chunk
+                for key, line_ids in chunk:
+                    try:
+                        with self.env.cr.savepoint():
+                            released += self._release_groups([(key, line_ids)], today, group_by_agreement)
+                    except ValidationError:
+                        raise
+                    except Exception:
+                        failed += 1
+                        _logger.exception('Failed to auto-release retention group %s', key)
+            self.env['ir.cron']._commit_progress(len(chunk), remaining=len(groups) - start - len(chunk))
+        _logger.info("Retention auto-release: %s retentions released, %s groups failed.", released, failed)
 
     # ---------------------------------------------------------------------
     # Helpers
@@ -188,30 +212,83 @@ class RmcAgreementRetention(models.Model):
         )
         return str(param_value).lower() in ('1', 'true', 'yes')
 
-    def _group_lines_for_release(self, lines, group_by_agreement):
-        grouped = {}
-        for line in lines:
-            company_id = line.company_id.id
-            if group_by_agreement:
-                agreement = line.rmc_retention_entry_id.agreement_id
-                key = (company_id, agreement.id)
-            else:
-                partner = line.partner_id.commercial_partner_id if line.partner_id else False
-                key = (company_id, partner.id if partner else 0)
-            if key in grouped:
-                grouped[key] = grouped[key] | line
-            else:
-                grouped[key] = line
-        return grouped
+    @api.model
+    def _due_release_groups(self, release_date, group_by_agreement):
+        """Return ``{(company_id, agreement or commercial partner id): line_ids}`` of the hold lines due."""
+        self.env['account.move.line'].flush_model([
+            'rmc_retention_entry_id', 'rmc_retention_release_due_date', 'reconciled',
+            'company_id', 'parent_state', 'partner_id',
+        ])
+        self.flush_model(['release_state', 'auto_release', 'agreement_id'])
+        self.env.cr.execute("""
+            SELECT l.company_id, {target}, array_agg(l.id ORDER BY l.id)
+              FROM account_move_line l
+              JOIN rmc_agreement_retention r ON r.id = l.rmc_retention_entry_id
+         LEFT JOIN res_partner p ON p.id = l.partner_id
+             WHERE l.rmc_retention_entry_id IS NOT NULL
+               AND l.reconciled IS NOT TRUE
+               AND l.rmc_retention_release_due_date <= %(release_date)s
+               AND l.company_id IS NOT NULL
+               AND l.parent_state = 'posted'
+               AND r.release_state = 'pending'
+               AND r.auto_release
+          GROUP BY 1, 2
+          ORDER BY 1, 2
+        """.format(target='r.agreement_id' if group_by_agreement else 'COALESCE(p.commercial_partner_id, 0)'),
+            {'release_date': release_date})
+        return {(company_id, target_id): line_ids for company_id, target_id, line_ids in self.env.cr.fetchall()}
 
-    def _process_release_group(self, lines, release_date, group_by_agreement):
-        lines = lines.filtered(lambda l: not l.reconciled)
-        if not lines:
-            return
+    def _release_groups(self, groups, release_date, group_by_agreement):
+        """Release ``[(key, line_ids)]`` with one batch of release moves; return the retentions released."""
+        AccountMoveLine = self.env['account.move.line']
+        lines_all = AccountMoveLine.browse([line_id for _key, line_ids in groups for line_id in line_ids])
+        accounts_by_company = {}
+        plans = []
+        for _key, line_ids in groups:
+            lines = AccountMoveLine.browse(line_ids).with_prefetch(lines_all._prefetch_ids).filtered(
+                lambda l: not l.reconciled
+            )
+            if not lines:
+                continue
+            company = lines[0].company_id
+            if company not in accounts_by_company:
+                accounts_by_company[company] = (self._get_general_journal(company), self._get_bank_account(company))
+            journal, bank_account = accounts_by_company[company]
+            move_vals = self._prepare_release_move_vals(lines, release_date, group_by_agreement, journal, bank_account)
+            if move_vals:
+                plans.append((lines, move_vals))
+        if not plans:
+            return 0
+
+        release_moves = self.env['account.move'].create([move_vals for _lines, move_vals in plans])
+        release_moves.action_post()
+        reconcile_plan = []
+        for (lines, _move_vals), release_move in zip(plans, release_moves):
+            retention_account = lines[0].account_id
+            reconcile_plan.append(lines | release_move.line_ids.filtered(
+                lambda l: l.account_id == retention_account and l.debit
+            ))
+        AccountMoveLine._reconcile_plan(reconcile_plan)
+
+        entries = self.browse()
+        for (lines, _move_vals), release_move in zip(plans, release_moves):
+            group_entries = lines.rmc_retention_entry_id
+            group_entries.write({
+                'release_state': 'released',
+                'released_date': release_date,
+                'release_move_id': release_move.id,
+            })
+            entries |= group_entries
+        message = _('Retention released on %s') % release_date
+        bills = entries.move_id
+        for bill in bills:
+            bill.message_post(body=message)
+        bills.write({'retention_release_date': release_date})
+        return len(entries)
+
+    def _prepare_release_move_vals(self, lines, release_date, group_by_agreement, journal, bank_account):
         company = lines[0].company_id
         retention_account = lines[0].account_id
-        general_journal = self._get_general_journal(company)
-        bank_account = self._get_bank_account(company)
 
         agreement = lines[0].rmc_retention_entry_id.agreement_id
         partner = lines[0].partner_id.commercial_partner_id if lines[0].partner_id else False
@@ -223,7 +300,7 @@ class RmcAgreementRetention(models.Model):
 
         total_company_amount = sum(abs(line.amount_residual) for line in lines)
         if float_is_zero(total_company_amount, precision_rounding=company.currency_id.rounding):
-            return
+            return False
         currency, amount_currency = self._compute_currency_components(lines)
         ref = _('Retention Release — %s') % target_label
 
@@ -251,9 +328,9 @@ class RmcAgreementRetention(models.Model):
                 'amount_currency': -amount_currency,
             })
 
-        move_vals = {
+        return {
             'move_type': 'entry',
-            'journal_id': general_journal.id,
+            'journal_id': journal.id,
             'company_id': company.id,
             'date': release_date,
             'ref': ref,
@@ -262,24 +339,6 @@ class RmcAgreementRetention(models.Model):
                 (0, 0, credit_vals),
             ],
         }
-        release_move = self.env['account.move'].create(move_vals)
-        release_move.action_post()
-        debit_release_line = release_move.line_ids.filtered(
-            lambda l: l.account_id == retention_account and l.debit
-        )
-        (lines | debit_release_line).reconcile()
-
-        entries = lines.mapped('rmc_retention_entry_id')
-        entries.write({
-            'release_state': 'released',
-            'released_date': release_date,
-            'release_move_id': release_move.id,
-        })
-        message = _('Retention released on %s') % release_date
-        bills = entries.mapped('move_id')
-        for bill in bills:
-            bill.message_post(body=message)
-            bill.retention_release_date = release_date
 
     def _compute_currency_components(self, lines):
         currencies = lines.mapped('currency_id').filtered(lambda c: c)
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""Shared helpers for the models mirrored from other apps."""
+
+
+def sync_vals_differ(record, vals):
+    """Return whether writing ``vals`` (many2one values as ids) would change ``record``."""
+    record.ensure_one()
+    for fname, value in vals.items():
+        current = record[fname]
+        if record._fields[fname].type == 'many2one':
+            current = current.id
+        if current != value:
+            return True
+    return False
@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
 import base64
+from unittest.mock import patch
 
 from odoo import fields
 from odoo.tests import TransactionCase, tagged
-from odoo.exceptions import ValidationError
+from odoo.exceptions import UserError, ValidationError
 from datetime import datetime, timedelta
 
 @tagged('post_install', '-at_install')
@@ -702,3 +703,332 @@ class TestAgreementIntegration(TransactionCase):
         wizard_action = log.action_prepare_monthly_bill()
         wizard = self.env['rmc.billing.prepare.wizard'].with_context(wizard_action.get('context', {})).create({})
         self.assertEqual(wizard.mgq_achieved, 1500.0, 'Wizard should reuse the same MGQ sum when opened from log.')
+
+    def test_31_attendance_metrics_bounded_to_activity_window(self):
+        """Attendance totals come from the daily summary and skip entries before the activity start."""
+        employee = self.env['hr.employee'].create({'name': 'Summary Driver'})
+        start = fields.Date.from_string('2024-03-10')
+        self.agreement.write({'validity_start': start})
+        self.env['rmc.manpower.matrix'].create({
+            'agreement_id': self.agreement.id,
+            'designation': 'Driver',
+            'employee_id': employee.id,
+            'headcount': 1,
+            'shift': 'day',
+            'base_rate': 1000,
+            'remark': 'part_a',
+        })
+        start_dt = self.agreement._get_activity_start_datetime()
+        Attendance = self.env['hr.attendance']
+        old = Attendance.create({
+            'employee_id': employee.id,
+            'check_in': start_dt - timedelta(days=20),
+            'check_out': start_dt - timedelta(days=20) + timedelta(hours=8),
+        })
+        recent = Attendance.create([{
+            'employee_id': employee.id,
+            'check_in': start_dt + timedelta(days=offset, hours=2),
+            'check_out': start_dt + timedelta(days=offset, hours=10),
+        } for offset in (0, 3, 4)])
+
+        summary = self.env['rmc.agreement.attendance.daily'].search([('employee_id', '=', employee.id)])
+        self.assertEqual(sum(summary.mapped('attendance_count')), 4, 'Every attendance should be summarized.')
+        self.assertEqual(self.agreement.employee_attendance_count, 3)
+        self.assertEqual(self.agreement.employee_attendance_days, 3)
+        self.assertAlmostEqual(self.agreement.employee_attendance_hours, sum(recent.mapped('worked_hours')), places=4)
+        self.assertNotIn(old, self.agreement.employee_attendance_ids)
+
+        recent[-1].unlink()
+        old.write({'check_in': start_dt + timedelta(days=6), 'check_out': start_dt + timedelta(days=6, hours=8)})
+        self.agreement.invalidate_recordset()
+        self.assertEqual(self.agreement.employee_attendance_count, 3, 'Summary should follow deletes and moved entries.')
+        self.assertEqual(self.env['rmc.agreement.attendance.daily'].search_count([('employee_id', '=', employee.id)]), 3)
+
+    def test_32_attendance_sync_cron_upserts_compliance(self):
+        """The sync cron creates one compliance row per agreement/day and updates it in place."""
+        employees = self.env['hr.employee'].create([{'name': 'Sync Driver A'}, {'name': 'Sync Driver B'}])
+        self.env['rmc.manpower.matrix'].create([{
+            'agreement_id': self.agreement.id,
+            'designation': 'Driver',
+            'employee_id': employee.id,
+            'headcount': 1,
+            'shift': 'day',
+            'base_rate': 1000,
+            'remark': 'part_a',
+        } for employee in employees])
+        day = fields.Date.context_today(self.agreement) - timedelta(days=1)
+        check_in = datetime.combine(day, datetime.min.time()) + timedelta(hours=6)
+        self.env['hr.attendance'].create({
+            'employee_id': employees[0].id,
+            'check_in': check_in,
+            'check_out': check_in + timedelta(hours=8),
+        })
+        Compliance = self.env['rmc.attendance.compliance']
+        Compliance.cron_sync_from_hr_attendance()
+        record = Compliance.search([('agreement_id', '=', self.agreement.id), ('date', '=', day)])
+        self.assertEqual(len(record), 1)
+        self.assertEqual(record.employee_ids, employees[0])
+        self.assertEqual(record.headcount_present, 1)
+
+        self.env['hr.attendance'].create({
+            'employee_id': employees[1].id,
+            'check_in': check_in + timedelta(hours=1),
+            'check_out': check_in + timedelta(hours=9),
+        })
+        Compliance.cron_sync_from_hr_attendance()
+        self.assertEqual(Compliance.search([('agreement_id', '=', self.agreement.id), ('date', '=', day)]), record)
+        self.assertEqual(record.employee_ids, employees)
+        self.assertEqual(record.headcount_present, 2)
+        self.assertEqual(record.last_check_out, check_in + timedelta(hours=9))
+        ICP = self.env['ir.config_parameter'].sudo()
+        self.assertFalse(ICP.get_param('rmc.attendance.sync_resume_date'), 'A finished run should clear its resume point.')
+
+    def test_33_maintenance_sync_upserts_breakdown_checks(self):
+        """Breakdowns are mirrored once into maintenance checks, linked by source."""
+        breakdown = self.env['rmc.breakdown.event'].create({
+            'agreement_id': self.agreement.id,
+            'event_type': 'emergency',
+            'start_time': datetime.now() - timedelta(hours=4),
+            'end_time': datetime.now(),
+            'responsibility': 'contractor',
+            'is_mgq_achieved': False,
+        })
+        Check = self.env['rmc.maintenance.check']
+        stats = Check.cron_sync_from_maintenance()
+        check = Check.search([('breakdown_event_id', '=', breakdown.id)])
+        self.assertEqual(len(check), 1)
+        self.assertEqual(check.name, 'SYNC-BD-%s' % breakdown.id)
+        self.assertGreaterEqual(stats['created'], 1)
+        self.assertIn('rmc.breakdown.event', stats['lag'])
+
+        Check.cron_sync_from_maintenance()
+        self.assertEqual(Check.search([('breakdown_event_id', '=', breakdown.id)]), check,
+                         'A second run should update the same check instead of creating one.')
+
+    def test_34_batch_billing_run_bills_each_agreement(self):
+        """A batch run bills signed agreements and records the failures of the others."""
+        self._get_purchase_journal()
+        self.env['ir.attachment'].create({
+            'name': 'signed_agreement.pdf',
+            'res_model': 'rmc.contract.agreement',
+            'res_id': self.agreement.id,
+            'type': 'binary',
+            'datas': base64.b64encode(b'signed'),
+        })
+        unsigned = self.Agreement.create({
+            'name': 'TEST-BATCH-UNSIGNED',
+            'contractor_id': self.env['res.partner'].create({'name': 'Batch Contractor', 'supplier_rank': 1}).id,
+            'contract_type': 'driver_transport',
+            'validity_start': datetime.now().date(),
+            'validity_end': datetime.now().date() + timedelta(days=365),
+            'mgq_target': 1000.0,
+            'part_a_fixed': 20000.0,
+            'part_b_variable': 10000.0,
+        })
+        run = self.env['rmc.billing.batch.run'].create({
+            'period_start': fields.Date.from_string('2024-02-01'),
+            'period_end': fields.Date.from_string('2024-02-29'),
+            'agreement_ids': [(6, 0, (self.agreement | unsigned).ids)],
+        })
+        run.action_run()
+        self.assertEqual(run.state, 'running', 'Starting a run should only queue it for the cron.')
+        self.assertFalse(run.line_ids)
+        self.env['rmc.billing.batch.run'].cron_process_runs()
+
+        self.assertEqual(run.state, 'done')
+        billed = run.line_ids.filtered(lambda line: line.agreement_id == self.agreement)
+        failed = run.line_ids.filtered(lambda line: line.agreement_id == unsigned)
+        self.assertEqual(billed.state, 'done')
+        self.assertTrue(billed.bill_id, 'Signed agreement should get a vendor bill.')
+        self.assertEqual(billed.log_id.bill_id, billed.bill_id, 'The billing log should be linked to the bill.')
+        self.assertEqual(failed.state, 'failed')
+        self.assertFalse(failed.bill_id)
+        self.assertEqual((run.bill_count, run.failed_count), (1, 1))
+
+        run.action_run()
+        self.env['rmc.billing.batch.run'].cron_process_runs()
+        self.assertEqual(len(run.line_ids), 2, 'Re-running should not duplicate lines.')
+        self.assertEqual(
+            self.env['account.move'].search_count([('agreement_id', '=', self.agreement.id), ('move_type', '=', 'in_invoice')]),
+            len(billed.bill_id),
+            'Billed agreements are skipped when the run is resumed.',
+        )
+
+    def test_35_kpi_snapshots_follow_log_changes(self):
+        """Validated logs feed the monthly snapshots and the agreement KPIs by deltas."""
+        logs = self.DieselLog.create([{
+            'agreement_id': self.agreement.id,
+            'date': fields.Date.from_string(day),
+            'opening_ltr': 100,
+            'issued_ltr': 50,
+            'closing_ltr': 50,
+            'work_done_km': km,
+        } for day, km in (('2024-01-10', 250), ('2024-01-20', 150), ('2024-02-05', 200))])
+        logs.write({'state': 'validated'})
+
+        Snapshot = self.env['rmc.agreement.kpi.snapshot']
+        january = Snapshot.search([('agreement_id', '=', self.agreement.id), ('month', '=', '2024-01-01')])
+        self.assertEqual(january.diesel_log_count, 2)
+        self.assertAlmostEqual(january.avg_diesel_efficiency, 4.0, places=2)
+        self.assertAlmostEqual(self.agreement.avg_diesel_efficiency, 4.0, places=2)
+
+        logs[1].write({'issued_ltr': 30, 'state': 'validated'})
+        self.assertAlmostEqual(january.avg_diesel_efficiency, 5.0, places=2,
+                               msg='A changed log should move its month by the difference only.')
+
+        logs[2].unlink()
+        february = Snapshot.search([('agreement_id', '=', self.agreement.id), ('month', '=', '2024-02-01')])
+        self.assertEqual(february.diesel_log_count, 0)
+        self.assertAlmostEqual(self.agreement.avg_diesel_efficiency, 5.0, places=2)
+        self.assertEqual(self.agreement.stars, self.Agreement._kpi_stars(self.agreement.performance_score))
+
+        score = self.agreement.performance_score
+        self.agreement.compute_performance()
+        self.assertAlmostEqual(self.agreement.performance_score, score, places=2,
+                               msg='Rebuilding the snapshots should match the incremental totals.')
+
+    def test_36_retention_release_batches_groups_once(self):
+        """Due retentions of one vendor share a release move and are not released twice."""
+        past_date = fields.Date.today() - timedelta(days=95)
+        bills = self._create_vendor_bill(10000.0, invoice_date=past_date) | \
+            self._create_vendor_bill(8000.0, invoice_date=past_date)
+        bills.action_post()
+        self._run_retention_cron()
+        for bill in bills:
+            self._assert_retention_released(bill)
+        release_move = bills.retention_entry_ids.release_move_id
+        self.assertEqual(len(release_move), 1, 'Retentions of one vendor should be released by one move.')
+
+        self._run_retention_cron()
+        self.assertEqual(bills.retention_entry_ids.release_move_id, release_move,
+                         'A second run should not release the same retentions again.')
+
+    def test_37_preview_served_from_fingerprint_store(self):
+        """Previews are prerendered per fingerprint, served from the store and collected once superseded."""
+        Preview = self.env['rmc.agreement.preview']
+        batch_size = self.Agreement.search_count([('preview_stale', '=', True)]) or 1
+        self.Agreement.cron_prerender_previews(batch_size=batch_size)
+        fingerprint = self.agreement._compute_preview_cache_key()
+        preview = Preview.search([('fingerprint', '=', fingerprint)])
+        self.assertEqual(len(preview), 1)
+        self.assertFalse(self.agreement.preview_stale)
+        self.assertEqual(self.agreement.preview_cache_key, fingerprint)
+
+        pdf_bytes, _filename = self.agreement._get_cached_preview_pdf()
+        self.assertEqual(pdf_bytes, preview._get_pdf()[0])
+        self.assertEqual(Preview.search_count([('agreement_id', '=', self.agreement.id)]), 1,
+                         'An unchanged agreement should be served from the store.')
+
+        self.agreement.mgq_target = 1200.0
+        self.assertTrue(self.agreement.preview_stale)
+        self.Agreement.cron_prerender_previews(batch_size=batch_size)
+        self.assertNotEqual(self.agreement.preview_cache_key, fingerprint)
+
+        self.env.cr.execute(
+            "UPDATE rmc_agreement_preview SET create_date = create_date - interval '2 days' WHERE id = %s",
+            [preview.id],
+        )
+        Preview._gc_superseded_previews()
+        self.assertFalse(preview.exists(), 'The superseded preview should be collected.')
+        self.assertEqual(Preview.search_count([('agreement_id', '=', self.agreement.id)]), 1)
+
+    def test_38_attendance_sync_keeps_early_local_check_in_on_first_day(self):
+        """A check-in just after local midnight belongs to the step of its local day, not the UTC one."""
+        employee = self.env['hr.employee'].create({'name': 'Early Shift Driver'})
+        self.env['rmc.manpower.matrix'].create({
+            'agreement_id': self.agreement.id,
+            'designation': 'Driver',
+            'employee_id': employee.id,
+            'headcount': 1,
+            'shift': 'day',
+            'base_rate': 1000,
+            'remark': 'part_a',
+        })
+        day = fields.Date.context_today(self.agreement) - timedelta(days=3)
+        # 01:00 in Asia/Kolkata is 19:30 UTC on the previous day
+        check_in = datetime.combine(day, datetime.min.time()) - timedelta(hours=4, minutes=30)
+        self.env['hr.attendance'].create({
+            'employee_id': employee.id,
+            'check_in': check_in,
+            'check_out': check_in + timedelta(hours=8),
+        })
+        Compliance = self.env['rmc.attendance.compliance'].with_context(tz='Asia/Kolkata')
+        Compliance._sync_attendance_days(day - timedelta(days=1), day - timedelta(days=1))
+        self.assertFalse(Compliance.search([('agreement_id', '=', self.agreement.id), ('employee_ids', 'in', employee.ids)]),
+                         'The previous step should leave the attendance to the step of its local day.')
+        Compliance._sync_attendance_days(day, day)
+        record = Compliance.search([('agreement_id', '=', self.agreement.id), ('date', '=', day)])
+        self.assertEqual(len(record), 1)
+        self.assertIn(employee, record.employee_ids)
+
+    def test_39_batch_billing_isolates_failures(self):
+        """Failures only fail their line or run; reports are rendered for the bill they are attached to."""
+        self._get_purchase_journal()
+        broken = self.Agreement.create({
+            'name': 'TEST-BATCH-BROKEN',
+            'contractor_id': self.contractor.id,
+            'contract_type': 'driver_transport',
+            'validity_start': datetime.now().date(),
+            'validity_end': datetime.now().date() + timedelta(days=365),
+            'mgq_target': 1000.0,
+            'part_a_fixed': 20000.0,
+            'part_b_variable': 10000.0,
+        })
+        self.env['ir.attachment'].create([{
+            'name': 'signed_agreement.pdf',
+            'res_model': 'rmc.contract.agreement',
+            'res_id': agreement.id,
+            'type': 'binary',
+            'datas': base64.b64encode(b'signed'),
+        } for agreement in self.agreement | broken])
+        Run = self.env['rmc.billing.batch.run']
+        period = {
+            'period_start': fields.Date.from_string('2024-03-01'),
+            'period_end': fields.Date.from_string('2024-03-31'),
+        }
+        run = Run.create(dict(period, agreement_ids=[(6, 0, (self.agreement | broken).ids)]))
+        failing_run = Run.create(dict(period, agreement_ids=[(6, 0, self.agreement.ids)]))
+        (failing_run | run).action_run()
+
+        Wizard = type(self.env['rmc.billing.prepare.wizard'])
+        compute_amounts = Wizard._compute_billing_amounts
+        report_html = Wizard._supporting_report_html
+        rendered_for = []
+
+        def _compute_billing_amounts(wizards):
+            if broken in wizards.agreement_id:
+                raise ValidationError('Broken agreement')
+            return compute_amounts(wizards)
+
+        def _supporting_report_html(wizard, source_records, bill=None):
+            rendered_for.append(bill)
+            return report_html(wizard, source_records, bill=bill)
+
+        run_method = type(Run)._run
+
+        def _run(runs):
+            if runs == failing_run:
+                raise UserError('Run exploded')
+            return run_method(runs)
+
+        with patch.object(Wizard, '_compute_billing_amounts', _compute_billing_amounts), \
+                patch.object(Wizard, '_supporting_report_html', _supporting_report_html), \
+                patch.object(type(Run), '_run', _run):
+            Run.cron_process_runs()
+
+        self.assertEqual((failing_run.state, failing_run.message), ('failed', 'Run exploded'))
+        self.assertEqual(run.state, 'done', 'A failing run should not stop the next one.')
+        billed = run.line_ids.filtered(lambda line: line.agreement_id == self.agreement)
+        failed = run.line_ids.filtered(lambda line: line.agreement_id == broken)
+        self.assertEqual(billed.state, 'done', 'A chunk whose preparation fails is retried agreement by agreement.')
+        self.assertEqual((failed.state, failed.message), ('failed', 'Broken agreement'))
+        self.assertEqual(rendered_for, [billed.bill_id])
+
+        run.action_run()
+        with patch.object(Wizard, '_render_supporting_report', side_effect=UserError('wkhtmltopdf crashed')):
+            Run.cron_process_runs()
+        self.assertEqual(run.state, 'done')
+        self.assertEqual((failed.state, failed.message), ('failed', 'wkhtmltopdf crashed'))
+        self.assertFalse(failed.bill_id)
+        self.assertFalse(self.env['account.move'].search_count([('agreement_id', '=', broken.id)]),
+                         'The draft bill of a line whose report fails is removed.')
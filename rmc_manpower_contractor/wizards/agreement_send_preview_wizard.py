@@ -135,8 +135,7 @@ class AgreementSendPreviewWizard(models.TransientModel):
 
     def _refresh_preview(self):
         self.ensure_one()
-        pdf_bytes, filename = self.agreement_id._generate_contract_pdf()
-        self.agreement_id._store_preview_pdf(pdf_bytes, filename)
+        pdf_bytes, filename = self.agreement_id._render_preview_pdf()
         self.write({
             'pdf_preview': base64.b64encode(pdf_bytes).decode('utf-8'),
             'pdf_filename': filename,
@@ -163,8 +162,7 @@ class AgreementSendPreviewWizard(models.TransientModel):
         self.agreement_id._ensure_sign_template()
         if not self.agreement_id.sign_template_id:
             raise UserError(_('Please select a Sign Template before sending for signature.'))
-        pdf_bytes, filename = self.agreement_id._generate_contract_pdf()
-        self.agreement_id._store_preview_pdf(pdf_bytes, filename)
+        pdf_bytes, filename = self.agreement_id._render_preview_pdf()
         self.agreement_id._refresh_sign_template(pdf_bytes, filename)
         self.write({
             'part_a_fixed': self.agreement_id.part_a_fixed,
@@ -179,8 +177,7 @@ class AgreementSendPreviewWizard(models.TransientModel):
         self.agreement_id._ensure_sign_template()
         if not self.agreement_id.sign_template_id:
             raise UserError(_('Please select a Sign Template before preparing the Sign request.'))
-        pdf_bytes, filename = self.agreement_id._generate_contract_pdf()
-        self.agreement_id._store_preview_pdf(pdf_bytes, filename)
+        pdf_bytes, filename = self.agreement_id._render_preview_pdf()
         self.agreement_id._refresh_sign_template(pdf_bytes, filename)
         self.write({
             'part_a_fixed': self.agreement_id.part_a_fixed,
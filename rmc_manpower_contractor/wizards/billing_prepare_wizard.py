@@ -156,8 +156,38 @@ class RmcBillingPrepareWizard(models.Model):
             else:
                 wizard.bonus_penalty_pct = 0.0
 
+    def _records_by_wizard(self, model_name, date_field, domain=None):
+        """Return ``{wizard_id: records}`` of ``model_name`` for each wizard's agreement and period.
+
+        Runs one search per distinct billing period, however many wizards
+        (agreements) ``self`` holds.
+        """
+        Model = self.env[model_name]
+        wizards_by_period = defaultdict(list)
+        for wizard in self:
+            if wizard.agreement_id and wizard.period_start and wizard.period_end:
+                wizards_by_period[(wizard.period_start, wizard.period_end)].append(wizard)
+        result = {wizard.id: Model.browse() for wizard in self}
+        for (start, end), wizards in wizards_by_period.items():
+            records = Model.search(list(domain or []) + [
+                ('agreement_id', 'in', list({wizard.agreement_id.id for wizard in wizards})),
+                (date_field, '>=', start),
+                (date_field, '<=', end),
+            ])
+            ids_by_agreement = defaultdict(list)
+            for record in records:
+                ids_by_agreement[record.agreement_id.id].append(record.id)
+            for wizard in wizards:
+                result[wizard.id] = records.browse(ids_by_agreement[wizard.agreement_id.id])
+        return result
+
     def _apply_attendance_proration(self):
         """Populate attendance days on manpower lines based on compliance records."""
+        attendance_by_wizard = self._records_by_wizard('rmc.attendance.compliance', 'date')
+        for wizard in self:
+            wizard._apply_attendance_proration_from(attendance_by_wizard[wizard.id])
+
+    def _apply_attendance_proration_from(self, attendance_records):
         self.ensure_one()
         if not self.agreement_id or not self.period_start or not self.period_end:
             return
@@ -169,12 +199,6 @@ class RmcBillingPrepareWizard(models.Model):
         if not start_date or not end_date or end_date < start_date:
             return
         scheduled_days = (end_date - start_date).days + 1
-        Attendance = self.env['rmc.attendance.compliance']
-        attendance_records = Attendance.search([
-            ('agreement_id', '=', self.agreement_id.id),
-            ('date', '>=', start_date),
-            ('date', '<=', end_date),
-        ])
         employee_present_days = defaultdict(float)
         total_man_days = 0.0
         for record in attendance_records:
@@ -222,6 +246,12 @@ class RmcBillingPrepareWizard(models.Model):
         'period_end'
     )
     def _compute_billing_amounts(self):
+        breakdowns_by_wizard = self._records_by_wizard(
+            'rmc.breakdown.event', 'start_time', [('state', 'in', ('confirmed', 'closed'))]
+        )
+        inventory_by_wizard = self._records_by_wizard(
+            'rmc.inventory.handover', 'date', [('state', '!=', 'reconciled')]
+        )
         for wizard in self:
             # Part-A: Sum of all Part-A entries in manpower matrix
             part_a_lines = wizard.agreement_id.manpower_matrix_ids.filtered(lambda x: x.remark == 'part_a')
@@ -248,21 +278,11 @@ class RmcBillingPrepareWizard(models.Model):
                 wizard.part_b_amount = part_b_base * (wizard.mgq_achievement_pct / 100.0)
             
             # Breakdown deductions (Clause 9)
-            breakdown_events = wizard.env['rmc.breakdown.event'].search([
-                ('agreement_id', '=', wizard.agreement_id.id),
-                ('start_time', '>=', wizard.period_start),
-                ('start_time', '<=', wizard.period_end),
-                ('state', 'in', ('confirmed', 'closed'))
-            ])
+            breakdown_events = breakdowns_by_wizard[wizard.id]
             wizard.breakdown_deduction = sum(breakdown_events.mapped('deduction_amount'))
             
             # Inventory variance
-            inventory_items = wizard.env['rmc.inventory.handover'].search([
-                ('agreement_id', '=', wizard.agreement_id.id),
-                ('date', '>=', wizard.period_start),
-                ('date', '<=', wizard.period_end),
-                ('state', '!=', 'reconciled')
-            ])
+            inventory_items = inventory_by_wizard[wizard.id]
             wizard.inventory_variance = sum(inventory_items.mapped('variance_value'))
             
             # Bonus/Penalty
@@ -312,7 +332,28 @@ class RmcBillingPrepareWizard(models.Model):
         self._sync_mgq_with_prime_output()
         self._apply_attendance_proration()
         self._compute_billing_amounts()
-        
+        bill = self._create_bill()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'account.move',
+            'res_id': bill.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
+
+    def _create_bill(self, source_records=None, report_pdf=None):
+        """Create the vendor bill, its attachments and billing log from the computed amounts.
+
+        ``source_records`` and ``report_pdf`` (the rendered supporting report)
+        may be given by a batch run that prepared them for many agreements
+        at once; they are collected and rendered here otherwise.
+        """
+        self.ensure_one()
+        return self._complete_bill(self._create_bill_move(), source_records=source_records, report_pdf=report_pdf)
+
+    def _create_bill_move(self):
+        """Create the draft vendor bill and its invoice lines."""
+        self.ensure_one()
         # Pre-flight checks
         if self.agreement_id.payment_hold:
             raise ValidationError(
@@ -338,14 +379,23 @@ class RmcBillingPrepareWizard(models.Model):
         
         bill = self.env['account.move'].create(bill_vals)
 
-        # Collect source records used for both attachments and log summary
-        source_records = self._collect_source_records()
-
         # Create invoice lines
         self._create_invoice_lines(bill)
+        return bill
+
+    def _complete_bill(self, bill, source_records=None, report_pdf=None):
+        """Attach the supporting reports to ``bill``, log it and start its approval chain.
+
+        ``report_pdf`` must have been rendered for ``bill``; it is rendered
+        here when missing.
+        """
+        self.ensure_one()
+        # Collect source records used for both attachments and log summary
+        if source_records is None:
+            source_records = self._collect_source_records()
 
         # Attach supporting reports
-        attachments = self._attach_reports(bill, source_records)
+        attachments = self._attach_reports(bill, source_records, pdf_content=report_pdf)
 
         # Reconcile inventory
         self._reconcile_inventory()
@@ -376,14 +426,7 @@ class RmcBillingPrepareWizard(models.Model):
         self._create_approval_chain(bill)
         
         self.state = 'done'
-        
-        return {
-            'type': 'ir.actions.act_window',
-            'res_model': 'account.move',
-            'res_id': bill.id,
-            'view_mode': 'form',
-            'target': 'current',
-        }
+        return bill
 
     def _create_billing_log(self, bill, attachments, source_records):
         """Persist a snapshot of the wizard data whenever a bill is created."""
@@ -465,38 +508,26 @@ class RmcBillingPrepareWizard(models.Model):
     def _collect_source_records(self):
         """Fetch datasets per type for the selected period."""
         self.ensure_one()
-        attendance_data = self.env['rmc.attendance.compliance'].search([
-            ('agreement_id', '=', self.agreement_id.id),
-            ('date', '>=', self.period_start),
-            ('date', '<=', self.period_end),
-        ])
-
-        diesel_data = self.env['rmc.diesel.log'].search([
-            ('agreement_id', '=', self.agreement_id.id),
-            ('date', '>=', self.period_start),
-            ('date', '<=', self.period_end),
-        ])
-        if not diesel_data:
-            diesel_data = self._collect_fallback_diesel_logs()
-
-        maintenance_data = self.env['rmc.maintenance.check'].search([
-            ('agreement_id', '=', self.agreement_id.id),
-            ('date', '>=', self.period_start),
-            ('date', '<=', self.period_end),
-        ])
-
-        breakdown_data = self.env['rmc.breakdown.event'].search([
-            ('agreement_id', '=', self.agreement_id.id),
-            ('start_time', '>=', self.period_start),
-            ('start_time', '<=', self.period_end),
-        ])
-
-        return {
-            'attendance': attendance_data,
-            'diesel': diesel_data,
-            'maintenance': maintenance_data,
-            'breakdown': breakdown_data,
-        }
+        return self._collect_source_records_batch()[self.id]
+
+    def _collect_source_records_batch(self):
+        """Return ``{wizard_id: datasets}`` as :meth:`_collect_source_records`, with one search per type."""
+        attendance = self._records_by_wizard('rmc.attendance.compliance', 'date')
+        diesel = self._records_by_wizard('rmc.diesel.log', 'date')
+        maintenance = self._records_by_wizard('rmc.maintenance.check', 'date')
+        breakdown = self._records_by_wizard('rmc.breakdown.event', 'start_time')
+        result = {}
+        for wizard in self:
+            diesel_data = diesel[wizard.id]
+            if not diesel_data and wizard.agreement_id and wizard.period_start and wizard.period_end:
+                diesel_data = wizard._collect_fallback_diesel_logs()
+            result[wizard.id] = {
+                'attendance': attendance[wizard.id],
+                'diesel': diesel_data,
+                'maintenance': maintenance[wizard.id],
+                'breakdown': breakdown[wizard.id],
+            }
+        return result
 
     def _localize_datetime_to_date(self, dt_value):
         if not dt_value:
@@ -762,8 +793,12 @@ class RmcBillingPrepareWizard(models.Model):
                 'price_unit': -self.tds_amount,
             })
 
-    def _attach_reports(self, bill, source_records):
-        """Attach supporting PDF reports to the bill and return created attachments."""
+    def _attach_reports(self, bill, source_records, pdf_content=None):
+        """Attach supporting PDF reports to the bill and return created attachments.
+
+        ``pdf_content`` is the supporting report already rendered by
+        :meth:`_render_supporting_report`; it is rendered here when missing.
+        """
         Attachment = self.env['ir.attachment'].with_context(no_document=True)
         attachments = {
             'all': self.env['ir.attachment'],
@@ -772,27 +807,11 @@ class RmcBillingPrepareWizard(models.Model):
             'maintenance': False,
             'breakdown': False,
         }
-        sections = []
-        section_keys = []
-
-        if self.attach_attendance:
-            sections.append(self._generate_attendance_section(source_records.get('attendance')))
-            section_keys.append('attendance')
-        if self.attach_diesel:
-            sections.append(self._generate_diesel_section(source_records.get('diesel')))
-            section_keys.append('diesel')
-        if self.attach_maintenance:
-            sections.append(self._generate_maintenance_section(source_records.get('maintenance')))
-            section_keys.append('maintenance')
-        if self.attach_breakdown:
-            sections.append(self._generate_breakdown_section(source_records.get('breakdown')))
-            section_keys.append('breakdown')
-
-        if not sections:
+        section_keys = self._supporting_section_keys()
+        if not section_keys:
             return attachments
-
-        html_content = self._wrap_sections_html(sections, bill=bill)
-        pdf_content = self.env['ir.actions.report']._run_wkhtmltopdf([html_content], landscape=False)
+        if pdf_content is None:
+            pdf_content = self._render_supporting_report(self._supporting_report_html(source_records, bill=bill))
         combined_attachment = Attachment.create({
             'name': f'Supporting_Report_{self.period_start.strftime("%Y%m")}.pdf',
             'type': 'binary',
@@ -806,6 +825,39 @@ class RmcBillingPrepareWizard(models.Model):
             attachments[key] = combined_attachment
 
         return attachments
+
+    def _supporting_section_keys(self):
+        self.ensure_one()
+        return [
+            key for key, enabled in (
+                ('attendance', self.attach_attendance),
+                ('diesel', self.attach_diesel),
+                ('maintenance', self.attach_maintenance),
+                ('breakdown', self.attach_breakdown),
+            ) if enabled
+        ]
+
+    def _supporting_report_html(self, source_records, bill=None):
+        """Return the HTML of the supporting report, or ``None`` when no section is selected."""
+        self.ensure_one()
+        sections = []
+
+        if self.attach_attendance:
+            sections.append(self._generate_attendance_section(source_records.get('attendance')))
+        if self.attach_diesel:
+            sections.append(self._generate_diesel_section(source_records.get('diesel')))
+        if self.attach_maintenance:
+            sections.append(self._generate_maintenance_section(source_records.get('maintenance')))
+        if self.attach_breakdown:
+            sections.append(self._generate_breakdown_section(source_records.get('breakdown')))
+        if not sections:
+            return None
+        return self._wrap_sections_html(sections, bill=bill)
+
+    @api.model
+    def _render_supporting_report(self, html_content):
+        return self.env['ir.actions.report']._run_wkhtmltopdf([html_content], landscape=False)
+
     def _reconcile_inventory(self):
         """Reconcile all inventory handovers for the period"""
         inventory_items = self.env['rmc.inventory.handover'].search([